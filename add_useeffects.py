@@ -1,13 +1,17 @@
-import re
+"""Patch set: OSM building layer effects and the Google Buildings placeholder.
 
-# Read the file
-with open(r'c:\Users\jrobertson\Downloads\SPWS1\components\SiteMap.tsx', 'r', encoding='utf-8') as f:
-    content = f.read()
+Run on its own (``python add_useeffects.py [--dry-run] [--root DIR]``) or through patch_engine.py.
+"""
 
-# Find and add OSM useEffects after activeToolRef useEffect
-insert_marker = 'useEffect(() => { activeToolRef.current = activeTool; }, [activeTool]);'
+import sys
 
-osm_code = """
+from patch_engine import insert_after, main
+
+SITEMAP = 'components/SiteMap.tsx'
+
+MARKER = 'useEffect(() => { activeToolRef.current = activeTool; }, [activeTool]);'
+
+OSM_EFFECTS = """
 
     // OSM Buildings Layer
     useEffect(() => {
@@ -70,9 +74,10 @@ osm_code = """
         }
     }, [showGoogleBuildings]);"""
 
-content = content.replace(insert_marker, insert_marker + osm_code)
+PATCHES = [
+    insert_after(SITEMAP, MARKER, OSM_EFFECTS, name='osm-building-effects'),
+]
 
-with open(r'c:\Users\jrobertson\Downloads\SPWS1\components\SiteMap.tsx', 'w', encoding='utf-8') as f:
-    f.write(content)
 
-print('Step 2/3 complete: Added OSM useEffect hooks')
+if __name__ == '__main__':
+    sys.exit(main(patches=PATCHES))
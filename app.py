@@ -0,0 +1,371 @@
+"""Local analytics backend: an offline stand-in for the Google Apps Script web app.
+
+Speaks the same protocol as the script in GOOGLE_APPS_SCRIPT_SETUP.md. GET or POST with an
+``action`` of ``log_report``, ``feedback`` or ``get_stats`` (query string or JSON body),
+so pointing VITE_ANALYTICS_URL at http://localhost:5000/exec is the only change the
+frontend needs.
+
+Logs live in SQLite (WAL mode). Triggers keep a one-row aggregate table current on every
+insert, so ``get_stats`` reads that row plus the newest page of logs. Its cost does not
+grow with the size of the log.
+
+Usage:
+    python app.py                                 # serve on :5000 with ./analytics.db
+    python app.py --db data/analytics.db --port 5001
+    python app.py --import analytics_data.json    # load the legacy server.js log, then serve
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+from flask import Flask, g, jsonify, request
+from flask_cors import CORS
+
+DEFAULT_DB = os.environ.get('ANALYTICS_DB', 'analytics.db')
+DEFAULT_PORT = int(os.environ.get('PORT', 5000))
+RECENT_LOGS = 50  # Same page size the Apps Script returned
+MAX_PAGE = 500
+MAX_BULK = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id TEXT,
+    received_at TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    site_name TEXT,
+    contract_number TEXT,
+    lat REAL,
+    lng REAL,
+    population REAL NOT NULL DEFAULT 0,
+    design_population REAL NOT NULL DEFAULT 0,
+    system_type TEXT,
+    solar_capex REAL NOT NULL DEFAULT 0,
+    handpump_capex REAL NOT NULL DEFAULT 0,
+    solar_net_value REAL NOT NULL DEFAULT 0,
+    handpump_net_value REAL NOT NULL DEFAULT 0,
+    winner TEXT,
+    time_spent_seconds REAL NOT NULL DEFAULT 0,
+    perf TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS logs_client_id ON logs(client_id) WHERE client_id IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    received_at TEXT NOT NULL,
+    timestamp TEXT,
+    message TEXT NOT NULL
+);
+
+-- Running totals, maintained by the triggers below. `version` changes on every write
+-- and doubles as the ETag for anything derived from the log.
+CREATE TABLE IF NOT EXISTS stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_reports INTEGER NOT NULL DEFAULT 0,
+    total_population REAL NOT NULL DEFAULT 0,
+    total_capex REAL NOT NULL DEFAULT 0,
+    total_time REAL NOT NULL DEFAULT 0,
+    solar_wins INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO stats (id) VALUES (1);
+
+CREATE TRIGGER IF NOT EXISTS logs_stats_insert AFTER INSERT ON logs BEGIN
+    UPDATE stats SET
+        total_reports = total_reports + 1,
+        total_population = total_population + NEW.population,
+        total_capex = total_capex + NEW.solar_capex,
+        total_time = total_time + NEW.time_spent_seconds,
+        solar_wins = solar_wins + (NEW.winner IS 'Solar'),
+        version = version + 1
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS logs_stats_delete AFTER DELETE ON logs BEGIN
+    UPDATE stats SET
+        total_reports = total_reports - 1,
+        total_population = total_population - OLD.population,
+        total_capex = total_capex - OLD.solar_capex,
+        total_time = total_time - OLD.time_spent_seconds,
+        solar_wins = solar_wins - (OLD.winner IS 'Solar'),
+        version = version + 1
+    WHERE id = 1;
+END;
+"""
+
+LOG_COLUMNS = (
+    'client_id', 'received_at', 'timestamp', 'site_name', 'contract_number', 'lat', 'lng',
+    'population', 'design_population', 'system_type', 'solar_capex', 'handpump_capex',
+    'solar_net_value', 'handpump_net_value', 'winner', 'time_spent_seconds', 'perf',
+)
+INSERT_LOG = f"INSERT OR IGNORE INTO logs ({', '.join(LOG_COLUMNS)}) VALUES ({', '.join('?' * len(LOG_COLUMNS))})"
+INSERT_FEEDBACK = 'INSERT INTO feedback (received_at, timestamp, message) VALUES (?, ?, ?)'
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def open_db(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')  # Safe under WAL; one fsync per checkpoint
+    conn.executescript(SCHEMA)
+    # Databases created before reports carried client timings
+    if 'perf' not in {col['name'] for col in conn.execute('PRAGMA table_info(logs)')}:
+        conn.execute('ALTER TABLE logs ADD COLUMN perf TEXT')
+    return conn
+
+
+def number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def log_row(entry, received_at):
+    """Maps a ReportLog payload (types.ts) onto the logs columns."""
+    location = entry.get('location') or {}
+    return (
+        entry.get('id'),
+        received_at,
+        entry.get('timestamp') or received_at,
+        entry.get('siteName') or '',
+        entry.get('contractNumber') or '',
+        location.get('lat'),
+        location.get('lng'),
+        number(entry.get('population')),
+        number(entry.get('designPopulation')),
+        entry.get('systemType'),
+        number(entry.get('solarCapex')),
+        number(entry.get('handpumpCapex')),
+        number(entry.get('solarNetValue')),
+        number(entry.get('handpumpNetValue')),
+        entry.get('winner'),
+        number(entry.get('timeSpentSeconds')),
+        json.dumps(entry['perf']) if isinstance(entry.get('perf'), dict) else None,
+    )
+
+
+def row_to_log(row):
+    """Inverse of log_row, shaped like the ReportLog the Dashboard renders."""
+    log = {
+        'id': row['client_id'] or str(row['id']),
+        'cursor': row['id'],
+        'timestamp': row['timestamp'],
+        'timeSpentSeconds': row['time_spent_seconds'],
+        'siteName': row['site_name'],
+        'contractNumber': row['contract_number'],
+        'population': row['population'],
+        'designPopulation': row['design_population'],
+        'systemType': row['system_type'],
+        'solarCapex': row['solar_capex'],
+        'handpumpCapex': row['handpump_capex'],
+        'solarNetValue': row['solar_net_value'],
+        'handpumpNetValue': row['handpump_net_value'],
+        'winner': row['winner'],
+    }
+    if row['lat'] is not None and row['lng'] is not None:
+        log['location'] = {'lat': row['lat'], 'lng': row['lng']}
+    if row['perf']:
+        log['perf'] = json.loads(row['perf'])
+    return log
+
+
+def insert_logs(conn, entries):
+    """Inserts in one transaction; entries whose client id is already stored are skipped."""
+    received_at = now_iso()
+    count = 'SELECT total_reports FROM stats WHERE id = 1'
+    with conn:
+        before = conn.execute(count).fetchone()[0]
+        conn.executemany(INSERT_LOG, [log_row(e, received_at) for e in entries if isinstance(e, dict)])
+        return conn.execute(count).fetchone()[0] - before
+
+
+def insert_feedback(conn, entries):
+    received_at = now_iso()
+    rows = [(received_at, e.get('timestamp'), str(e.get('message', ''))) for e in entries
+            if isinstance(e, dict) and e.get('message')]
+    with conn:
+        conn.executemany(INSERT_FEEDBACK, rows)
+    return len(rows)
+
+
+def unpack_batch(data):
+    """Items of a queued batch; `gzip+base64` bodies are inflated first. None when malformed."""
+    if not isinstance(data, dict):
+        return None
+    if data.get('encoding') == 'gzip+base64':
+        try:
+            data = json.loads(gzip.decompress(base64.b64decode(data.get('data', ''))))
+        except (ValueError, OSError, EOFError):
+            return None
+    items = data.get('items') if isinstance(data, dict) else None
+    return [i for i in items if isinstance(i, dict)] if isinstance(items, list) else None
+
+
+def read_version(conn):
+    return conn.execute('SELECT version FROM stats WHERE id = 1').fetchone()['version']
+
+
+def read_page(conn, before=None, limit=RECENT_LOGS):
+    """Newest-first keyset page: rows with id < before, walked on the primary key."""
+    if before is None:
+        rows = conn.execute('SELECT * FROM logs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    else:
+        rows = conn.execute('SELECT * FROM logs WHERE id < ? ORDER BY id DESC LIMIT ?', (before, limit)).fetchall()
+    logs = [row_to_log(r) for r in rows]
+    next_cursor = logs[-1]['cursor'] if len(logs) == limit else None
+    return logs, next_cursor
+
+
+def read_stats(conn):
+    s = conn.execute('SELECT * FROM stats WHERE id = 1').fetchone()
+    n = s['total_reports']
+    logs, next_cursor = read_page(conn)
+    return {
+        'totalReports': n,
+        'totalPopulationServed': s['total_population'],
+        'totalCapexEstimated': s['total_capex'],
+        'avgTimeSpentSeconds': round(s['total_time'] / n) if n else 0,
+        'solarWinRate': round(s['solar_wins'] / n * 100) if n else 0,
+        'recentLogs': logs,
+        'nextCursor': next_cursor,
+    }
+
+
+def create_app(db_path=DEFAULT_DB):
+    app = Flask(__name__)
+    CORS(app)
+    app.config['DB_PATH'] = db_path
+    open_db(db_path).close()  # Create the schema up front
+
+    def db():
+        if 'db' not in g:
+            g.db = open_db(app.config['DB_PATH'])
+        return g.db
+
+    @app.teardown_appcontext
+    def close_db(_exc):
+        conn = g.pop('db', None)
+        if conn is not None:
+            conn.close()
+
+    def payload():
+        # The frontend posts with mode: 'no-cors', which turns the body into text/plain
+        data = request.get_json(force=True, silent=True)
+        return data if isinstance(data, (dict, list)) else {}
+
+    def cached(etag, build):
+        """Answers 304 when the client already holds this version; otherwise builds the body."""
+        if etag in request.if_none_match:
+            return '', 304, {'ETag': f'"{etag}"'}
+        response = jsonify(build())
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'  # Always revalidate, reuse on 304
+        return response
+
+    @app.route('/exec', methods=['GET', 'POST'])
+    @app.route('/', methods=['GET', 'POST'])
+    def handle_request():
+        """Apps Script compatible router."""
+        data = payload()
+        action = (data.get('action') if isinstance(data, dict) else None) or request.args.get('action')
+        conn = db()
+        if action == 'get_stats':
+            return cached(f'stats-{read_version(conn)}', lambda: read_stats(conn))
+        if action == 'log_report':
+            insert_logs(conn, [data])
+            return jsonify({'status': 'success'})
+        if action == 'feedback':
+            insert_feedback(conn, [data])
+            return jsonify({'status': 'success'})
+        if action == 'capabilities':
+            return jsonify({'capabilities': ['batch', 'gzip']})
+        if action == 'batch':
+            items = unpack_batch(data)
+            if items is None:
+                return jsonify({'status': 'error', 'message': 'Malformed batch'}), 400
+            if len(items) > MAX_BULK:
+                return jsonify({'status': 'error', 'message': f'At most {MAX_BULK} items per request'}), 413
+            inserted = insert_logs(conn, [i for i in items if i.get('action') == 'log_report'])
+            insert_feedback(conn, [i for i in items if i.get('action') == 'feedback'])
+            return jsonify({'status': 'success', 'inserted': inserted})
+        return jsonify({'status': 'error', 'message': f'Unknown action: {action}'}), 400
+
+    @app.get('/api/logs')
+    def list_logs():
+        before = request.args.get('before', type=int)
+        limit = max(1, min(MAX_PAGE, request.args.get('limit', RECENT_LOGS, type=int)))
+        conn = db()
+
+        def build():
+            logs, next_cursor = read_page(conn, before, limit)
+            return {'logs': logs, 'nextCursor': next_cursor}
+        # Older pages only change when the log is edited, which also bumps the version
+        return cached(f'logs-{read_version(conn)}-{before}-{limit}', build)
+
+    def bulk(insert):
+        data = payload()
+        entries = data if isinstance(data, list) else data.get('items', [])
+        if not isinstance(entries, list):
+            return jsonify({'status': 'error', 'message': 'Expected a JSON array or {"items": [...]}'}), 400
+        if len(entries) > MAX_BULK:
+            return jsonify({'status': 'error', 'message': f'At most {MAX_BULK} items per request'}), 413
+        return jsonify({'status': 'success', 'inserted': insert(db(), entries)})
+
+    @app.post('/api/logs/bulk')
+    def bulk_logs():
+        return bulk(insert_logs)
+
+    @app.post('/api/feedback/bulk')
+    def bulk_feedback():
+        return bulk(insert_feedback)
+
+    return app
+
+
+def import_legacy(db_path, json_path):
+    """Loads reports and feedback from the old server.js analytics_data.json."""
+    with open(json_path, encoding='utf-8') as f:
+        data = json.load(f)
+    conn = open_db(db_path)
+    # server.js kept newest first; insert oldest first so ids follow time
+    reports = list(reversed(data.get('reports', [])))
+    feedback = list(reversed(data.get('feedback', [])))
+    started = time.perf_counter()
+    n_logs = insert_logs(conn, reports)
+    n_feedback = insert_feedback(conn, feedback)
+    conn.close()
+    print(f'Imported {n_logs} reports and {n_feedback} feedback entries from {json_path} '
+          f'in {time.perf_counter() - started:.2f}s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=DEFAULT_DB, help='SQLite database path (default: %(default)s)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--import', dest='import_path', help='Load a legacy analytics_data.json before serving')
+    parser.add_argument('--import-only', action='store_true', help='Exit after --import instead of serving')
+    args = parser.parse_args(argv)
+
+    if args.import_path:
+        import_legacy(args.db, args.import_path)
+        if args.import_only:
+            return 0
+    create_app(args.db).run(host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import { readFileSync, writeFileSync, existsSync } from 'node:fs';
+import os from 'node:os';
+import process from 'node:process';
+import { DEFAULT_ADDITIONAL_BENEFITS, DEFAULT_BENEFITS, DEFAULT_DESIGN_SEARCH, DEFAULT_GLOBAL, DEFAULT_HANDPUMP, DEFAULT_HYDRAULICS, DEFAULT_REVENUE, DEFAULT_SOLAR } from '../constants';
+import { designSystem } from '../utils/boq';
+import { calculateNPV, runMonteCarloSimulation } from '../utils/calculations';
+import { classifyCoverage } from '../utils/coverage';
+import { createDesignProblem, lifecycleCostModel, optimizeDesign } from '../utils/designOptimizer';
+import { buildPipeNetwork, headAtChainage, profileChainage, profileRows, solveNetwork } from '../utils/hydraulics';
+import { densifyPath, nearestConnections } from '../utils/networkModel';
+import { createSimulationRun } from '../utils/simulation';
+import { createVillage, Village, VillageSpec } from './village';
+
+// --- Benchmarks for the computational hot paths ---
+// Times coverage classification, the auto-connection search, profile generation (network
+// solve + profile rows), calculateNPV and both Monte Carlo models on synthetic villages at
+// several scales. Results go to bench/results.json and are compared against
+// bench/baseline.json; a case whose median is more than --threshold slower is reported as
+// a regression and the run exits non-zero. Baselines are machine-specific: refresh them
+// with --update-baseline on the machine that runs the comparison.
+//
+//     npm run bench                      # run everything, compare with the baseline
+//     npm run bench -- --filter coverage --threshold 0.1
+//     npm run bench -- --update-baseline
+
+interface CaseResult {
+    medianMs: number; // Per operation
+    minMs: number;
+    samples: number;
+    params: Record<string, number>;
+}
+
+interface BenchFile {
+    schema: 1;
+    runtime: string;
+    cpu: string;
+    date: string;
+    results: Record<string, CaseResult>;
+}
+
+const args = process.argv.slice(2);
+const flag = (name: string) => args.includes(`--${name}`);
+const option = (name: string, fallback: string) => {
+    const i = args.indexOf(`--${name}`);
+    return i >= 0 && i + 1 < args.length ? args[i + 1] : fallback;
+};
+
+const OUT = option('out', 'bench/results.json');
+const BASELINE = option('baseline', 'bench/baseline.json');
+const THRESHOLD = parseFloat(option('threshold', '0.25'));
+const FILTER = option('filter', '');
+const MIN_TIME_MS = flag('quick') ? 100 : 500;
+const MIN_SAMPLES = flag('quick') ? 3 : 7;
+const NOISE_FLOOR_MS = 0.05; // Differences below this are never reported
+
+const SCALES: Record<string, VillageSpec> = {
+    small: { buildings: 2000, vertices: 200, taps: 20 },
+    medium: { buildings: 20000, vertices: 1000, taps: 100 },
+    large: { buildings: 100000, vertices: 5000, taps: 500 }
+};
+
+// --- Helper: Median time per call. Fast calls are repeated inside a sample so each
+// sample lasts at least ~1 ms and timer resolution does not dominate. ---
+const measure = (fn: () => unknown): { medianMs: number, minMs: number, samples: number } => {
+    let t0 = performance.now();
+    fn(); // Warm-up (JIT, caches)
+    const first = performance.now() - t0;
+    const reps = Math.max(1, Math.ceil(1 / Math.max(first, 1e-3)));
+    const times: number[] = [];
+    const started = performance.now();
+    while (times.length < MIN_SAMPLES || performance.now() - started < MIN_TIME_MS) {
+        t0 = performance.now();
+        for (let r = 0; r < reps; r++) fn();
+        times.push((performance.now() - t0) / reps);
+        if (times.length >= 1000) break;
+    }
+    times.sort((a, b) => a - b);
+    const round = (ms: number) => Number(ms.toPrecision(4));
+    return { medianMs: round(times[times.length >> 1]), minMs: round(times[0]), samples: times.length };
+};
+
+// --- Cases ---
+const npvInputs = (lifespan: number) => ({
+    global: { ...DEFAULT_GLOBAL, projectLifespan: lifespan },
+    solar: DEFAULT_SOLAR,
+    handpump: DEFAULT_HANDPUMP,
+    revenue: DEFAULT_REVENUE,
+    benefits: DEFAULT_BENEFITS,
+    additionalBenefits: DEFAULT_ADDITIONAL_BENEFITS
+});
+
+const { specs } = designSystem({
+    population: DEFAULT_GLOBAL.population, risingLen: 300, mainLen: 1500, distLen: 2500, hasRisingMain: true,
+    taps: 12, schools: 1, clinics: 1, gardens: 0, hasGrid: false
+}, DEFAULT_HYDRAULICS);
+
+const profilesCase = (v: Village) => {
+    const requests = [...v.taps, ...v.institutions];
+    const connections = nearestConnections(requests, v.mains, v.tank);
+    const points = new Map(requests.map(r => [r.id, r.point]));
+    return () => {
+        const build = buildPipeNetwork({
+            source: v.tank,
+            sourceHead: v.elevationAt(v.tank) + DEFAULT_HYDRAULICS.tankHeight,
+            mains: v.mains.map(m => ({ id: m.id, path: m.path, diameterMM: 63 })),
+            attachments: connections.map(c => ({
+                point: points.get(c.featureId)!, lineId: c.lineId, segIndex: c.segIndex, attach: c.point, demand: 1e-4, diameterMM: 32
+            }))
+        });
+        const solution = solveNetwork(build.network);
+        return v.mains.map(m => {
+            const pts = densifyPath(m.path, 25);
+            const nodes = build.lineNodes.get(m.id)!;
+            return profileRows(profileChainage(pts), pts.map(v.elevationAt), d => headAtChainage(nodes, solution.heads, d));
+        });
+    };
+};
+
+// Design search over the solved network: pipe sizes per main, rising main, tank and PV array
+const designCase = (v: Village, spec: VillageSpec) => {
+    const requests = [...v.taps, ...v.institutions];
+    const connections = nearestConnections(requests, v.mains, v.tank);
+    const points = new Map(requests.map(r => [r.id, r.point]));
+    const sourceHead = v.elevationAt(v.tank) + DEFAULT_HYDRAULICS.tankHeight;
+    const build = buildPipeNetwork({
+        source: v.tank, sourceHead,
+        mains: v.mains.map(m => ({ id: m.id, path: m.path, diameterMM: 63 })),
+        attachments: connections.map(c => ({
+            point: points.get(c.featureId)!, lineId: c.lineId, segIndex: c.segIndex, attach: c.point, demand: 1e-4, diameterMM: 32
+        }))
+    });
+    const tapIds = new Set(v.taps.map(t => t.id));
+    const taps = connections.flatMap((c, attachment) => tapIds.has(c.featureId) ? [{ attachment, elevation: v.elevationAt(points.get(c.featureId)!) }] : []);
+    const site = {
+        population: DEFAULT_GLOBAL.population, risingLen: 300, mainLen: 0, distLen: 500, hasRisingMain: true,
+        taps: spec.taps, schools: 0, clinics: 0, gardens: 0, hasGrid: false, mainLines: [] as { id: string, length: number }[]
+    };
+    const problem = createDesignProblem(site, build, solveNetwork(build.network), v.mains.map((m, i) => ({ id: m.id, name: `Main Line ${i + 1}` })), taps, sourceHead);
+    site.mainLines = problem.lines.map(l => ({ id: l.id, length: l.length }));
+    site.mainLen = problem.lines.reduce((acc, l) => acc + l.length, 0);
+    const lifecycleCost = lifecycleCostModel(npvInputs(20), 'compact', specs);
+    return () => optimizeDesign(problem, DEFAULT_HYDRAULICS, DEFAULT_DESIGN_SEARCH, lifecycleCost);
+};
+
+const cases: { name: string, params: Record<string, number>, setup: () => () => unknown }[] = [];
+Object.entries(SCALES).forEach(([scale, spec]) => {
+    const village = () => createVillage(spec);
+    const params = { buildings: spec.buildings, vertices: spec.vertices, taps: spec.taps };
+    cases.push({
+        name: `coverage/${scale}`, params,
+        setup: () => { const v = village(); return () => classifyCoverage(v.centroids, v.servicePoints, 50); }
+    });
+    cases.push({
+        name: `connections/${scale}`, params,
+        setup: () => { const v = village(); return () => nearestConnections([...v.taps, ...v.institutions], v.mains, v.tank); }
+    });
+    cases.push({ name: `profiles/${scale}`, params, setup: () => profilesCase(village()) });
+    cases.push({ name: `design/${scale}`, params, setup: () => designCase(village(), spec) });
+});
+[20, 50].forEach(years => {
+    const inputs = npvInputs(years);
+    cases.push({
+        name: `npv/${years}y`, params: { years },
+        setup: () => () => calculateNPV(inputs.global, inputs.solar, inputs.handpump, inputs.revenue, inputs.benefits, inputs.additionalBenefits, 'compact', specs)
+    });
+});
+[10000, 100000].forEach(iterations => {
+    const inputs = npvInputs(20);
+    const { summary } = calculateNPV(inputs.global, inputs.solar, inputs.handpump, inputs.revenue, inputs.benefits, inputs.additionalBenefits, 'compact', specs);
+    cases.push({
+        name: `montecarlo-summary/${iterations}`, params: { iterations },
+        setup: () => () => runMonteCarloSimulation(summary, 'economic', { iterations })
+    });
+    cases.push({
+        name: `montecarlo-full/${iterations}`, params: { iterations },
+        setup: () => () => {
+            const run = createSimulationRun({ kind: 'full', inputs, specs }, 'economic', { iterations });
+            while (!run.step(50000)) { /* Same batch size as the worker */ }
+            return run.finish();
+        }
+    });
+});
+
+// --- Run ---
+const results: Record<string, CaseResult> = {};
+cases.filter(c => c.name.includes(FILTER)).forEach(c => {
+    const fn = c.setup();
+    results[c.name] = { ...measure(fn), params: c.params };
+    console.log(`${c.name.padEnd(28)} ${results[c.name].medianMs.toFixed(3).padStart(10)} ms`);
+});
+
+const deno = (globalThis as { Deno?: { version: { deno: string } } }).Deno;
+const file: BenchFile = {
+    schema: 1,
+    runtime: `${deno ? `deno ${deno.version.deno}` : `node ${process.version}`} ${os.platform()}-${os.arch()}`,
+    cpu: os.cpus()[0]?.model ?? 'unknown',
+    date: new Date().toISOString(),
+    results
+};
+writeFileSync(OUT, JSON.stringify(file, null, 2) + '\n');
+
+if (flag('update-baseline')) {
+    const previous: BenchFile | null = existsSync(BASELINE) ? JSON.parse(readFileSync(BASELINE, 'utf8')) : null;
+    // A filtered run only replaces the cases it measured
+    writeFileSync(BASELINE, JSON.stringify({ ...file, results: { ...previous?.results, ...results } }, null, 2) + '\n');
+    console.log(`Baseline updated: ${BASELINE}`);
+    process.exit(0);
+}
+
+if (!existsSync(BASELINE)) {
+    console.log(`No baseline at ${BASELINE}; run with --update-baseline to create one.`);
+    process.exit(0);
+}
+
+const baseline: BenchFile = JSON.parse(readFileSync(BASELINE, 'utf8'));
+if (baseline.cpu !== file.cpu || baseline.runtime !== file.runtime) {
+    console.log(`Note: baseline was recorded on ${baseline.runtime} / ${baseline.cpu}`);
+}
+const regressions: string[] = [];
+console.log(`\n${'case'.padEnd(28)} ${'baseline'.padStart(10)} ${'now'.padStart(10)}   change`);
+Object.entries(results).forEach(([name, r]) => {
+    const base = baseline.results[name];
+    if (!base) { console.log(`${name.padEnd(28)} ${'-'.padStart(10)} ${r.medianMs.toFixed(3).padStart(10)}   new`); return; }
+    const change = r.medianMs / base.medianMs - 1;
+    const regressed = change > THRESHOLD && r.medianMs - base.medianMs > NOISE_FLOOR_MS;
+    if (regressed) regressions.push(name);
+    const pct = `${change >= 0 ? '+' : ''}${(change * 100).toFixed(1)}%`;
+    console.log(`${name.padEnd(28)} ${base.medianMs.toFixed(3).padStart(10)} ${r.medianMs.toFixed(3).padStart(10)}   ${pct}${regressed ? '  REGRESSION' : ''}`);
+});
+
+if (regressions.length) {
+    console.log(`\n${regressions.length} regression(s) beyond +${(THRESHOLD * 100).toFixed(0)}%: ${regressions.join(', ')}`);
+    process.exit(1);
+}
+console.log(`\nNo regressions beyond +${(THRESHOLD * 100).toFixed(0)}%.`);
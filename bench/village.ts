@@ -0,0 +1,84 @@
+import { createRng } from '../utils/random';
+import { ConnectionRequest, LatLngPoint } from '../utils/networkModel';
+
+// --- Synthetic village generator ---
+// N building centroids, main lines totalling M vertices, K taps and a few institutions,
+// all placed around one tank. Densities stay roughly constant as N grows (about one
+// building per 400 m2), so the larger scales look like bigger villages, not denser ones.
+// The same seed always produces the same village.
+
+export interface VillageSpec {
+    buildings: number; // N
+    vertices: number; // M, across all main lines
+    taps: number; // K
+    seed?: number;
+}
+
+export interface Village {
+    tank: LatLngPoint;
+    centroids: Float64Array; // Packed [lat0, lng0, lat1, lng1, ...]
+    mains: { id: string, path: LatLngPoint[] }[];
+    taps: ConnectionRequest[];
+    institutions: ConnectionRequest[];
+    servicePoints: Float64Array; // Taps + institutions, packed like centroids
+    elevationAt: (p: LatLngPoint) => number; // Smooth synthetic terrain (m)
+}
+
+const CENTRE = { lat: -13.2543, lng: 34.3015 };
+const M_PER_DEG = 111195;
+const M2_PER_BUILDING = 400;
+const VERTICES_PER_LINE = 40;
+const STEP_M = 30;
+
+export const createVillage = ({ buildings, vertices, taps, seed = 1 }: VillageSpec): Village => {
+    const rng = createRng(seed);
+    const kx = M_PER_DEG * Math.cos(CENTRE.lat * Math.PI / 180);
+    const offset = (dxM: number, dyM: number): LatLngPoint => ({ lat: CENTRE.lat + dyM / M_PER_DEG, lng: CENTRE.lng + dxM / kx });
+    const radius = Math.sqrt(buildings * M2_PER_BUILDING / Math.PI);
+
+    // Buildings: uniform over a disc
+    const centroids = new Float64Array(buildings * 2);
+    for (let i = 0; i < buildings; i++) {
+        const r = radius * Math.sqrt(rng());
+        const a = 2 * Math.PI * rng();
+        const p = offset(r * Math.cos(a), r * Math.sin(a));
+        centroids[i * 2] = p.lat;
+        centroids[i * 2 + 1] = p.lng;
+    }
+
+    // Main lines: random walks out of the tank, drifting along a heading
+    const tank = offset(0, 0);
+    const mains: Village['mains'] = [];
+    let remaining = vertices;
+    for (let line = 0; remaining > 1; line++) {
+        const count = Math.min(remaining, VERTICES_PER_LINE);
+        remaining -= count;
+        let heading = 2 * Math.PI * rng();
+        let x = 0, y = 0;
+        const path: LatLngPoint[] = [tank];
+        for (let v = 1; v < count; v++) {
+            heading += (rng() - 0.5) * 0.6;
+            x += STEP_M * Math.cos(heading);
+            y += STEP_M * Math.sin(heading);
+            path.push(offset(x, y));
+        }
+        mains.push({ id: `main-${line}`, path });
+    }
+
+    // Taps next to random buildings; a school, clinic and garden per 2,000 buildings
+    const nearBuilding = (): LatLngPoint => {
+        const b = Math.floor(rng() * buildings);
+        return { lat: centroids[b * 2] + (rng() - 0.5) * 1e-4, lng: centroids[b * 2 + 1] + (rng() - 0.5) * 1e-4 };
+    };
+    const tapList = Array.from({ length: taps }, (_, i) => ({ id: `tap-${i}`, point: nearBuilding() }));
+    const institutions = Array.from({ length: Math.max(1, Math.round(buildings / 2000)) * 3 }, (_, i) => ({ id: `inst-${i}`, point: nearBuilding() }));
+
+    const service = [...tapList, ...institutions];
+    const servicePoints = new Float64Array(service.length * 2);
+    service.forEach((s, i) => { servicePoints[i * 2] = s.point.lat; servicePoints[i * 2 + 1] = s.point.lng; });
+
+    const elevationAt = (p: LatLngPoint) =>
+        1000 + 15 * Math.sin((p.lat - CENTRE.lat) * M_PER_DEG / 400) + 10 * Math.cos((p.lng - CENTRE.lng) * kx / 650);
+
+    return { tank, centroids, mains, taps: tapList, institutions, servicePoints, elevationAt };
+};
@@ -0,0 +1,204 @@
+"""Build Cloud Optimized GeoTIFFs and the raster manifest for the map layers.
+
+Takes the raw Earth Engine exports (``<name>_raw_<part>.tif``), reprojects them to Web
+Mercator and writes internally tiled, compressed COGs with overview pyramids into
+public/maps/. Alongside them it writes public/maps/manifest.json with per-part bounds and
+nodata plus per-layer percentile stretch and histogram, so the browser never has to scan
+pixels to pick a contrast.
+
+Usage:
+    python build_cogs.py                      # rasters/*_raw_*.tif -> public/maps/
+    python build_cogs.py --src exports --workers 4
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as rio_copy
+from rasterio.warp import Resampling, calculate_default_transform, reproject
+
+RAW_PATTERN = re.compile(r'^(?P<name>[a-z]+)_raw_(?P<part>\d+)\.tif$', re.IGNORECASE)
+
+# Export file prefix -> layer id used by the app (see RasterLayerId in services/cogService.ts)
+LAYER_IDS = {'dtw': 'dtw', 'gw': 'gw', 'elevation': 'dem', 'hillshade': 'hillshade'}
+
+DST_CRS = 'EPSG:3857'
+NODATA = -9999.0
+BLOCK_SIZE = 256
+HISTOGRAM_BINS = 64
+STRETCH_PERCENTILES = (2, 98)  # Same stretch the map used to compute at runtime
+MAX_STATS_SAMPLES = 1_000_000  # Per part; values are taken on a fixed stride so builds are reproducible
+
+
+def output_name(name, part):
+    return f'{name.lower()}_{part}.tif'
+
+
+def reproject_to_memory(src, dst_crs, resampling):
+    """Returns an open in-memory GTiff of `src` in dst_crs (a straight copy if already there)."""
+    nodata = src.nodata if src.nodata is not None else NODATA
+    if src.crs and src.crs.to_string() == dst_crs:
+        transform, width, height = src.transform, src.width, src.height
+    else:
+        transform, width, height = calculate_default_transform(src.crs, dst_crs, src.width, src.height, *src.bounds)
+
+    profile = src.profile.copy()
+    profile.update(driver='GTiff', crs=dst_crs, transform=transform, width=width, height=height,
+                   count=1, dtype='float32', nodata=NODATA, tiled=True,
+                   blockxsize=BLOCK_SIZE, blockysize=BLOCK_SIZE, compress=None)
+
+    memfile = MemoryFile()
+    with memfile.open(**profile) as dst:
+        data = np.full((height, width), NODATA, dtype=np.float32)
+        reproject(
+            source=rasterio.band(src, 1),
+            destination=data,
+            src_nodata=nodata,
+            dst_transform=transform,
+            dst_crs=dst_crs,
+            dst_nodata=NODATA,
+            resampling=resampling,
+        )
+        data[~np.isfinite(data)] = NODATA  # Some exports mark nodata with NaN as well
+        dst.write(data, 1)
+    return memfile, data
+
+
+def build_one(src_path, out_dir, dst_crs, resampling_name):
+    """Worker: converts one export to a COG and returns its manifest part plus a stats sample."""
+    started = time.perf_counter()
+    match = RAW_PATTERN.match(os.path.basename(src_path))
+    name, part = match.group('name').lower(), match.group('part')
+    out_file = output_name(name, part)
+    out_path = os.path.join(out_dir, out_file)
+
+    with rasterio.open(src_path) as src:
+        memfile, data = reproject_to_memory(src, dst_crs, Resampling[resampling_name])
+
+    with memfile:
+        with memfile.open() as tmp:
+            bounds = list(tmp.bounds)
+            rio_copy(tmp, out_path, driver='COG', COMPRESS='DEFLATE', PREDICTOR='YES',
+                     BLOCKSIZE=BLOCK_SIZE, OVERVIEWS='AUTO', RESAMPLING='AVERAGE',
+                     NUM_THREADS='1', BIGTIFF='IF_SAFER')
+
+    valid = data[data != NODATA]
+    stride = max(1, valid.size // MAX_STATS_SAMPLES)
+    return {
+        'layer': LAYER_IDS.get(name, name),
+        'part': {'file': out_file, 'bounds': [float(b) for b in bounds], 'nodata': NODATA},
+        'sample': valid[::stride],
+        'data_min': float(valid.min()) if valid.size else None,
+        'data_max': float(valid.max()) if valid.size else None,
+        'valid_pixels': int(valid.size),
+        'input_bytes': os.path.getsize(src_path),
+        'output_bytes': os.path.getsize(out_path),
+        'seconds': time.perf_counter() - started,
+        'source': os.path.basename(src_path),
+    }
+
+
+def layer_stats(results):
+    """Percentile stretch and normalised histogram for one layer (all parts combined)."""
+    sample = np.concatenate([r['sample'] for r in results]) if results else np.array([], dtype=np.float32)
+    if sample.size == 0:
+        return None
+    # Zero is excluded from the stretch, matching the old in-browser auto-contrast
+    stretch = sample[sample != 0]
+    if stretch.size == 0:
+        stretch = sample
+    p_lo, p_hi = (float(v) for v in np.percentile(stretch, STRETCH_PERCENTILES))
+    data_min = min(r['data_min'] for r in results if r['data_min'] is not None)
+    data_max = max(r['data_max'] for r in results if r['data_max'] is not None)
+    counts, _ = np.histogram(sample, bins=HISTOGRAM_BINS, range=(data_min, data_max if data_max > data_min else data_min + 1))
+    return {
+        'min': p_lo,
+        'max': p_hi,
+        'percentiles': list(STRETCH_PERCENTILES),
+        'dataMin': data_min,
+        'dataMax': data_max,
+        'validPixels': sum(r['valid_pixels'] for r in results),
+        'histogram': {
+            'min': data_min,
+            'max': data_max,
+            'density': [round(float(c) / sample.size, 6) for c in counts],
+        },
+    }
+
+
+def write_manifest(results, out_dir, dst_crs):
+    layers = {}
+    for layer in sorted({r['layer'] for r in results}):
+        parts = sorted((r for r in results if r['layer'] == layer), key=lambda r: r['part']['file'])
+        minx = min(r['part']['bounds'][0] for r in parts)
+        miny = min(r['part']['bounds'][1] for r in parts)
+        maxx = max(r['part']['bounds'][2] for r in parts)
+        maxy = max(r['part']['bounds'][3] for r in parts)
+        layers[layer] = {
+            'bounds': [minx, miny, maxx, maxy],
+            'parts': [r['part'] for r in parts],
+            'stats': layer_stats(parts),
+        }
+    manifest = {'version': 1, 'crs': dst_crs, 'layers': layers}
+    path = os.path.join(out_dir, 'manifest.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return path
+
+
+def format_mb(n):
+    return f'{n / (1024 * 1024):7.2f} MB'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build COGs and manifest.json for the map raster layers.')
+    parser.add_argument('--src', default='rasters', help='Directory containing *_raw_*.tif exports (default: rasters)')
+    parser.add_argument('--out', default=os.path.join('public', 'maps'), help='Output directory (default: public/maps)')
+    parser.add_argument('--crs', default=DST_CRS, help=f'Target CRS (default: {DST_CRS})')
+    parser.add_argument('--resampling', default='bilinear', choices=['nearest', 'bilinear', 'cubic', 'average'],
+                        help='Resampling used when reprojecting (default: bilinear)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parallel processes (default: all cores)')
+    args = parser.parse_args(argv)
+
+    sources = sorted(os.path.join(args.src, f) for f in os.listdir(args.src) if RAW_PATTERN.match(f))
+    if not sources:
+        print(f'No *_raw_*.tif files found in {args.src}')
+        return 1
+    os.makedirs(args.out, exist_ok=True)
+
+    print(f'Building {len(sources)} COG(s) with {args.workers} worker(s) -> {args.out}')
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(build_one, s, args.out, args.crs, args.resampling): s for s in sources}
+        for future in as_completed(futures):
+            try:
+                r = future.result()
+            except Exception as e:
+                print(f'  FAILED {os.path.basename(futures[future])}: {e}')
+                continue
+            results.append(r)
+            print(f"  {r['source']:<24} -> {r['part']['file']:<20} {format_mb(r['input_bytes'])} -> "
+                  f"{format_mb(r['output_bytes'])}  {r['seconds']:6.2f}s")
+
+    if not results:
+        return 1
+    manifest_path = write_manifest(results, args.out, args.crs)
+    total_in = sum(r['input_bytes'] for r in results)
+    total_out = sum(r['output_bytes'] for r in results)
+    print(f'Total: {format_mb(total_in)} -> {format_mb(total_out)} in {time.perf_counter() - started:.2f}s')
+    print(f'Manifest written to {manifest_path}')
+    return 0 if len(results) == len(sources) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+import React, { useEffect } from 'react';
+import { Settings as SettingsIcon, Timer, Heart, DollarSign, Coins, Activity, Download, RotateCcw, Zap } from 'lucide-react';
+import { Charts } from './Charts';
+import { TornadoChart } from './TornadoChart';
+import { SystemSchematic } from './SystemSchematic';
+import { DesignSearchPanel } from './DesignSearchPanel';
+import { ReportAssumptions } from './ReportAssumptions';
+import { ParamInput } from './ParamInput';
+import { Profiled } from './RenderProfiler';
+import { projectActions, projectStore, selectFinalDesignPopulation, selectHandpumpsNeeded, selectNpv, selectSensitivity, useProject } from '../hooks/useProjectState';
+import { shallowEqual } from '../utils/store';
+import { AnalyticsService } from '../services/analyticsService';
+import { exportReport } from '../services/reportBuilder';
+import { Perf } from '../utils/perf';
+
+// --- Economic Analysis tab ---
+// Each card subscribes to the fields it shows. Inputs are ParamInputs, so a keystroke
+// re-renders its own field and, once typing pauses, the results that depend on it.
+
+// Shared by the Schematic tab and part 1 of the PDF report
+export const SchematicPanel: React.FC<{ printMode?: boolean }> = ({ printMode }) => {
+    const props = useProject(s => ({
+        inputs: s.hydraulicInputs,
+        specs: s.systemSpecs,
+        boq: s.generatedBoQ,
+        profiles: s.pipelineProfiles,
+        currency: s.global.currency,
+        geometry: s.systemGeometry,
+        projectDetails: s.projectDetails,
+        population: s.global.population,
+        designPopulation: selectFinalDesignPopulation(s)
+    }), shallowEqual);
+    return <SystemSchematic {...props} onUpdateRate={projectActions.updateBoQRate} printMode={printMode} designSearch={<Profiled id="analysis.designSearch"><DesignSearchPanel /></Profiled>} />;
+};
+
+const GlobalParamsCard: React.FC = () => {
+    const lifespan = useProject(s => s.global.projectLifespan);
+    const finalDesignPopulation = useProject(selectFinalDesignPopulation);
+    return (
+        <div className="bg-white p-5 rounded-xl shadow-sm border border-gray-200">
+            <div className="flex items-center gap-2 mb-4 text-slate-800"><SettingsIcon className="w-5 h-5" /><h2 className="font-bold">Global Parameters</h2></div>
+            <ParamInput group="global" field="discountRate" label="Discount Rate" unit="%" />
+            <ParamInput group="global" field="projectLifespan" label="Project Lifespan" unit="years" />
+            <ParamInput group="global" field="populationGrowthRate" label="Pop. Growth Rate" unit="%" step={0.1} />
+            <div className="mt-2 text-xs bg-gray-50 p-2 rounded border border-gray-100">
+                <span className="font-bold text-gray-500">Design Population (Yr {lifespan}):</span>
+                <div className="text-lg font-bold text-gray-800">{finalDesignPopulation.toLocaleString()}</div>
+            </div>
+        </div>
+    );
+};
+
+const TimeHealthCard: React.FC = () => (
+    <div className="bg-white p-5 rounded-xl shadow-sm border border-gray-200">
+        <div className="flex items-center gap-2 mb-4 text-slate-800"><Timer className="w-5 h-5" /><h2 className="font-bold">Time & Health Inputs</h2></div>
+        <ParamInput group="benefits" field="hourlyWage" label="Hourly Wage (Opp. Cost)" unit="$/hr" step={0.05} />
+        <div className="border-t pt-2 mt-2">
+            <h3 className="text-xs font-bold text-gray-400 uppercase mb-2">Collection Time (Round Trip)</h3>
+            <ParamInput group="benefits" field="timeSpentBaseline" label="Status Quo (River/Well)" unit="min/day" helpText="Baseline 'No Water' Scenario" />
+            <ParamInput group="benefits" field="timeSpentHandpump" label="Handpump (Walk+Queue)" unit="min/day" />
+            <ParamInput group="benefits" field="timeSpentSolar" label="Solar Piped (At Tap)" unit="min/day" />
+        </div>
+        <div className="border-t pt-2 mt-2"><h3 className="text-xs font-bold text-gray-400 uppercase mb-2">Health Value (Monetized)</h3><ParamInput group="benefits" field="healthPremiumSolar" label="Solar Health Premium" unit="$/pp/yr" /><ParamInput group="benefits" field="healthPremiumHandpump" label="Handpump Health Value" unit="$/pp/yr" /></div>
+    </div>
+);
+
+// Additional Benefits Values (Driven by Map)
+const CommunityCard: React.FC = () => {
+    const counts = useProject(s => s.systemSpecs && {
+        schools: s.systemSpecs.countSchools, clinics: s.systemSpecs.countClinics, gardens: s.systemSpecs.countGardens, grid: s.systemSpecs.hasGrid
+    }, shallowEqual);
+    return (
+        <div className="bg-white p-5 rounded-xl shadow-sm border border-gray-200 border-l-4 border-l-purple-500">
+            <div className="flex items-center gap-2 mb-4 text-purple-900"><Heart className="w-5 h-5" /><h2 className="font-bold">Community Value-Add</h2></div>
+            <div className="mb-3 text-xs text-purple-800 bg-purple-50 p-2 rounded">
+                Add Schools, Clinics, Gardens, or Grids in the <strong>Design Map</strong> to enable these benefits.
+            </div>
+            <div className="space-y-3">
+                {counts && counts.schools > 0 && <div className="pl-2 border-l-2 border-purple-200"><div className="flex justify-between text-sm font-medium mb-1"><span>Schools ({counts.schools})</span></div><ParamInput group="additionalBenefits" field="valueSchool" label="Value per School/Yr" unit="$" /></div>}
+                {counts && counts.clinics > 0 && <div className="pl-2 border-l-2 border-purple-200"><div className="flex justify-between text-sm font-medium mb-1"><span>Clinics ({counts.clinics})</span></div><ParamInput group="additionalBenefits" field="valueClinic" label="Value per Clinic/Yr" unit="$" /></div>}
+                {counts && counts.gardens > 0 && <div className="pl-2 border-l-2 border-purple-200"><div className="flex justify-between text-sm font-medium mb-1"><span>Gardens ({counts.gardens})</span></div><ParamInput group="additionalBenefits" field="valueGarden" label="Value per Garden/Yr" unit="$" /></div>}
+                {counts && counts.grid && <div className="pl-2 border-l-2 border-purple-200"><div className="flex justify-between text-sm font-medium mb-1"><span>Energy Access</span></div><ParamInput group="additionalBenefits" field="valueEnergy" label="Value of Energy/Yr" unit="$" /></div>}
+                {(!counts || (counts.schools === 0 && counts.clinics === 0 && counts.gardens === 0 && !counts.grid)) && <div className="text-sm text-gray-400 italic text-center py-2">No institutions added on map.</div>}
+            </div>
+        </div>
+    );
+};
+
+const FinancialCard: React.FC = () => (
+    <div className="bg-white p-5 rounded-xl shadow-sm border border-gray-200">
+        <div className="flex items-center gap-2 mb-4 text-slate-800"><DollarSign className="w-5 h-5" /><h2 className="font-bold">Financial Assumptions</h2></div>
+        <div className="space-y-4">
+            <div><h3 className="text-xs font-bold text-gray-400 uppercase mb-2">Solar Piped</h3><ParamInput group="solar" field="opexAnnual" label="OpEx (Annual)" unit="$" /><ParamInput group="solar" field="replacementCost" label="Replacements (Inv/Pump)" unit="$" /><ParamInput group="solar" field="theftProbability" label="Theft Probability" unit="%" /></div>
+            <div className="border-t pt-2"><h3 className="text-xs font-bold text-gray-400 uppercase mb-2">Handpumps</h3><ParamInput group="handpump" field="capexPerUnit" label="CapEx (Per Unit)" unit="$" /><ParamInput group="handpump" field="opexAnnualPerUnit" label="OpEx (Per Unit/Yr)" unit="$" /></div>
+        </div>
+    </div>
+);
+
+const RevenueCard: React.FC = () => (
+    <div className="bg-white p-5 rounded-xl shadow-sm border border-gray-200">
+        <div className="flex items-center gap-2 mb-4 text-slate-800"><Coins className="w-5 h-5" /><h2 className="font-bold">Revenue & Subsidies</h2></div>
+        <div className="mb-4">
+            <h3 className="text-xs font-bold text-gray-400 uppercase mb-2">Solar Piped</h3>
+            <ParamInput group="revenue" field="tariffSolarPerMonth" label="Tariff (Per HH/Mo)" unit="$" step={0.1} />
+            <ParamInput group="revenue" field="collectionEfficiencySolar" label="Collection Efficiency" unit="%" />
+            <div className="mt-3 pt-3 border-t border-gray-100">
+                <h4 className="text-xs font-bold text-blue-600 uppercase mb-2">External Support</h4>
+                <ParamInput group="revenue" field="carbonCreditPricePerM3" label="Carbon Credit Price" unit="$/m³" step={0.01} />
+                <ParamInput group="revenue" field="govtSubsidyFraction" label="Govt Subsidy (Top-up)" unit="% of Tariff" />
+            </div>
+        </div>
+        <div className="border-t pt-2">
+            <h3 className="text-xs font-bold text-gray-400 uppercase mb-2">Handpumps</h3>
+            <ParamInput group="revenue" field="tariffHandpumpPerMonth" label="Tariff (Per HH/Mo)" unit="$" step={0.1} />
+            <ParamInput group="revenue" field="collectionEfficiencyHandpump" label="Collection Efficiency" unit="%" />
+        </div>
+    </div>
+);
+
+// Picked up by AnalysisTab's effect once the print-only parts have rendered
+let pendingPdf: { elementId: string, filename: string } | null = null;
+
+const generatePDF = (elementId: string, filename: string) => {
+    const s = projectStore.getState();
+    const { summary } = selectNpv(s);
+    pendingPdf = { elementId, filename };
+    projectActions.setIsDownloadingPdf(true);
+
+    // --- Analytics Logging ---
+    AnalyticsService.logReport({
+        siteName: s.projectDetails.siteName,
+        contractNumber: s.projectDetails.contractNumber,
+        location: s.systemGeometry ? s.systemGeometry.center : { lat: 0, lng: 0 },
+        population: s.global.population,
+        designPopulation: selectFinalDesignPopulation(s),
+        systemType: 'Mixed',
+        solarCapex: summary.capexSolar,
+        handpumpCapex: summary.capexHandpump,
+        solarNetValue: summary.netEconomicValueSolar,
+        handpumpNetValue: summary.netEconomicValueHandpump,
+        winner: summary.netEconomicValueSolar > summary.netEconomicValueHandpump ? 'Solar' : 'Handpump',
+        perf: Perf.digest() // Timings so far this session (this PDF's own export is not in it yet)
+    });
+    // -------------------------
+};
+
+const ResultsHeader: React.FC = () => {
+    const handpumpsNeeded = useProject(selectHandpumpsNeeded);
+    const isDownloadingPdf = useProject(s => s.isDownloadingPdf);
+    return (
+        <div className="flex justify-between items-center bg-white p-4 rounded-xl shadow-sm border border-gray-200">
+            <div><h2 className="font-bold text-gray-900">Economic Analysis</h2><p className="text-sm text-gray-500">20-Year Lifecycle Cost Comparison</p></div>
+            <div className="flex gap-2">
+                <div className="px-3 py-1 bg-gray-100 rounded text-xs font-medium text-gray-600 flex items-center">Handpumps Needed: <strong className="ml-1 text-gray-900">{handpumpsNeeded}</strong></div>
+                <button onClick={() => {
+                    const dateStr = new Date().toISOString().split('T')[0]; // YYYY-MM-DD
+                    const cleanName = (projectStore.getState().projectDetails.siteName || 'Site').replace(/[^a-z0-9]/gi, '_');
+                    generatePDF('report-content', `Feasibility_Report_${cleanName}_${dateStr}.pdf`);
+                }} disabled={isDownloadingPdf} className="flex items-center gap-2 px-4 py-2 bg-slate-800 text-white rounded-md hover:bg-slate-700 transition shadow-sm disabled:opacity-75">
+                    {isDownloadingPdf ? <Activity className="w-4 h-4 animate-spin" /> : <Download className="w-4 h-4" />}
+                    {isDownloadingPdf ? "Generating PDF..." : "Download Full Report"}
+                </button>
+            </div>
+        </div>
+    );
+};
+
+const ChartsPanel: React.FC = () => {
+    const { yearlyData, summary } = useProject(selectNpv);
+    const currency = useProject(s => s.global.currency);
+    const simulationResult = useProject(s => s.simulationResult);
+    return <Charts yearlyData={yearlyData} summary={summary} currency={currency} simulationResult={simulationResult} />;
+};
+
+const SensitivityPanel: React.FC = () => {
+    const sim = useProject(s => ({
+        simMetric: s.simMetric, simIterations: s.simIterations, simEarlyStop: s.simEarlyStop, simModel: s.simModel,
+        isSimulating: s.isSimulating, simProgress: s.simProgress
+    }), shallowEqual);
+    const sensitivity = useProject(selectSensitivity);
+    const currency = useProject(s => s.global.currency);
+    const { simMetric, simIterations, simEarlyStop, simModel, isSimulating, simProgress } = sim;
+    const { setSimMetric, setSimIterations, setSimEarlyStop, setSimModel, runSimulation } = projectActions;
+    return (
+        <div className="mt-6 bg-white p-6 rounded-xl shadow-sm border border-gray-200 break-inside-avoid">
+            <div className="flex justify-between items-center mb-4">
+                <h3 className="font-bold text-indigo-900 flex items-center gap-2"><Activity className="w-5 h-5" /> Sensitivity Analysis</h3>
+                <div className="flex bg-gray-100 p-1 rounded-lg text-xs font-bold" data-html2canvas-ignore="true">
+                    <button onClick={() => setSimMetric('economic')} className={`px-3 py-1 rounded ${simMetric === 'economic' ? 'bg-white shadow text-indigo-600' : 'text-gray-500'}`}>Economic</button>
+                    <button onClick={() => setSimMetric('financial')} className={`px-3 py-1 rounded ${simMetric === 'financial' ? 'bg-white shadow text-indigo-600' : 'text-gray-500'}`}>Financial</button>
+                </div>
+            </div>
+            <p className="text-sm text-gray-600 mb-4">Running up to {simIterations.toLocaleString()} scenarios varying costs and benefits by ±20%. This simulates real-world uncertainty to determine the probability of the Solar System providing better value.</p>
+            <div className="flex flex-wrap items-center gap-4 mb-4 text-xs text-gray-600" data-html2canvas-ignore="true">
+                <label className="flex items-center gap-2">Scenarios
+                    <select value={simIterations} onChange={(e) => setSimIterations(parseInt(e.target.value))} disabled={isSimulating} className="border border-gray-300 rounded px-2 py-1 bg-white">
+                        <option value={10000}>10,000</option>
+                        <option value={100000}>100,000</option>
+                        <option value={1000000}>1,000,000</option>
+                    </select>
+                </label>
+                <label className="flex items-center gap-2">
+                    <input type="checkbox" checked={simEarlyStop} onChange={(e) => setSimEarlyStop(e.target.checked)} disabled={isSimulating} />
+                    Stop early at ±0.5% win-rate precision
+                </label>
+                <label className="flex items-center gap-2">Model
+                    <select value={simModel} onChange={(e) => setSimModel(e.target.value as typeof simModel)} disabled={isSimulating} className="border border-gray-300 rounded px-2 py-1 bg-white">
+                        <option value="full">Full cash flow (all inputs)</option>
+                        <option value="summary">Quick (NPV totals)</option>
+                    </select>
+                </label>
+            </div>
+            <button onClick={runSimulation} disabled={isSimulating} className="w-full py-3 bg-indigo-600 hover:bg-indigo-700 text-white font-bold rounded-lg shadow transition flex justify-center items-center gap-2" data-html2canvas-ignore="true">{isSimulating ? <RotateCcw className="w-4 h-4 animate-spin" /> : <Zap className="w-4 h-4" />}{isSimulating ? `Simulating... ${Math.round(simProgress * 100)}%` : 'Run Simulation'}</button>
+            <div className="mt-6">
+                <TornadoChart result={sensitivity} currency={currency} />
+            </div>
+        </div>
+    );
+};
+
+const AssumptionsPanel: React.FC = () => {
+    const p = useProject(s => ({
+        global: s.global, solar: s.solar, handpump: s.handpump, benefits: s.benefits, revenue: s.revenue, additional: s.additionalBenefits
+    }), shallowEqual);
+    return <ReportAssumptions {...p} />;
+};
+
+// WRAPPED CONTENT FOR PDF
+const ReportContent: React.FC = () => {
+    const isDownloadingPdf = useProject(s => s.isDownloadingPdf);
+    const designApplied = useProject(s => s.designApplied);
+    const projectDetails = useProject(s => s.projectDetails);
+    return (
+        <div id="report-content" className="bg-white p-4 rounded-xl">
+            {/* PDF Header - Visible only in PDF */}
+            {isDownloadingPdf && (
+                <div className="mb-6 pb-6 border-b border-gray-200 text-center">
+                    <h1 className="text-3xl font-bold text-gray-900">Water Supply Feasibility Report</h1>
+                    <p className="text-gray-500 text-lg mt-2">{projectDetails.siteName || "Site Name Not Specified"} | Contract: {projectDetails.contractNumber || "TBD"}</p>
+                    <p className="text-sm text-gray-400 mt-1">Generated: {new Date().toLocaleDateString()}</p>
+
+                    <div className="mt-6 text-left bg-slate-50 p-4 rounded-lg border border-slate-100">
+                        <h3 className="font-bold text-slate-800 mb-2">Executive Summary</h3>
+                        <p className="text-sm text-slate-600 leading-relaxed">
+                            This report provides a comparative economic analysis between a Solar Piped Water System and a decentralized Handpump solution.
+                            It evaluates the lifecycle costs, revenue potential (including tariffs, carbon credits, and subsidies), and socio-economic benefits
+                            such as health improvements, time savings, and institutional support. The analysis utilizes a 20-year projection to determine the
+                            Net Economic Value and long-term financial sustainability of each option.
+                        </p>
+                    </div>
+                </div>
+            )}
+
+            {/* PART 1: Technical Design (PDF ONLY - Renders FIRST) */}
+            {designApplied && (
+                <div className={`mt-8 ${isDownloadingPdf ? 'block' : 'hidden'}`}>
+                    <h2 className="text-xl font-bold mb-4 bg-gray-100 p-2 rounded">Part 1: Technical Design & BoQ</h2>
+                    <SchematicPanel printMode={isDownloadingPdf} />
+                    <div className="break-after-page"></div>
+                </div>
+            )}
+
+            {/* PART 2: Economic Analysis (Renders Second in PDF, First on Screen) */}
+            <div>
+                {isDownloadingPdf && <h2 className="text-xl font-bold mb-4 bg-gray-100 p-2 rounded">Part 2: Economic Analysis</h2>}
+                <Profiled id="analysis.charts"><ChartsPanel /></Profiled>
+
+                {/* Simulation Result */}
+                <Profiled id="analysis.sensitivity"><SensitivityPanel /></Profiled>
+            </div>
+
+            {/* PART 3: Assumptions (PDF ONLY) */}
+            <div className={`mt-8 ${isDownloadingPdf ? 'block' : 'hidden'}`}>
+                <div className="break-before-page"></div>
+                <AssumptionsPanel />
+            </div>
+
+            <p className="text-xs font-medium">Click <strong>Apply Design</strong> in the sidebar to generate costs and schematics.</p>
+        </div>
+    );
+};
+
+export const AnalysisTab: React.FC = () => {
+    const isDownloadingPdf = useProject(s => s.isDownloadingPdf);
+
+    // Runs once the print-only parts have been committed; the builder then waits for map
+    // tiles and charts itself instead of a fixed delay
+    useEffect(() => {
+        const job = pendingPdf;
+        if (!isDownloadingPdf || !job) return;
+        pendingPdf = null;
+        const element = document.getElementById(job.elementId);
+        if (!element) {
+            console.error(`Element ${job.elementId} not found`);
+            projectActions.setIsDownloadingPdf(false);
+            return;
+        }
+        Perf.timeAsync('report.pdf', () => exportReport(element, job.filename), stats => ({ items: stats.pages }))
+            .catch(e => {
+                console.error("PDF Gen Error", e);
+                alert("Failed to generate PDF. Please check the console for errors.");
+            })
+            .finally(() => projectActions.setIsDownloadingPdf(false));
+    }, [isDownloadingPdf]);
+
+    return (
+        <div className="grid grid-cols-1 lg:grid-cols-3 gap-6">
+
+            {/* Inputs Sidebar (Hidden in PDF) */}
+            <div className="space-y-6" data-html2canvas-ignore="true">
+                <Profiled id="analysis.global"><GlobalParamsCard /></Profiled>
+                <Profiled id="analysis.timeHealth"><TimeHealthCard /></Profiled>
+                <Profiled id="analysis.community"><CommunityCard /></Profiled>
+                <Profiled id="analysis.financial"><FinancialCard /></Profiled>
+                <Profiled id="analysis.revenue"><RevenueCard /></Profiled>
+            </div>
+
+            {/* Results (Included in PDF) */}
+            <div className="lg:col-span-2 space-y-6">
+                <ResultsHeader />
+                <ReportContent />
+            </div>
+        </div>
+    );
+};
@@ -255,7 +255,9 @@ export const Charts: React.FC<ChartsProps> = ({ yearlyData, summary, currency, s
             </ResponsiveContainer>
           </div>
           <div className="text-xs text-center text-gray-400 mt-2 italic">
-               Monte Carlo Simulation (10,000 runs) varying input costs & benefits by ±20%.
+               Monte Carlo Simulation ({simulationResult.iterations.toLocaleString()} runs{simulationResult.converged ? ', stopped at target precision' : ''}, seed {simulationResult.seed}) varying input costs & benefits by ±20%.
+               Solar win rate 95% CI: {simulationResult.winRateInterval[0].toFixed(1)}–{simulationResult.winRateInterval[1].toFixed(1)}%.
+               Advantage P5 / P50 / P95: {(simulationResult.p5 / 1000).toFixed(0)}k / {(simulationResult.p50 / 1000).toFixed(0)}k / {(simulationResult.p95 / 1000).toFixed(0)}k.
           </div>
         </div>
         ) : (
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 
 interface CostInputProps {
   label: string;
@@ -7,6 +7,7 @@ interface CostInputProps {
   unit?: string;
   step?: number;
   helpText?: string;
+  commitDelayMs?: number; // Typing is reported once it pauses this long (and on blur); 0 reports every keystroke
 }
 
 export const CostInput: React.FC<CostInputProps> = ({
@@ -16,7 +17,37 @@ export const CostInput: React.FC<CostInputProps> = ({
   unit,
   step = 1,
   helpText,
+  commitDelayMs = 0,
 }) => {
+  // The field shows the draft; the parent only hears about settled values
+  const [draft, setDraft] = useState(String(value));
+  const timer = useRef<ReturnType<typeof setTimeout> | null>(null);
+  const pending = useRef<number | null>(null);
+  const latest = useRef({ value, onChange });
+  latest.current = { value, onChange }; // The timer fires after later renders
+
+  useEffect(() => {
+    if (pending.current === null && parseFloat(draft) !== value) setDraft(String(value));
+  }, [value]);
+
+  const commit = () => {
+    if (timer.current) { clearTimeout(timer.current); timer.current = null; }
+    if (pending.current === null) return;
+    const next = pending.current;
+    pending.current = null;
+    if (next !== latest.current.value) latest.current.onChange(next);
+  };
+
+  useEffect(() => commit, []); // An edit still pending on unmount is not lost
+
+  const handleChange = (text: string) => {
+    setDraft(text);
+    pending.current = parseFloat(text) || 0;
+    if (commitDelayMs <= 0) { commit(); return; }
+    if (timer.current) clearTimeout(timer.current);
+    timer.current = setTimeout(commit, commitDelayMs);
+  };
+
   return (
     <div className="mb-4">
       <div className="flex justify-between items-center mb-1">
@@ -25,12 +56,13 @@ export const CostInput: React.FC<CostInputProps> = ({
       </div>
       <input
         type="number"
-        value={value}
-        onChange={(e) => onChange(parseFloat(e.target.value) || 0)}
+        value={draft}
+        onChange={(e) => handleChange(e.target.value)}
+        onBlur={commit}
         step={step}
         className="w-full px-3 py-2 bg-white text-gray-900 border border-gray-300 rounded-md shadow-sm focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-blue-500 text-sm"
       />
       {helpText && <p className="mt-1 text-xs text-gray-500">{helpText}</p>}
     </div>
   );
-};
\ No newline at end of file
+};
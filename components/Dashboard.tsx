@@ -6,20 +6,27 @@ import { PieChart, Pie, Tooltip, ResponsiveContainer, Cell } from 'recharts';
 import { Users, DollarSign, Clock, FileText, MapPin, Database, RefreshCcw, AlertCircle } from 'lucide-react';
 
 export const Dashboard: React.FC = () => {
-  const [stats, setStats] = useState<DashboardStats | null>(null);
-  const [loading, setLoading] = useState(true);
+  // Stale-while-revalidate: render the last snapshot immediately, then refresh it
+  const [cached] = useState(() => AnalyticsService.getCachedStats());
+  const [stats, setStats] = useState<DashboardStats | null>(cached?.stats ?? null);
+  const [updatedAt, setUpdatedAt] = useState<number | null>(cached?.savedAt ?? null);
+  const [loading, setLoading] = useState(!cached);
+  const [refreshing, setRefreshing] = useState(false);
   const [error, setError] = useState(false);
 
   const loadStats = async () => {
-    setLoading(true);
+    if (!stats) setLoading(true);
+    setRefreshing(true);
     setError(false);
     try {
         const data = await AnalyticsService.getDashboardStats();
         setStats(data);
+        setUpdatedAt(AnalyticsService.getCachedStats()?.savedAt ?? null);
     } catch (e) {
         setError(true);
     }
     setLoading(false);
+    setRefreshing(false);
   };
 
   useEffect(() => {
@@ -57,13 +64,14 @@ export const Dashboard: React.FC = () => {
         <div className="flex justify-between items-center bg-slate-800 p-6 rounded-xl text-white shadow-lg">
             <div>
                 <h2 className="text-2xl font-bold flex items-center gap-2"><Database className="w-6 h-6"/> Usage Analytics Dashboard</h2>
-                <p className="text-slate-300">Live data from server CSV log.</p>
+                <p className="text-slate-300">Live data from server CSV log.{updatedAt && <span className="ml-2 text-xs text-slate-400">Updated {new Date(updatedAt).toLocaleString()}</span>}</p>
             </div>
             <button 
                 onClick={loadStats}
+                disabled={refreshing}
                 className="px-3 py-2 bg-slate-700 hover:bg-slate-600 rounded-lg text-xs font-bold transition flex items-center gap-2"
             >
-                <RefreshCcw className="w-3 h-3"/> Refresh Data
+                <RefreshCcw className={`w-3 h-3 ${refreshing ? 'animate-spin' : ''}`}/> {refreshing ? 'Refreshing...' : 'Refresh Data'}
             </button>
         </div>
 
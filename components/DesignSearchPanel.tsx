@@ -0,0 +1,156 @@
+import React, { useMemo, useState } from 'react';
+import { Check, RotateCcw, TrendingDown } from 'lucide-react';
+import { CartesianGrid, ReferenceLine, ResponsiveContainer, Scatter, ScatterChart, Tooltip, XAxis, YAxis, ZAxis } from 'recharts';
+import { DEFAULT_DESIGN_SEARCH } from '../constants';
+import { projectActions, selectLifecycleCost, useProject } from '../hooks/useProjectState';
+import { DesignCandidate, DesignSearchOptions, optimizeDesign } from '../utils/designOptimizer';
+import { shallowEqual } from '../utils/store';
+import { Perf } from '../utils/perf';
+
+const money = (v: number) => `$${Math.round(v).toLocaleString()}`;
+const pressure = (v: number) => Number.isNaN(v) ? 'n/a' : `${v.toFixed(1)} m`;
+const count = (v: number) => v < 1e6 ? v.toLocaleString() : v.toExponential(1);
+
+const FIELDS: { key: keyof DesignSearchOptions, label: string, step: number, title: string }[] = [
+    { key: 'minTapPressure', label: 'Min tap pressure (m)', step: 1, title: 'Residual head required at the worst tap' },
+    { key: 'maxVelocity', label: 'Max velocity (m/s)', step: 0.1, title: 'Limit in the rising main and every main line' },
+    { key: 'minStorageDays', label: 'Min storage (days)', step: 0.25, title: 'Smallest tank allowed, as a share of daily demand' }
+];
+
+// "Cost-Optimal Design": searches pipe sizes, tank and PV array for the lowest lifecycle cost
+export const DesignSearchPanel: React.FC = () => {
+    const { problem, inputs, lifecycleCost, applied, notice } = useProject(s => ({
+        problem: s.designProblem,
+        inputs: s.hydraulicInputs,
+        lifecycleCost: selectLifecycleCost(s),
+        applied: s.designChoice,
+        notice: s.designNotice
+    }), shallowEqual);
+    const [options, setOptions] = useState<DesignSearchOptions>(DEFAULT_DESIGN_SEARCH);
+    const [picked, setPicked] = useState<number | null>(null); // Frontier index chosen on the chart
+
+    const search = useMemo(() => {
+        if (!problem) return null;
+        const started = performance.now();
+        const result = Perf.time('design.optimize', () => optimizeDesign(problem, inputs, options, lifecycleCost), r => ({ items: r.evaluated }));
+        return { result, ms: performance.now() - started };
+    }, [problem, inputs, options, lifecycleCost]);
+
+    if (!problem || !search) return null;
+    const { result, ms } = search;
+    const selected: DesignCandidate | null = (picked !== null ? result.frontier[picked] : null) ?? result.best;
+    const saving = selected ? result.standard.lifecycleCost - selected.lifecycleCost : 0;
+    const appliedKey = JSON.stringify(applied);
+    const isApplied = (c: DesignCandidate | null) => !!c && JSON.stringify(c.choice) === appliedKey;
+    const hasPressure = !Number.isNaN(result.standard.minPressure);
+    const frontierData = result.frontier.map((c, i) => ({ i, pressure: c.minPressure, cost: c.lifecycleCost }));
+
+    const setOption = (key: keyof DesignSearchOptions, value: number) => {
+        setPicked(null);
+        setOptions(o => ({ ...o, [key]: Math.max(0, value) }));
+    };
+
+    return (
+        <div className="bg-white p-6 rounded-xl shadow-sm border border-gray-200 space-y-4">
+            <div className="flex justify-between items-start">
+                <div>
+                    <h3 className="text-sm font-bold text-gray-500 uppercase tracking-wide flex items-center gap-2"><TrendingDown className="w-4 h-4" /> Cost-Optimal Design</h3>
+                    <p className="text-xs text-gray-400 mt-1">Pipe sizes per main line, rising main, tank and PV array, ranked by CAPEX plus discounted OPEX and replacements</p>
+                </div>
+                {applied && (
+                    <button onClick={() => projectActions.setDesignChoice(null)} className="flex items-center gap-1 px-3 py-1.5 text-xs font-bold text-gray-600 border border-gray-200 rounded hover:bg-gray-50">
+                        <RotateCcw className="w-3.5 h-3.5" /> Use standard sizing
+                    </button>
+                )}
+            </div>
+
+            {notice && <div className="p-3 bg-amber-50 border border-amber-200 rounded text-sm text-amber-800">{notice}</div>}
+
+            <div className="grid grid-cols-3 gap-3 text-xs">
+                {FIELDS.map(f => (
+                    <label key={f.key} title={f.title}>
+                        <span className="block text-gray-600 font-bold mb-1">{f.label}</span>
+                        <input type="number" min={0} step={f.step} value={options[f.key]} onChange={e => setOption(f.key, parseFloat(e.target.value) || 0)} className="w-full p-1.5 border rounded" />
+                    </label>
+                ))}
+            </div>
+
+            {!selected ? (
+                <div className="p-3 bg-amber-50 border border-amber-200 rounded text-sm text-amber-800">{result.reason ?? 'No design meets the limits.'}</div>
+            ) : (
+                <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
+                    <div className="text-sm space-y-3">
+                        <table className="w-full">
+                            <thead>
+                                <tr className="text-xs text-gray-500 uppercase"><th className="text-left font-bold pb-1"></th><th className="text-right font-bold pb-1">Standard</th><th className="text-right font-bold pb-1">{picked !== null ? 'Selected' : 'Optimal'}</th></tr>
+                            </thead>
+                            <tbody className="divide-y divide-gray-50">
+                                <tr><td className="py-1 text-gray-600">CAPEX</td><td className="text-right">{money(result.standard.capex)}</td><td className="text-right font-bold">{money(selected.capex)}</td></tr>
+                                <tr><td className="py-1 text-gray-600">Lifecycle cost</td><td className="text-right">{money(result.standard.lifecycleCost)}</td><td className="text-right font-bold text-emerald-600">{money(selected.lifecycleCost)}</td></tr>
+                                <tr><td className="py-1 text-gray-600">Worst tap pressure</td><td className="text-right">{pressure(result.standard.minPressure)}</td><td className="text-right font-bold">{pressure(selected.minPressure)}</td></tr>
+                                <tr><td className="py-1 text-gray-600">Max velocity</td><td className="text-right">{result.standard.maxVelocity.toFixed(2)} m/s</td><td className="text-right font-bold">{selected.maxVelocity.toFixed(2)} m/s</td></tr>
+                                <tr><td className="py-1 text-gray-600">Rising main</td><td className="text-right">HDPE {result.standard.specs.pipeDiameterMM}mm</td><td className="text-right font-bold">HDPE {selected.specs.pipeDiameterMM}mm</td></tr>
+                                <tr><td className="py-1 text-gray-600">Tank</td><td className="text-right">{result.standard.specs.tankM3 ?? Math.ceil(result.standard.specs.dailyDemandM3)} m³</td><td className="text-right font-bold">{selected.specs.tankM3 ?? Math.ceil(selected.specs.dailyDemandM3)} m³</td></tr>
+                                <tr><td className="py-1 text-gray-600">Pump / PV array</td><td className="text-right">{result.standard.specs.pumpPowerKW.toFixed(2)} / {result.standard.specs.pvArrayKW.toFixed(2)} kW</td><td className="text-right font-bold">{selected.specs.pumpPowerKW.toFixed(2)} / {selected.specs.pvArrayKW.toFixed(2)} kW</td></tr>
+                            </tbody>
+                        </table>
+                        {selected.choice && problem.lines.length > 0 && (
+                            <div className="text-xs">
+                                <div className="font-bold text-gray-500 uppercase mb-1">Main lines</div>
+                                <div className="grid grid-cols-2 gap-x-4">
+                                    {problem.lines.map(line => (
+                                        <div key={line.id} className="flex justify-between border-b border-gray-50 py-0.5">
+                                            <span className="text-gray-600 truncate">{line.name} ({Math.round(line.length)} m)</span>
+                                            <span className="font-bold">{selected.choice!.mainDiameters[line.id]}mm</span>
+                                        </div>
+                                    ))}
+                                </div>
+                            </div>
+                        )}
+                        <div className="flex items-center gap-3">
+                            {isApplied(selected) ? (
+                                <span className="flex items-center gap-1 text-xs font-bold text-emerald-700"><Check className="w-4 h-4" /> Applied to the BoQ</span>
+                            ) : (
+                                <button onClick={() => projectActions.setDesignChoice(selected.choice)} className="px-4 py-1.5 bg-emerald-600 hover:bg-emerald-700 text-white text-xs font-bold rounded transition">
+                                    Apply to BoQ
+                                </button>
+                            )}
+                            <span className="text-xs text-gray-500">
+                                {saving >= 0 ? `Saves ${money(saving)}` : `Costs ${money(-saving)} more`} over the project life
+                            </span>
+                        </div>
+                    </div>
+
+                    <div>
+                        <div className="text-xs font-bold text-gray-500 uppercase mb-1">Cost vs. worst tap pressure</div>
+                        {hasPressure ? (
+                            <div className="h-56">
+                                <ResponsiveContainer width="100%" height="100%">
+                                    <ScatterChart margin={{ top: 10, right: 10, bottom: 20, left: 10 }}>
+                                        <CartesianGrid strokeDasharray="3 3" />
+                                        <XAxis type="number" dataKey="pressure" name="Pressure" unit=" m" tick={{ fontSize: 10 }} domain={['auto', 'auto']} />
+                                        <YAxis type="number" dataKey="cost" name="Lifecycle cost" tick={{ fontSize: 10 }} tickFormatter={v => `$${Math.round(v / 1000)}k`} domain={['auto', 'auto']} />
+                                        <ZAxis range={[40, 40]} />
+                                        <Tooltip formatter={(v: number, name: string) => name === 'Pressure' ? `${v.toFixed(1)} m` : money(v)} />
+                                        <ReferenceLine x={options.minTapPressure} stroke="#ef4444" strokeDasharray="4 4" />
+                                        <Scatter name="Frontier" data={frontierData} fill="#0ea5e9" line={{ stroke: '#0ea5e9' }} onClick={(p: { i: number }) => setPicked(p.i)} isAnimationActive={false} />
+                                        <Scatter name="Selected" data={[{ pressure: selected.minPressure, cost: selected.lifecycleCost }]} fill="#059669" shape="star" isAnimationActive={false} />
+                                        <Scatter name="Standard" data={[{ pressure: result.standard.minPressure, cost: result.standard.lifecycleCost }]} fill="#94a3b8" shape="diamond" isAnimationActive={false} />
+                                    </ScatterChart>
+                                </ResponsiveContainer>
+                            </div>
+                        ) : (
+                            <div className="text-xs text-gray-400 py-8 text-center">No tap has a ground level yet, so pressures are not checked.</div>
+                        )}
+                        <p className="text-[10px] text-gray-400 mt-1">Click a point to compare that design. Grey: standard sizing; star: selected.</p>
+                    </div>
+                </div>
+            )}
+
+            <p className="text-[10px] text-gray-400">
+                Scored {result.evaluated.toLocaleString()} designs and pruned {result.pruned.toLocaleString()} branches out of {count(result.space)} combinations in {Math.round(ms)} ms
+                {!result.exhaustive && ' (search budget reached; smaller savings may remain)'}.
+            </p>
+        </div>
+    );
+};
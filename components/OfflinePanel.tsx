@@ -0,0 +1,165 @@
+import React, { useEffect, useRef, useState } from 'react';
+import * as L from 'leaflet';
+import { WifiOff, Download, Trash2, X } from 'lucide-react';
+import { BasemapStyle, countSiteTiles, MAX_SITE_TILES, OfflineInventory, OfflineService, PrepareProgress } from '../services/offlineService';
+import { LatLngBox } from '../utils/tiles';
+
+interface OfflinePanelProps {
+    mapRef: React.MutableRefObject<L.Map | null>;
+    iso: string;
+    mapStyle: BasemapStyle;
+}
+
+const STYLE_LABELS: Record<BasemapStyle, string> = { street: 'Street', satellite: 'Satellite', hybrid: 'Hybrid', topo: 'Topo' };
+const MAX_PREFETCH_ZOOM = 18;
+
+const mb = (bytes: number) => `${(bytes / 1e6).toFixed(1)} MB`;
+
+const viewOf = (map: L.Map): { box: LatLngBox, zoom: number } => {
+    const b = map.getBounds();
+    return { box: { south: b.getSouth(), west: b.getWest(), north: b.getNorth(), east: b.getEast() }, zoom: Math.round(map.getZoom()) };
+};
+
+// "Prepare for offline": caches the current view for a field visit and lists what is stored
+export const OfflinePanel: React.FC<OfflinePanelProps> = ({ mapRef, iso, mapStyle }) => {
+    const [open, setOpen] = useState(false);
+    const [view, setView] = useState<{ box: LatLngBox, zoom: number } | null>(null);
+    const [name, setName] = useState('');
+    const [minZoom, setMinZoom] = useState(12);
+    const [maxZoom, setMaxZoom] = useState(16);
+    const [styles, setStyles] = useState<BasemapStyle[]>([mapStyle]);
+    const [progress, setProgress] = useState<PrepareProgress | null>(null);
+    const [error, setError] = useState('');
+    const [inventory, setInventory] = useState<OfflineInventory | null>(null);
+    const abortRef = useRef<AbortController | null>(null);
+
+    const refreshInventory = () => OfflineService.inventory().then(setInventory).catch(e => console.warn('Offline: inventory failed', e));
+
+    // Follow the map only while the panel is open, so panning does not re-render it otherwise
+    useEffect(() => {
+        const map = mapRef.current;
+        if (!open || !map) return;
+        const update = () => setView(viewOf(map));
+        const initial = viewOf(map);
+        setView(initial);
+        setMinZoom(Math.min(initial.zoom, MAX_PREFETCH_ZOOM));
+        setMaxZoom(Math.min(initial.zoom + 3, MAX_PREFETCH_ZOOM));
+        setStyles([mapStyle]);
+        refreshInventory();
+        map.on('moveend', update);
+        return () => { map.off('moveend', update); };
+    }, [open]);
+
+    useEffect(() => () => abortRef.current?.abort(), []);
+
+    const estimate = view ? countSiteTiles(view.box, minZoom, maxZoom, styles) : 0;
+    const busy = progress !== null;
+
+    const prepare = async () => {
+        if (!view || busy) return;
+        const controller = new AbortController();
+        abortRef.current = controller;
+        setError('');
+        setProgress({ phase: 'tiles', done: 0, total: estimate, failed: 0 });
+        try {
+            await OfflineService.prepareSite(
+                { name: name.trim() || `Site ${(inventory?.sites.length ?? 0) + 1}`, box: view.box, minZoom, maxZoom, styles, iso },
+                setProgress,
+                controller.signal
+            );
+            setName('');
+        } catch (e) {
+            setError(e instanceof Error ? e.message : String(e));
+        } finally {
+            abortRef.current = null;
+            setProgress(null);
+            refreshInventory();
+        }
+    };
+
+    const remove = async (id: string) => {
+        await OfflineService.removeSite(id).catch(e => console.warn('Offline: removing site failed', e));
+        refreshInventory();
+    };
+
+    const toggleStyle = (style: BasemapStyle) =>
+        setStyles(prev => prev.includes(style) ? prev.filter(s => s !== style) : [...prev, style]);
+
+    if (!open) {
+        return (
+            <button onClick={() => setOpen(true)} className="w-full flex items-center justify-center gap-2 px-3 py-2 bg-gray-50 border border-gray-200 rounded-lg text-xs font-bold text-gray-700 hover:bg-gray-100 transition">
+                <WifiOff className="w-4 h-4" /> Offline Field Mode
+            </button>
+        );
+    }
+
+    return (
+        <div className="p-2 bg-gray-50 rounded border border-gray-200 text-xs space-y-2">
+            <div className="flex justify-between items-center">
+                <h4 className="font-bold text-gray-800 flex items-center gap-1"><WifiOff className="w-3.5 h-3.5" /> Offline Field Mode</h4>
+                <button onClick={() => setOpen(false)} className="text-gray-400 hover:text-gray-700"><X className="w-4 h-4" /></button>
+            </div>
+
+            <input type="text" placeholder="Site name" value={name} onChange={e => setName(e.target.value)} className="w-full p-1.5 border rounded" disabled={busy} />
+            <div className="flex gap-2">
+                <label className="flex-1">
+                    <span className="block text-gray-600 font-bold mb-1">Min zoom</span>
+                    <input type="number" min={1} max={maxZoom} value={minZoom} onChange={e => setMinZoom(Math.max(1, Math.min(maxZoom, parseInt(e.target.value) || 1)))} className="w-full p-1.5 border rounded" disabled={busy} />
+                </label>
+                <label className="flex-1">
+                    <span className="block text-gray-600 font-bold mb-1">Max zoom</span>
+                    <input type="number" min={minZoom} max={MAX_PREFETCH_ZOOM} value={maxZoom} onChange={e => setMaxZoom(Math.max(minZoom, Math.min(MAX_PREFETCH_ZOOM, parseInt(e.target.value) || minZoom)))} className="w-full p-1.5 border rounded" disabled={busy} />
+                </label>
+            </div>
+            <div className="flex flex-wrap gap-2">
+                {(Object.keys(STYLE_LABELS) as BasemapStyle[]).map(style => (
+                    <label key={style} className="flex items-center gap-1">
+                        <input type="checkbox" checked={styles.includes(style)} onChange={() => toggleStyle(style)} disabled={busy} /> {STYLE_LABELS[style]}
+                    </label>
+                ))}
+            </div>
+            <div className={estimate > MAX_SITE_TILES ? 'text-red-600 font-bold' : 'text-gray-500'}>
+                {estimate.toLocaleString()} basemap tiles{estimate > MAX_SITE_TILES ? ` (limit ${MAX_SITE_TILES.toLocaleString()}: zoom in or lower the max zoom)` : ''} + footprints and rasters for this view
+            </div>
+
+            {progress ? (
+                <div className="space-y-1">
+                    <div className="flex justify-between text-gray-600">
+                        <span>{progress.phase === 'tiles' ? 'Tiles and rasters' : 'Building footprints'}: {progress.done}/{progress.total}{progress.failed > 0 ? ` (${progress.failed} failed)` : ''}</span>
+                        <button onClick={() => abortRef.current?.abort()} className="text-red-600 font-bold hover:underline">Cancel</button>
+                    </div>
+                    <div className="h-1.5 bg-gray-200 rounded"><div className="h-1.5 bg-[#1CABE2] rounded" style={{ width: `${progress.total ? Math.round(progress.done / progress.total * 100) : 0}%` }} /></div>
+                </div>
+            ) : (
+                <button
+                    onClick={prepare}
+                    disabled={!view || styles.length === 0 || estimate > MAX_SITE_TILES}
+                    className="w-full flex items-center justify-center gap-2 px-3 py-2 bg-[#003E5E] text-white rounded font-bold hover:bg-[#1CABE2] transition disabled:opacity-50"
+                >
+                    <Download className="w-4 h-4" /> Prepare this view for offline
+                </button>
+            )}
+            {error && <div className="text-red-600">{error}</div>}
+
+            {inventory && (
+                <div className="border-t border-gray-200 pt-2 space-y-1">
+                    {!inventory.workerActive && <div className="text-amber-700">Offline cache is not active (production builds only). Building footprints are still stored.</div>}
+                    {inventory.sites.map(({ site, cachedBytes }) => (
+                        <div key={site.id} className="flex justify-between items-center gap-2">
+                            <span className="truncate" title={`Zoom ${site.minZoom}-${site.maxZoom}, ${site.styles.join(', ')}`}>{site.name}</span>
+                            <span className="flex items-center gap-2 shrink-0">
+                                <span className="font-mono text-gray-600">{mb(cachedBytes + site.buildingBytes)}</span>
+                                <button onClick={() => remove(site.id)} disabled={busy} className="text-gray-400 hover:text-red-600" title="Remove offline data"><Trash2 className="w-3.5 h-3.5" /></button>
+                            </span>
+                        </div>
+                    ))}
+                    {inventory.workerActive && (
+                        <div className="text-gray-500">
+                            Browsing cache {mb(inventory.browsingBytes)} · total {mb(inventory.totalBytes)} of {mb(inventory.budget)}
+                        </div>
+                    )}
+                </div>
+            )}
+        </div>
+    );
+};
@@ -0,0 +1,29 @@
+import React, { useCallback } from 'react';
+import { CostInput } from './CostInput';
+import { ProjectState, projectStore, useProject } from '../hooks/useProjectState';
+
+type ParamGroup = 'global' | 'solar' | 'handpump' | 'revenue' | 'benefits' | 'additionalBenefits';
+type NumericField<T> = { [K in keyof T]-?: NonNullable<T[K]> extends number ? K : never }[keyof T];
+
+interface ParamInputProps<G extends ParamGroup> {
+    group: G;
+    field: NumericField<ProjectState[G]>;
+    label: string;
+    unit?: string;
+    step?: number;
+    helpText?: string;
+}
+
+// Recomputing the NPV model waits until typing pauses
+const PARAM_COMMIT_DELAY_MS = 250;
+
+// A CostInput bound to one numeric parameter: it subscribes to that field only, so editing
+// it re-renders this input (and whatever reads the results), not its neighbours
+export const ParamInput = <G extends ParamGroup>({ group, field, label, unit, step, helpText }: ParamInputProps<G>) => {
+    const value = useProject(s => (s[group][field] as number | undefined) ?? 0);
+    const onChange = useCallback(
+        (v: number) => projectStore.setState(s => ({ [group]: { ...s[group], [field]: v } })),
+        [group, field]
+    );
+    return <CostInput label={label} value={value} onChange={onChange} unit={unit} step={step} helpText={helpText} commitDelayMs={PARAM_COMMIT_DELAY_MS} />;
+};
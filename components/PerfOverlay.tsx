@@ -0,0 +1,75 @@
+import React, { useEffect, useState } from 'react';
+import { Perf, PERF_WINDOW, PerfSummary } from '../utils/perf';
+
+// --- Timings overlay ---
+// Shows rolling p50/p95 for the instrumented hot paths (utils/perf.ts). Open the app with
+// `?perf` or press Ctrl+Shift+P; the choice is remembered on the device. Timings are
+// collected either way; the overlay only adds the polling and the profiler marks.
+
+const STORAGE_KEY = 'mw_tool_perf_overlay';
+
+const initiallyOpen = () => {
+    if (typeof location === 'undefined') return false;
+    const param = new URLSearchParams(location.search).get('perf');
+    if (param !== null) return param !== '0';
+    try { return localStorage.getItem(STORAGE_KEY) === '1'; } catch { return false; }
+};
+
+const formatBytes = (b: number) =>
+    b >= 1e6 ? `${(b / 1e6).toFixed(1)} MB` : b >= 1e3 ? `${(b / 1e3).toFixed(0)} kB` : b > 0 ? `${b} B` : '';
+
+export const PerfOverlay: React.FC = () => {
+    const [open, setOpen] = useState(initiallyOpen);
+    const [rows, setRows] = useState<PerfSummary[]>([]);
+
+    useEffect(() => {
+        const onKey = (e: KeyboardEvent) => {
+            if (e.ctrlKey && e.shiftKey && e.key.toLowerCase() === 'p') {
+                e.preventDefault();
+                setOpen(o => !o);
+            }
+        };
+        window.addEventListener('keydown', onKey);
+        return () => window.removeEventListener('keydown', onKey);
+    }, []);
+
+    useEffect(() => {
+        try { localStorage.setItem(STORAGE_KEY, open ? '1' : '0'); } catch { /* private mode */ }
+        Perf.setMeasuring(open);
+        if (!open) return;
+        setRows(Perf.summaries());
+        const id = setInterval(() => setRows(Perf.summaries()), 1000);
+        return () => clearInterval(id);
+    }, [open]);
+
+    if (!open) return null;
+    return (
+        <div className="fixed bottom-2 left-2 z-[3000] bg-slate-900/90 text-white text-[10px] font-mono rounded-lg p-2 shadow-lg max-h-[50vh] overflow-y-auto" data-html2canvas-ignore="true">
+            <div className="flex justify-between items-center gap-4 mb-1">
+                <span className="font-bold">Timings (last {PERF_WINDOW} per metric)</span>
+                <span className="flex gap-2">
+                    <button onClick={() => { Perf.reset(); setRows([]); }} className="text-slate-300 hover:text-white">reset</button>
+                    <button onClick={() => setOpen(false)} className="text-slate-300 hover:text-white">close</button>
+                </span>
+            </div>
+            {rows.length === 0 ? <div className="text-slate-400">No samples yet</div> : (
+                <table>
+                    <thead><tr className="text-slate-400"><th className="text-left pr-3">metric</th><th className="text-right pr-3">n</th><th className="text-right pr-3">p50 ms</th><th className="text-right pr-3">p95 ms</th><th className="text-right pr-3">max ms</th><th className="text-right pr-3">items</th><th className="text-right">bytes</th></tr></thead>
+                    <tbody>
+                        {rows.map(r => (
+                            <tr key={r.name}>
+                                <td className="pr-3">{r.name}</td>
+                                <td className="text-right pr-3">{r.count}</td>
+                                <td className="text-right pr-3">{r.p50.toFixed(1)}</td>
+                                <td className="text-right pr-3">{r.p95.toFixed(1)}</td>
+                                <td className="text-right pr-3">{r.max.toFixed(0)}</td>
+                                <td className="text-right pr-3">{r.items || ''}</td>
+                                <td className="text-right">{formatBytes(r.bytes)}</td>
+                            </tr>
+                        ))}
+                    </tbody>
+                </table>
+            )}
+        </div>
+    );
+};
@@ -0,0 +1,56 @@
+import React, { useEffect, useState } from 'react';
+
+// --- Render-count overlay ---
+// Open the app with `?profile` to wrap the main regions in React.Profiler and show how often
+// each one commits and how long it takes. Without the flag the wrapper renders its children
+// directly and records nothing. React drops Profiler timings from production builds unless
+// the profiling build is aliased in, so use `vite dev` for the numbers.
+
+interface RegionStats {
+    renders: number;
+    lastMs: number;
+    totalMs: number;
+}
+
+const enabled = typeof location !== 'undefined' && new URLSearchParams(location.search).has('profile');
+const stats = new Map<string, RegionStats>();
+
+const record: React.ProfilerOnRenderCallback = (id, _phase, actualDuration) => {
+    const s = stats.get(id) ?? { renders: 0, lastMs: 0, totalMs: 0 };
+    s.renders++;
+    s.lastMs = actualDuration;
+    s.totalMs += actualDuration;
+    stats.set(id, s);
+};
+
+export const Profiled: React.FC<{ id: string, children: React.ReactNode }> = ({ id, children }) =>
+    enabled ? <React.Profiler id={id} onRender={record}>{children}</React.Profiler> : <>{children}</>;
+
+export const RenderProfilerOverlay: React.FC = () => {
+    const [rows, setRows] = useState<[string, RegionStats][]>([]);
+
+    // Polled rather than pushed, so the overlay never renders inside a profiled commit
+    useEffect(() => {
+        if (!enabled) return;
+        const id = setInterval(() => setRows(Array.from(stats.entries(), ([k, v]) => [k, { ...v }] as [string, RegionStats])), 500);
+        return () => clearInterval(id);
+    }, []);
+
+    if (!enabled) return null;
+    return (
+        <div className="fixed bottom-2 right-2 z-[3000] bg-slate-900/90 text-white text-[10px] font-mono rounded-lg p-2 shadow-lg max-h-[50vh] overflow-y-auto" data-html2canvas-ignore="true">
+            <div className="flex justify-between items-center gap-4 mb-1">
+                <span className="font-bold">Renders</span>
+                <button onClick={() => { stats.clear(); setRows([]); }} className="text-slate-300 hover:text-white">reset</button>
+            </div>
+            <table>
+                <thead><tr className="text-slate-400"><th className="text-left pr-3">region</th><th className="text-right pr-3">n</th><th className="text-right pr-3">last ms</th><th className="text-right">total ms</th></tr></thead>
+                <tbody>
+                    {rows.sort((a, b) => b[1].renders - a[1].renders).map(([id, s]) => (
+                        <tr key={id}><td className="pr-3">{id}</td><td className="text-right pr-3">{s.renders}</td><td className="text-right pr-3">{s.lastMs.toFixed(1)}</td><td className="text-right">{s.totalMs.toFixed(0)}</td></tr>
+                    ))}
+                </tbody>
+            </table>
+        </div>
+    );
+};
@@ -4,7 +4,25 @@ import * as L from 'leaflet';
 import { Map as MapIcon, Navigation, Trash2, Settings, CheckCircle, Layers, Disc, Box, Spline, CircleDot, Activity, MousePointerClick, MousePointer2, User, Users, Eraser, Search, FileText, Hash, GraduationCap, School, Stethoscope, Sprout, Zap, Mountain, Home, Cylinder, Droplets } from 'lucide-react';
 import { HydraulicInputs, SystemSpecs, BoQItem, PipelineProfile, SystemGeometry, ProjectDetails } from '../types';
 import { DESIGN_COSTS, INSTITUTIONAL_DEMAND } from '../constants';
-import { deserialize } from 'flatgeobuf/lib/mjs/geojson';
+import { createCoverageClient, CoverageClient } from '../services/coverageService';
+import { BuildingTileCache, BuildingCacheStats, BUILDING_TILE_ZOOM, fgbUrlForCountry } from '../services/buildingTileCache';
+import { OsmTileCache, OSM_TILE_ZOOM } from '../services/osmTileCache';
+import { tileKey, tilesInBox, tileCountInBox } from '../utils/tiles';
+import { ElevationService, fillElevationGaps } from '../services/elevationService';
+import { CogService, RasterLayerId } from '../services/cogService';
+import { createCogTileLayer } from '../utils/cogTileLayer';
+import { BASEMAP_URLS, BasemapStyle } from '../services/offlineService';
+import { OfflinePanel } from './OfflinePanel';
+import { TapOptimizeRequest, TapOptimizerPanel } from './TapOptimizerPanel';
+import { createFootprintLayer, FootprintFrameStats, FootprintLayer } from '../utils/footprintLayer';
+import { FootprintData, mergeFootprints, packFootprints } from '../utils/footprints';
+import { createConnectionIndex, createNetworkModel, createPathMemo, densifyPath } from '../utils/networkModel';
+import { DesignChoice, designSystem, SiteQuantities } from '../utils/boq';
+import { createDesignProblem, DesignProblem } from '../utils/designOptimizer';
+import { CoverageSnapshot, DesignSnapshot, InstitutionType, ProfileSnapshot, RestoredDesign } from '../utils/projectCodec';
+import { buildPipeNetwork, headAtChainage, headLossHW, LineAttachment, LineNodes, NetworkSolution, PipeNetworkBuild, profileChainage, profileRows, solveNetwork } from '../utils/hydraulics';
+import { Perf } from '../utils/perf';
+import { optimizeTapPlacement, TapPlacementResult } from '../utils/tapPlacement';
 
 interface SiteMapProps {
     population: number;
@@ -13,12 +31,36 @@ interface SiteMapProps {
     setProjectDetails: React.Dispatch<React.SetStateAction<ProjectDetails>>;
     inputs: HydraulicInputs;
     setInputs: React.Dispatch<React.SetStateAction<HydraulicInputs>>;
-    onUpdateCalc: (specs: SystemSpecs, boq: BoQItem[], profiles: PipelineProfile[], geometry: SystemGeometry) => void;
+    onUpdateCalc: (specs: SystemSpecs, boq: BoQItem[], profiles: PipelineProfile[], geometry: SystemGeometry, problem: DesignProblem | null) => void;
     onApplyDesign: (civilCost: number, equipCost: number, pipeLength: number) => void;
+    designChoice?: DesignChoice | null; // Sizes applied from the design search
+    restore?: RestoredDesign | null; // Read once on mount
+    onDesignChange?: (design: DesignSnapshot, profiles: ProfileSnapshot[]) => void;
+    onCoverageChange?: (coverage: CoverageSnapshot) => void;
 }
 
 type ToolType = 'select' | 'borehole' | 'tank' | 'tap' | 'pipeMain' | 'delete' | 'school' | 'clinic' | 'garden' | 'grid';
-type MapStyle = 'street' | 'satellite' | 'topo' | 'hybrid';
+type MapStyle = BasemapStyle;
+
+// Building footprint tiling (beyond this many tiles the viewport is too zoomed out to load)
+const MAX_BUILDING_TILES = 48;
+const BUILDING_FETCH_CONCURRENCY = 3;
+const MAX_OSM_TILES = 24; // Each tile is one Overpass query
+const OSM_FETCH_CONCURRENCY = 2;
+
+// A main drawn before the tank is joined to it when one of its ends is this close (m)
+const TANK_SNAP_M = 25;
+
+// Hydraulic profiles sample ground level at least this often along each pipe (m)
+const PROFILE_SPACING_M = 25;
+
+interface ProfileSample {
+    pts: L.LatLng[];
+    dists: number[];
+    totalDist: number;
+    elevs: number[];
+    flat?: boolean; // Elevation lookup failed; zeros stand in until the next attempt
+}
 
 // --- Helper: Country from Bounds ---
 function getCountryFromBounds(lat: number, lng: number): string {
@@ -33,42 +75,7 @@ function getCountryFromBounds(lat: number, lng: number): string {
     return 'MWI'; // Default
 }
 
-// --- Helper: Closest Point on Segment ---
-function getClosestPointOnSegment(p: L.LatLng, a: L.LatLng, b: L.LatLng) {
-    const x = p.lat;
-    const y = p.lng;
-    const x1 = a.lat;
-    const y1 = a.lng;
-    const x2 = b.lat;
-    const y2 = b.lng;
-
-    const A = x - x1;
-    const B = y - y1;
-    const C = x2 - x1;
-    const D = y2 - y1;
-
-    const dot = A * C + B * D;
-    const len_sq = C * C + D * D;
-    let param = -1;
-    if (len_sq !== 0) param = dot / len_sq;
-
-    let xx, yy;
-
-    if (param < 0) {
-        xx = x1;
-        yy = y1;
-    } else if (param > 1) {
-        xx = x2;
-        yy = y2;
-    } else {
-        xx = x1 + param * C;
-        yy = y1 + param * D;
-    }
-
-    return new L.LatLng(xx, yy);
-}
-
-export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, projectDetails, setProjectDetails, inputs, setInputs, onUpdateCalc, onApplyDesign }) => {
+export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, projectDetails, setProjectDetails, inputs, setInputs, onUpdateCalc, onApplyDesign, designChoice, restore, onDesignChange, onCoverageChange }) => {
     const mapContainerRef = useRef<HTMLDivElement>(null);
     const mapInstanceRef = useRef<L.Map | null>(null);
 
@@ -79,10 +86,11 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         borehole: { marker: L.Marker, elev: number | null } | null;
         tank: { marker: L.Marker, elev: number | null } | null;
         taps: { marker: L.Marker, elev: number | null, id: string }[];
-        institutions: { marker: L.Marker, type: 'school' | 'clinic' | 'garden' | 'grid', id: string }[];
+        institutions: { marker: L.Marker, type: InstitutionType, id: string }[];
         mainLines: { poly: L.Polyline, id: string }[];
         risingMain: L.Polyline | null;
         distLines: L.Polyline[];
+        connections: { featureId: string, lineId: string | null, segIndex: number }[]; // One per distLine
         tempLine: L.Polyline | null;
     }>({
         borehole: null,
@@ -92,6 +100,7 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         mainLines: [],
         risingMain: null,
         distLines: [],
+        connections: [],
         tempLine: null
     });
 
@@ -114,8 +123,9 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
     const [counts, setCounts] = useState({ taps: 0, mainLen: 0, risingLen: 0, distLen: 0, hasBh: false, hasTank: false, schools: 0, clinics: 0, gardens: 0, hasGrid: false });
 
     // Search State
-    const [servedPop, setServedPop] = useState(0);
-    const [unservedPop, setUnservedPop] = useState(0);
+    const [detachedMains, setDetachedMains] = useState<string[]>([]); // Named mains the tank cannot feed
+    const [servedPop, setServedPop] = useState(restore?.coverage?.servedPop ?? 0);
+    const [unservedPop, setUnservedPop] = useState(restore?.coverage?.unservedPop ?? 0);
 
     // Search State
     const [searchQuery, setSearchQuery] = useState("");
@@ -127,14 +137,32 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
     const [selectedCountry, setSelectedCountry] = useState('MWI'); // Default to Malawi
     const [buildingsLoading, setBuildingsLoading] = useState(false);
     const [analysisUpdateTrigger, setAnalysisUpdateTrigger] = useState(0); // Force re-run of analysis
+    const [buildingCacheStats, setBuildingCacheStats] = useState<BuildingCacheStats | null>(null);
+    const [footprintStats, setFootprintStats] = useState<FootprintFrameStats | null>(null);
 
     // Spatial Analysis State
-    const [bufferDistance, setBufferDistance] = useState(50); // meters
-    const [peoplePerBuilding, setPeoplePerBuilding] = useState(5);
+    const [bufferDistance, setBufferDistance] = useState(restore?.coverage?.bufferDistance ?? 50); // meters
+    const [peoplePerBuilding, setPeoplePerBuilding] = useState(restore?.coverage?.peoplePerBuilding ?? 5);
 
-    const osmBuildingLayerRef = useRef<L.LayerGroup | null>(null);
+    const osmBuildingLayerRef = useRef<FootprintLayer | null>(null);
     const visualBufferLayerRef = useRef<L.LayerGroup | null>(null);
-    const googleBuildingLayerRef = useRef<L.LayerGroup | null>(null);
+    const googleBuildingLayerRef = useRef<FootprintLayer | null>(null);
+
+    // Packed building centroids for the coverage worker (rebuilt whenever footprints load)
+    const coverageClientRef = useRef<CoverageClient | null>(null);
+    const buildingIndexRef = useRef<{ layer: FootprintLayer, data: FootprintData, datasetId: number } | null>(null);
+
+    // Network model: per-line lengths and ground profiles survive between recalculations.
+    // Edits only schedule a recalculation; bursts collapse into one per animation frame, and
+    // calcSeqRef lets a newer calculation discard the async result of an older one.
+    const networkRef = useRef(createNetworkModel());
+    const connectionIndexRef = useRef(createConnectionIndex());
+    const profileMemoRef = useRef(createPathMemo<ProfileSample>(64, sample => !sample.flat));
+    const profileReuseRef = useRef<{ key: string, profiles: PipelineProfile[], samples: ProfileSnapshot[], problem: DesignProblem | null } | null>(null);
+    const recalcRef = useRef<(geometry: boolean) => void>(() => { });
+    const recalcFrameRef = useRef<number | null>(null);
+    const recalcGeometryRef = useRef(false); // Set when a pending recalculation includes a geometry change
+    const calcSeqRef = useRef(0);
 
     // Create a global SVG renderer to prevent Canvas renderer usage
     const svgRenderer = useRef<L.SVG | null>(null);
@@ -153,67 +181,21 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
     });
 
     // Auto-Contrast Handler (runs automatically on layer load)
-    const applyAutoContrast = (type: 'dtw' | 'gw' | 'dem' | 'hillshade', layerGroup: any) => {
-        const values: number[] = [];
-
-        console.log(`[Auto-Contrast] Calculating stats for ${type}...`);
-
-        // Sample pixel values from all loaded tiles
-        layerGroup.eachLayer((layer: any) => {
-            if (layer.georaster && layer.georaster.values) {
-                try {
-                    console.log(`[Auto-Contrast] Georaster structure:`, {
-                        numberOfBands: layer.georaster.numberOfRasters || layer.georaster.values.length,
-                        height: layer.georaster.height,
-                        width: layer.georaster.width,
-                        valuesType: typeof layer.georaster.values,
-                        isArray: Array.isArray(layer.georaster.values)
-                    });
-
-                    // Handle different structures
-                    let band0 = layer.georaster.values[0];
-
-                    // If values is not an array of arrays, it might be the data directly
-                    if (!Array.isArray(band0)) {
-                        band0 = layer.georaster.values;
-                    }
-
-                    if (!Array.isArray(band0)) {
-                        console.warn(`[Auto-Contrast] Unexpected data structure for ${type}`);
-                        return;
-                    }
-
-                    // Sample every 20th pixel for performance
-                    for (let r = 0; r < layer.georaster.height; r += 20) {
-                        const row = band0[r];
-                        if (!row) continue;
+    const applyAutoContrast = (type: RasterLayerId, values: number[], layerGroup: any) => {
+        const valid = values.filter(v => v !== 0);
+        console.log(`[Auto-Contrast] Collected ${valid.length} samples for ${type}`);
 
-                        for (let c = 0; c < layer.georaster.width; c += 20) {
-                            const v = row[c];
-                            if (v !== -9999 && v !== null && !isNaN(v) && v !== undefined && v !== 0) {
-                                values.push(v);
-                            }
-                        }
-                    }
-                } catch (e) {
-                    console.error(`[Auto-Contrast] Error sampling raster for ${type}:`, e);
-                }
-            }
-        });
-
-        console.log(`[Auto-Contrast] Collected ${values.length} samples for ${type}`);
-
-        if (values.length === 0) {
+        if (valid.length === 0) {
             console.warn(`[Auto-Contrast] No values found for ${type}. Using defaults.`);
             return;
         }
 
         // Calculate 2nd and 98th percentiles for robust stretching
-        values.sort((a, b) => a - b);
-        const p2 = values[Math.floor(values.length * 0.02)];
-        const p98 = values[Math.floor(values.length * 0.98)];
+        valid.sort((a, b) => a - b);
+        const p2 = valid[Math.floor(valid.length * 0.02)];
+        const p98 = valid[Math.floor(valid.length * 0.98)];
 
-        console.log(`[Auto-Contrast] ${type} - Min: ${p2.toFixed(2)}, Max: ${p98.toFixed(2)} (from ${values.length} samples)`);
+        console.log(`[Auto-Contrast] ${type} - Min: ${p2.toFixed(2)}, Max: ${p98.toFixed(2)} (from ${valid.length} samples)`);
 
         // Update visualization parameters
         visParamsRef.current[type].min = p2;
@@ -230,95 +212,44 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
     useEffect(() => {
         if (!mapInstanceRef.current) return;
 
-        const handleCOGLayer = async (show: boolean, type: 'dtw' | 'gw' | 'dem' | 'hillshade', name: string) => {
+        const handleCOGLayer = async (show: boolean, type: RasterLayerId, name: string) => {
             if (show) {
                 if (!geeLayersRef.current[type]) {
-                    console.log(`Loading COG Layer: ${name} (Split View)`);
+                    console.log(`Loading COG Layer: ${name}`);
                     setLayerLoading(prev => ({ ...prev, [type]: true }));
 
                     const layerGroup = L.layerGroup().addTo(mapInstanceRef.current!);
                     geeLayersRef.current[type] = layerGroup;
 
                     try {
-                        // @ts-ignore
-                        const proj4 = (await import('proj4')).default;
-                        (window as any).proj4 = proj4;
-                        // Add definitions for common projections just in case
-                        proj4.defs("EPSG:4326", "+proj=longlat +datum=WGS84 +no_defs");
-                        proj4.defs("EPSG:3857", "+proj=merc +a=6378137 +b=6378137 +lat_ts=0.0 +lon_0=0.0 +x_0=0.0 +y_0=0 +k=1.0 +units=m +nadgrids=@null +wktext  +no_defs");
-                        // 32767 is often used as "User Defined" by GEE/GDAL, essentially WGS84
-                        proj4.defs("EPSG:32767", "+proj=longlat +datum=WGS84 +no_defs");
-
-                        // @ts-ignore
-                        const parse_georaster = (await import('georaster')).default;
-                        // @ts-ignore
-                        const GeoRasterLayer = (await import('georaster-layer-for-leaflet')).default;
-                        // @ts-ignore
-                        const chroma = (await import('chroma-js')).default;
-
-                        const baseName = type === 'dtw' ? 'dtw_raw'
-                            : type === 'gw' ? 'gw_raw'
-                                : type === 'hillshade' ? 'hillshade_raw'
-                                    : 'elevation_raw';
-
-                        for (let i = 1; i <= 4; i++) {
-                            const url = `maps/${baseName}_${i}.tif`;
-
-                            fetch(url).then(async (response) => {
-                                if (!response.ok) throw new Error(`Failed to fetch ${url}`);
-                                const arrayBuffer = await response.arrayBuffer();
-                                const georaster = await parse_georaster(arrayBuffer);
-
-                                console.log(`[DEBUG] Loaded part ${i} of ${name}`);
-                                console.log('[DEBUG] Georaster Projection:', georaster.projection);
-                                console.log('[DEBUG] Image Height/Width:', georaster.height, georaster.width);
-                                console.log('[DEBUG] Bounds:', georaster.xmin, georaster.ymin, georaster.xmax, georaster.ymax);
-
-                                // Test Proj4 Manually
-                                try {
-                                    const testPt = (proj4 as any)('EPSG:4326', 'EPSG:3857', [34.0, -13.0]);
-                                    console.log('[DEBUG] Manual Proj4 Test (MWI):', testPt);
-                                } catch (err) {
-                                    console.error('[DEBUG] Manual Proj4 Test FAILED:', err);
-                                }
-
-                                // Explicitly check validity or weird GEE codes
-                                // The bounds (3 million+) confirm this is EPSG:3857 (Web Mercator), not 4326
-                                if (!georaster.projection || georaster.projection === 32767) {
-                                    georaster.projection = 3857;
-                                }
-
-                                const layer = new GeoRasterLayer({
-                                    georaster: georaster,
-                                    opacity: layerOpacity[type],
-                                    pixelValuesToColorFn: (values: any) => {
-                                        const v = values[0];
-                                        if (v === -9999 || v === null || isNaN(v)) return null;
-
-                                        // Use dynamic parameters from visParamsRef
-                                        const { min, max, palette } = visParamsRef.current[type];
-                                        const scale = chroma.scale(palette).domain([min, max]);
-                                        return scale(v).hex();
-                                    },
-                                    resolution: 64,
-                                    debugLevel: 0
-                                });
-
-                                layer.addTo(layerGroup);
-
-                                // Apply auto-contrast after all parts loaded
-                                if (i === 4) {
-                                    setTimeout(() => {
-                                        applyAutoContrast(type, layerGroup);
-                                        setLayerLoading(prev => ({ ...prev, [type]: false }));
-                                    }, 1000);
-                                }
-                            }).catch(e => console.warn(`Skipping part ${i} of ${name}:`, e));
+                        // Part files come from the manifest; only tiles in view are range-requested
+                        const manifest = await CogService.loadManifest();
+                        const entry = manifest?.layers[type];
+                        const parts = entry?.parts || [];
+                        if (parts.length === 0) throw new Error(`No raster parts listed for ${type}`);
+
+                        // Stretch before the first tiles are drawn: build-time stats when the
+                        // manifest has them, otherwise sample the coarsest overview
+                        if (entry?.stats) {
+                            visParamsRef.current[type].min = entry.stats.min;
+                            visParamsRef.current[type].max = entry.stats.max;
+                        } else {
+                            applyAutoContrast(type, await CogService.sampleOverview(parts), layerGroup);
                         }
+                        if (geeLayersRef.current[type] !== layerGroup) return; // Toggled off meanwhile
+
+                        const layer = createCogTileLayer({
+                            parts,
+                            getRamp: () => visParamsRef.current[type],
+                            opacity: layerOpacity[type]
+                        });
+                        layer.once('load', () => setLayerLoading(prev => ({ ...prev, [type]: false })));
+                        layer.addTo(layerGroup);
                     } catch (e) {
                         console.error(`Failed to init layer ${name}`, e);
-                        if (geeLayersRef.current[type]) {
-                            geeLayersRef.current[type].remove();
+                        setLayerLoading(prev => ({ ...prev, [type]: false }));
+                        if (geeLayersRef.current[type] === layerGroup) {
+                            layerGroup.remove();
                             geeLayersRef.current[type] = null;
                         }
                     }
@@ -327,6 +258,7 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
                 if (geeLayersRef.current[type]) {
                     geeLayersRef.current[type].remove(); // This removes the LayerGroup
                     geeLayersRef.current[type] = null;
+                    setLayerLoading(prev => ({ ...prev, [type]: false }));
                 }
             }
         };
@@ -375,37 +307,36 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
     });
 
     const fetchElevation = async (lat: number, lng: number): Promise<number | null> => {
-        try {
-            setLoadingElevation(true);
-            const res = await fetch(`https://api.open-meteo.com/v1/elevation?latitude=${lat}&longitude=${lng}`);
-            const data = await res.json();
-            setLoadingElevation(false);
-            if (data.elevation && data.elevation.length > 0) return data.elevation[0];
-            return null;
-        } catch (e) {
-            console.error("Elevation fetch failed", e);
-            setLoadingElevation(false);
-            return null;
-        }
+        setLoadingElevation(true);
+        const elev = await ElevationService.getElevation(lat, lng);
+        setLoadingElevation(false);
+        return elev;
     };
 
-    const fetchPathElevations = async (points: L.LatLng[]): Promise<number[]> => {
+    const fetchPathElevations = async (points: L.LatLng[]): Promise<(number | null)[]> => {
         if (points.length === 0) return [];
-        const lats = points.map(p => p.lat).join(',');
-        const lngs = points.map(p => p.lng).join(',');
-        try {
-            setLoadingElevation(true);
-            const res = await fetch(`https://api.open-meteo.com/v1/elevation?latitude=${lats}&longitude=${lngs}`);
-            const data = await res.json();
-            setLoadingElevation(false);
-            return data.elevation || [];
-        } catch (e) {
-            console.error("Bulk elevation fetch failed", e);
-            setLoadingElevation(false);
-            return points.map(() => 0); // Fallback
+        setLoadingElevation(true);
+        const elevs = await ElevationService.getElevations(points);
+        setLoadingElevation(false);
+        return elevs;
+    };
+
+    // --- Helper: Densified profile path with cumulative distance and gap-filled ground levels ---
+    const sampleProfileUncached = async (path: L.LatLng[]): Promise<ProfileSample> => {
+        const pts = densifyPath(path, PROFILE_SPACING_M).map(p => L.latLng(p.lat, p.lng));
+        const dists = profileChainage(pts);
+        const totalDist = dists.length ? dists[dists.length - 1] : 0;
+        const elevs = fillElevationGaps(await fetchPathElevations(pts), dists);
+        if (!elevs) {
+            console.warn('No elevation available for profile, assuming flat ground');
+            return { pts, dists, totalDist, elevs: pts.map(() => 0), flat: true };
         }
+        return { pts, dists, totalDist, elevs };
     };
 
+    // Unchanged lines reuse their sample, so only edited lines hit the elevation service
+    const sampleProfile = (path: L.LatLng[]) => profileMemoRef.current(path, () => sampleProfileUncached(path));
+
     const fetchLocationName = async (lat: number, lng: number) => {
         try {
             const res = await fetch(`https://nominatim.openstreetmap.org/reverse?format=json&lat=${lat}&lon=${lng}`);
@@ -421,6 +352,169 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         }
     };
 
+    // --- Helpers: Design features with their edit handlers (placed by map clicks or a restore) ---
+    const updateBorehole = async (lat: number, lng: number) => {
+        const elev = await fetchElevation(lat, lng);
+        if (features.current.borehole) features.current.borehole.elev = elev;
+        if (elev !== null) setInputs(prev => ({ ...prev, boreholeElevation: elev }));
+
+        // Auto-name site if empty using Reverse Geocoding
+        setProjectDetails(current => {
+            if (!current.siteName) {
+                fetchLocationName(lat, lng).then(name => {
+                    if (name) setProjectDetails(prev => ({ ...prev, siteName: name }));
+                });
+            }
+            return current;
+        });
+
+        scheduleRecalc();
+    };
+
+    const addBoreholeMarker = (latlng: L.LatLng) => {
+        if (features.current.borehole?.marker) features.current.borehole.marker.remove();
+        const m = L.marker(latlng, { icon: icons.current.bh, draggable: true }).addTo(mapInstanceRef.current!);
+        m.on('click', () => { if (activeToolRef.current === 'delete') { m.remove(); features.current.borehole = null; setInputs(prev => ({ ...prev, boreholeElevation: undefined })); scheduleRecalc(); setAnalysisUpdateTrigger(prev => prev + 1); } });
+        m.on('dragend', async () => {
+            const ll = m.getLatLng();
+            await updateBorehole(ll.lat, ll.lng);
+        });
+        return m;
+    };
+
+    const addTankMarker = (latlng: L.LatLng) => {
+        if (features.current.tank?.marker) features.current.tank.marker.remove();
+        const m = L.marker(latlng, { icon: icons.current.tank, draggable: true }).addTo(mapInstanceRef.current!);
+        m.on('click', () => { if (activeToolRef.current === 'delete') { m.remove(); features.current.tank = null; setInputs(prev => ({ ...prev, tankElevation: undefined })); scheduleRecalc(); setAnalysisUpdateTrigger(prev => prev + 1); } });
+        let dragFrom: L.LatLng | null = null;
+        m.on('dragstart', () => { dragFrom = m.getLatLng(); });
+        m.on('dragend', async () => {
+            const ll = m.getLatLng();
+            snapMainsToTank(dragFrom);
+            const elev = await fetchElevation(ll.lat, ll.lng);
+            if (features.current.tank) features.current.tank.elev = elev;
+            if (elev !== null) setInputs(prev => ({ ...prev, tankElevation: elev }));
+            scheduleRecalc();
+        });
+        return m;
+    };
+
+    // --- Helper: Keep mains joined to the tank when it is placed or moved ---
+    // The end that sat on the previous tank position follows it; failing that, the end nearest
+    // the tank is joined if it lies within TANK_SNAP_M (a main drawn before the tank existed).
+    const snapMainsToTank = (previous: L.LatLng | null) => {
+        const tankLL = features.current.tank?.marker.getLatLng();
+        if (!tankLL) return;
+        features.current.mainLines.forEach(ml => {
+            const pts = ml.poly.getLatLngs() as L.LatLng[];
+            const path: L.LatLng[] = [...((Array.isArray(pts[0]) && !('lat' in pts[0])) ? (pts as any).flat() : pts)];
+            if (path.length < 2) return;
+            const last = path.length - 1;
+            let end = previous ? [0, last].find(i => path[i].equals(previous, 0)) : undefined;
+            if (end === undefined) {
+                if (path[0].equals(tankLL, 0) || path[last].equals(tankLL, 0)) return;
+                const nearest = path[0].distanceTo(tankLL) <= path[last].distanceTo(tankLL) ? 0 : last;
+                if (path[nearest].distanceTo(tankLL) <= TANK_SNAP_M) end = nearest;
+            }
+            if (end === undefined || path[end].equals(tankLL, 0)) return;
+            path[end] = tankLL;
+            ml.poly.setLatLngs(path);
+        });
+    };
+
+    const addTapMarker = (latlng: L.LatLng, id: string) => {
+        const m = L.marker(latlng, { icon: icons.current.tap, draggable: true }).addTo(mapInstanceRef.current!);
+        m.on('click', () => { if (activeToolRef.current === 'delete') { m.remove(); features.current.taps = features.current.taps.filter(t => t.id !== id); scheduleRecalc(); setAnalysisUpdateTrigger(prev => prev + 1); } });
+        m.on('dragend', async () => {
+            const ll = m.getLatLng();
+            const tap = features.current.taps.find(t => t.id === id);
+            if (tap) { tap.elev = await fetchElevation(ll.lat, ll.lng); }
+            scheduleRecalc();
+            setAnalysisUpdateTrigger(prev => prev + 1);
+        });
+        return m;
+    };
+
+    const addInstitutionMarker = (latlng: L.LatLng, type: InstitutionType, id: string) => {
+        const m = L.marker(latlng, { icon: icons.current[type], draggable: true }).addTo(mapInstanceRef.current!);
+        m.on('click', () => {
+            if (activeToolRef.current === 'delete') {
+                m.remove();
+                features.current.institutions = features.current.institutions.filter(t => t.id !== id);
+                scheduleRecalc();
+                setAnalysisUpdateTrigger(prev => prev + 1);
+            }
+        });
+        m.on('dragend', () => { scheduleRecalc(); setAnalysisUpdateTrigger(prev => prev + 1); }); // Repositioning changes connections potentially
+        return m;
+    };
+
+    const addMainLine = (path: L.LatLng[], id: string) => {
+        const poly = L.polyline(path, { color: '#ef4444', weight: 4, renderer: svgRenderer.current! }).addTo(mapInstanceRef.current!);
+        poly.on('click', (e) => {
+            if (activeToolRef.current === 'delete') {
+                L.DomEvent.stopPropagation(e);
+                poly.remove();
+                features.current.mainLines = features.current.mainLines.filter(ml => ml.id !== id);
+                scheduleRecalc();
+                setAnalysisUpdateTrigger(prev => prev + 1);
+            }
+        });
+        features.current.mainLines.push({ poly, id });
+    };
+
+    // --- Helper: Rebuild a saved design without network calls ---
+    // Elevations come from the snapshot, and each saved ground profile is seeded into the
+    // profile memo under the restored vertices, so the first recalculation finds every line
+    // already sampled.
+    const restoreDesign = ({ design, profiles }: RestoredDesign) => {
+        const map = mapInstanceRef.current!;
+        const ll = (p: { lat: number, lng: number }) => L.latLng(p.lat, p.lng);
+        map.setView(ll(design.view), design.view.zoom);
+        if (design.borehole) features.current.borehole = { marker: addBoreholeMarker(ll(design.borehole)), elev: design.borehole.elev };
+        if (design.tank) features.current.tank = { marker: addTankMarker(ll(design.tank)), elev: design.tank.elev };
+        design.taps.forEach(t => features.current.taps.push({ marker: addTapMarker(ll(t), t.id), elev: t.elev, id: t.id }));
+        design.institutions.forEach(inst => features.current.institutions.push({ marker: addInstitutionMarker(ll(inst), inst.type, inst.id), type: inst.type, id: inst.id }));
+        design.mainLines.forEach(ml => addMainLine(ml.path.map(ll), ml.id));
+
+        const paths = new Map(design.mainLines.map(ml => [ml.id, ml.path.map(ll)]));
+        if (design.borehole && design.tank) paths.set('rising', [ll(design.borehole), ll(design.tank)]);
+        profiles.forEach(profile => {
+            const path = paths.get(profile.lineId);
+            if (!path) return;
+            const pts = densifyPath(path, PROFILE_SPACING_M).map(ll);
+            if (pts.length !== profile.elevs.length) return; // Sampled at another spacing: fetch afresh
+            const dists = profileChainage(pts);
+            const sample: ProfileSample = { pts, dists, totalDist: dists.length ? dists[dists.length - 1] : 0, elevs: profile.elevs };
+            profileMemoRef.current(path, () => Promise.resolve(sample));
+        });
+
+        scheduleRecalc();
+        setAnalysisUpdateTrigger(prev => prev + 1);
+    };
+
+    // --- Helper: Current design in saveable form (pipe vertices as the network model holds them) ---
+    const snapshotDesign = (): DesignSnapshot => {
+        const map = mapInstanceRef.current;
+        const center = map ? map.getCenter() : { lat: -13.2543, lng: 34.3015 };
+        const node = (f: { marker: L.Marker, elev: number | null } | null) => {
+            if (!f) return null;
+            const { lat, lng } = f.marker.getLatLng();
+            return { lat, lng, elev: f.elev };
+        };
+        return {
+            view: { lat: center.lat, lng: center.lng, zoom: map ? map.getZoom() : 7 },
+            borehole: node(features.current.borehole),
+            tank: node(features.current.tank),
+            taps: features.current.taps.map(t => ({ id: t.id, ...node(t)! })),
+            institutions: features.current.institutions.map(inst => {
+                const { lat, lng } = inst.marker.getLatLng();
+                return { id: inst.id, type: inst.type, lat, lng };
+            }),
+            mainLines: features.current.mainLines.map(ml => ({ id: ml.id, path: networkRef.current.get(ml.id)?.path || [] }))
+        };
+    };
+
     // Search Handler
     const handleSearch = async (e: React.FormEvent) => {
         e.preventDefault();
@@ -474,16 +568,13 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         L.control.scale({ position: 'bottomleft', metric: true, imperial: false }).addTo(map);
 
         // Initial layer based on state (street)
-        const url = 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png';
-        L.tileLayer(url, {
+        L.tileLayer(BASEMAP_URLS.street, {
             attribution: 'Map data',
             maxZoom: 22,
             crossOrigin: true
         }).addTo(map);
 
-        // Initialize layers
-        osmBuildingLayerRef.current = L.layerGroup().addTo(map);
-        googleBuildingLayerRef.current = L.layerGroup().addTo(map);
+        // Initialize layers (building footprint layers are created when their toggle is switched on)
         visualBufferLayerRef.current = L.layerGroup().addTo(map); // Initialize buffer layer here
 
         setTimeout(() => { map.invalidateSize(); }, 500);
@@ -496,86 +587,32 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
             if (tool === 'select' || tool === 'delete') return;
 
             if (tool === 'borehole') {
-                if (features.current.borehole?.marker) features.current.borehole.marker.remove();
-                const m = L.marker(latlng, { icon: icons.current.bh, draggable: true }).addTo(map);
-                m.on('click', () => { if (activeToolRef.current === 'delete') { m.remove(); features.current.borehole = null; setInputs(prev => ({ ...prev, boreholeElevation: undefined })); recalcAutoConnections(); setAnalysisUpdateTrigger(prev => prev + 1); } });
-
-                // Helper for handling placement and reverse geocoding
-                const handleBoreholeUpdate = async (lat: number, lng: number) => {
-                    const elev = await fetchElevation(lat, lng);
-                    if (features.current.borehole) features.current.borehole.elev = elev;
-                    if (elev !== null) setInputs(prev => ({ ...prev, boreholeElevation: elev }));
-
-                    // Auto-name site if empty using Reverse Geocoding
-                    setProjectDetails(current => {
-                        if (!current.siteName) {
-                            fetchLocationName(lat, lng).then(name => {
-                                if (name) setProjectDetails(prev => ({ ...prev, siteName: name }));
-                            });
-                        }
-                        return current;
-                    });
-
-                    recalcAutoConnections();
-                };
-
-                m.on('dragend', async () => {
-                    const ll = m.getLatLng();
-                    await handleBoreholeUpdate(ll.lat, ll.lng);
-                });
-
+                const m = addBoreholeMarker(latlng);
                 const elev = await fetchElevation(latlng.lat, latlng.lng);
                 features.current.borehole = { marker: m, elev };
-                await handleBoreholeUpdate(latlng.lat, latlng.lng); // Handle initial placement logic (elev + naming)
+                await updateBorehole(latlng.lat, latlng.lng); // Handle initial placement logic (elev + naming)
             }
             else if (tool === 'tank') {
-                if (features.current.tank?.marker) features.current.tank.marker.remove();
-                const m = L.marker(latlng, { icon: icons.current.tank, draggable: true }).addTo(map);
-                m.on('click', () => { if (activeToolRef.current === 'delete') { m.remove(); features.current.tank = null; setInputs(prev => ({ ...prev, tankElevation: undefined })); recalcAutoConnections(); setAnalysisUpdateTrigger(prev => prev + 1); } });
-                m.on('dragend', async () => {
-                    const ll = m.getLatLng();
-                    const elev = await fetchElevation(ll.lat, ll.lng);
-                    if (features.current.tank) features.current.tank.elev = elev;
-                    if (elev !== null) setInputs(prev => ({ ...prev, tankElevation: elev }));
-                    recalcAutoConnections();
-                });
+                const previous = features.current.tank?.marker.getLatLng() ?? null;
+                const m = addTankMarker(latlng);
                 const elev = await fetchElevation(latlng.lat, latlng.lng);
                 features.current.tank = { marker: m, elev };
+                snapMainsToTank(previous);
                 if (elev !== null) setInputs(prev => ({ ...prev, tankElevation: elev }));
-                recalcAutoConnections();
+                scheduleRecalc();
             }
             else if (tool === 'tap') {
-                const m = L.marker(latlng, { icon: icons.current.tap, draggable: true }).addTo(map);
                 const id = Math.random().toString(36).substr(2, 9);
-                m.on('click', () => { if (activeToolRef.current === 'delete') { m.remove(); features.current.taps = features.current.taps.filter(t => t.id !== id); recalcAutoConnections(); setAnalysisUpdateTrigger(prev => prev + 1); } });
-                m.on('dragend', async () => {
-                    const ll = m.getLatLng();
-                    const tap = features.current.taps.find(t => t.id === id);
-                    if (tap) { tap.elev = await fetchElevation(ll.lat, ll.lng); }
-                    recalcAutoConnections();
-                    setAnalysisUpdateTrigger(prev => prev + 1);
-                });
+                const m = addTapMarker(latlng, id);
                 const elev = await fetchElevation(latlng.lat, latlng.lng);
                 features.current.taps.push({ marker: m, elev, id });
-                recalcAutoConnections();
+                scheduleRecalc();
             }
             else if (['school', 'clinic', 'garden', 'grid'].includes(tool)) {
-                const icon = tool === 'school' ? icons.current.school : tool === 'clinic' ? icons.current.clinic : tool === 'garden' ? icons.current.garden : icons.current.grid;
-                const m = L.marker(latlng, { icon: icon, draggable: true }).addTo(map);
                 const id = Math.random().toString(36).substr(2, 9);
-
-                m.on('click', () => {
-                    if (activeToolRef.current === 'delete') {
-                        m.remove();
-                        features.current.institutions = features.current.institutions.filter(t => t.id !== id);
-                        recalcAutoConnections();
-                        setAnalysisUpdateTrigger(prev => prev + 1);
-                    }
-                });
-                m.on('dragend', () => { recalcAutoConnections(); setAnalysisUpdateTrigger(prev => prev + 1); }); // Repositioning changes connections potentially
-
-                features.current.institutions.push({ marker: m, type: tool as any, id });
-                recalcAutoConnections();
+                const m = addInstitutionMarker(latlng, tool as InstitutionType, id);
+                features.current.institutions.push({ marker: m, type: tool as InstitutionType, id });
+                scheduleRecalc();
             }
             else if (tool === 'pipeMain') {
                 let point = latlng;
@@ -621,6 +658,8 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
             }
         });
 
+        if (restore) restoreDesign(restore);
+
         return () => { };
     }, []);
 
@@ -635,186 +674,233 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
 
     useEffect(() => { activeToolRef.current = activeTool; }, [activeTool]);
 
-    // OSM Buildings Layer
+    // Coverage worker lifecycle
     useEffect(() => {
-        if (!mapInstanceRef.current) return;
+        coverageClientRef.current = createCoverageClient();
+        return () => {
+            coverageClientRef.current?.dispose();
+            coverageClientRef.current = null;
+        };
+    }, []);
 
-        const fetchAndDisplayOSMBuildings = async () => {
-            if (showOSMBuildings && !osmBuildingLayerRef.current) {
-                setBuildingsLoading(true);
-                try {
-                    const bounds = mapInstanceRef.current!.getBounds();
-                    const bbox = `${bounds.getSouth()},${bounds.getWest()},${bounds.getNorth()},${bounds.getEast()}`;
-                    const query = `[out:json][timeout:25];(way["building"](${bbox}););out geom;`;
-                    const url = `https://overpass-api.de/api/interpreter?data=${encodeURIComponent(query)}`;
-
-                    const response = await fetch(url);
-                    const data = await response.json();
-
-                    const features = data.elements.map((element: any) => {
-                        if (element.type === 'way' && element.geometry) {
-                            return {
-                                type: 'Feature',
-                                properties: { building: element.tags?.building || 'yes' },
-                                geometry: {
-                                    type: 'Polygon',
-                                    coordinates: [element.geometry.map((node: any) => [node.lon, node.lat])]
-                                }
-                            };
-                        }
-                        return null;
-                    }).filter(Boolean);
-
-                    const geojson = { type: 'FeatureCollection', features: features };
-
-                    const layer = L.geoJSON(geojson as any, {
-                        style: { color: '#3b82f6', weight: 1, fillColor: '#3b82f6', fillOpacity: 0.3 }
-                    });
-
-                    osmBuildingLayerRef.current = layer.addTo(mapInstanceRef.current!);
-                    console.log(`Loaded ${features.length} OSM buildings`);
-                } catch (error) {
-                    console.error('Error fetching OSM buildings:', error);
-                    alert('Failed to load OSM buildings. Try zooming in to a smaller area.');
-                } finally {
-                    setBuildingsLoading(false);
+    // Hand a footprint layer's packed centroids to the coverage worker
+    const indexBuildings = (layer: FootprintLayer) => {
+        const data = layer.getData();
+        if (!coverageClientRef.current || !data) return null;
+        const datasetId = coverageClientRef.current.setDataset(data.centroids);
+        buildingIndexRef.current = { layer, data, datasetId };
+        return buildingIndexRef.current;
+    };
+
+    // OSM Buildings Layer (Overpass, fetched per tile through OsmTileCache)
+    useEffect(() => {
+        if (!mapInstanceRef.current || !showOSMBuildings) return;
+
+        const map = mapInstanceRef.current;
+        const layer = createFootprintLayer({
+            style: { color: '#3b82f6', weight: 1, fillColor: '#3b82f6', fillOpacity: 0.3 },
+            onFrame: setFootprintStats
+        }).addTo(map);
+        osmBuildingLayerRef.current = layer;
+        const tileData = new Map<string, FootprintData>(); // tile key -> packed footprints currently on the map
+        let controller: AbortController | null = null;
+        let debounceTimer: ReturnType<typeof setTimeout> | null = null;
+        let disposed = false;
+
+        // Only the tiles covering the view are on the map, so only they enter the coverage analysis
+        const updateFeatures = async () => {
+            controller?.abort(); // Superseded queries are cancelled, not left to finish
+            controller = new AbortController();
+            const signal = controller.signal;
+
+            const bounds = map.getBounds();
+            const box = { south: bounds.getSouth(), west: bounds.getWest(), north: bounds.getNorth(), east: bounds.getEast() };
+            if (tileCountInBox(box, OSM_TILE_ZOOM) > MAX_OSM_TILES) {
+                setBuildingsLoading(false);
+                return;
+            }
+            const tiles = tilesInBox(box, OSM_TILE_ZOOM);
+            const wanted = new Set(tiles.map(tileKey));
+
+            let changed = false;
+            tileData.forEach((_, key) => {
+                if (!wanted.has(key)) { tileData.delete(key); changed = true; }
+            });
+
+            const missing = tiles.filter(t => !tileData.has(tileKey(t)));
+            if (missing.length > 0) setBuildingsLoading(true);
+
+            // Overpass serves two queries at a time per client; a failed tile is retried on the next move
+            let next = 0, failed = 0;
+            const worker = async () => {
+                while (next < missing.length && !signal.aborted) {
+                    const tile = missing[next++];
+                    try {
+                        const result = await OsmTileCache.getTile(tile, signal);
+                        if (!result || signal.aborted || disposed) return;
+                        tileData.set(tileKey(tile), result.data);
+                        changed = true;
+                    } catch (e) {
+                        failed++;
+                    }
                 }
-            } else if (!showOSMBuildings && osmBuildingLayerRef.current) {
-                osmBuildingLayerRef.current.remove();
-                osmBuildingLayerRef.current = null;
+            };
+            await Promise.all(Array.from({ length: Math.min(OSM_FETCH_CONCURRENCY, missing.length) }, worker));
+
+            if (signal.aborted || disposed) return;
+            if (failed > 0) console.warn(`OSM: ${failed} of ${missing.length} building tiles failed to load`);
+            if (changed) {
+                layer.setData(mergeFootprints([...tileData.values()]));
+                indexBuildings(layer);
+                setAnalysisUpdateTrigger(prev => prev + 1);
             }
+            setBuildingsLoading(false);
         };
 
-        fetchAndDisplayOSMBuildings();
+        const onMoveEnd = () => {
+            if (debounceTimer) clearTimeout(debounceTimer);
+            debounceTimer = setTimeout(updateFeatures, 300);
+        };
+
+        updateFeatures();
+        map.on('moveend', onMoveEnd);
+
+        return () => {
+            disposed = true;
+            controller?.abort();
+            if (debounceTimer) clearTimeout(debounceTimer);
+            map.off('moveend', onMoveEnd);
+            map.removeLayer(layer);
+            osmBuildingLayerRef.current = null;
+            setFootprintStats(null);
+            setBuildingsLoading(false);
+        };
     }, [showOSMBuildings]);
 
-    // Google Buildings Layer (FlatGeobuf)
+    // Google Buildings Layer (FlatGeobuf, fetched per tile through BuildingTileCache)
     useEffect(() => {
-        console.log('Google Buildings Effect Triggered. Show:', showGoogleBuildings, 'Map:', !!mapInstanceRef.current);
         if (!mapInstanceRef.current || !showGoogleBuildings) return;
 
-        let buildingsLayer: any = null;
+        const map = mapInstanceRef.current;
+        const fgbUrl = fgbUrlForCountry(selectedCountry);
+        const buildingsLayer = createFootprintLayer({
+            style: { fillColor: '#1CABE2', fillOpacity: 0.6, color: '#003E5E', weight: 1 },
+            onFrame: setFootprintStats
+        }).addTo(map);
+        googleBuildingLayerRef.current = buildingsLayer; // Store ref for analysis
+        const tileData = new Map<string, FootprintData>(); // tile key -> packed footprints currently on the map
+        let controller: AbortController | null = null;
+        let debounceTimer: ReturnType<typeof setTimeout> | null = null;
+        let disposed = false;
+
+        // Function to sync the tiles on the map with the current viewport
+        const updateFeatures = async () => {
+            controller?.abort(); // Superseded requests stop pulling range reads
+            controller = new AbortController();
+            const signal = controller.signal;
+
+            const bounds = map.getBounds();
+            const box = { south: bounds.getSouth(), west: bounds.getWest(), north: bounds.getNorth(), east: bounds.getEast() };
+            if (tileCountInBox(box, BUILDING_TILE_ZOOM) > MAX_BUILDING_TILES) {
+                console.log('Zoom in to load building footprints');
+                setBuildingsLoading(false);
+                return;
+            }
+            const tiles = tilesInBox(box, BUILDING_TILE_ZOOM);
+            const wanted = new Set(tiles.map(tileKey));
 
-        const loadGoogleBuildings = async () => {
-            try {
-                const fgbUrl = `https://data.source.coop/vida/google-microsoft-open-buildings/flatgeobuf/by_country/country_iso=${selectedCountry}/${selectedCountry}.fgb`;
-                console.log(`Loading Google Buildings (FGB) for ${selectedCountry}: ${fgbUrl}`);
-
-                // Check if resource is reachable before trying to deserialize
-                try {
-                    const headRes = await fetch(fgbUrl, { method: 'HEAD' });
-                    if (!headRes.ok) {
-                        throw new Error(`FGB URL not reachable: ${headRes.status} ${headRes.statusText}`);
-                    }
-                } catch (netErr) {
-                    console.warn("Network check failed for FGB, trying to proceed anyway...", netErr);
-                }
+            // Drop tiles that left the viewport (they stay cached)
+            let changed = false;
+            tileData.forEach((_, key) => {
+                if (!wanted.has(key)) { tileData.delete(key); changed = true; }
+            });
 
-                // Create a GeoJSON layer
-                buildingsLayer = L.geoJSON(null, {
-                    // renderer: L.svg(), // Removed invalid option, handled by map preference
-                    style: {
-                        fillColor: '#1CABE2',
-                        fillOpacity: 0.6,
-                        color: '#003E5E',
-                        weight: 1
-                    }
-                });
+            const missing = tiles.filter(t => !tileData.has(tileKey(t)));
+            if (missing.length > 0) setBuildingsLoading(true);
 
-                if (mapInstanceRef.current) {
-                    buildingsLayer.addTo(mapInstanceRef.current);
-                    googleBuildingLayerRef.current = buildingsLayer; // Store ref for analysis
-
-                    // Function to update features based on bounds
-                    const updateFeatures = async () => {
-                        if (!mapInstanceRef.current) return;
-                        const bounds = mapInstanceRef.current.getBounds();
-                        const rect = {
-                            minX: bounds.getWest(),
-                            minY: bounds.getSouth(),
-                            maxX: bounds.getEast(),
-                            maxY: bounds.getNorth()
-                        };
-
-                        // Clear existing layers to avoid duplicates/memory issues
-                        buildingsLayer.clearLayers();
-
-                        try {
-                            // Use flatgeobuf to fetch features in bounds
-                            // Note: deserialize uses fetch internally with Range headers
-                            const iter = deserialize(fgbUrl, rect);
-                            let count = 0;
-                            for await (const feature of iter) {
-                                buildingsLayer.addData(feature as any);
-                                count++;
-                            }
-                            console.log(`Loaded ${count} Google Buildings features`);
-
-                            if (count === 0) {
-                                console.log("No buildings found in this area (or FGB load failed silently).");
-                            }
-                            setAnalysisUpdateTrigger(prev => prev + 1); // Force analysis update
-                        } catch (e) {
-                            console.error('Error fetching FGB features:', e);
-                            // Do not alert constantly on move
-                        } finally {
-                            setBuildingsLoading(false);
-                        }
-                    };
+            const syncDone = Perf.start('buildings.viewport');
+            try {
+                // Small worker pool so several tiles stream concurrently
+                let next = 0;
+                const worker = async () => {
+                    while (next < missing.length && !signal.aborted) {
+                        const tile = missing[next++];
+                        const result = await BuildingTileCache.getTile(selectedCountry, tile, signal);
+                        if (!result || signal.aborted || disposed) return;
+                        tileData.set(tileKey(tile), packFootprints(result.features));
+                        changed = true;
+                    }
+                };
+                await Promise.all(Array.from({ length: Math.min(BUILDING_FETCH_CONCURRENCY, missing.length) }, worker));
 
-                    // Initial load
-                    updateFeatures();
+                if (signal.aborted || disposed) return;
+                let count = 0;
+                tileData.forEach(data => { count += data.count; });
+                if (count === 0) {
+                    console.log("No buildings found in this area (or FGB load failed silently).");
+                }
+                setBuildingCacheStats(BuildingTileCache.getStats());
+                if (changed) {
+                    buildingsLayer.setData(mergeFootprints([...tileData.values()]));
+                    indexBuildings(buildingsLayer);
+                    setAnalysisUpdateTrigger(prev => prev + 1); // Force analysis update
+                }
+                syncDone({ items: count });
+            } catch (e) {
+                console.error('Error fetching FGB features:', e);
+                // Do not alert constantly on move
+            } finally {
+                if (!signal.aborted) setBuildingsLoading(false);
+            }
+        };
 
-                    // Add event listener for map movement
-                    mapInstanceRef.current.on('moveend', updateFeatures);
+        const onMoveEnd = () => {
+            if (debounceTimer) clearTimeout(debounceTimer);
+            debounceTimer = setTimeout(updateFeatures, 300);
+        };
 
-                    // Store reference for cleanup
-                    (buildingsLayer as any)._updateFeatures = updateFeatures;
+        const loadGoogleBuildings = async () => {
+            console.log(`Loading Google Buildings (FGB) for ${selectedCountry}: ${fgbUrl}`);
+            // Check if resource is reachable before trying to deserialize
+            try {
+                const headRes = await fetch(fgbUrl, { method: 'HEAD' });
+                if (!headRes.ok) {
+                    throw new Error(`FGB URL not reachable: ${headRes.status} ${headRes.statusText}`);
                 }
-            } catch (error) {
-                console.error('Failed to load Google Buildings:', error);
-                alert(`Google Buildings failed to load for ${selectedCountry}. Please check your internet connection or try OSM Buildings.`);
-                setShowGoogleBuildings(false);
-                setShowOSMBuildings(true);
-                setBuildingsLoading(false);
+            } catch (netErr) {
+                console.warn("Network check failed for FGB, trying to proceed anyway (cached tiles may still load)...", netErr);
             }
+            if (disposed) return;
+
+            // Initial load
+            updateFeatures();
+
+            // Add event listener for map movement
+            map.on('moveend', onMoveEnd);
         };
 
         setBuildingsLoading(true);
         loadGoogleBuildings();
 
         return () => {
-            if (buildingsLayer) {
-                if (mapInstanceRef.current) {
-                    mapInstanceRef.current.removeLayer(buildingsLayer);
-                    if ((buildingsLayer as any)._updateFeatures) {
-                        mapInstanceRef.current.off('moveend', (buildingsLayer as any)._updateFeatures);
-                    }
-                }
-                buildingsLayer = null;
-                googleBuildingLayerRef.current = null;
-            }
+            disposed = true;
+            controller?.abort();
+            if (debounceTimer) clearTimeout(debounceTimer);
+            map.off('moveend', onMoveEnd);
+            map.removeLayer(buildingsLayer);
+            googleBuildingLayerRef.current = null;
+            setFootprintStats(null);
+            setBuildingsLoading(false);
         };
     }, [showGoogleBuildings, selectedCountry]);
 
     // Map Style Layer
     useEffect(() => {
         if (!mapInstanceRef.current) return;
-        let url = '';
+        // Shared with the offline prefetch so cached tiles match the URLs requested here
+        const url = BASEMAP_URLS[mapStyle];
         let labelsUrl = '';
 
-        if (mapStyle === 'street') {
-            url = 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png';
-        } else if (mapStyle === 'satellite') {
-            url = 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}';
-        } else if (mapStyle === 'topo') {
-            // OpenTopoMap for hydraulic planning
-            url = 'https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png';
-        } else if (mapStyle === 'hybrid') {
-            // Use Google Maps hybrid (satellite + labels)
-            url = 'https://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}';
-        }
-
         // Update TileLayer with crossOrigin for PDF export compatibility
         const tileLayer = L.tileLayer(url, {
             attribution: mapStyle === 'topo' ? 'Map data: © OpenStreetMap contributors, SRTM | Map style: © OpenTopoMap (CC-BY-SA)' : mapStyle === 'hybrid' ? 'Map data: © Google' : 'Map data',
@@ -848,32 +934,37 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         };
     }, [mapStyle]);
 
-    useEffect(() => { recalcAutoConnections(); }, [inputs, population]);
+    // Inputs, population and applied pipe sizes never move a pipe, so these only redo the calculations
+    useEffect(() => { scheduleRecalc(false); }, [inputs, population, designChoice]);
+
+    useEffect(() => () => {
+        if (recalcFrameRef.current !== null) cancelAnimationFrame(recalcFrameRef.current);
+    }, []);
+
+    // Marker handlers are bound once, so they go through recalcRef to reach this render's inputs.
+    // A burst that includes any geometry change runs the geometry pass once.
+    const scheduleRecalc = (geometry = true) => {
+        if (geometry) recalcGeometryRef.current = true;
+        if (recalcFrameRef.current !== null) return;
+        recalcFrameRef.current = requestAnimationFrame(() => {
+            recalcFrameRef.current = null;
+            const withGeometry = recalcGeometryRef.current;
+            recalcGeometryRef.current = false;
+            recalcRef.current(withGeometry);
+        });
+    };
 
     const finishSegment = () => {
         const seg = currentSegmentRef.current;
         if (seg.length < 2) return;
         const cleanSeg = seg.filter((p, i) => i === 0 || p.distanceTo(seg[i - 1]) > 0.1);
 
-        if (cleanSeg.length > 1) {
-            const id = Math.random().toString(36).substr(2, 9);
-            const poly = L.polyline(cleanSeg, { color: '#ef4444', weight: 4, renderer: svgRenderer.current! }).addTo(mapInstanceRef.current!);
-            poly.on('click', (e) => {
-                if (activeToolRef.current === 'delete') {
-                    L.DomEvent.stopPropagation(e);
-                    poly.remove();
-                    features.current.mainLines = features.current.mainLines.filter(ml => ml.id !== id);
-                    recalcAutoConnections();
-                    setAnalysisUpdateTrigger(prev => prev + 1);
-                }
-            });
-            features.current.mainLines.push({ poly, id });
-        }
+        if (cleanSeg.length > 1) addMainLine(cleanSeg, Math.random().toString(36).substr(2, 9));
 
         setCurrentSegment([]);
         setIsDrawing(false);
         if (features.current.tempLine) { features.current.tempLine.remove(); features.current.tempLine = null; }
-        recalcAutoConnections();
+        scheduleRecalc();
         setAnalysisUpdateTrigger(prev => prev + 1); // Force analysis update after pipe finish
     };
 
@@ -885,85 +976,104 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         if (features.current.borehole && features.current.tank) {
             const bhLL = features.current.borehole.marker.getLatLng();
             const tankLL = features.current.tank.marker.getLatLng();
-            if (features.current.risingMain) features.current.risingMain.remove();
-            features.current.risingMain = L.polyline([bhLL, tankLL], { color: '#3b82f6', weight: 5, opacity: 0.8, renderer: svgRenderer.current! }).addTo(map);
+            if (features.current.risingMain) features.current.risingMain.setLatLngs([bhLL, tankLL]);
+            else features.current.risingMain = L.polyline([bhLL, tankLL], { color: '#3b82f6', weight: 5, opacity: 0.8, renderer: svgRenderer.current! }).addTo(map);
         } else {
             if (features.current.risingMain) { features.current.risingMain.remove(); features.current.risingMain = null; }
         }
 
-        // Distribution Lines
-        features.current.distLines.forEach(l => l.remove());
-        features.current.distLines = [];
+        // Distribution Lines: the index only re-searches features that moved or were added,
+        // and each feature keeps its polyline, so only changed connections touch the SVG
+        const index = connectionIndexRef.current;
+        index.setMains(features.current.mainLines.map(ml => {
+            const pts = ml.poly.getLatLngs() as L.LatLng[];
+            const flatPts: L.LatLng[] = Array.isArray(pts[0]) ? (pts as any).flat() : pts;
+            return { id: ml.id, path: flatPts.length > 0 && 'lat' in flatPts[0] ? flatPts : [] };
+        }));
+        index.setTank(features.current.tank ? features.current.tank.marker.getLatLng() : null);
 
         const connectableFeatures = [...features.current.taps, ...features.current.institutions.filter(i => i.type !== 'grid')];
-
-        if (features.current.mainLines.length > 0 || features.current.tank) {
-            connectableFeatures.forEach(feature => {
-                const featLL = feature.marker.getLatLng();
-                let minDist = Infinity;
-                let connectPt: L.LatLng | null = null;
-
-                features.current.mainLines.forEach(ml => {
-                    const pts = ml.poly.getLatLngs() as L.LatLng[];
-                    const flatPts: L.LatLng[] = Array.isArray(pts[0]) ? (pts as any).flat() : pts;
-                    if (flatPts.length > 0 && 'lat' in flatPts[0]) {
-                        for (let i = 0; i < flatPts.length - 1; i++) {
-                            const closest = getClosestPointOnSegment(featLL, flatPts[i], flatPts[i + 1]);
-                            const dist = featLL.distanceTo(closest);
-                            if (dist < minDist) { minDist = dist; connectPt = closest; }
-                        }
-                    }
-                });
-
-                if (features.current.tank) {
-                    const tLoc = features.current.tank.marker.getLatLng();
-                    const dist = featLL.distanceTo(tLoc);
-                    if (dist < minDist) { minDist = dist; connectPt = tLoc; }
-                }
-
-                if (connectPt) {
-                    const line = L.polyline([featLL, connectPt], { color: '#10b981', weight: 2, dashArray: '5, 5', renderer: svgRenderer.current! }).addTo(map);
-                    features.current.distLines.push(line);
-                }
-            });
-        }
+        const requests = connectableFeatures.map(f => ({ id: f.id, point: f.marker.getLatLng() }));
+        const featureLL = new Map(requests.map(r => [r.id, r.point]));
+        const previous = new Map(features.current.connections.map((conn, i) => [conn.featureId, features.current.distLines[i]]));
+        const distLines: L.Polyline[] = [];
+        const connections: typeof features.current.connections = [];
+
+        index.connect(requests).forEach(conn => {
+            const ends = [featureLL.get(conn.featureId)!, L.latLng(conn.point.lat, conn.point.lng)];
+            let line = previous.get(conn.featureId);
+            if (line) {
+                const [a, b] = line.getLatLngs() as L.LatLng[];
+                if (!a.equals(ends[0], 0) || !b.equals(ends[1], 0)) line.setLatLngs(ends);
+                previous.delete(conn.featureId);
+            } else {
+                line = L.polyline(ends, { color: '#10b981', weight: 2, dashArray: '5, 5', renderer: svgRenderer.current! }).addTo(map);
+            }
+            distLines.push(line);
+            connections.push({ featureId: conn.featureId, lineId: conn.lineId, segIndex: conn.segIndex });
+        });
+        previous.forEach(line => line.remove()); // Features deleted, or nothing left to connect to
+        features.current.distLines = distLines;
+        features.current.connections = connections;
 
         performCalculations();
     };
-
-    const calculateHeadLoss = (lengthM: number, flowRateM3H: number, diameterMM: number) => {
-        const Q = flowRateM3H / 3600; // m3/s
-        const D = diameterMM / 1000; // m
-        const C = 140; // HDPE Roughness
-        if (Q === 0 || D === 0) return 0;
-        return 10.67 * lengthM * Math.pow(Q, 1.852) * Math.pow(C, -1.852) * Math.pow(D, -4.87);
+    recalcRef.current = geometry => geometry ? recalcAutoConnections() : performCalculations();
+
+    // --- Helper: A main with any node the solver could not reach from the tank ---
+    const isDetached = (line: LineNodes | undefined, solution: NetworkSolution) =>
+        !!line && solution.unreached.length > 0 && line.nodes.some(n => Number.isNaN(solution.heads[n]));
+
+    // --- Helper: Solve the gravity network fed from the tank (mains, connections, tap demands) ---
+    const solveDistribution = (domesticDemandM3: number): { build: PipeNetworkBuild, solution: NetworkSolution } | null => {
+        if (!features.current.tank) return null;
+        const toM3S = (dailyM3: number) => dailyM3 / inputs.peakSunHours / 3600;
+        const tapDemand = features.current.taps.length ? toM3S(domesticDemandM3) / features.current.taps.length : 0;
+        const attachments: LineAttachment[] = [];
+        features.current.connections.forEach((conn, i) => {
+            const [featLL, attach] = features.current.distLines[i].getLatLngs() as L.LatLng[];
+            const inst = features.current.institutions.find(f => f.id === conn.featureId);
+            const litresPerDay = !inst ? 0 : inst.type === 'school' ? INSTITUTIONAL_DEMAND.SCHOOL : inst.type === 'clinic' ? INSTITUTIONAL_DEMAND.CLINIC : inst.type === 'garden' ? INSTITUTIONAL_DEMAND.GARDEN : 0;
+            attachments.push({
+                point: featLL,
+                lineId: conn.lineId,
+                segIndex: conn.segIndex,
+                attach,
+                demand: inst ? toM3S(litresPerDay / 1000) : tapDemand,
+                diameterMM: 32
+            });
+        });
+        const build = buildPipeNetwork({
+            source: features.current.tank.marker.getLatLng(),
+            sourceHead: (features.current.tank.elev || 0) + inputs.tankHeight,
+            mains: features.current.mainLines.map(ml => ({ id: ml.id, path: networkRef.current.get(ml.id)?.path || [], diameterMM: designChoice?.mainDiameters[ml.id] ?? 63 })),
+            attachments
+        });
+        const solution = solveNetwork(build.network);
+        // Mains that share no vertex with the tank (or with a main that does) get no head
+        const detached = features.current.mainLines
+            .map((ml, i) => ({ ml, name: `Main Line ${i + 1}` }))
+            .filter(({ ml }) => isDetached(build.lineNodes.get(ml.id), solution))
+            .map(({ name }) => name);
+        setDetachedMains(prev => prev.join() === detached.join() ? prev : detached);
+        if (detached.length > 0) console.warn(`Not connected to the tank: ${detached.join(', ')} (${solution.unreached.length} nodes left unsolved)`);
+        else if (!solution.converged) console.warn(`Network solver stopped after ${solution.iterations} iterations without converging`);
+        return { build, solution };
     };
 
-    const generateProfiles = async (flowRateM3H: number): Promise<PipelineProfile[]> => {
+    const generateProfiles = async (flowRateM3H: number, risingDiameterMM: number, hydraulics: { build: PipeNetworkBuild, solution: NetworkSolution } | null): Promise<{ profiles: PipelineProfile[], samples: ProfileSnapshot[], flat: boolean }> => {
         const profiles: PipelineProfile[] = [];
+        const samples: ProfileSnapshot[] = []; // Ground levels kept with the saved project (never the flat stand-in)
+        let flat = false;
         // 1. Rising Main
         if (features.current.borehole && features.current.tank && features.current.risingMain) {
-            const pts = features.current.risingMain.getLatLngs() as L.LatLng[];
-            const elevs = await fetchPathElevations(pts);
-            const dists: number[] = [];
-            let totalDist = 0;
-            pts.forEach((p, i) => {
-                if (i > 0) totalDist += p.distanceTo(pts[i - 1]);
-                dists.push(totalDist);
-            });
-            const totalHeadLoss = calculateHeadLoss(totalDist, flowRateM3H, 63);
+            const sample = await sampleProfile(features.current.risingMain.getLatLngs() as L.LatLng[]);
+            const { dists, totalDist, elevs } = sample;
+            if (sample.flat) flat = true;
+            else samples.push({ lineId: 'rising', elevs });
+            const totalHeadLoss = headLossHW(totalDist, flowRateM3H, risingDiameterMM);
             const startHGL = (features.current.tank.elev || 0) + inputs.tankHeight + totalHeadLoss;
-            const data = pts.map((p, i) => {
-                const currentHGL = startHGL - ((dists[i] / totalDist) * totalHeadLoss);
-                const groundElev = (elevs[i] || 0);
-                return {
-                    dist: dists[i],
-                    elevation: groundElev,
-                    hgl: currentHGL,
-                    pressure: currentHGL - (groundElev - 1),
-                    risk: (currentHGL - (groundElev - 1) < 0 ? 'negative_pressure' : (currentHGL - (groundElev - 1) > 100 ? 'high_pressure' : null)) as 'high_pressure' | 'negative_pressure' | null
-                };
-            });
+            const data = profileRows(dists, elevs, d => startHGL - ((d / totalDist) * totalHeadLoss));
             profiles.push({ id: 'rising', name: 'Rising Main', data });
         }
         // 2. Main Lines
@@ -971,49 +1081,69 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
             const ml = features.current.mainLines[i];
             const pts = ml.poly.getLatLngs() as L.LatLng[];
             const flatPts = (Array.isArray(pts[0]) && !('lat' in pts[0])) ? (pts as any).flat() : pts;
-            const elevs = await fetchPathElevations(flatPts);
+            const sample = await sampleProfile(flatPts);
+            const { dists, elevs } = sample;
+            if (sample.flat) flat = true;
+            else samples.push({ lineId: ml.id, elevs });
             const startHGL = (features.current.tank?.elev || 0) + inputs.tankHeight;
-            let cumDist = 0;
-            const data = flatPts.map((p: L.LatLng, idx: number) => {
-                if (idx > 0) cumDist += p.distanceTo(flatPts[idx - 1]);
-                const headLoss = calculateHeadLoss(cumDist, flowRateM3H, 63);
-                const currentHGL = startHGL - headLoss;
-                const groundElev = elevs[idx] || 0;
-                return {
-                    dist: cumDist,
-                    elevation: groundElev,
-                    hgl: currentHGL,
-                    pressure: currentHGL - (groundElev - 1),
-                    risk: (currentHGL - (groundElev - 1) < 0 ? 'negative_pressure' : (currentHGL - (groundElev - 1) > 100 ? 'high_pressure' : null)) as 'high_pressure' | 'negative_pressure' | null
-                };
-            });
-            profiles.push({ id: ml.id, name: `Main Line ${i + 1}`, data });
+            // Solved heads carry the per-segment flows; without a tank there is nothing to solve
+            // against, so fall back to the full flow through the whole line
+            // A main not joined to the tank has no solved heads either; it is profiled the same
+            // way and named as detached
+            const lineNodes = hydraulics?.build.lineNodes.get(ml.id);
+            const detached = !!hydraulics && isDetached(lineNodes, hydraulics.solution);
+            const data = profileRows(dists, elevs, d => lineNodes && !detached
+                ? headAtChainage(lineNodes, hydraulics!.solution.heads, d)
+                : startHGL - headLossHW(d, flowRateM3H, designChoice?.mainDiameters[ml.id] ?? 63));
+            profiles.push({ id: ml.id, name: `Main Line ${i + 1}${detached ? ' (not connected to the tank)' : ''}`, data });
         }
-        return profiles;
+        return { profiles, samples, flat };
     }
 
-    const performCalculations = (generatedProfiles: PipelineProfile[] = []) => {
-        // Lengths
-        let rLen = 0;
-        if (features.current.risingMain) {
-            const pts = features.current.risingMain.getLatLngs() as L.LatLng[];
-            rLen = pts[0].distanceTo(pts[1]);
-        }
-
-        let mLen = 0;
+    // --- Helper: Mirror the drawn pipes into the network model (re-measures moved lines only) ---
+    const syncNetwork = () => {
+        const network = networkRef.current;
+        if (features.current.risingMain) network.syncLine('rising', 'rising', features.current.risingMain.getLatLngs() as L.LatLng[]);
+        network.retain('rising', features.current.risingMain ? ['rising'] : []);
         features.current.mainLines.forEach(ml => {
             const pts = ml.poly.getLatLngs() as L.LatLng[];
-            const flatPts = (Array.isArray(pts[0]) && !('lat' in pts[0])) ? (pts as any).flat() : pts;
-            for (let i = 0; i < flatPts.length - 1; i++) mLen += flatPts[i].distanceTo(flatPts[i + 1]);
+            const flatPts: L.LatLng[] = (Array.isArray(pts[0]) && !('lat' in pts[0])) ? (pts as any).flat() : pts;
+            network.syncLine(ml.id, 'main', flatPts);
         });
-
-        let dLen = 0;
-        features.current.distLines.forEach(dl => {
-            const pts = dl.getLatLngs() as L.LatLng[];
-            dLen += pts[0].distanceTo(pts[1]);
+        network.retain('main', features.current.mainLines.map(ml => ml.id));
+        // Connections are keyed by feature, so deleting one tap leaves the others clean
+        const distIds = features.current.distLines.map((dl, i) => {
+            const id = `dist-${features.current.connections[i].featureId}`;
+            network.syncLine(id, 'dist', dl.getLatLngs() as L.LatLng[]);
+            return id;
         });
+        network.retain('dist', distIds);
+        return network;
+    };
 
-        const totalPipeLen = rLen + mLen + dLen;
+    // --- Helper: Pipe-sizing problem for the design search (taps with a known ground level) ---
+    const createDistributionProblem = (site: SiteQuantities, { build, solution }: { build: PipeNetworkBuild, solution: NetworkSolution }): DesignProblem => {
+        const tank = features.current.tank;
+        const taps: { attachment: number, elevation: number }[] = [];
+        if (tank && tank.elev !== null) { // Pressures mean nothing without the tank's level
+            features.current.connections.forEach((conn, i) => {
+                const tap = features.current.taps.find(t => t.id === conn.featureId);
+                if (tap && tap.elev !== null) taps.push({ attachment: i, elevation: tap.elev });
+            });
+        }
+        const lines = features.current.mainLines.map((ml, i) => ({ id: ml.id, name: `Main Line ${i + 1}` }));
+        return createDesignProblem(site, build, solution, lines, taps, (tank?.elev || 0) + inputs.tankHeight);
+    };
+
+    const performCalculations = () => {
+        const calcDone = Perf.start('design.calculate');
+        const network = syncNetwork();
+        if (network.takeDirty().length > 0) profileReuseRef.current = null; // Pipes moved
+
+        // Lengths
+        const rLen = network.totalLength('rising');
+        const mLen = network.totalLength('main');
+        const dLen = network.totalLength('dist');
 
         // Institutional Counts & Demand
         const countSchools = features.current.institutions.filter(i => i.type === 'school').length;
@@ -1021,16 +1151,6 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         const countGardens = features.current.institutions.filter(i => i.type === 'garden').length;
         const hasGrid = features.current.institutions.some(i => i.type === 'grid');
 
-        const domesticDemandM3 = (population * inputs.dailyDemandPerCapita) / 1000;
-        const institutionalDemandM3 = (
-            (countSchools * INSTITUTIONAL_DEMAND.SCHOOL) +
-            (countClinics * INSTITUTIONAL_DEMAND.CLINIC) +
-            (countGardens * INSTITUTIONAL_DEMAND.GARDEN)
-        ) / 1000;
-
-        const dailyDemandM3 = domesticDemandM3 + institutionalDemandM3;
-        const flowRateM3H = dailyDemandM3 / inputs.peakSunHours;
-
         setCounts({
             taps: features.current.taps.length,
             risingLen: Math.round(rLen),
@@ -1060,86 +1180,84 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
             lines: []
         };
 
-        if (features.current.risingMain) {
-            const pts = features.current.risingMain.getLatLngs() as L.LatLng[];
-            geometry.lines.push({
-                path: pts.map(p => ({ lat: p.lat, lng: p.lng })),
-                type: 'rising',
-                label: `Rising Main (${Math.round(rLen)}m)`
-            });
+        const rising = network.get('rising');
+        if (rising) {
+            geometry.lines.push({ path: rising.path, type: 'rising', label: `Rising Main (${Math.round(rLen)}m)` });
         }
         features.current.mainLines.forEach((ml, i) => {
-            const pts = ml.poly.getLatLngs() as L.LatLng[];
-            const flatPts = (Array.isArray(pts[0]) && !('lat' in pts[0])) ? (pts as any).flat() : pts;
-            let segLen = 0;
-            for (let k = 0; k < flatPts.length - 1; k++) segLen += flatPts[k].distanceTo(flatPts[k + 1]);
-            geometry.lines.push({
-                path: flatPts.map(p => ({ lat: p.lat, lng: p.lng })),
-                type: 'main',
-                label: `Main Line ${i + 1} (${Math.round(segLen)}m)`
-            });
+            const line = network.get(ml.id);
+            if (line) geometry.lines.push({ path: line.path, type: 'main', label: `Main Line ${i + 1} (${Math.round(line.length)}m)` });
         });
-        features.current.distLines.forEach((dl) => {
-            const pts = dl.getLatLngs() as L.LatLng[];
-            geometry.lines.push({ path: pts.map(p => ({ lat: p.lat, lng: p.lng })), type: 'dist', label: 'Distribution' });
+        features.current.connections.forEach(conn => {
+            const line = network.get(`dist-${conn.featureId}`);
+            if (line) geometry.lines.push({ path: line.path, type: 'dist', label: 'Distribution' });
         });
 
-        // Engineering
-        let staticHead = inputs.staticWaterLevel + inputs.tankHeight;
-        let elevDiff = inputs.elevationDifference;
-        if (features.current.borehole?.elev && features.current.tank?.elev) {
-            elevDiff = Math.max(0, features.current.tank.elev - features.current.borehole.elev);
-            staticHead = inputs.staticWaterLevel + elevDiff + inputs.tankHeight;
-        }
-        const frictionHead = totalPipeLen * inputs.frictionLossFactor;
-        const totalDynamicHead = staticHead + frictionHead;
-        const hydraulicPowerKW = (flowRateM3H * totalDynamicHead * 9.81) / (3600 * inputs.pumpEfficiency);
-        const pumpPowerKW = hydraulicPowerKW * 1.2;
-        const pvArrayKW = pumpPowerKW * 1.5;
-
-        const specs: SystemSpecs = {
-            dailyDemandM3, domesticDemandM3, institutionalDemandM3, totalDynamicHead, flowRateM3H, pumpPowerKW, pvArrayKW, pipeDiameterMM: 63,
-            countSchools, countClinics, countGardens, hasGrid
+        const site: SiteQuantities = {
+            population, risingLen: rLen, mainLen: mLen, distLen: dLen, hasRisingMain: !!features.current.risingMain,
+            taps: features.current.taps.length, schools: countSchools, clinics: countClinics, gardens: countGardens, hasGrid,
+            boreholeElevation: features.current.borehole?.elev, tankElevation: features.current.tank?.elev,
+            mainLines: features.current.mainLines.map(ml => ({ id: ml.id, length: network.get(ml.id)?.length || 0 }))
         };
-
-        // Generate BoQ
-        const boq: BoQItem[] = [];
-        // Civils
-        boq.push({ id: 'c1', category: 'Civils', item: 'Borehole Drilling & Construction', unit: 'm', qty: inputs.boreholeDepth, rate: DESIGN_COSTS.DRILLING_PER_M, amount: Math.round(inputs.boreholeDepth * DESIGN_COSTS.DRILLING_PER_M) });
-        boq.push({ id: 'c2', category: 'Civils', item: 'Borehole Siting & Mob/Demob', unit: 'LS', qty: 1, rate: DESIGN_COSTS.DRILLING_BASE, amount: Math.round(DESIGN_COSTS.DRILLING_BASE) });
-        boq.push({ id: 'c3', category: 'Civils', item: `Tank Stand (${inputs.tankHeight}m) & Base`, unit: 'Sum', qty: 1, rate: DESIGN_COSTS.TANK_STAND_6M, amount: Math.round(DESIGN_COSTS.TANK_STAND_6M) });
-        boq.push({ id: 'c4', category: 'Civils', item: 'Fencing & Site Works', unit: 'Sum', qty: 1, rate: DESIGN_COSTS.FENCE_CIVILS, amount: Math.round(DESIGN_COSTS.FENCE_CIVILS) });
-        boq.push({ id: 'c5', category: 'Civils', item: 'Tap Stand Construction', unit: 'No', qty: counts.taps, rate: DESIGN_COSTS.DISTRIBUTION_POINTS, amount: Math.round(counts.taps * DESIGN_COSTS.DISTRIBUTION_POINTS) });
-
-        // Network
-        boq.push({ id: 'n1', category: 'Network', item: 'Trenching & Backfill', unit: 'm', qty: Math.round(totalPipeLen), rate: DESIGN_COSTS.TRENCHING_PER_M, amount: Math.round(totalPipeLen * DESIGN_COSTS.TRENCHING_PER_M) });
-        if (rLen > 0) boq.push({ id: 'n2', category: 'Network', item: 'Rising Main (HDPE 63mm)', unit: 'm', qty: Math.round(rLen), rate: DESIGN_COSTS.PIPE_HDPE_63MM, amount: Math.round(Math.round(rLen) * DESIGN_COSTS.PIPE_HDPE_63MM) });
-        if (mLen > 0) boq.push({ id: 'n3', category: 'Network', item: 'Main Line (HDPE 63mm)', unit: 'm', qty: Math.round(mLen), rate: DESIGN_COSTS.PIPE_HDPE_63MM, amount: Math.round(Math.round(mLen) * DESIGN_COSTS.PIPE_HDPE_63MM) });
-        if (dLen > 0) boq.push({ id: 'n4', category: 'Network', item: 'Distribution (HDPE 32mm)', unit: 'm', qty: Math.round(dLen), rate: DESIGN_COSTS.PIPE_HDPE_32MM, amount: Math.round(Math.round(dLen) * DESIGN_COSTS.PIPE_HDPE_32MM) });
-
-        // Institutional connections
-        const instCount = countSchools + countClinics + countGardens;
-        if (instCount > 0) {
-            boq.push({ id: 'n5', category: 'Network', item: 'Institution Connections (Fittings/Meter)', unit: 'No', qty: instCount, rate: DESIGN_COSTS.INSTITUTION_CONNECTION, amount: instCount * DESIGN_COSTS.INSTITUTION_CONNECTION });
+        const { specs, boq } = designSystem(site, inputs, designChoice);
+        const { flowRateM3H, domesticDemandM3, pipeDiameterMM } = specs;
+        calcDone({ items: geometry.lines.length });
+
+        // Profiles depend on the pipe geometry plus these hydraulic inputs; if none of them
+        // moved, the previous profiles are still exact and no async work is needed
+        const seq = ++calcSeqRef.current;
+        const profileKey = [flowRateM3H, features.current.tank?.elev ?? '', inputs.tankHeight, features.current.borehole ? 1 : 0,
+            features.current.taps.filter(t => t.elev !== null).length, designChoice ? JSON.stringify(designChoice) : ''].join('|');
+        const reuse = profileReuseRef.current;
+        if (reuse && reuse.key === profileKey) {
+            onUpdateCalc(specs, boq, reuse.profiles, geometry, reuse.problem && { ...reuse.problem, site });
+            onDesignChange?.(snapshotDesign(), reuse.samples);
+            return;
         }
+        const hydraulics = Perf.time('network.solve', () => solveDistribution(domesticDemandM3));
+        const problem = hydraulics && createDistributionProblem(site, hydraulics);
+        Perf.timeAsync('design.profiles', () => generateProfiles(flowRateM3H, pipeDiameterMM, hydraulics), r => ({ items: r.profiles.length })).then(({ profiles, samples, flat }) => {
+            if (seq !== calcSeqRef.current) return; // A newer calculation has started
+            // Flat stand-ins are not reused, so the next calculation asks for the ground levels again
+            profileReuseRef.current = flat ? null : { key: profileKey, profiles, samples, problem };
+            onUpdateCalc(specs, boq, profiles, geometry, problem);
+            onDesignChange?.(snapshotDesign(), samples);
+        });
+    };
 
-        // Mechanical
-        const tankCost = DESIGN_COSTS.TANK_STEEL_BASE + (dailyDemandM3 * DESIGN_COSTS.TANK_PER_M3);
-        boq.push({ id: 'm1', category: 'Mechanical', item: `Steel Tank (${Math.ceil(dailyDemandM3)}m3)`, unit: 'No', qty: 1, rate: Math.round(tankCost), amount: Math.round(tankCost) });
-        const pumpCost = DESIGN_COSTS.PUMP_BASE + (pumpPowerKW * DESIGN_COSTS.PUMP_PER_KW);
-        boq.push({ id: 'm2', category: 'Mechanical', item: `Submersible Pump (${pumpPowerKW.toFixed(1)}kW)`, unit: 'No', qty: 1, rate: Math.round(pumpCost), amount: Math.round(pumpCost) });
-
-        // Electrical
-        const pvCost = DESIGN_COSTS.PV_STRUCTURE_BASE + (pvArrayKW * DESIGN_COSTS.PV_PER_KW);
-        boq.push({ id: 'e1', category: 'Electrical', item: `Solar Array (${pvArrayKW.toFixed(2)}kWp) & Structure`, unit: 'kW', qty: Math.ceil(pvArrayKW), rate: DESIGN_COSTS.PV_PER_KW, amount: Math.round(pvCost) });
-        boq.push({ id: 'e2', category: 'Electrical', item: 'Solar Pump Inverter/Controller', unit: 'No', qty: 1, rate: 1500, amount: 1500 });
-        if (hasGrid) {
-            boq.push({ id: 'e3', category: 'Electrical', item: 'Mini-Grid Kiosk / Charging Station', unit: 'Sum', qty: 1, rate: 4500, amount: 4500 });
-        }
+    // --- Helper: Drop taps where they serve the most buildings not yet served ---
+    const optimizeTaps = async ({ budget, targetCoverage, maxTapToMain, replace }: TapOptimizeRequest): Promise<TapPlacementResult> => {
+        const layer = showGoogleBuildings && googleBuildingLayerRef.current ? googleBuildingLayerRef.current : osmBuildingLayerRef.current;
+        const data = layer?.getData();
+        if (!data || data.count === 0) throw new Error('Load building footprints first.');
+        const mains = features.current.mainLines.map(ml => {
+            const pts = ml.poly.getLatLngs() as L.LatLng[];
+            return (Array.isArray(pts[0]) && !('lat' in pts[0])) ? (pts as any).flat() as L.LatLng[] : pts;
+        }).filter(path => path.length > 1);
+        if (mains.length === 0) throw new Error('Draw a main line first; taps are placed along the mains.');
 
-        generateProfiles(flowRateM3H).then(profiles => {
-            onUpdateCalc(specs, boq, profiles, geometry);
-        });
+        if (replace) {
+            features.current.taps.forEach(t => t.marker.remove());
+            features.current.taps = [];
+        }
+        // Whatever stays on the map already serves its buildings
+        const kept = [...features.current.taps.map(t => t.marker.getLatLng()), ...features.current.institutions.map(i => i.marker.getLatLng())];
+        const existing = new Float64Array(kept.flatMap(p => [p.lat, p.lng]));
+        const result = Perf.time('taps.optimize', () => optimizeTapPlacement(data.centroids, mains, existing, { bufferDistance, maxTapToMain, budget, targetCoverage }), r => ({ items: r.candidates }));
+
+        if (result.taps.length > 0) {
+            const points = result.taps.map(p => L.latLng(p.lat, p.lng));
+            const elevs = await fetchPathElevations(points);
+            points.forEach((pt, i) => {
+                const id = Math.random().toString(36).substr(2, 9);
+                features.current.taps.push({ marker: addTapMarker(pt, id), elev: elevs[i] ?? null, id });
+            });
+        }
+        if (replace || result.taps.length > 0) {
+            scheduleRecalc(); // Connections, BoQ and profiles
+            setAnalysisUpdateTrigger(prev => prev + 1);
+        }
+        return result;
     };
 
     const handleApply = () => {
@@ -1174,7 +1292,6 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         // Initialize visual buffer layer if needed
         if (!visualBufferLayerRef.current) {
             visualBufferLayerRef.current = L.layerGroup().addTo(mapInstanceRef.current);
-            console.log('Created visual buffer layer for immediate drawing');
         } else if (!mapInstanceRef.current.hasLayer(visualBufferLayerRef.current)) {
             visualBufferLayerRef.current.addTo(mapInstanceRef.current);
         }
@@ -1189,7 +1306,6 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
         ];
 
         // Draw buffers around each point feature
-        console.log(`Drawing ${pointFeatures.length} buffers immediately (radius: ${bufferDistance}m)`);
         pointFeatures.forEach((pt, idx) => {
             L.circle(pt, {
                 radius: bufferDistance,
@@ -1205,40 +1321,19 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
 
     // Spatial Analysis Logic
     useEffect(() => {
-        console.log('Spatial Analysis Effect Running:', {
-            hasOSMBuildings: !!osmBuildingLayerRef.current,
-            hasGoogleBuildings: !!googleBuildingLayerRef.current,
-            hasMap: !!mapInstanceRef.current,
-            bufferDistance,
-            peoplePerBuilding,
-            analysisUpdateTrigger
-        });
-
         // Check if we have a map and at least one building layer
-        if (!mapInstanceRef.current) {
-            console.log('No map instance, skipping analysis');
-            return;
-        }
+        if (!mapInstanceRef.current) return;
 
         const hasBuildings = osmBuildingLayerRef.current || googleBuildingLayerRef.current;
-        if (!hasBuildings) {
-            console.log('No building layers available, skipping analysis');
-            return;
-        }
+        if (!hasBuildings) return;
 
         // Initialize visual buffer layer if needed (safety check)
         if (!visualBufferLayerRef.current) {
             visualBufferLayerRef.current = L.layerGroup().addTo(mapInstanceRef.current);
-            console.log('Created visual buffer layer');
         } else if (!mapInstanceRef.current.hasLayer(visualBufferLayerRef.current)) {
             visualBufferLayerRef.current.addTo(mapInstanceRef.current);
-            console.log('Added visual buffer layer to map');
         }
         visualBufferLayerRef.current.clearLayers();
-        console.log('Cleared existing buffer layers');
-
-        let servedCount = 0;
-        let unservedCount = 0;
 
         // Collect all pipe geometries (EXCLUDING Rising Main as requested)
         const pipes: L.Polyline[] = [
@@ -1253,128 +1348,58 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
             ...features.current.institutions.map(i => i.marker.getLatLng())
         ];
 
-        // Helper: Distance from point P to segment AB in meters
-        const getDistToSegmentMeters = (p: L.LatLng, a: L.LatLng, b: L.LatLng) => {
-            const pLat = p.lat; const pLng = p.lng;
-            const aLat = a.lat; const aLng = a.lng;
-            const bLat = b.lat; const bLng = b.lng;
-
-            let t = ((pLat - aLat) * (bLat - aLat) + (pLng - aLng) * (bLng - aLng)) /
-                ((bLat - aLat) ** 2 + (bLng - aLng) ** 2);
-
-            t = Math.max(0, Math.min(1, t));
-
-            const closestLat = aLat + t * (bLat - aLat);
-            const closestLng = aLng + t * (bLng - aLng);
-            const closest = new L.LatLng(closestLat, closestLng);
-
-            return p.distanceTo(closest);
-        };
-
-        // Helper: Generate buffer polygon around a segment
-        const getBufferPolygon = (p1: L.LatLng, p2: L.LatLng, bufferMeters: number) => {
-            // Calculate offset vectors
-            const dx = p2.lng - p1.lng;
-            const dy = p2.lat - p1.lat;
-            const len = Math.sqrt(dx * dx + dy * dy);
-
-            if (len === 0) return null;
-
-            // Convert meters to approx degrees (rough approximation for visualization)
-            // 1 deg lat ~ 111km, 1 deg lng ~ 111km * cos(lat)
-            const metersPerDegLat = 111132.92;
-            const metersPerDegLng = 111132.92 * Math.cos(p1.lat * (Math.PI / 180));
-
-            const bufferDegLat = bufferMeters / metersPerDegLat;
-            const bufferDegLng = bufferMeters / metersPerDegLng;
-
-            // Perpendicular vector (-dy, dx) normalized
-            const ux = -dy / len;
-            const uy = dx / len;
-
-            // Offset points
-            const offX = ux * bufferDegLng;
-            const offY = uy * bufferDegLat;
-
-            return [
-                [p1.lat + offY, p1.lng + offX],
-                [p2.lat + offY, p2.lng + offX],
-                [p2.lat - offY, p2.lng - offX],
-                [p1.lat - offY, p1.lng - offX]
-            ];
-        };
-
-        if (pipes.length === 0 && pointFeatures.length === 0) {
-            // No pipes or points, all unserved
-            const activeBuildingLayer = showGoogleBuildings && googleBuildingLayerRef.current ? googleBuildingLayerRef.current : osmBuildingLayerRef.current;
+        // Determine which building layer to use
+        const activeBuildingLayer = showGoogleBuildings && googleBuildingLayerRef.current ? googleBuildingLayerRef.current : osmBuildingLayerRef.current;
+        if (!activeBuildingLayer) return;
 
-            if (activeBuildingLayer) {
-                console.log('No infrastructure - marking all buildings as unserved');
-                activeBuildingLayer.eachLayer((layer: any) => {
-                    if (layer.setStyle) layer.setStyle({ color: '#ef4444', fillColor: '#ef4444', fillOpacity: 0.3, weight: 1 });
-                    unservedCount++;
-                });
-            } else {
-                console.log('No building layer available for unserved analysis');
-            }
-        } else {
+        // With no pipes or points every building is unserved; otherwise draw the buffers
+        if ((pipes.length > 0 || pointFeatures.length > 0) && visualBufferLayerRef.current) {
             // Draw Visual Buffers for Point Features
-            if (visualBufferLayerRef.current) {
-                pointFeatures.forEach(pt => {
-                    L.circle(pt, {
-                        radius: bufferDistance,
-                        color: '#22c55e',
-                        fillColor: '#22c55e',
-                        fillOpacity: 0.1,
-                        weight: 1,
-                        dashArray: '5, 5'
-                    }).addTo(visualBufferLayerRef.current!);
-                });
-            }
-
-            // Determine which building layer to use
-            const activeBuildingLayer = showGoogleBuildings && googleBuildingLayerRef.current ? googleBuildingLayerRef.current : osmBuildingLayerRef.current;
-
-            if (activeBuildingLayer) {
-                console.log("Running service analysis on layer:", showGoogleBuildings ? "Google" : "OSM");
-                activeBuildingLayer.eachLayer((layer: any) => {
-                    // Google Buildings (FGB) features might be different structure than OSM
-                    // OSM: layer.feature.geometry.type === 'Polygon'
-                    // FGB: layer.feature.geometry.type === 'Polygon' (usually)
+            pointFeatures.forEach(pt => {
+                L.circle(pt, {
+                    radius: bufferDistance,
+                    color: '#22c55e',
+                    fillColor: '#22c55e',
+                    fillOpacity: 0.1,
+                    weight: 1,
+                    dashArray: '5, 5'
+                }).addTo(visualBufferLayerRef.current!);
+            });
+        }
 
-                    if (layer.feature && (layer.feature.geometry.type === 'Polygon' || layer.feature.geometry.type === 'MultiPolygon')) {
-                        const bounds = layer.getBounds();
-                        const center = bounds.getCenter();
+        const index = buildingIndexRef.current && buildingIndexRef.current.layer === activeBuildingLayer && buildingIndexRef.current.data === activeBuildingLayer.getData()
+            ? buildingIndexRef.current
+            : indexBuildings(activeBuildingLayer);
+        if (!index || !coverageClientRef.current) return;
 
-                        let isServed = false;
+        // Check distance to point features ONLY (pipes convey water but don't distribute it)
+        const servicePoints = new Float64Array(pointFeatures.length * 2);
+        pointFeatures.forEach((pt, i) => {
+            servicePoints[i * 2] = pt.lat;
+            servicePoints[i * 2 + 1] = pt.lng;
+        });
 
-                        // Check distance to point features ONLY (pipes convey water but don't distribute it)
-                        for (const pt of pointFeatures) {
-                            if (center.distanceTo(pt) <= bufferDistance) {
-                                isServed = true;
-                                break;
-                            }
-                        }
+        const classifyDone = Perf.start('coverage.classify'); // Includes the worker round trip
+        coverageClientRef.current.classify(servicePoints, bufferDistance).then(result => {
+            // Superseded by a newer request, or the footprints were reloaded meanwhile
+            if (!result || buildingIndexRef.current !== index || result.datasetId !== index.datasetId) return;
+            if (index.layer.getData() !== index.data) return;
+            classifyDone({ items: result.servedCount + result.unservedCount });
 
-                        if (isServed) {
-                            layer.setStyle({ color: '#22c55e', fillColor: '#22c55e', fillOpacity: 0.5, weight: 2 }); // Green, thicker
-                            servedCount++;
-                        } else {
-                            layer.setStyle({ color: '#ef4444', fillColor: '#ef4444', fillOpacity: 0.3, weight: 1 }); // Red
-                            unservedCount++;
-                        }
-                    }
-                });
-            }
-        }
+            // Served green, unserved red: one canvas redraw from the bitmask
+            index.layer.setCoverage(result.bits);
 
-        console.log(`Analysis complete: ${servedCount} served buildings, ${unservedCount} unserved buildings`);
-        console.log(`Population: ${servedCount * peoplePerBuilding} served, ${unservedCount * peoplePerBuilding} unserved`);
-        setServedPop(servedCount * peoplePerBuilding);
-        setUnservedPop(unservedCount * peoplePerBuilding);
+            setServedPop(result.servedCount * peoplePerBuilding);
+            setUnservedPop(result.unservedCount * peoplePerBuilding);
+        });
 
     }, [bufferDistance, peoplePerBuilding, showOSMBuildings, showGoogleBuildings, buildingsLoading, analysisUpdateTrigger]); // Removed counts to prevent loop
 
+    // Coverage settings and results are saved with the project
+    useEffect(() => {
+        onCoverageChange?.({ bufferDistance, peoplePerBuilding, servedPop, unservedPop });
+    }, [bufferDistance, peoplePerBuilding, servedPop, unservedPop]);
+
     // Recalc when pipes change
 
     return (
@@ -1416,6 +1441,7 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
                                 <span className="text-green-700 font-bold">Served: {servedPop.toLocaleString()}</span>
                                 <span className="text-red-700 font-bold">Unserved: {unservedPop.toLocaleString()}</span>
                             </div>
+                            <TapOptimizerPanel onOptimize={optimizeTaps} peoplePerBuilding={peoplePerBuilding} />
                         </div>
                     </div>
                     <div>
@@ -1440,12 +1466,14 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
                         <select value={inputs.tankHeight} onChange={e => setInputs({ ...inputs, tankHeight: parseFloat(e.target.value) })} className="w-full p-2 border rounded"><option value={3}>3m</option><option value={6}>6m</option><option value={9}>9m</option></select>
                     </div>
                 </div>
+                <OfflinePanel mapRef={mapInstanceRef} iso={selectedCountry} mapStyle={mapStyle} />
                 <div className="mt-auto bg-slate-800 text-white p-4 rounded-lg text-xs space-y-2">
                     <div className="flex justify-between"><span>Borehole:</span><span className={counts.hasBh ? "text-emerald-400 font-bold" : "text-gray-500"}>{counts.hasBh ? "Set" : "Missing"}</span></div>
                     <div className="flex justify-between"><span>Tank:</span><span className={counts.hasTank ? "text-emerald-400 font-bold" : "text-gray-500"}>{counts.hasTank ? "Set" : "Missing"}</span></div>
                     <div className="flex justify-between"><span>Taps:</span><span className="font-bold">{counts.taps}</span></div>
                     <div className="flex justify-between"><span>Institutions:</span><span className="font-bold">{counts.schools + counts.clinics + counts.gardens}</span></div>
                     <div className="flex justify-between border-t border-slate-600 pt-2"><span>Total Pipe:</span><span className="font-bold">{(counts.risingLen + counts.mainLen + counts.distLen).toLocaleString()} m</span></div>
+                    {detachedMains.length > 0 && counts.hasTank && <div className="text-amber-300 border-t border-slate-600 pt-2">Not connected to the tank: {detachedMains.join(', ')}. Start the main at the tank or on a connected main.</div>}
                 </div>
                 <button onClick={handleApply} disabled={!counts.hasBh || !counts.hasTank} className="w-full py-3 bg-[#1CABE2] hover:bg-[#003E5E] disabled:bg-gray-300 disabled:cursor-not-allowed text-white font-bold rounded-lg shadow transition flex items-center justify-center gap-2"><CheckCircle className="w-4 h-4" /> Apply Design</button>
             </div>
@@ -1455,6 +1483,20 @@ export const SiteMap: React.FC<SiteMapProps> = ({ population, setPopulation, pro
                 <div ref={mapContainerRef} className="w-full h-full z-0 min-h-[400px]" style={{ minHeight: '400px' }} />
                 {loadingElevation && <div className="absolute top-4 left-4 bg-white/90 backdrop-blur px-3 py-1 rounded-full shadow text-xs font-bold text-blue-600 flex items-center gap-2 z-[400]"><Activity className="w-3 h-3 animate-spin" /> Fetching Elevation...</div>}
                 {buildingsLoading && <div className="absolute top-4 left-4 bg-white/90 backdrop-blur px-3 py-1 rounded-full shadow text-xs font-bold text-green-600 flex items-center gap-2 z-[400]"><Activity className="w-3 h-3 animate-spin" /> Loading Buildings...</div>}
+                {(footprintStats || (showGoogleBuildings && buildingCacheStats && buildingCacheStats.tileRequests > 0)) && (
+                    <div className="absolute bottom-8 right-4 bg-white/90 backdrop-blur px-2 py-1 rounded shadow text-[10px] text-gray-600 z-[400] text-right">
+                        {footprintStats && (
+                            <div title="Building footprints drawn in the last frame">
+                                {footprintStats.buildings.toLocaleString()} buildings ({footprintStats.drawn.toLocaleString()} in view, {footprintStats.mode}) · {footprintStats.frameMs.toFixed(1)} ms
+                            </div>
+                        )}
+                        {showGoogleBuildings && buildingCacheStats && buildingCacheStats.tileRequests > 0 && (
+                            <div title="Building footprint tile cache">
+                                Tile cache: {Math.round(buildingCacheStats.hitRate * 100)}% hits ({buildingCacheStats.memoryHits + buildingCacheStats.dbHits}/{buildingCacheStats.tileRequests}) · {(buildingCacheStats.bytesFetched / 1e6).toFixed(1)} MB fetched
+                            </div>
+                        )}
+                    </div>
+                )}
                 <div className="absolute top-4 right-4 bg-white rounded-lg shadow-md border border-gray-200 p-2 flex flex-col gap-2 z-[400]">
                     {/* Google Buildings Toggle */}
                     <button
@@ -4,6 +4,8 @@ import React, { useEffect, useRef, useMemo, useState } from 'react';
 import * as L from 'leaflet';
 import { BoQItem, HydraulicInputs, SystemSpecs, PipelineProfile, SystemGeometry, ProjectDetails } from '../types';
 import { FileText, Activity, AlertTriangle, Map as MapIcon, ClipboardCheck, Droplets, Download } from 'lucide-react';
+import { exportReport, snapshotKey } from '../services/reportBuilder';
+import { HOURLY_DEMAND_PATTERN } from '../constants';
 import { Area, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Line, ComposedChart, ReferenceLine, Legend, Bar } from 'recharts';
 
 interface SystemSchematicProps {
@@ -18,48 +20,31 @@ interface SystemSchematicProps {
     printMode?: boolean; 
     population?: number;
     designPopulation?: number;
+    designSearch?: React.ReactNode; // Shown under the technical summary, not in print
 }
 
-export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs, boq, profiles, currency, onUpdateRate, geometry, projectDetails, printMode = false, population, designPopulation }) => {
+export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs, boq, profiles, currency, onUpdateRate, geometry, projectDetails, printMode = false, population, designPopulation, designSearch }) => {
     const mapRef = useRef<HTMLDivElement>(null);
     const mapInstance = useRef<L.Map | null>(null);
     const [isDownloading, setIsDownloading] = useState(false);
 
+    const mapSnapshotKey = useMemo(() => `schematic-map:${snapshotKey(geometry)}`, [geometry]);
+
     const downloadPDF = async () => {
+        const element = document.getElementById('technical-report');
+        if (!element) {
+            alert("Report element not found.");
+            return;
+        }
         setIsDownloading(true);
-        // Small delay to allow UI to update (e.g. show "Generating..." spinner)
-        setTimeout(async () => {
-            const element = document.getElementById('technical-report');
-            if (!element) { 
-                alert("Report element not found.");
-                setIsDownloading(false); 
-                return; 
-            }
-
-            const opt = {
-                margin: [5, 5, 5, 5], 
-                filename: `Technical_Design_${projectDetails.siteName || 'Site'}.pdf`,
-                image: { type: 'jpeg', quality: 0.98 },
-                html2canvas: { scale: 2, useCORS: true, logging: true, allowTaint: true },
-                jsPDF: { unit: 'mm', format: 'a4', orientation: 'portrait' },
-                pagebreak: { mode: ['avoid-all', 'css', 'legacy'] }
-            };
-
-            try {
-                // @ts-ignore
-                if (window.html2pdf) {
-                    // @ts-ignore
-                    await window.html2pdf().set(opt).from(element).save();
-                } else {
-                    alert("PDF Generator library not loaded. Please refresh and try again.");
-                }
-            } catch (e) {
-                console.error("PDF Generation Error:", e);
-                alert("Failed to generate PDF. Please check console for details.");
-            } finally {
-                setIsDownloading(false);
-            }
-        }, 100);
+        try {
+            await exportReport(element, `Technical_Design_${projectDetails.siteName || 'Site'}.pdf`);
+        } catch (e) {
+            console.error("PDF Generation Error:", e);
+            alert("Failed to generate PDF. Please check console for details.");
+        } finally {
+            setIsDownloading(false);
+        }
     };
 
     // --- MAP INITIALIZATION ---
@@ -67,7 +52,7 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
         if (!geometry || !mapRef.current) return;
         if (mapInstance.current) { mapInstance.current.remove(); mapInstance.current = null; }
 
-        // Use preferCanvas: true for better compatibility with html2canvas during PDF generation
+        // Pipes render as SVG so the PDF report can draw them as vector paths
         const map = L.map(mapRef.current, {
             center: [geometry.center.lat, geometry.center.lng], 
             zoom: geometry.zoom, 
@@ -76,17 +61,21 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
             scrollWheelZoom: false, 
             doubleClickZoom: false, 
             boxZoom: false, 
-            attributionControl: false,
-            preferCanvas: true 
+            attributionControl: false
         });
         mapInstance.current = map;
 
         // CRITICAL FIX: crossOrigin: true is required for html2canvas to capture map tiles
-        L.tileLayer('https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}', { 
+        const tiles = L.tileLayer('https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}', { 
             attribution: 'Tiles &copy; Esri', 
             maxZoom: 19,
             crossOrigin: true 
         }).addTo(map);
+        // The report builder waits while tiles are pending and won't cache a snapshot with failed tiles
+        const container = mapRef.current;
+        tiles.on('loading', () => { container.setAttribute('data-report-pending', ''); container.removeAttribute('data-report-incomplete'); });
+        tiles.on('load', () => container.removeAttribute('data-report-pending'));
+        tiles.on('tileerror', () => container.setAttribute('data-report-incomplete', ''));
 
         const bhIcon = L.divIcon({ className: 'bg-blue-600 border-2 border-white rounded-full flex items-center justify-center text-white text-[8px] font-bold', html: 'BH', iconSize: [20, 20] });
         const tankIcon = L.divIcon({ className: 'bg-cyan-500 border-2 border-white rounded flex items-center justify-center text-white text-[8px] font-bold', html: 'T', iconSize: [20, 20] });
@@ -132,25 +121,18 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
 
     }, [geometry]);
 
-    // Force Redraw when Print Mode Changes
+    // Force Redraw when Print Mode Changes. The container is visible once this runs, so the
+    // refit is immediate and unanimated; the tiles it requests mark the map as pending.
     useEffect(() => {
-        if (printMode && mapInstance.current) {
-            // Immediate invalidation to handle visibility change from hidden to block
-            mapInstance.current.invalidateSize();
-            // Delayed invalidation to ensure container dimensions are settled
-            setTimeout(() => {
-                if (mapInstance.current) {
-                    mapInstance.current.invalidateSize();
-                    // Refit bounds to ensure map is centered correctly in the print view
-                    if (geometry) {
-                         const group = new L.FeatureGroup();
-                         if(geometry.borehole) group.addLayer(L.marker([geometry.borehole.lat, geometry.borehole.lng]));
-                         if(geometry.tank) group.addLayer(L.marker([geometry.tank.lat, geometry.tank.lng]));
-                         geometry.taps.forEach(t => group.addLayer(L.marker([t.lat, t.lng])));
-                         if(group.getLayers().length > 0) mapInstance.current.fitBounds(group.getBounds(), { padding: [50, 50] });
-                    }
-                }
-            }, 500);
+        const map = mapInstance.current;
+        if (!printMode || !map) return;
+        map.invalidateSize();
+        if (geometry) {
+            const group = new L.FeatureGroup();
+            if(geometry.borehole) group.addLayer(L.marker([geometry.borehole.lat, geometry.borehole.lng]));
+            if(geometry.tank) group.addLayer(L.marker([geometry.tank.lat, geometry.tank.lng]));
+            geometry.taps.forEach(t => group.addLayer(L.marker([t.lat, t.lng])));
+            if(group.getLayers().length > 0) map.fitBounds(group.getBounds(), { padding: [50, 50], animate: false });
         }
     }, [printMode, geometry]);
 
@@ -163,15 +145,14 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
 
     const tankSimulationData = useMemo(() => {
         if (!specs) return [];
-        const tankCapacity = Math.ceil(specs.dailyDemandM3); 
+        const tankCapacity = specs.tankM3 ?? Math.ceil(specs.dailyDemandM3);
         const startLevel = tankCapacity * 0.4;
         const data = [];
         let currentLevel = startLevel;
-        const hourlyDemandPattern = [ 0.01, 0.01, 0.01, 0.01, 0.02, 0.08, 0.12, 0.10, 0.08, 0.06, 0.05, 0.05, 0.05, 0.05, 0.05, 0.06, 0.08, 0.10, 0.08, 0.04, 0.03, 0.02, 0.01, 0.01 ];
-        const patternSum = hourlyDemandPattern.reduce((a, b) => a + b, 0);
+        const patternSum = HOURLY_DEMAND_PATTERN.reduce((a, b) => a + b, 0);
         const sunStart = 8; const sunEnd = 16;
         for (let i = 0; i < 24; i++) {
-            const demandM3 = (hourlyDemandPattern[i] / patternSum) * specs.dailyDemandM3;
+            const demandM3 = (HOURLY_DEMAND_PATTERN[i] / patternSum) * specs.dailyDemandM3;
             let pumpM3 = 0;
             if (i >= sunStart && i <= sunEnd) {
                 const hourInSun = i - sunStart;
@@ -234,7 +215,7 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
                     <div className="space-y-3 print:space-y-1 print:text-xs">
                         <div className="flex justify-between border-b border-gray-50 pb-2 print:pb-1"><span className="text-gray-600">Pump Power</span><span className="font-bold">{specs.pumpPowerKW.toFixed(2)} kW</span></div>
                         <div className="flex justify-between border-b border-gray-50 pb-2 print:pb-1"><span className="text-gray-600">Solar Generator</span><span className="font-bold text-yellow-600">{specs.pvArrayKW.toFixed(2)} kWp</span></div>
-                        <div className="flex justify-between border-b border-gray-50 pb-2 print:pb-1"><span className="text-gray-600">Tank Capacity</span><span className="font-bold text-cyan-600">{Math.ceil(specs.dailyDemandM3)} m³</span></div>
+                        <div className="flex justify-between border-b border-gray-50 pb-2 print:pb-1"><span className="text-gray-600">Tank Capacity</span><span className="font-bold text-cyan-600">{specs.tankM3 ?? Math.ceil(specs.dailyDemandM3)} m³</span></div>
                         <div className="flex justify-between"><span className="text-gray-600">Main Pipeline</span><span className="font-bold">HDPE {specs.pipeDiameterMM}mm</span></div>
                     </div>
                 </div>
@@ -250,6 +231,8 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
                 </div>
             </div>
 
+            {!printMode && designSearch}
+
             {/* 2. Design Layout Map */}
             <div className="bg-white p-6 rounded-xl shadow-sm border border-gray-200 break-inside-avoid print:p-0 print:border-0">
                 <div className="mb-4 flex items-center justify-between print:mb-2">
@@ -257,7 +240,7 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
                     <MapIcon className="w-5 h-5 text-gray-400"/>
                 </div>
                 <div className="h-[400px] w-full bg-slate-100 rounded-lg border border-gray-300 overflow-hidden relative z-0 print:border-2 print:border-gray-800 print:h-[500px]">
-                    <div ref={mapRef} className="w-full h-full z-0" />
+                    <div ref={mapRef} className="w-full h-full z-0" data-report-snapshot={mapSnapshotKey} />
                 </div>
             </div>
 
@@ -276,9 +259,9 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
                             <YAxis yAxisId="right" orientation="right" unit="m³" tick={{fontSize:10}} hide />
                             <Tooltip contentStyle={{fontSize: 12}} formatter={(value: number, name: string) => [value.toFixed(2) + ' m³', name]}/>
                             <Legend verticalAlign="top" height={36}/>
-                            <Bar yAxisId="left" dataKey="pump" name="Solar Pump Input" fill="#fbbf24" radius={[2, 2, 0, 0]} barSize={20} fillOpacity={0.6}/>
-                            <Area yAxisId="left" type="monotone" dataKey="demand" name="Community Demand" fill="#94a3b8" stroke="#64748b" fillOpacity={0.3} />
-                            <Line yAxisId="left" type="monotone" dataKey="level" name="Tank Storage Level" stroke="#0ea5e9" strokeWidth={3} dot={false} />
+                            <Bar yAxisId="left" dataKey="pump" name="Solar Pump Input" fill="#fbbf24" radius={[2, 2, 0, 0]} barSize={20} fillOpacity={0.6} isAnimationActive={!printMode}/>
+                            <Area yAxisId="left" type="monotone" dataKey="demand" name="Community Demand" fill="#94a3b8" stroke="#64748b" fillOpacity={0.3} isAnimationActive={!printMode} />
+                            <Line yAxisId="left" type="monotone" dataKey="level" name="Tank Storage Level" stroke="#0ea5e9" strokeWidth={3} dot={false} isAnimationActive={!printMode} />
                             <ReferenceLine yAxisId="left" y={tankSimulationData[0]?.capacity} label={{ position: 'top', value: 'Tank Capacity', fontSize: 10, fill: '#ef4444' }} stroke="#ef4444" strokeDasharray="3 3" />
                         </ComposedChart>
                     </ResponsiveContainer>
@@ -310,8 +293,8 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
                                                 <YAxis unit="m" domain={['auto', 'auto']} tick={{fontSize:10}} label={{value: 'Elev (m)', angle: -90, position: 'insideLeft', fontSize: 10}} />
                                                 <Tooltip contentStyle={{fontSize: 12}} formatter={(value: number, name: string) => [value.toFixed(1) + 'm', name === 'hgl' ? 'Hydraulic Grade' : name === 'elevation' ? 'Ground Elev' : name]} labelFormatter={(l) => `Dist: ${Math.round(l)}m`}/>
                                                 <Legend verticalAlign="top" height={36}/>
-                                                <Area type="monotone" dataKey="elevation" name="Ground Elevation" stroke="#94a3b8" fill="#cbd5e1" fillOpacity={0.4} strokeWidth={2} />
-                                                <Line type="monotone" dataKey="hgl" name="Hydraulic Grade Line" stroke="#ef4444" strokeWidth={2} dot={false} />
+                                                <Area type="monotone" dataKey="elevation" name="Ground Elevation" stroke="#94a3b8" fill="#cbd5e1" fillOpacity={0.4} strokeWidth={2} isAnimationActive={!printMode} />
+                                                <Line type="monotone" dataKey="hgl" name="Hydraulic Grade Line" stroke="#ef4444" strokeWidth={2} dot={false} isAnimationActive={!printMode} />
                                             </ComposedChart>
                                         </ResponsiveContainer>
                                     </div>
@@ -328,8 +311,8 @@ export const SystemSchematic: React.FC<SystemSchematicProps> = ({ inputs, specs,
                 ) : <p className="text-gray-400 text-sm italic">No pipeline profiles generated.</p>}
             </div>
 
-            {/* 5. Bill of Quantities Table */}
-            <div className="bg-white rounded-xl shadow-sm border border-gray-200 overflow-hidden break-before-page print:border print:shadow-none">
+            {/* 5. Bill of Quantities Table (one report section, so the heading stays with the table) */}
+            <div className="bg-white rounded-xl shadow-sm border border-gray-200 overflow-hidden break-before-page print:border print:shadow-none" data-report-section>
                 <div className="p-6 border-b border-gray-200 bg-gray-50 print:p-2 print:bg-gray-100"><h3 className="text-lg font-bold text-gray-900 flex items-center gap-2 print:text-base"><FileText className="w-5 h-5"/> Bill of Quantities (BoQ)</h3></div>
                 <div className="overflow-x-auto print:overflow-x-visible">
                     <table className="w-full text-sm text-left print:text-xs">
@@ -0,0 +1,95 @@
+import React, { useState } from 'react';
+import { Sparkles, X } from 'lucide-react';
+import { TapPlacementResult } from '../utils/tapPlacement';
+
+export interface TapOptimizeRequest {
+    budget?: number;
+    targetCoverage?: number; // 0-1
+    maxTapToMain: number; // m
+    replace: boolean; // Remove the current taps first (institutions always stay)
+}
+
+interface TapOptimizerPanelProps {
+    onOptimize: (request: TapOptimizeRequest) => Promise<TapPlacementResult>;
+    peoplePerBuilding: number;
+}
+
+// "Optimize taps": places taps along the drawn mains to serve as many buildings as possible
+export const TapOptimizerPanel: React.FC<TapOptimizerPanelProps> = ({ onOptimize, peoplePerBuilding }) => {
+    const [open, setOpen] = useState(false);
+    const [mode, setMode] = useState<'budget' | 'target'>('budget');
+    const [budget, setBudget] = useState(10);
+    const [targetPct, setTargetPct] = useState(80);
+    const [maxTapToMain, setMaxTapToMain] = useState(30);
+    const [replace, setReplace] = useState(false);
+    const [busy, setBusy] = useState(false);
+    const [result, setResult] = useState<TapPlacementResult | null>(null);
+    const [error, setError] = useState('');
+
+    const run = async () => {
+        setBusy(true);
+        setError('');
+        try {
+            setResult(await onOptimize({
+                ...(mode === 'budget' ? { budget } : { targetCoverage: targetPct / 100 }),
+                maxTapToMain,
+                replace
+            }));
+        } catch (e) {
+            setResult(null);
+            setError(e instanceof Error ? e.message : String(e));
+        } finally {
+            setBusy(false);
+        }
+    };
+
+    if (!open) {
+        return (
+            <button onClick={() => setOpen(true)} className="w-full flex items-center justify-center gap-2 px-3 py-1.5 bg-white border border-blue-200 rounded text-xs font-bold text-blue-800 hover:bg-blue-100 transition">
+                <Sparkles className="w-3.5 h-3.5" /> Optimize Taps
+            </button>
+        );
+    }
+
+    return (
+        <div className="p-2 bg-white rounded border border-blue-200 text-xs space-y-2">
+            <div className="flex justify-between items-center">
+                <h4 className="font-bold text-blue-800 flex items-center gap-1"><Sparkles className="w-3.5 h-3.5" /> Optimize Taps</h4>
+                <button onClick={() => setOpen(false)} className="text-gray-400 hover:text-gray-700"><X className="w-4 h-4" /></button>
+            </div>
+            <div className="flex gap-3">
+                <label className="flex items-center gap-1"><input type="radio" checked={mode === 'budget'} onChange={() => setMode('budget')} disabled={busy} /> Tap budget</label>
+                <label className="flex items-center gap-1"><input type="radio" checked={mode === 'target'} onChange={() => setMode('target')} disabled={busy} /> Target coverage</label>
+            </div>
+            <div className="flex gap-2">
+                {mode === 'budget' ? (
+                    <label className="flex-1">
+                        <span className="block text-gray-600 font-bold mb-1">New taps</span>
+                        <input type="number" min={1} value={budget} onChange={e => setBudget(Math.max(1, parseInt(e.target.value) || 1))} className="w-full p-1.5 border rounded" disabled={busy} />
+                    </label>
+                ) : (
+                    <label className="flex-1">
+                        <span className="block text-gray-600 font-bold mb-1">Buildings served (%)</span>
+                        <input type="number" min={1} max={100} value={targetPct} onChange={e => setTargetPct(Math.max(1, Math.min(100, parseFloat(e.target.value) || 1)))} className="w-full p-1.5 border rounded" disabled={busy} />
+                    </label>
+                )}
+                <label className="flex-1" title="How far a tap may stand from the main line it connects to">
+                    <span className="block text-gray-600 font-bold mb-1">Max from main (m)</span>
+                    <input type="number" min={0} value={maxTapToMain} onChange={e => setMaxTapToMain(Math.max(0, parseFloat(e.target.value) || 0))} className="w-full p-1.5 border rounded" disabled={busy} />
+                </label>
+            </div>
+            <label className="flex items-center gap-1"><input type="checkbox" checked={replace} onChange={e => setReplace(e.target.checked)} disabled={busy} /> Replace current taps</label>
+            <button onClick={run} disabled={busy} className="w-full py-1.5 bg-blue-600 hover:bg-blue-700 disabled:bg-gray-300 text-white font-bold rounded transition">
+                {busy ? 'Optimizing...' : 'Place Taps'}
+            </button>
+            {error && <div className="text-red-600">{error}</div>}
+            {result && !error && (
+                <div className="text-gray-700">
+                    {result.taps.length === 0
+                        ? 'No new tap would serve more buildings.'
+                        : <>Placed <strong>{result.taps.length}</strong> taps serving <strong>{(result.newlyServed * peoplePerBuilding).toLocaleString()}</strong> more people; {Math.round(result.served / Math.max(1, result.total) * 100)}% of buildings served.</>}
+                </div>
+            )}
+        </div>
+    );
+};
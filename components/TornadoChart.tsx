@@ -0,0 +1,67 @@
+import React from 'react';
+import {
+  BarChart,
+  Bar,
+  XAxis,
+  YAxis,
+  CartesianGrid,
+  Tooltip,
+  ResponsiveContainer,
+  ReferenceLine
+} from 'recharts';
+import { TornadoResult } from '../utils/npvBatch';
+
+interface TornadoChartProps {
+  result: TornadoResult;
+  currency: string;
+  maxBars?: number;
+}
+
+// One-at-a-time sensitivity: each bar spans the Solar - Handpump differential as a single
+// input moves between its low and high value, the others held at their base values.
+export const TornadoChart: React.FC<TornadoChartProps> = ({ result, currency, maxBars = 10 }) => {
+  const formatCurrency = (val: number) => new Intl.NumberFormat('en-US', { style: 'currency', currency: currency, maximumFractionDigits: 0 }).format(val);
+  const formatInput = (val: number) => Math.abs(val) >= 100 ? val.toFixed(0) : val.toPrecision(3);
+
+  const data = result.bars.filter(b => b.swing > 0).slice(0, maxBars).map(b => ({
+    ...b,
+    range: [Math.min(b.lowOutput, b.highOutput), Math.max(b.lowOutput, b.highOutput)]
+  }));
+
+  if (data.length === 0) return null;
+
+  return (
+    <div>
+      <h4 className="text-sm font-bold text-gray-700 mb-1">Key Drivers (Tornado)</h4>
+      <p className="text-xs text-gray-500 mb-2">NPV differential as each input moves across its range. Base case: {formatCurrency(result.baseOutput)}.</p>
+      <div style={{ height: 40 + data.length * 26 }}>
+        <ResponsiveContainer width="100%" height="100%">
+          <BarChart data={data} layout="vertical" margin={{ left: 20, right: 20 }}>
+            <CartesianGrid strokeDasharray="3 3" horizontal={false} />
+            <XAxis type="number" domain={['auto', 'auto']} tickFormatter={(val) => `${(val / 1000).toFixed(0)}k`} tick={{ fontSize: 10 }} />
+            <YAxis type="category" dataKey="label" width={170} tick={{ fontSize: 10 }} />
+            <ReferenceLine x={result.baseOutput} stroke="#6b7280" />
+            <ReferenceLine x={0} stroke="#ef4444" strokeDasharray="3 3" />
+            <Tooltip
+              cursor={{ fill: 'transparent' }}
+              content={({ active, payload }) => {
+                if (active && payload && payload.length) {
+                  const bar = payload[0].payload;
+                  return (
+                    <div className="bg-white p-2 border border-gray-200 shadow-lg rounded text-xs text-gray-900">
+                      <p className="font-bold text-sm mb-1">{bar.label}</p>
+                      <p>Low ({formatInput(bar.lowInput)}): {formatCurrency(bar.lowOutput)}</p>
+                      <p>High ({formatInput(bar.highInput)}): {formatCurrency(bar.highOutput)}</p>
+                    </div>
+                  );
+                }
+                return null;
+              }}
+            />
+            <Bar dataKey="range" fill="#6366f1" isAnimationActive={false} />
+          </BarChart>
+        </ResponsiveContainer>
+      </div>
+    </div>
+  );
+};
@@ -1,5 +1,5 @@
 
-import { AdditionalBenefitsParams, BenefitsParams, GlobalParams, HandpumpParams, RevenueParams, SolarSystemParams } from "./types";
+import { AdditionalBenefitsParams, BenefitsParams, GlobalParams, HandpumpParams, HydraulicInputs, RevenueParams, SolarSystemParams } from "./types";
 
 // Defaults based on typical rural water supply projects in Malawi (Values in USD for stability)
 export const DEFAULT_GLOBAL: GlobalParams = {
@@ -10,6 +10,20 @@ export const DEFAULT_GLOBAL: GlobalParams = {
   currency: "USD",
 };
 
+export const DEFAULT_HYDRAULICS: HydraulicInputs = {
+  boreholeDepth: 60,
+  staticWaterLevel: 25,
+  elevationDifference: 15,
+  tankHeight: 6,
+  pipeLength: 0,
+  dailyDemandPerCapita: 30,
+  peakSunHours: 5.5,
+  pumpEfficiency: 0.6,
+  frictionLossFactor: 0.08,
+  boreholeElevation: undefined,
+  tankElevation: undefined,
+};
+
 export const INSTITUTIONAL_DEMAND = {
     SCHOOL: 2500, // Liters per day (approx 5L/student * 500)
     CLINIC: 1000, // Liters per day
@@ -42,6 +56,34 @@ export const DESIGN_COSTS = {
     INSTITUTION_CONNECTION: 300 // Extra fittings/meter for school/clinic
 };
 
+// HDPE sizes offered by the design search, $/m for pipe material (nominal OD)
+export const PIPE_CATALOGUE: { diameterMM: number, costPerM: number }[] = [
+    { diameterMM: 25, costPerM: 2.2 },
+    { diameterMM: 32, costPerM: DESIGN_COSTS.PIPE_HDPE_32MM },
+    { diameterMM: 40, costPerM: 4 },
+    { diameterMM: 50, costPerM: 5 },
+    { diameterMM: 63, costPerM: DESIGN_COSTS.PIPE_HDPE_63MM },
+    { diameterMM: 75, costPerM: 8 },
+    { diameterMM: 90, costPerM: 11 },
+    { diameterMM: 110, costPerM: 15 }
+];
+
+// Standard steel tank volumes (m3); larger needs round up in steps of the last one
+export const TANK_SIZES_M3 = [5, 10, 15, 20, 25, 30, 40, 50, 60, 75, 100];
+
+// PV array / pump power ratios tried by the design search (standard sizing uses 1.5)
+export const PV_RATIOS = [1, 1.25, 1.5, 1.75, 2, 2.5];
+
+// Share of the day's demand drawn in each hour (0:00-23:00), relative weights
+export const HOURLY_DEMAND_PATTERN = [0.01, 0.01, 0.01, 0.01, 0.02, 0.08, 0.12, 0.10, 0.08, 0.06, 0.05, 0.05, 0.05, 0.05, 0.05, 0.06, 0.08, 0.10, 0.08, 0.04, 0.03, 0.02, 0.01, 0.01];
+
+// Design search limits (editable in the Schematic & BoQ tab)
+export const DEFAULT_DESIGN_SEARCH = {
+    minTapPressure: 5, // m at the worst tap
+    maxVelocity: 2, // m/s in any pipe
+    minStorageDays: 0.5 // Tank holds at least this share of a day's demand
+};
+
 // High Level Estimators (Fallback)
 export const SOLAR_COST_FACTORS = {
     BOREHOLE_FIXED: 7000,      
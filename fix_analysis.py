@@ -1,21 +1,18 @@
-import re
+"""Patch set: spatial analysis on metre distances (LatLng maths) with a visual buffer layer.
 
-file_path = r'c:\Users\jrobertson\Downloads\SPWS1\components\SiteMap.tsx'
+Run on its own (``python fix_analysis.py [--dry-run] [--root DIR]``) or through patch_engine.py.
+"""
 
-with open(file_path, 'r', encoding='utf-8') as f:
-    content = f.read()
+import sys
 
-# 1. Add visualBufferLayerRef
-ref_pattern = r'(const osmBuildingLayerRef = useRef<L.LayerGroup \| null>\(null\);)'
-new_ref = r'\1\n    const visualBufferLayerRef = useRef<L.LayerGroup | null>(null);'
-content = re.sub(ref_pattern, new_ref, content)
+from patch_engine import insert_after, main, replace_block
 
-# 2. Replace the Analysis Logic with robust LatLng math and visual buffer
-logic_start = r'// Spatial Analysis Logic'
-logic_end = r'return \('
+SITEMAP = 'components/SiteMap.tsx'
 
-# New robust logic
-new_logic = r'''// Spatial Analysis Logic
+ANALYSIS_START = '// Spatial Analysis Logic'
+ANALYSIS_END = '}, [bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts]);'
+
+ANALYSIS = r'''// Spatial Analysis Logic
     useEffect(() => {
         if (!osmBuildingLayerRef.current || !mapInstanceRef.current) return;
 
@@ -105,18 +102,14 @@ new_logic = r'''// Spatial Analysis Logic
         setServedPop(servedCount * peoplePerBuilding);
         setUnservedPop(unservedCount * peoplePerBuilding);
 
-    }, [bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts]); // Recalc when pipes change
-
-    '''
-
-# Use regex to replace the old logic block
-# We look for the start of the useEffect and replace until the end of the block
-# This is tricky with regex, so we'll match the start and assume the structure
-pattern = r'// Spatial Analysis Logic\s*useEffect\(\(\) => \{[\s\S]*?\}, \[bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts\]\);\s*'
+    }, [bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts]);'''
 
-content = re.sub(pattern, new_logic, content)
+PATCHES = [
+    insert_after(SITEMAP, 'const osmBuildingLayerRef = useRef<L.LayerGroup | null>(null);',
+                 '\n    const visualBufferLayerRef = useRef<L.LayerGroup | null>(null);', name='visual-buffer-ref'),
+    replace_block(SITEMAP, ANALYSIS_START, ANALYSIS_END, ANALYSIS, name='analysis-latlng-distance'),
+]
 
-with open(file_path, 'w', encoding='utf-8') as f:
-    f.write(content)
 
-print("Successfully updated spatial analysis logic and added visual buffer!")
+if __name__ == '__main__':
+    sys.exit(main(patches=PATCHES))
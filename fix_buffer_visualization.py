@@ -1,21 +1,18 @@
-import re
+"""Patch set: buffer drawn as segment polygons, rising main excluded from service.
 
-file_path = r'c:\Users\jrobertson\Downloads\SPWS1\components\SiteMap.tsx'
+Run on its own (``python fix_buffer_visualization.py [--dry-run] [--root DIR]``) or through patch_engine.py.
+"""
 
-with open(file_path, 'r', encoding='utf-8') as f:
-    content = f.read()
+import sys
 
-# Replace the entire useEffect block for Spatial Analysis
-# We need to match the block we just inserted in the previous step
-# The key changes are:
-# 1. Exclude risingMain from 'pipes' array
-# 2. Add 'getBufferPolygon' helper function
-# 3. Draw polygons instead of circles/lines for visualization
+from patch_engine import main, replace_block
 
-start_marker = r'// Spatial Analysis Logic'
-end_marker = r'return \('
+SITEMAP = 'components/SiteMap.tsx'
 
-new_logic = r'''// Spatial Analysis Logic
+ANALYSIS_START = '// Spatial Analysis Logic'
+ANALYSIS_END = '}, [bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts]);'
+
+ANALYSIS = r'''// Spatial Analysis Logic
     useEffect(() => {
         if (!osmBuildingLayerRef.current || !mapInstanceRef.current) return;
 
@@ -144,17 +141,12 @@ new_logic = r'''// Spatial Analysis Logic
         setServedPop(servedCount * peoplePerBuilding);
         setUnservedPop(unservedCount * peoplePerBuilding);
 
-    }, [bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts]); // Recalc when pipes change
-
-    '''
-
-# Use regex to replace the old logic block
-# We look for the start of the useEffect and replace until the end of the block
-pattern = r'// Spatial Analysis Logic\s*useEffect\(\(\) => \{[\s\S]*?\}, \[bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts\]\);\s*'
+    }, [bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts]);'''
 
-content = re.sub(pattern, new_logic, content)
+PATCHES = [
+    replace_block(SITEMAP, ANALYSIS_START, ANALYSIS_END, ANALYSIS, name='analysis-buffer-polygons'),
+]
 
-with open(file_path, 'w', encoding='utf-8') as f:
-    f.write(content)
 
-print("Successfully updated buffer visualization (polygons) and excluded rising main!")
+if __name__ == '__main__':
+    sys.exit(main(patches=PATCHES))
@@ -1,38 +1,30 @@
-import re
+"""Patch set: buffer shapes stop catching clicks (so delete works) and analysis logs its counts.
 
-file_path = r'c:\Users\jrobertson\Downloads\SPWS1\components\SiteMap.tsx'
+Run on its own (``python fix_delete_and_debug.py [--dry-run] [--root DIR]``) or through patch_engine.py.
+"""
 
-with open(file_path, 'r', encoding='utf-8') as f:
-    content = f.read()
+import sys
 
-# 1. Fix Delete Button: Set interactive: false on buffer layers
-# We need to find the L.circle and L.polygon calls in the spatial analysis useEffect
-# and add interactive: false
+from patch_engine import insert_before, main, replace
 
-# Replace L.circle options
-content = content.replace(
-    "L.circle(ll, { radius: bufferDistance, color: '#22c55e', weight: 0, fillOpacity: 0.2 })",
-    "L.circle(ll, { radius: bufferDistance, color: '#22c55e', weight: 0, fillOpacity: 0.2, interactive: false })"
-)
+SITEMAP = 'components/SiteMap.tsx'
 
-# Replace L.polygon options
-content = content.replace(
-    "L.polygon(polyCoords as any, { color: '#22c55e', weight: 0, fillOpacity: 0.2 })",
-    "L.polygon(polyCoords as any, { color: '#22c55e', weight: 0, fillOpacity: 0.2, interactive: false })"
-)
+PATCHES = [
+    replace(SITEMAP,
+            "L.circle(ll, { radius: bufferDistance, color: '#22c55e', weight: 0, fillOpacity: 0.2 })",
+            "L.circle(ll, { radius: bufferDistance, color: '#22c55e', weight: 0, fillOpacity: 0.2, interactive: false })",
+            name='buffer-circle-not-interactive'),
+    replace(SITEMAP,
+            "L.polygon(polyCoords as any, { color: '#22c55e', weight: 0, fillOpacity: 0.2 })",
+            "L.polygon(polyCoords as any, { color: '#22c55e', weight: 0, fillOpacity: 0.2, interactive: false })",
+            name='buffer-polygon-not-interactive'),
+    insert_before(SITEMAP, 'let servedCount = 0;', "console.log('Running Spatial Analysis...');\n        ",
+                  name='log-analysis-start'),
+    insert_before(SITEMAP, 'setServedPop(servedCount * peoplePerBuilding);',
+                  "console.log(`Served: ${servedCount}, Unserved: ${unservedCount}, Total Pop: ${servedCount * peoplePerBuilding}`);\n        ",
+                  name='log-analysis-result'),
+]
 
-# 2. Add Logging to debug Service Coverage
-# Find the start of the useEffect logic
-log_insert_point = "let servedCount = 0;"
-new_log = "console.log('Running Spatial Analysis...');\n        let servedCount = 0;"
-content = content.replace(log_insert_point, new_log)
 
-# Log the result
-result_log_point = "setServedPop(servedCount * peoplePerBuilding);"
-new_result_log = "console.log(`Served: ${servedCount}, Unserved: ${unservedCount}, Total Pop: ${servedCount * peoplePerBuilding}`);\n        setServedPop(servedCount * peoplePerBuilding);"
-content = content.replace(result_log_point, new_result_log)
-
-with open(file_path, 'w', encoding='utf-8') as f:
-    f.write(content)
-
-print("Successfully applied fixes: interactive: false for buffer, and added debug logs.")
+if __name__ == '__main__':
+    sys.exit(main(patches=PATCHES))
@@ -0,0 +1,84 @@
+import { readFileSync, writeFileSync } from 'node:fs';
+import { DEFAULT_ADDITIONAL_BENEFITS, DEFAULT_BENEFITS, DEFAULT_GLOBAL, DEFAULT_HANDPUMP, DEFAULT_HYDRAULICS, DEFAULT_REVENUE, DEFAULT_SOLAR } from '../../constants';
+import { boqCapex, designSystem } from '../../utils/boq';
+import { calculateNPV } from '../../utils/calculations';
+import { createFullModelRun, NpvInputs, NPV_PARAMS } from '../../utils/npvBatch';
+import { DEFAULT_SEED } from '../../utils/random';
+
+// --- Reference outputs for `python portfolio.py parity` ---
+// Sizes and appraises every site in sites.csv with the app's own TypeScript models and writes
+// expected.json next to it. Re-run after changing any model or default, from the repo root:
+//     npx tsx fixtures/portfolio/generate.ts
+
+const DIR = 'fixtures/portfolio';
+const ITERATIONS = 2000;
+const MC_STEP = 50000; // Same batch size as workers/monteCarloWorker.ts
+
+const [header, ...rows] = readFileSync(`${DIR}/sites.csv`, 'utf8').trim().split(/\r?\n/).map(line => line.split(','));
+
+const sites = rows.map((cells, row) => {
+    const raw: Record<string, string> = {};
+    header.forEach((h, i) => { raw[h] = cells[i] ?? ''; });
+    const num = (key: string, fallback: number) => raw[key] === undefined || raw[key] === '' ? fallback : parseFloat(raw[key]);
+
+    const inputs: NpvInputs = {
+        global: { ...DEFAULT_GLOBAL, population: num('population', DEFAULT_GLOBAL.population) },
+        solar: { ...DEFAULT_SOLAR },
+        handpump: { ...DEFAULT_HANDPUMP },
+        revenue: { ...DEFAULT_REVENUE },
+        benefits: { ...DEFAULT_BENEFITS },
+        additionalBenefits: { ...DEFAULT_ADDITIONAL_BENEFITS }
+    };
+    NPV_PARAMS.forEach(({ key }) => {
+        if (raw[key] === undefined || raw[key] === '') return;
+        const [group, field] = key.split('.') as [keyof NpvInputs, string];
+        (inputs[group] as unknown as Record<string, number>)[field] = parseFloat(raw[key]);
+    });
+
+    const hydraulics = {
+        ...DEFAULT_HYDRAULICS,
+        boreholeDepth: num('borehole_depth', DEFAULT_HYDRAULICS.boreholeDepth),
+        staticWaterLevel: num('static_water_level', DEFAULT_HYDRAULICS.staticWaterLevel),
+        tankHeight: num('tank_height', DEFAULT_HYDRAULICS.tankHeight)
+    };
+    const risingLen = num('rising_len', 0);
+    const { specs, boq } = designSystem({
+        population: inputs.global.population,
+        risingLen, mainLen: num('main_len', 0), distLen: num('dist_len', 0), hasRisingMain: risingLen > 0,
+        taps: num('taps', 0), schools: num('schools', 0), clinics: num('clinics', 0), gardens: num('gardens', 0),
+        hasGrid: num('has_grid', 0) > 0,
+        boreholeElevation: num('borehole_elev', 0), tankElevation: num('tank_elev', 0)
+    }, hydraulics);
+
+    // The auto-scaler replaces the solar CapEx with the BoQ totals
+    const { civils, equip } = boqCapex(boq);
+    inputs.solar.capexDrillingAndCivil = civils;
+    inputs.solar.capexEquip = equip;
+    const { summary } = calculateNPV(inputs.global, inputs.solar, inputs.handpump, inputs.revenue, inputs.benefits, inputs.additionalBenefits, 'compact', specs);
+
+    const monteCarlo = (metric: 'economic' | 'financial') => {
+        const run = createFullModelRun(inputs, specs, metric, { iterations: ITERATIONS, seed: (DEFAULT_SEED + row) >>> 0 });
+        while (!run.step(MC_STEP)) { /* one batch */ }
+        const res = run.finish();
+        return { solarWinRate: res.solarWinRate, winRateInterval: res.winRateInterval, p5: res.p5, p50: res.p50, p95: res.p95 };
+    };
+
+    return {
+        siteId: raw.site_id,
+        specs,
+        capexCivils: civils,
+        capexEquip: equip,
+        summary: {
+            capexSolar: summary.capexSolar,
+            capexHandpump: summary.capexHandpump,
+            netEconomicValueSolar: summary.netEconomicValueSolar,
+            netEconomicValueHandpump: summary.netEconomicValueHandpump,
+            totalSolarFinNPV: summary.totalSolarFinNPV,
+            totalHandpumpFinNPV: summary.totalHandpumpFinNPV
+        },
+        monteCarlo: { economic: monteCarlo('economic'), financial: monteCarlo('financial') }
+    };
+});
+
+writeFileSync(`${DIR}/expected.json`, JSON.stringify({ iterations: ITERATIONS, seed: DEFAULT_SEED, sites }, null, 2) + '\n');
+console.log(`Wrote ${sites.length} sites to ${DIR}/expected.json`);
@@ -1,161 +1,459 @@
-import { useState, useMemo, useEffect, useCallback } from 'react';
-import { DEFAULT_GLOBAL, DEFAULT_HANDPUMP, DEFAULT_SOLAR, DEFAULT_BENEFITS, DEFAULT_ADDITIONAL_BENEFITS, DEFAULT_REVENUE } from '../constants';
+import { useEffect } from 'react';
+import { DEFAULT_GLOBAL, DEFAULT_HANDPUMP, DEFAULT_SOLAR, DEFAULT_BENEFITS, DEFAULT_ADDITIONAL_BENEFITS, DEFAULT_REVENUE, DEFAULT_HYDRAULICS } from '../constants';
 import { GlobalParams, HandpumpParams, SolarSystemParams, BenefitsParams, VillageLayout, SimulationResult, AdditionalBenefitsParams, RevenueParams, HydraulicInputs, SystemSpecs, BoQItem, PipelineProfile, SystemGeometry, ProjectDetails } from '../types';
 import { AnalyticsService } from '../services/analyticsService';
-import { calculateNPV, runMonteCarloSimulation } from '../utils/calculations';
-
-export const useProjectState = () => {
-    // --- View State ---
-    const [activeTab, setActiveTab] = useState<'map' | 'schematic' | 'analysis' | 'dashboard'>('map');
-    const [mapResetKey, setMapResetKey] = useState(0);
-    const [showSplash, setShowSplash] = useState(true);
-
-    // Feedback State
-    const [showFeedback, setShowFeedback] = useState(false);
-    const [feedbackText, setFeedbackText] = useState("");
-    const [isSubmittingFeedback, setIsSubmittingFeedback] = useState(false);
-
-    // --- State ---
-    const [projectDetails, setProjectDetails] = useState<ProjectDetails>({ siteName: '', contractNumber: '' });
-    const [global, setGlobal] = useState<GlobalParams>(DEFAULT_GLOBAL);
-    const [solar, setSolar] = useState<SolarSystemParams>(DEFAULT_SOLAR);
-    const [handpump, setHandpump] = useState<HandpumpParams>(DEFAULT_HANDPUMP);
-    const [revenue, setRevenue] = useState<RevenueParams>(DEFAULT_REVENUE);
-    const [benefits, setBenefits] = useState<BenefitsParams>(DEFAULT_BENEFITS);
-    const [additionalBenefits, setAdditionalBenefits] = useState<AdditionalBenefitsParams>(DEFAULT_ADDITIONAL_BENEFITS);
-    const [layout, setLayout] = useState<VillageLayout>('compact');
-
-    // Auto-Scale Logic
-    const [autoScaleSolar, setAutoScaleSolar] = useState(true);
-    const [designApplied, setDesignApplied] = useState(false);
-
-    // Lifted Engineering State
-    const [hydraulicInputs, setHydraulicInputs] = useState<HydraulicInputs>({
-        boreholeDepth: 60, staticWaterLevel: 25, elevationDifference: 15, tankHeight: 6, pipeLength: 0, dailyDemandPerCapita: 30, peakSunHours: 5.5, pumpEfficiency: 0.6, frictionLossFactor: 0.08, boreholeElevation: undefined, tankElevation: undefined
-    });
-    const [systemSpecs, setSystemSpecs] = useState<SystemSpecs | null>(null);
-    const [generatedBoQ, setGeneratedBoQ] = useState<BoQItem[]>([]);
-    const [pipelineProfiles, setPipelineProfiles] = useState<PipelineProfile[]>([]);
-    const [systemGeometry, setSystemGeometry] = useState<SystemGeometry | null>(null);
-
-    // Simulation Settings
-    const [simMetric, setSimMetric] = useState<'economic' | 'financial'>('economic');
-    const [simulationResult, setSimulationResult] = useState<SimulationResult | null>(null);
-    const [isSimulating, setIsSimulating] = useState(false);
-
-    const [isDownloadingPdf, setIsDownloadingPdf] = useState(false);
-
-    // --- Analytics Initialization ---
-    useEffect(() => {
-        AnalyticsService.startSession();
-    }, []);
+import { calculateNPV } from '../utils/calculations';
+import { createMonteCarloClient, MonteCarloClient } from '../services/monteCarloService';
+import { DEFAULT_MONTE_CARLO } from '../utils/monteCarlo';
+import { NpvInputs, tornadoSensitivity } from '../utils/npvBatch';
+import { MonteCarloModel } from '../utils/simulation';
+import { boqCapex, DesignChoice } from '../utils/boq';
+import { checkDesignChoice, DesignProblem, lifecycleCostModel } from '../utils/designOptimizer';
+import { BoqOverrides, CoverageSnapshot, decodeSections, DesignSnapshot, encodeSections, ProfileSnapshot, ProjectSections, RestoredDesign } from '../utils/projectCodec';
+import { newProjectId, ProjectStore } from '../services/projectStore';
+import { createSelector, createSetter, createStableSelector, createStore, shallowEqual } from '../utils/store';
+import { useStore } from './useStore';
+import { Perf } from '../utils/perf';
 
-    // --- Handlers ---
-    const handleApplyDesign = (civilCost: number, equipCost: number, pipeLength: number) => {
-        if (autoScaleSolar) {
-            setSolar(prev => ({ ...prev, capexDrillingAndCivil: civilCost, capexEquip: equipCost }));
-        }
-        setDesignApplied(true);
-        setActiveTab('schematic');
+// --- Project state ---
+// All app state lives in one store. Components subscribe to the slice (or single field) they
+// show through useProject, so typing in one input re-renders that input, not the app.
+// Actions are plain functions and keep their identity, so they never invalidate props.
+
+export type ActiveTab = 'map' | 'schematic' | 'analysis' | 'dashboard';
+
+export interface ProjectState {
+    // View
+    activeTab: ActiveTab;
+    mapResetKey: number;
+    showSplash: boolean;
+    showFeedback: boolean;
+    feedbackText: string;
+    isSubmittingFeedback: boolean;
+    isDownloadingPdf: boolean;
+
+    // Parameters
+    projectDetails: ProjectDetails;
+    global: GlobalParams;
+    solar: SolarSystemParams;
+    handpump: HandpumpParams;
+    revenue: RevenueParams;
+    benefits: BenefitsParams;
+    additionalBenefits: AdditionalBenefitsParams;
+    layout: VillageLayout;
+    autoScaleSolar: boolean;
+    designApplied: boolean;
+
+    // Lifted engineering state
+    hydraulicInputs: HydraulicInputs;
+    systemSpecs: SystemSpecs | null;
+    generatedBoQ: BoQItem[];
+    boqOverrides: BoqOverrides;
+    pipelineProfiles: PipelineProfile[];
+    systemGeometry: SystemGeometry | null;
+    restoredDesign: RestoredDesign | null;
+    designProblem: DesignProblem | null; // Pipe network as last solved, for the design search
+    designChoice: DesignChoice | null; // Sizes applied from the design search (standard when null)
+    designNotice: string | null; // Why an applied design was dropped
+
+    // Simulation
+    simMetric: 'economic' | 'financial';
+    simulationResult: SimulationResult | null;
+    isSimulating: boolean;
+    simIterations: number;
+    simSeed: number;
+    simEarlyStop: boolean;
+    simProgress: number; // 0-1 while a run is in flight
+    simModel: MonteCarloModel['kind'];
+}
+
+// Edits are persisted once they have settled for this long
+const AUTOSAVE_DELAY_MS = 1500;
+
+export const projectStore = createStore<ProjectState>({
+    activeTab: 'map',
+    mapResetKey: 0,
+    showSplash: true,
+    showFeedback: false,
+    feedbackText: '',
+    isSubmittingFeedback: false,
+    isDownloadingPdf: false,
+    projectDetails: { siteName: '', contractNumber: '' },
+    global: DEFAULT_GLOBAL,
+    solar: DEFAULT_SOLAR,
+    handpump: DEFAULT_HANDPUMP,
+    revenue: DEFAULT_REVENUE,
+    benefits: DEFAULT_BENEFITS,
+    additionalBenefits: DEFAULT_ADDITIONAL_BENEFITS,
+    layout: 'compact',
+    autoScaleSolar: true,
+    designApplied: false,
+    hydraulicInputs: DEFAULT_HYDRAULICS,
+    systemSpecs: null,
+    generatedBoQ: [],
+    boqOverrides: {},
+    pipelineProfiles: [],
+    systemGeometry: null,
+    restoredDesign: null,
+    designProblem: null,
+    designChoice: null,
+    designNotice: null,
+    simMetric: 'economic',
+    simulationResult: null,
+    isSimulating: false,
+    simIterations: DEFAULT_MONTE_CARLO.iterations,
+    simSeed: DEFAULT_MONTE_CARLO.seed,
+    simEarlyStop: false,
+    simProgress: 0,
+    simModel: 'full'
+});
+
+export const useProject = <T>(selector: (state: ProjectState) => T, equal?: (a: T, b: T) => boolean) =>
+    useStore(projectStore, selector, equal);
+
+// --- Derived values (memoized on the fields they read, not on whole objects) ---
+
+// Design population based on compounded growth
+export const selectFinalDesignPopulation = createSelector(
+    (s: ProjectState) => [s.global.population, s.global.populationGrowthRate, s.global.projectLifespan] as const,
+    (population, growth, lifespan) => Math.round(population * Math.pow(1 + growth / 100, lifespan))
+);
+
+export const selectHandpumpsNeeded = (s: ProjectState) => Math.ceil(s.global.population / s.handpump.usersPerPump);
+
+// The NPV model reads these specs fields only; a redrawn pipe that leaves demand and
+// institution counts alone keeps the previous result
+const selectNpvSpecs = createStableSelector(
+    (s: ProjectState) => s.systemSpecs,
+    (a, b) => !!a && !!b && a.dailyDemandM3 === b.dailyDemandM3 && a.countSchools === b.countSchools &&
+        a.countClinics === b.countClinics && a.countGardens === b.countGardens && a.hasGrid === b.hasGrid
+);
+
+// Nor does it read the currency
+const selectNpvGlobal = createStableSelector(
+    (s: ProjectState) => s.global,
+    (a, b) => a.population === b.population && a.populationGrowthRate === b.populationGrowthRate &&
+        a.projectLifespan === b.projectLifespan && a.discountRate === b.discountRate
+);
+
+export const selectNpvInputs = createSelector(
+    (s: ProjectState) => [selectNpvGlobal(s), s.solar, s.handpump, s.revenue, s.benefits, s.additionalBenefits] as const,
+    (global, solar, handpump, revenue, benefits, additionalBenefits): NpvInputs => ({ global, solar, handpump, revenue, benefits, additionalBenefits })
+);
+
+export const selectNpv = createSelector(
+    (s: ProjectState) => [selectNpvInputs(s), s.layout, selectNpvSpecs(s)] as const,
+    (inputs, layout, specs) => Perf.time('npv.calculate', () => calculateNPV(
+        inputs.global, inputs.solar, inputs.handpump, inputs.revenue, inputs.benefits, inputs.additionalBenefits, layout, specs
+    ))
+);
+
+// Lifecycle cost of a design as a function of its CAPEX, for the design search
+export const selectLifecycleCost = createSelector(
+    (s: ProjectState) => [selectNpvInputs(s), s.layout, selectNpvSpecs(s)] as const,
+    (inputs, layout, specs) => lifecycleCostModel(inputs, layout, specs)
+);
+
+// One batched NPV evaluation per input change, cheap enough to keep live
+export const selectSensitivity = createSelector(
+    (s: ProjectState) => [selectNpvInputs(s), selectNpvSpecs(s), s.simMetric] as const,
+    (inputs, specs, metric) => Perf.time('npv.sensitivity', () => tornadoSensitivity(inputs, specs, metric))
+);
+
+// --- Persistence state (module level: there is one project open at a time) ---
+// The map reports its design through callbacks into these (no re-render per edit)
+let projectId = newProjectId();
+let designSnapshot: DesignSnapshot | null = null;
+let profileSnapshots: ProfileSnapshot[] = [];
+let coverageSnapshot: CoverageSnapshot | null = null;
+let autosaveTimer: ReturnType<typeof setTimeout> | null = null;
+let persistReady = false; // Off until the startup restore has been tried
+let savedOnce = false;
+let monteCarlo: MonteCarloClient | null = null;
+
+const isBlankDesign = (d: DesignSnapshot | null) =>
+    !d || (!d.borehole && !d.tank && d.taps.length === 0 && d.institutions.length === 0 && d.mainLines.length === 0);
+
+// --- Helper: Re-apply user-entered rates to a freshly generated BoQ ---
+const applyBoqOverrides = (boq: BoQItem[], overrides: BoqOverrides): BoQItem[] =>
+    boq.map(item => overrides[item.id] === undefined ? item : { ...item, rate: overrides[item.id], amount: overrides[item.id] * item.qty });
+
+// --- Helper: Copy BoQ costs into the solar CAPEX when auto-scaling (no-op if unchanged) ---
+const scaleSolarCapex = (civils: number, equip: number) => projectStore.setState(s => {
+    if (!s.autoScaleSolar || (s.solar.capexDrillingAndCivil === civils && s.solar.capexEquip === equip)) return {};
+    return { solar: { ...s.solar, capexDrillingAndCivil: civils, capexEquip: equip } };
+});
+
+// The slices a project file stores; a change to any of them schedules an autosave
+const selectPersisted = (s: ProjectState) => ({
+    projectDetails: s.projectDetails, global: s.global, solar: s.solar, handpump: s.handpump, revenue: s.revenue,
+    benefits: s.benefits, additionalBenefits: s.additionalBenefits, layout: s.layout, autoScaleSolar: s.autoScaleSolar,
+    designApplied: s.designApplied, designChoice: s.designChoice, hydraulicInputs: s.hydraulicInputs, boqOverrides: s.boqOverrides, simMetric: s.simMetric,
+    simIterations: s.simIterations, simSeed: s.simSeed, simEarlyStop: s.simEarlyStop, simModel: s.simModel
+});
+
+const collectSections = (): Partial<ProjectSections> => {
+    const s = projectStore.getState();
+    return {
+        design: designSnapshot ?? undefined,
+        profiles: profileSnapshots,
+        inputs: s.hydraulicInputs,
+        params: {
+            projectDetails: s.projectDetails, global: s.global, solar: s.solar, handpump: s.handpump, revenue: s.revenue,
+            benefits: s.benefits, additionalBenefits: s.additionalBenefits, layout: s.layout, autoScaleSolar: s.autoScaleSolar,
+            designApplied: s.designApplied,
+            designChoice: s.designChoice,
+            simulation: { metric: s.simMetric, iterations: s.simIterations, seed: s.simSeed, earlyStop: s.simEarlyStop, model: s.simModel }
+        },
+        boq: s.boqOverrides,
+        coverage: coverageSnapshot ?? undefined
     };
+};
 
-    const handleUpdateCalc = (specs: SystemSpecs, boq: BoQItem[], profiles: PipelineProfile[], geometry: SystemGeometry) => {
-        setSystemSpecs(specs);
-        setGeneratedBoQ(boq);
-        setPipelineProfiles(profiles);
-        setSystemGeometry(geometry);
+const saveNow = async () => {
+    if (autosaveTimer) { clearTimeout(autosaveTimer); autosaveTimer = null; }
+    // An untouched map is not worth a project entry; once saved, a project keeps saving
+    if (!persistReady || (isBlankDesign(designSnapshot) && !savedOnce)) return;
+    const sections = collectSections();
+    const name = sections.params?.projectDetails.siteName || 'Untitled project';
+    const result = await ProjectStore.save(projectId, name, encodeSections(sections));
+    savedOnce = true;
+    if (result.written.length > 0) console.log(`Projects: saved ${result.written.join(', ')} (${result.bytesWritten} bytes, ${result.ms.toFixed(1)} ms)`);
+};
 
-        // Real-time cost updates
-        const civils = boq.filter(i => i.category === 'Civils' || i.category === 'Network').reduce((acc, i) => acc + i.amount, 0);
-        const equip = boq.filter(i => i.category === 'Mechanical' || i.category === 'Electrical').reduce((acc, i) => acc + i.amount, 0);
+const scheduleAutosave = () => {
+    if (!persistReady) return;
+    if (autosaveTimer) clearTimeout(autosaveTimer);
+    autosaveTimer = setTimeout(() => { saveNow(); }, AUTOSAVE_DELAY_MS);
+};
+
+// Missing fields (files from older versions) fall back to the defaults
+const applySections = (s: Partial<ProjectSections>) => {
+    const p = s.params;
+    designSnapshot = s.design ?? null;
+    profileSnapshots = s.profiles ?? [];
+    coverageSnapshot = s.coverage ?? null;
+    projectStore.setState(prev => ({
+        projectDetails: { siteName: '', contractNumber: '', ...p?.projectDetails },
+        global: { ...DEFAULT_GLOBAL, ...p?.global },
+        solar: { ...DEFAULT_SOLAR, ...p?.solar },
+        handpump: { ...DEFAULT_HANDPUMP, ...p?.handpump },
+        revenue: { ...DEFAULT_REVENUE, ...p?.revenue },
+        benefits: { ...DEFAULT_BENEFITS, ...p?.benefits },
+        additionalBenefits: { ...DEFAULT_ADDITIONAL_BENEFITS, ...p?.additionalBenefits },
+        layout: p?.layout ?? 'compact',
+        autoScaleSolar: p?.autoScaleSolar ?? true,
+        designApplied: p?.designApplied ?? false,
+        designChoice: p?.designChoice ?? null,
+        designNotice: null,
+        simMetric: p?.simulation.metric ?? 'economic',
+        simIterations: p?.simulation.iterations ?? DEFAULT_MONTE_CARLO.iterations,
+        simSeed: p?.simulation.seed ?? DEFAULT_MONTE_CARLO.seed,
+        simEarlyStop: p?.simulation.earlyStop ?? false,
+        simModel: p?.simulation.model ?? 'full',
+        hydraulicInputs: { ...DEFAULT_HYDRAULICS, ...s.inputs },
+        boqOverrides: s.boq ?? {},
+        systemSpecs: null,
+        generatedBoQ: [],
+        pipelineProfiles: [],
+        systemGeometry: null,
+        designProblem: null,
+        simulationResult: null,
+        restoredDesign: s.design ? { design: s.design, profiles: s.profiles ?? [], coverage: s.coverage ?? null } : null,
+        mapResetKey: prev.mapResetKey + 1 // Remount the map on the restored design
+    }));
+};
+
+// --- Actions ---
+export const projectActions = {
+    setActiveTab: createSetter(projectStore, 'activeTab'),
+    setShowSplash: createSetter(projectStore, 'showSplash'),
+    setShowFeedback: createSetter(projectStore, 'showFeedback'),
+    setFeedbackText: createSetter(projectStore, 'feedbackText'),
+    setIsDownloadingPdf: createSetter(projectStore, 'isDownloadingPdf'),
+    setProjectDetails: createSetter(projectStore, 'projectDetails'),
+    setGlobal: createSetter(projectStore, 'global'),
+    setSolar: createSetter(projectStore, 'solar'),
+    setHandpump: createSetter(projectStore, 'handpump'),
+    setRevenue: createSetter(projectStore, 'revenue'),
+    setBenefits: createSetter(projectStore, 'benefits'),
+    setAdditionalBenefits: createSetter(projectStore, 'additionalBenefits'),
+    setHydraulicInputs: createSetter(projectStore, 'hydraulicInputs'),
+    setSimMetric: createSetter(projectStore, 'simMetric'),
+    setSimIterations: createSetter(projectStore, 'simIterations'),
+    setSimEarlyStop: createSetter(projectStore, 'simEarlyStop'),
+    setSimModel: createSetter(projectStore, 'simModel'),
+    setDesignChoice: (designChoice: DesignChoice | null) => projectStore.setState({ designChoice, designNotice: null }),
+
+    setPopulation: (population: number) => projectStore.setState(s => s.global.population === population ? {} : { global: { ...s.global, population } }),
 
-        if (autoScaleSolar) {
-            setSolar(prev => ({ ...prev, capexDrillingAndCivil: civils, capexEquip: equip }));
+    handleApplyDesign: (civilCost: number, equipCost: number, pipeLength: number) => {
+        scaleSolarCapex(civilCost, equipCost);
+        projectStore.setState({ designApplied: true, activeTab: 'schematic' });
+    },
+
+    handleUpdateCalc: (specs: SystemSpecs, designedBoq: BoQItem[], profiles: PipelineProfile[], geometry: SystemGeometry, problem: DesignProblem | null) => {
+        const boq = applyBoqOverrides(designedBoq, projectStore.getState().boqOverrides);
+        projectStore.setState({ systemSpecs: specs, generatedBoQ: boq, pipelineProfiles: profiles, systemGeometry: geometry, designProblem: problem });
+
+        // An applied design holds only while the site still meets its limits; dropping it
+        // re-runs the map's calculation with standard sizing
+        const { designChoice, hydraulicInputs } = projectStore.getState();
+        const broken = designChoice && checkDesignChoice(designChoice, specs, problem, hydraulicInputs);
+        if (broken) {
+            console.warn(`Design search: applied design dropped (${broken})`);
+            projectStore.setState({ designChoice: null, designNotice: `The applied design was dropped: ${broken}. The BoQ is back on standard sizing; search again to re-size.` });
         }
-    };
 
-    const updateBoQRate = (id: string, newRate: number) => {
-        const updated = generatedBoQ.map(item => {
-            if (item.id === id) return { ...item, rate: newRate, amount: newRate * item.qty };
-            return item;
-        });
-        setGeneratedBoQ(updated);
-        const civils = updated.filter(i => i.category === 'Civils' || i.category === 'Network').reduce((acc, i) => acc + i.amount, 0);
-        const equip = updated.filter(i => i.category === 'Mechanical' || i.category === 'Electrical').reduce((acc, i) => acc + i.amount, 0);
-        if (autoScaleSolar) { setSolar(prev => ({ ...prev, capexDrillingAndCivil: civils, capexEquip: equip })); }
-    };
+        // Real-time cost updates
+        const { civils, equip } = boqCapex(boq);
+        scaleSolarCapex(civils, equip);
+    },
+
+    updateBoQRate: (id: string, newRate: number) => {
+        const s = projectStore.getState();
+        const updated = s.generatedBoQ.map(item => item.id === id ? { ...item, rate: newRate, amount: newRate * item.qty } : item);
+        projectStore.setState({ generatedBoQ: updated, boqOverrides: { ...s.boqOverrides, [id]: newRate } });
+        const { civils, equip } = boqCapex(updated);
+        scaleSolarCapex(civils, equip);
+    },
 
-    const handleFeedbackSubmit = async () => {
+    handleFeedbackSubmit: async () => {
+        const { feedbackText } = projectStore.getState();
         if (!feedbackText.trim()) return;
-        setIsSubmittingFeedback(true);
+        projectStore.setState({ isSubmittingFeedback: true });
         try {
             await AnalyticsService.sendFeedback(feedbackText);
             alert("Thank you! Your feedback has been recorded.");
-            setFeedbackText("");
-            setShowFeedback(false);
+            projectStore.setState({ feedbackText: '', showFeedback: false });
         } catch (e) {
             alert("Error sending feedback. Please check your internet connection.");
         } finally {
-            setIsSubmittingFeedback(false);
+            projectStore.setState({ isSubmittingFeedback: false });
         }
-    };
+    },
 
-    // --- Calculations ---
+    runSimulation: async () => {
+        if (!monteCarlo) return;
+        const s = projectStore.getState();
+        projectStore.setState({ isSimulating: true, simProgress: 0 });
+        const model: MonteCarloModel = s.simModel === 'full'
+            ? { kind: 'full', inputs: selectNpvInputs(s), specs: s.systemSpecs }
+            : { kind: 'summary', summary: selectNpv(s).summary };
+        const simDone = Perf.start('montecarlo.run');
+        let result: SimulationResult | null;
+        try {
+            result = await monteCarlo.run(
+                model,
+                s.simMetric,
+                { iterations: s.simIterations, seed: s.simSeed, earlyStop: s.simEarlyStop },
+                progress => projectStore.setState({ simProgress: progress.done / progress.total })
+            );
+        } catch (e) {
+            console.error('Monte Carlo simulation failed', e);
+            projectStore.setState({ simProgress: 0, isSimulating: false });
+            alert(`The simulation failed. ${e instanceof Error ? e.message : ''}`);
+            return;
+        }
+        if (!result) return; // Superseded by a newer run, which owns isSimulating now
+        simDone({ items: result.iterations });
+        projectStore.setState({ simulationResult: result, simProgress: 1, isSimulating: false });
+    },
 
-    // Calculate Final Design Population based on compounded growth
-    const finalDesignPopulation = useMemo(() => {
-        return Math.round(global.population * Math.pow(1 + global.populationGrowthRate / 100, global.projectLifespan));
-    }, [global.population, global.populationGrowthRate, global.projectLifespan]);
+    handleDesignChange: (design: DesignSnapshot, profiles: ProfileSnapshot[]) => {
+        designSnapshot = design;
+        profileSnapshots = profiles;
+        scheduleAutosave();
+    },
 
-    const { yearlyData, summary } = useMemo(() => calculateNPV(
-        global, solar, handpump, revenue, benefits, additionalBenefits, layout, systemSpecs
-    ), [global, solar, handpump, revenue, benefits, additionalBenefits, layout, systemSpecs]);
+    handleCoverageChange: (coverage: CoverageSnapshot) => {
+        coverageSnapshot = coverage;
+        scheduleAutosave();
+    },
 
-    const handpumpsNeeded = Math.ceil(global.population / handpump.usersPerPump);
+    // Replaces the old page reload: the current project stays saved, a blank one starts
+    newProject: async () => {
+        await saveNow();
+        projectId = newProjectId();
+        savedOnce = false;
+        applySections({});
+        projectStore.setState({ activeTab: 'map' });
+    },
 
-    const runSimulation = () => {
-        setIsSimulating(true);
-        setTimeout(() => {
-            const result = runMonteCarloSimulation(summary, simMetric);
-            setSimulationResult(result);
-            setIsSimulating(false);
-        }, 100);
-    };
+    exportProject: () => {
+        const sections = collectSections();
+        ProjectStore.exportFile(sections.params?.projectDetails.siteName || 'project', encodeSections(sections));
+    },
 
-    return {
-        activeTab, setActiveTab,
-        mapResetKey, setMapResetKey,
-        showSplash, setShowSplash,
-        showFeedback, setShowFeedback,
-        feedbackText, setFeedbackText,
-        isSubmittingFeedback, setIsSubmittingFeedback,
-        projectDetails, setProjectDetails,
-        global, setGlobal,
-        solar, setSolar,
-        handpump, setHandpump,
-        revenue, setRevenue,
-        benefits, setBenefits,
-        additionalBenefits, setAdditionalBenefits,
-        layout, setLayout,
-        autoScaleSolar, setAutoScaleSolar,
-        designApplied, setDesignApplied,
-        hydraulicInputs, setHydraulicInputs,
-        systemSpecs, setSystemSpecs,
-        generatedBoQ, setGeneratedBoQ,
-        pipelineProfiles, setPipelineProfiles,
-        systemGeometry, setSystemGeometry,
-        simMetric, setSimMetric,
-        simulationResult, setSimulationResult,
-        isSimulating, setIsSimulating,
-        isDownloadingPdf, setIsDownloadingPdf,
-        handleApplyDesign,
-        handleUpdateCalc,
-        updateBoQRate,
-        handleFeedbackSubmit,
-        finalDesignPopulation,
-        yearlyData,
-        summary,
-        handpumpsNeeded,
-        runSimulation
-    };
+    importProject: async (file: Blob) => {
+        try {
+            const sections = decodeSections(await ProjectStore.importFile(file));
+            await saveNow();
+            projectId = newProjectId();
+            savedOnce = false;
+            applySections(sections);
+            projectStore.setState({ activeTab: 'map' });
+            scheduleAutosave();
+        } catch (e) {
+            console.error('Projects: import failed', e);
+            alert(`Could not open this project file. ${e instanceof Error ? e.message : ''}`);
+        }
+    }
+};
+
+// --- Lifecycle: mounted once by App (analytics, simulation worker, restore and autosave) ---
+export const useProjectLifecycle = () => {
+    useEffect(() => {
+        AnalyticsService.startSession();
+    }, []);
+
+    // Monte Carlo worker
+    useEffect(() => {
+        monteCarlo = createMonteCarloClient();
+        return () => {
+            monteCarlo?.dispose();
+            monteCarlo = null;
+        };
+    }, []);
+
+    // Restore the most recent autosave on startup
+    useEffect(() => {
+        let cancelled = false;
+        ProjectStore.latest()
+            .then(record => record ? ProjectStore.load(record.id) : null)
+            .then(loaded => {
+                if (cancelled) return;
+                if (loaded) {
+                    projectId = loaded.record.id;
+                    savedOnce = true;
+                    applySections(decodeSections(loaded.sections));
+                    console.log(`Projects: restored "${loaded.record.name}" (${loaded.record.bytes} bytes)`);
+                }
+                persistReady = true;
+            });
+        return () => { cancelled = true; };
+    }, []);
+
+    // Autosave when a persisted slice changes (view state and results do not count)
+    useEffect(() => {
+        let persisted = selectPersisted(projectStore.getState());
+        return projectStore.subscribe(() => {
+            const next = selectPersisted(projectStore.getState());
+            if (shallowEqual(persisted, next)) return;
+            persisted = next;
+            scheduleAutosave();
+        });
+    }, []);
+
+    // Flush a pending autosave when the tab is hidden or closed
+    useEffect(() => {
+        const flush = () => { if (autosaveTimer) saveNow(); };
+        const onVisibility = () => { if (document.visibilityState === 'hidden') flush(); };
+        document.addEventListener('visibilitychange', onVisibility);
+        window.addEventListener('pagehide', flush);
+        return () => {
+            document.removeEventListener('visibilitychange', onVisibility);
+            window.removeEventListener('pagehide', flush);
+        };
+    }, []);
 };
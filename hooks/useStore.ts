@@ -0,0 +1,21 @@
+import { useRef, useSyncExternalStore } from 'react';
+import { Store } from '../utils/store';
+
+// Subscribes a component to one selected value of a store. It re-renders only when the
+// selection changes (Object.is by default; pass shallowEqual for selections built as objects).
+export const useStore = <S extends object, T>(store: Store<S>, selector: (state: S) => T, equal: (a: T, b: T) => boolean = Object.is): T => {
+    const cache = useRef<{ state: S, selector: (state: S) => T, value: T } | null>(null);
+
+    const getSnapshot = () => {
+        const state = store.getState();
+        const prev = cache.current;
+        if (prev && prev.state === state && prev.selector === selector) return prev.value;
+        const value = selector(state);
+        // An equal selection keeps its old reference, which is what stops the re-render
+        const kept = prev && equal(prev.value, value) ? prev.value : value;
+        cache.current = { state, selector, value: kept };
+        return kept;
+    };
+
+    return useSyncExternalStore(store.subscribe, getSnapshot);
+};
@@ -0,0 +1,312 @@
+"""Apply declarative source patches to the app in one read/write pass per file.
+
+The old one-off fix scripts each re-read SiteMap.tsx / App.tsx from a hard-coded path and
+rewrote it with whole-file regexes, so running one twice duplicated code. Here a patch set
+is a module-level ``PATCHES`` list built from the helpers below. Every patch is anchored on
+literal text, so no pattern backtracks across the file:
+
+    replace(file, old, new)                   old must occur exactly once
+    insert_after(file, anchor, text)          text goes right after the anchor
+    insert_before(file, anchor, text)
+    replace_block(file, start, end, new)      start ... first end after it, inclusive
+
+``loose=True`` lets any run of whitespace in the anchors match any other run (including
+none), for code that has been reformatted since the patch was written.
+
+An insert is skipped when its text is anywhere in the file. When only its ``marker`` is
+there (by default the first line of the text, e.g. a section comment), the code it adds
+exists in another form, rewritten since the patch was written: the patch reports missing
+rather than adding the old code back. Patch names must be unique within a run; unnamed
+patches that would share a default name get a ``#2``, ``#3`` suffix.
+
+All patches for a file are applied in memory, in order, and the file is written once, only
+if every one of them applied or was already there. A patch counts as already applied when
+its result is in the file (e.g. the inserted text, wherever it sits), or when the state
+file records it. The state file keeps a digest of every patch applied to each file plus
+the file's SHA-256 after the run; a file edited since then is reported, and ``--force``
+re-checks every patch against the file's content instead (e.g. after a git checkout).
+
+Usage:
+    python patch_engine.py fix_population_calc add_ui_controls      # patch sets by module name
+    python patch_engine.py restore_features --dry-run               # unified diff, nothing written
+    python patch_engine.py update_pop_and_log --root ../SPWS1
+    python fix_population_calc.py --dry-run                         # each set also runs on its own
+"""
+
+import argparse
+import difflib
+import hashlib
+import importlib
+import json
+import os
+import re
+import sys
+import time
+
+DEFAULT_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = '.patch-state.json'
+
+# Outcomes, in report order
+APPLIED, SKIPPED, MISSING, AMBIGUOUS = 'applied', 'skipped', 'missing', 'ambiguous'
+
+
+class Patch:
+    """One anchored edit. Build these with replace / insert_after / insert_before / replace_block."""
+
+    def __init__(self, kind, path, anchors, text, name=None, loose=False, marker=None):
+        self.kind = kind
+        self.path = path.replace('\\', '/')
+        self.anchors = anchors
+        self.text = text
+        self.named = name is not None
+        self.name = name or f'{kind}@{anchors[0][:40].strip()}'
+        self.loose = loose
+        self.marker = marker or next((line.strip() for line in text.splitlines() if re.search(r'\w', line)), None)
+        self.digest = hashlib.sha256(json.dumps([kind, self.path, anchors, text, loose]).encode('utf-8')).hexdigest()
+
+    def __repr__(self):
+        return f'Patch({self.kind}, {self.path}, {self.name!r})'
+
+
+def replace(path, old, new, name=None, loose=False):
+    return Patch('replace', path, [old], new, name, loose)
+
+
+def insert_after(path, anchor, text, name=None, loose=False, marker=None):
+    return Patch('insert_after', path, [anchor], text, name, loose, marker)
+
+
+def insert_before(path, anchor, text, name=None, loose=False, marker=None):
+    return Patch('insert_before', path, [anchor], text, name, loose, marker)
+
+
+def replace_block(path, start, end, new, name=None, loose=False):
+    return Patch('replace_block', path, [start, end], new, name, loose)
+
+
+# --- Matching ---
+def _finder(anchor, loose):
+    """Returns find(content, pos) -> (start, end) or None for one anchor."""
+    if not loose:
+        def find(content, pos=0):
+            i = content.find(anchor, pos)
+            return None if i < 0 else (i, i + len(anchor))
+        return find
+    # Literal tokens separated by \s*: linear, nothing to backtrack into
+    tokens = anchor.split()
+    pattern = re.compile(r'\s*'.join(re.escape(t) for t in tokens))
+
+    def find(content, pos=0):
+        m = pattern.search(content, pos)
+        return None if m is None else (m.start(), m.end())
+    return find
+
+
+def _occurrences(find, content, limit=2):
+    """Up to `limit` non-overlapping matches, enough to tell unique from ambiguous."""
+    found, pos = [], 0
+    while len(found) < limit:
+        span = find(content, pos)
+        if span is None:
+            break
+        found.append(span)
+        pos = max(span[1], span[0] + 1)
+    return found
+
+
+def apply_patch(patch, content, newline='\n'):
+    """Returns (status, new_content). Already-applied patches come back SKIPPED and unchanged."""
+    anchors = [a.replace('\n', newline) for a in patch.anchors]
+    text = patch.text.replace('\n', newline)
+    first = _finder(anchors[0], patch.loose)
+    hits = _occurrences(first, content)
+
+    if patch.kind == 'replace':
+        # When the new text contains the old (wrapping or extending it), a hit inside the
+        # new text means the patch is already there
+        offset = text.find(anchors[0])
+        hits = [h for h in hits if offset < 0 or not content.startswith(text, h[0] - offset)]
+        if not hits:
+            return (SKIPPED if text and text in content else MISSING), content
+        if len(hits) > 1:
+            return AMBIGUOUS, content
+        (s, e), = hits
+        return APPLIED, content[:s] + text + content[e:]
+
+    if patch.kind in ('insert_after', 'insert_before'):
+        # Already inserted, wherever it ended up; or rewritten since, and not to be re-added
+        if text.strip() and _finder(text.strip(), patch.loose)(content) is not None:
+            return SKIPPED, content
+        if patch.marker and _finder(patch.marker, True)(content) is not None:
+            return MISSING, content
+        if not hits:
+            return MISSING, content
+        if len(hits) > 1:
+            return AMBIGUOUS, content
+        (s, e), = hits
+        if patch.kind == 'insert_after':
+            return APPLIED, content[:e] + text + content[e:]
+        return APPLIED, content[:s] + text + content[s:]
+
+    if patch.kind == 'replace_block':
+        if not hits:
+            return (SKIPPED if text and text in content else MISSING), content
+        if len(hits) > 1:
+            return AMBIGUOUS, content
+        (s, e), = hits
+        end = _finder(anchors[1], patch.loose)(content, e)
+        if end is None:
+            return MISSING, content
+        block = content[s:end[1]]
+        if block == text or (patch.loose and block.split() == text.split()):
+            return SKIPPED, content
+        return APPLIED, content[:s] + text + content[end[1]:]
+
+    raise ValueError(f'Unknown patch kind: {patch.kind}')
+
+
+# --- State ---
+def sha256_text(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+# --- Engine ---
+def check_names(patches):
+    """The report and the state file key on names: explicit ones must be unique, default ones get a suffix."""
+    seen = {}
+    for patch in patches:
+        if patch.name in seen and seen[patch.name] is not patch:
+            if patch.named:
+                raise ValueError(f'Duplicate patch name {patch.name!r}: {seen[patch.name]!r} and {patch!r}')
+            n = 2
+            while f'{patch.name}#{n}' in seen:
+                n += 1
+            patch.name = f'{patch.name}#{n}'
+        seen[patch.name] = patch
+
+
+def group_by_file(patches):
+    """Patches per file, keeping their order; files in order of first appearance."""
+    files = {}
+    for patch in patches:
+        files.setdefault(patch.path, []).append(patch)
+    return files
+
+
+def run_patches(patches, root=DEFAULT_ROOT, dry_run=False, force=False, state_path=None):
+    """Applies `patches` under `root`. Returns a list of (patch, status, ms) and the diffs
+    (one unified diff string per changed file)."""
+    check_names(patches)
+    state_path = state_path or os.path.join(root, STATE_FILE)
+    state = load_state(state_path)
+    report, diffs = [], []
+
+    for rel, file_patches in group_by_file(patches).items():
+        full = os.path.join(root, rel)
+        if not os.path.exists(full):
+            report.extend((p, MISSING, 0.0) for p in file_patches)
+            continue
+        # newline='' keeps CRLF files CRLF; patch text is matched and written in the file's style
+        with open(full, encoding='utf-8', newline='') as f:
+            original = f.read()
+        newline = '\r\n' if '\r\n' in original else '\n'
+        digest = sha256_text(original)
+        recorded = state.get(rel, {})
+
+        # Patches recorded as applied are skipped without matching. Later patch sets often
+        # rewrite what earlier ones inserted, so the text alone cannot always tell.
+        applied = {} if force else recorded.get('patches', {})
+        if applied and recorded.get('sha256') != digest:
+            print(f'Note: {rel} changed since its patches were recorded; use --force to re-check them against the file')
+
+        content = original
+        results = []
+        for patch in file_patches:
+            if applied.get(patch.name) == patch.digest:
+                results.append((patch, SKIPPED, 0.0))
+                continue
+            t0 = time.perf_counter()
+            status, content = apply_patch(patch, content, newline)
+            results.append((patch, status, (time.perf_counter() - t0) * 1000))
+        report.extend(results)
+
+        if any(status in (MISSING, AMBIGUOUS) for _, status, _ in results):
+            continue  # All or nothing per file
+        if content != original:
+            diffs.append(''.join(difflib.unified_diff(
+                original.splitlines(keepends=True), content.splitlines(keepends=True), f'a/{rel}', f'b/{rel}')))
+        if dry_run:
+            continue
+        if content != original:
+            tmp = full + '.patch-tmp'
+            with open(tmp, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+            os.replace(tmp, full)
+        entry = state.setdefault(rel, {'patches': {}})
+        entry['sha256'] = sha256_text(content)
+        entry.setdefault('patches', {}).update({p.name: p.digest for p in file_patches})
+
+    if not dry_run:
+        save_state(state_path, state)
+    return report, diffs
+
+
+def load_patch_sets(names):
+    """Patch sets are modules with a PATCHES list, named like the old scripts."""
+    patches = []
+    for name in names:
+        module = importlib.import_module(name[:-3] if name.endswith('.py') else name)
+        patches.extend(getattr(module, 'PATCHES'))
+    return patches
+
+
+def print_report(report):
+    width = max((len(p.name) for p, _, _ in report), default=0)
+    for patch, status, ms in report:
+        print(f'  {status:<10} {patch.name:<{width}}  {patch.path}  {ms:.2f} ms')
+    counts = {}
+    for _, status, _ in report:
+        counts[status] = counts.get(status, 0) + 1
+    total_ms = sum(ms for _, _, ms in report)
+    summary = ', '.join(f'{counts[s]} {s}' for s in (APPLIED, SKIPPED, MISSING, AMBIGUOUS) if s in counts)
+    print(f'{len(report)} patches: {summary or "none"} ({total_ms:.1f} ms matching)')
+
+
+def main(argv=None, patches=None):
+    """CLI entry point. Patch set scripts call main(patches=PATCHES) and take the same flags."""
+    parser = argparse.ArgumentParser(description='Apply anchored, idempotent source patches.')
+    if patches is None:
+        parser.add_argument('sets', nargs='+', help='Patch set modules (e.g. fix_population_calc)')
+    parser.add_argument('--root', default=DEFAULT_ROOT, help='Repository root the patch paths are relative to (default: this directory)')
+    parser.add_argument('--dry-run', action='store_true', help='Print a unified diff instead of writing')
+    parser.add_argument('--force', action='store_true', help='Ignore the recorded state and re-check every patch')
+    parser.add_argument('--state', default=None, help=f'State file (default: <root>/{STATE_FILE})')
+    args = parser.parse_args(argv)
+
+    if patches is None:
+        patches = load_patch_sets(args.sets)
+    report, diffs = run_patches(patches, os.path.abspath(args.root), args.dry_run, args.force, args.state)
+    if args.dry_run:
+        for diff in diffs:
+            sys.stdout.write(diff)
+    print_report(report)
+    return 1 if any(status in (MISSING, AMBIGUOUS) for _, status, _ in report) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
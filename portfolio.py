@@ -0,0 +1,536 @@
+"""Appraise a whole portfolio of sites: system sizing, BoQ, lifecycle NPV and Monte Carlo.
+
+A NumPy port of the browser models (utils/boq.ts, utils/npvBatch.ts, utils/random.ts) for
+funding rounds with hundreds or thousands of villages. Sizing and NPV are evaluated
+vectorized across every site in a chunk. Each site's full-model Monte Carlo runs vectorized
+across its scenarios, and chunks are spread over a process pool. Sites are read and results
+are written one chunk at a time, with a bounded number of chunks in flight, so peak memory
+does not grow with the number of sites.
+
+Input is a CSV (or Parquet) file with one row per site. Columns (all optional except
+site_id; blanks fall back to the app defaults in constants.ts):
+
+    site_id, population, borehole_depth, static_water_level, tank_height,
+    daily_demand_per_capita, peak_sun_hours, pump_efficiency, friction_loss_factor,
+    rising_len, main_len, dist_len (m), taps, schools, clinics, gardens, has_grid,
+    borehole_elev, tank_elev (m, both needed to override the static head)
+
+plus any economic input by its key in utils/npvBatch.ts, e.g. ``global.discountRate`` or
+``solar.opexAnnual``. As with the app's auto-scaler, the solar CapEx is taken from the BoQ.
+Parquet needs pyarrow.
+
+Usage:
+    python portfolio.py run sites.csv results.csv
+    python portfolio.py run sites.parquet results.parquet --iterations 10000 --workers 8
+    python portfolio.py parity                # compare against the TypeScript fixtures
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# --- Defaults (keep in sync with constants.ts) ---
+DEFAULT_GLOBAL = {'population': 2000, 'populationGrowthRate': 2.5, 'projectLifespan': 20, 'discountRate': 10}
+DEFAULT_SOLAR = {
+    'capexDrillingAndCivil': 51000, 'capexEquip': 25000, 'opexAnnual': 1500,
+    'replacementCost': 4000, 'replacementInterval': 7, 'theftProbability': 5,
+}
+DEFAULT_HANDPUMP = {
+    'usersPerPump': 250, 'capexPerUnit': 6500, 'opexAnnualPerUnit': 150,
+    'rehabCostPerUnit': 800, 'rehabInterval': 5,
+}
+DEFAULT_REVENUE = {
+    'tariffSolarPerMonth': 0.50, 'tariffHandpumpPerMonth': 0, 'collectionEfficiencySolar': 85,
+    'collectionEfficiencyHandpump': 40, 'householdSize': 5, 'carbonCreditPricePerM3': 0.10,
+    'govtSubsidyFraction': 10,
+}
+DEFAULT_BENEFITS = {
+    'hourlyWage': 0.10, 'timeSpentBaseline': 120, 'timeSpentHandpump': 60, 'timeSpentSolar': 15,
+    'healthPremiumSolar': 2.50, 'healthPremiumHandpump': 1.50,
+}
+DEFAULT_ADDITIONAL_BENEFITS = {'valueSchool': 2500, 'valueClinic': 3500, 'valueGarden': 1000, 'valueEnergy': 500}
+DEFAULT_HYDRAULICS = {
+    'borehole_depth': 60, 'static_water_level': 25, 'tank_height': 6, 'daily_demand_per_capita': 30,
+    'peak_sun_hours': 5.5, 'pump_efficiency': 0.6, 'friction_loss_factor': 0.08,
+}
+INSTITUTIONAL_DEMAND = {'SCHOOL': 2500, 'CLINIC': 1000, 'GARDEN': 2000}
+DESIGN_COSTS = {
+    'DRILLING_BASE': 2500, 'DRILLING_PER_M': 60, 'PIPE_HDPE_63MM': 6, 'PIPE_HDPE_32MM': 3,
+    'TRENCHING_PER_M': 2.5, 'TANK_STEEL_BASE': 2000, 'TANK_PER_M3': 300, 'TANK_STAND_6M': 3500,
+    'PUMP_BASE': 1200, 'PUMP_PER_KW': 800, 'PV_STRUCTURE_BASE': 500, 'PV_PER_KW': 600,
+    'FENCE_CIVILS': 1500, 'DISTRIBUTION_POINTS': 600, 'INSTITUTION_CONNECTION': 300,
+}
+INVERTER_COST = 1500  # Fixed BoQ lines in utils/boq.ts
+GRID_KIOSK_COST = 4500
+
+DEFAULTS = {}
+for _group, _values in (('global', DEFAULT_GLOBAL), ('solar', DEFAULT_SOLAR), ('handpump', DEFAULT_HANDPUMP),
+                        ('revenue', DEFAULT_REVENUE), ('benefits', DEFAULT_BENEFITS),
+                        ('additionalBenefits', DEFAULT_ADDITIONAL_BENEFITS)):
+    DEFAULTS.update({f'{_group}.{k}': float(v) for k, v in _values.items()})
+
+# Economic inputs in NPV_PARAMS order (utils/npvBatch.ts); the order fixes the RNG stream
+NPV_PARAMS = [
+    'global.population', 'global.populationGrowthRate', 'global.projectLifespan', 'global.discountRate',
+    'solar.capexDrillingAndCivil', 'solar.capexEquip', 'solar.opexAnnual', 'solar.replacementCost',
+    'solar.replacementInterval', 'solar.theftProbability',
+    'handpump.usersPerPump', 'handpump.capexPerUnit', 'handpump.opexAnnualPerUnit',
+    'handpump.rehabCostPerUnit', 'handpump.rehabInterval',
+    'revenue.tariffSolarPerMonth', 'revenue.tariffHandpumpPerMonth', 'revenue.collectionEfficiencySolar',
+    'revenue.collectionEfficiencyHandpump', 'revenue.householdSize', 'revenue.carbonCreditPricePerM3',
+    'revenue.govtSubsidyFraction',
+    'benefits.hourlyWage', 'benefits.timeSpentBaseline', 'benefits.timeSpentHandpump', 'benefits.timeSpentSolar',
+    'benefits.healthPremiumSolar', 'benefits.healthPremiumHandpump',
+    'additionalBenefits.valueSchool', 'additionalBenefits.valueClinic', 'additionalBenefits.valueGarden',
+    'additionalBenefits.valueEnergy',
+]
+INTEGER_PARAMS = {'global.projectLifespan', 'solar.replacementInterval', 'handpump.rehabInterval'}
+FIXED_PARAMS = {'global.projectLifespan', 'global.population', 'handpump.usersPerPump', 'revenue.householdSize'}
+
+DEFAULT_SEED = 20240601
+MC_STEP = 50000  # Batch size of workers/monteCarloWorker.ts; sampling order depends on it
+MC_ROWS = 1 << 18  # Scenarios evaluated together (x 32 inputs x 8 bytes = 64 MB)
+SPREAD = 0.2
+Z_95 = 1.96
+
+FIXTURES = os.path.join('fixtures', 'portfolio')
+
+
+# --- Helper: JavaScript rounding (Math.round rounds halves up, NumPy rounds them to even) ---
+def js_round(x):
+    return np.floor(np.asarray(x, dtype=np.float64) + 0.5)
+
+
+# --- Sizing & BoQ (utils/boq.ts), vectorized across sites ---
+def design_sites(cols):
+    """Returns SystemSpecs fields plus the CapEx split for every site in the chunk."""
+    pop = cols['global.population']
+    r_len, m_len, d_len = cols['rising_len'], cols['main_len'], cols['dist_len']
+    schools, clinics, gardens = cols['schools'], cols['clinics'], cols['gardens']
+    has_grid = cols['has_grid'] > 0
+    total_len = r_len + m_len + d_len
+
+    domestic = pop * cols['daily_demand_per_capita'] / 1000
+    institutional = (schools * INSTITUTIONAL_DEMAND['SCHOOL'] + clinics * INSTITUTIONAL_DEMAND['CLINIC']
+                     + gardens * INSTITUTIONAL_DEMAND['GARDEN']) / 1000
+    daily = domestic + institutional
+    flow = daily / cols['peak_sun_hours']
+
+    # Both elevations must be known (and non-zero, as in the app) to replace the default head
+    bh, tank = cols['borehole_elev'], cols['tank_elev']
+    known = (np.nan_to_num(bh) != 0) & (np.nan_to_num(tank) != 0)
+    elev_diff = np.where(known, np.maximum(0, np.nan_to_num(tank) - np.nan_to_num(bh)), 0)
+    static_head = cols['static_water_level'] + elev_diff + cols['tank_height']
+    friction = np.where(r_len > 0, head_loss_hw(r_len, flow, 63), total_len * cols['friction_loss_factor'])
+    tdh = static_head + friction
+    pump_kw = flow * tdh * 9.81 / (3600 * cols['pump_efficiency']) * 1.2
+    pv_kw = pump_kw * 1.5
+
+    c = DESIGN_COSTS
+    civils = (js_round(cols['borehole_depth'] * c['DRILLING_PER_M']) + c['DRILLING_BASE'] + c['TANK_STAND_6M']
+              + c['FENCE_CIVILS'] + js_round(cols['taps'] * c['DISTRIBUTION_POINTS'])
+              + js_round(total_len * c['TRENCHING_PER_M'])
+              + np.where(r_len > 0, js_round(js_round(r_len) * c['PIPE_HDPE_63MM']), 0)
+              + np.where(m_len > 0, js_round(js_round(m_len) * c['PIPE_HDPE_63MM']), 0)
+              + np.where(d_len > 0, js_round(js_round(d_len) * c['PIPE_HDPE_32MM']), 0)
+              + (schools + clinics + gardens) * c['INSTITUTION_CONNECTION'])
+    equip = (js_round(c['TANK_STEEL_BASE'] + daily * c['TANK_PER_M3'])
+             + js_round(c['PUMP_BASE'] + pump_kw * c['PUMP_PER_KW'])
+             + js_round(c['PV_STRUCTURE_BASE'] + pv_kw * c['PV_PER_KW'])
+             + INVERTER_COST + np.where(has_grid, GRID_KIOSK_COST, 0))
+
+    return {
+        'daily_demand_m3': daily, 'domestic_demand_m3': domestic, 'institutional_demand_m3': institutional,
+        'flow_rate_m3h': flow, 'total_dynamic_head': tdh, 'pump_power_kw': pump_kw, 'pv_array_kw': pv_kw,
+        'capex_civils': civils, 'capex_equip': equip,
+    }
+
+
+def head_loss_hw(length_m, flow_m3h, diameter_mm, roughness=140):
+    """Hazen-Williams head loss in m (utils/hydraulics.ts headLossHW)."""
+    q = np.abs(np.asarray(flow_m3h, dtype=np.float64)) / 3600
+    r = 10.67 * length_m * roughness ** -1.852 * (diameter_mm / 1000) ** -4.87
+    return r * q ** 1.852
+
+
+# --- Lifecycle NPV kernel (evaluateNpvBatch), vectorized across rows ---
+def evaluate_npv(p, specs):
+    """`p` maps every NPV_PARAMS key to an array (or scalar); `specs` holds the per-row site
+    demand and institution counts. Returns the four totals compared in the app."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        solar_capex = p['solar.capexDrillingAndCivil'] + p['solar.capexEquip']
+        pumps = np.ceil(p['global.population'] / p['handpump.usersPerPump'])
+        carbon_rev = specs['daily_demand_m3'] * 365 * p['revenue.carbonCreditPricePerM3']
+        theft_cost = solar_capex * (p['solar.theftProbability'] / 100)
+        solar_add = (specs['schools'] * p['additionalBenefits.valueSchool']
+                     + specs['clinics'] * p['additionalBenefits.valueClinic']
+                     + specs['gardens'] * p['additionalBenefits.valueGarden']
+                     + np.where(specs['has_grid'], p['additionalBenefits.valueEnergy'], 0))
+        hh = p['revenue.householdSize']
+        tariff_s = p['revenue.tariffSolarPerMonth'] * 12 * (p['revenue.collectionEfficiencySolar'] / 100) / hh
+        tariff_h = p['revenue.tariffHandpumpPerMonth'] * 12 * (p['revenue.collectionEfficiencyHandpump'] / 100) / hh
+        subsidy = p['revenue.govtSubsidyFraction'] / 100
+        wage, base = p['benefits.hourlyWage'], p['benefits.timeSpentBaseline']
+        solar_time = ((base - p['benefits.timeSpentSolar']) / 60) * 365 * wage * 0.5
+        hp_time = ((base - p['benefits.timeSpentHandpump']) / 60) * 365 * wage * 0.5
+        h_opex = pumps * p['handpump.opexAnnualPerUnit']
+        h_rehab = pumps * p['handpump.rehabCostPerUnit']
+        g = 1 + p['global.populationGrowthRate'] / 100
+        r = 1 + p['global.discountRate'] / 100
+        life = np.asarray(p['global.projectLifespan'])
+        repl_int, rehab_int = p['solar.replacementInterval'], p['handpump.rehabInterval']
+
+        shape = np.broadcast(solar_capex, pumps, carbon_rev, g, r, life).shape
+        pop = np.broadcast_to(p['global.population'], shape).astype(np.float64)
+        df = np.ones(shape)
+        s_cum = np.zeros(shape)
+        h_cum = np.zeros(shape)
+        s_net = -np.broadcast_to(solar_capex, shape).astype(np.float64)
+        h_net = -np.broadcast_to(pumps * p['handpump.capexPerUnit'], shape).astype(np.float64)
+        years = int(np.max(life)) if np.size(life) else 0
+        uniform_life = np.size(life) == 0 or np.min(life) == years
+        for year in range(1, years + 1):
+            # Rows with a shorter lifespan stop accumulating
+            live = True if uniform_life else year <= life
+            keep = (lambda new, old: new) if uniform_life else (lambda new, old: np.where(live, new, old))
+            pop = keep(pop * g, pop)
+            df = keep(df * r, df)
+            s_cost = p['solar.opexAnnual'] + np.where(np.fmod(year, repl_int) == 0, p['solar.replacementCost'], 0)
+            h_cost = h_opex + np.where(np.fmod(year, rehab_int) == 0, h_rehab, 0)
+            tariff_rev = pop * tariff_s
+            s_rev = tariff_rev + carbon_rev + tariff_rev * subsidy
+            h_rev = pop * tariff_h
+            s_time = np.maximum(0, solar_time * pop)
+            h_time = np.maximum(0, hp_time * pop)
+            s_cum = keep(s_cum + (s_rev - s_cost), s_cum)
+            h_cum = keep(h_cum + (h_rev - h_cost), h_cum)
+            s_net = keep(s_net + ((tariff_rev + s_time + pop * p['benefits.healthPremiumSolar'] + solar_add
+                                   + carbon_rev) - (s_cost + theft_cost)) / df, s_net)
+            h_net = keep(h_net + ((h_rev + h_time + pop * p['benefits.healthPremiumHandpump']) - h_cost) / df, h_net)
+    return {'solar_net_value': s_net, 'handpump_net_value': h_net, 'solar_cashflow': s_cum, 'handpump_cashflow': h_cum}
+
+
+def differential(res, metric):
+    if metric == 'financial':
+        return res['solar_cashflow'] - res['handpump_cashflow']
+    return res['solar_net_value'] - res['handpump_net_value']
+
+
+# --- Seeded random numbers (utils/random.ts) ---
+def mulberry32(seed, index):
+    """Draw number `index` (0-based) of the mulberry32 stream for `seed`. The generator state
+    is a plain counter, so any draws of any number of streams are computed at once."""
+    m = np.uint64(0xFFFFFFFF)
+    n = np.asarray(index, dtype=np.uint64) + np.uint64(1)
+    t = (np.asarray(seed, dtype=np.uint64) + n * np.uint64(0x6D2B79F5)) & m
+    t = ((t ^ (t >> np.uint64(15))) * (t | np.uint64(1))) & m
+    t = t ^ ((t + (((t ^ (t >> np.uint64(7))) * (t | np.uint64(61))) & m)) & m)
+    return ((t ^ (t >> np.uint64(14))) & m).astype(np.float64) / 4294967296.0
+
+
+def wilson_interval(successes, n):
+    """95% Wilson score interval, as fractions (vectorized over `successes`)."""
+    if n == 0:
+        return np.zeros_like(successes, dtype=np.float64), np.ones_like(successes, dtype=np.float64)
+    p = successes / n
+    z2 = Z_95 * Z_95
+    denom = 1 + z2 / n
+    centre = (p + z2 / (2 * n)) / denom
+    half = Z_95 * np.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / denom
+    return np.maximum(0.0, centre - half), np.minimum(1.0, centre + half)
+
+
+# --- Full-model Monte Carlo (createFullModelRun without early stopping) ---
+def monte_carlo(values, specs, metric, iterations, seeds):
+    """Runs `iterations` scenarios for each of len(seeds) sites as one (sites x iterations)
+    batch. Each input gets the app's default distribution (±20% triangular, integer inputs
+    ±1, structural counts and zero inputs fixed), and every site consumes its own stream in
+    the worker's order (per batch of MC_STEP rows, input by input), so a site reproduces
+    the app's result for the same seed."""
+    seeds = np.asarray(seeds, dtype=np.uint64)[:, None]
+    sites = len(seeds)
+    cols = {key: np.repeat(np.asarray(values[key], dtype=np.float64)[:, None], iterations, axis=1) for key in NPV_PARAMS}
+    drawn = np.zeros((sites, 1), dtype=np.uint64)
+    for start in range(0, iterations, MC_STEP):
+        end = min(iterations, start + MC_STEP)
+        count = end - start
+        offsets = np.arange(count, dtype=np.uint64)[None, :]
+        for key in NPV_PARAMS:
+            if key in FIXED_PARAMS:
+                continue
+            v = np.asarray(values[key], dtype=np.float64)[:, None]
+            active = (v != 0) & ~np.isnan(v)
+            if not active.any():
+                continue
+            u = mulberry32(seeds, drawn + offsets)
+            if key in INTEGER_PARAMS:
+                low = np.maximum(1, v - 1.5)
+                draw = np.maximum(1, js_round(low + (v + 1.5 - low) * u))
+            else:
+                low, high = np.minimum(v * (1 - SPREAD), v * (1 + SPREAD)), np.maximum(v * (1 - SPREAD), v * (1 + SPREAD))
+                span = high - low
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    f = (v - low) / span
+                    draw = np.where(u < f, low + np.sqrt(u * span * (v - low)), high - np.sqrt((1 - u) * span * (high - v)))
+            cols[key][:, start:end] = np.where(active, draw, cols[key][:, start:end])
+            drawn += active.astype(np.uint64) * np.uint64(count)
+
+    diffs = differential(evaluate_npv(cols, {key: np.asarray(value)[:, None] for key, value in specs.items()}), metric)
+    wins = np.count_nonzero(diffs > 0, axis=1)
+    lo, hi = wilson_interval(wins, iterations)
+    p5, p50, p95 = np.quantile(diffs, [0.05, 0.5, 0.95], axis=1)
+    return {
+        'solar_win_rate': wins / iterations * 100, 'win_rate_lo': lo * 100, 'win_rate_hi': hi * 100,
+        'p5': p5, 'p50': p50, 'p95': p95,
+    }
+
+
+# --- Chunk evaluation (runs in the worker processes) ---
+SITE_COLUMNS = ['rising_len', 'main_len', 'dist_len', 'taps', 'schools', 'clinics', 'gardens',
+                'has_grid', 'borehole_elev', 'tank_elev', *DEFAULT_HYDRAULICS]
+
+
+def to_float(values):
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        if v is None or v == '':
+            continue
+        if isinstance(v, str) and v.strip().lower() in ('true', 'false', 'yes', 'no'):
+            out[i] = 1.0 if v.strip().lower() in ('true', 'yes') else 0.0
+        else:
+            out[i] = float(v)
+    return out
+
+
+def site_columns(chunk, n):
+    """Numeric site and economic inputs with blanks filled from the defaults."""
+    raw = {key: to_float(values) for key, values in chunk.items() if key != 'site_id'}
+    missing = np.full(n, np.nan)
+    cols = {}
+    for key in SITE_COLUMNS:
+        fallback = DEFAULT_HYDRAULICS.get(key, np.nan if key.endswith('_elev') else 0.0)
+        cols[key] = np.where(np.isnan(raw.get(key, missing)), fallback, raw.get(key, missing))
+    for key in NPV_PARAMS:
+        column = raw.get('population' if key == 'global.population' else key, missing)
+        cols[key] = np.where(np.isnan(column), DEFAULTS[key], column)
+    return cols
+
+
+def evaluate_chunk(job):
+    first_row, chunk, options = job
+    n = len(chunk['site_id'])
+    cols = site_columns(chunk, n)
+    design = design_sites(cols)
+    # Auto-scaler: the BoQ replaces the solar CapEx defaults
+    cols['solar.capexDrillingAndCivil'] = design['capex_civils']
+    cols['solar.capexEquip'] = design['capex_equip']
+    specs = {'daily_demand_m3': design['daily_demand_m3'], 'schools': cols['schools'], 'clinics': cols['clinics'],
+             'gardens': cols['gardens'], 'has_grid': cols['has_grid'] > 0}
+    npv = evaluate_npv({key: cols[key] for key in NPV_PARAMS}, specs)
+
+    out = {'site_id': list(chunk['site_id'])}
+    out.update({key: design[key] for key in design})
+    out['capex_solar'] = design['capex_civils'] + design['capex_equip']
+    out['capex_handpump'] = np.ceil(cols['global.population'] / cols['handpump.usersPerPump']) * cols['handpump.capexPerUnit']
+    out.update(npv)
+
+    iterations, metric = options['iterations'], options['metric']
+    if iterations > 0:
+        # Sites per batch such that a batch holds about MC_ROWS scenarios
+        per_batch = max(1, MC_ROWS // iterations)
+        seeds = (options['seed'] + first_row + np.arange(n)) & 0xFFFFFFFF
+        parts = []
+        for lo in range(0, n, per_batch):
+            hi = min(n, lo + per_batch)
+            parts.append(monte_carlo({key: cols[key][lo:hi] for key in NPV_PARAMS},
+                                     {key: value[lo:hi] for key, value in specs.items()},
+                                     metric, iterations, seeds[lo:hi]))
+        for key in parts[0]:
+            out[f'mc_{key}'] = np.concatenate([part[key] for part in parts])
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in out.items()}
+
+
+# --- Streaming IO ---
+def require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit('Parquet input/output needs pyarrow (pip install pyarrow); CSV works without it.')
+    return pa, pq
+
+
+def read_chunks(path, chunk_rows):
+    """Yields {column: [values]} dicts of at most chunk_rows sites."""
+    if path.lower().endswith('.parquet'):
+        _, pq = require_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            chunk = batch.to_pydict()
+            chunk['site_id'] = [str(s) for s in chunk.get('site_id', range(batch.num_rows))]
+            yield chunk
+        return
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        chunk = {name: [] for name in reader.fieldnames or []}
+        chunk.setdefault('site_id', [])
+        for row in reader:
+            for name in chunk:
+                chunk[name].append(row.get(name, ''))
+            if len(chunk['site_id']) >= chunk_rows:
+                yield chunk
+                chunk = {name: [] for name in chunk}
+        if chunk['site_id']:
+            yield chunk
+
+
+class ResultWriter:
+    """Appends result chunks to a CSV or Parquet file as they arrive."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith('.parquet')
+        self.file = None
+        self.writer = None
+
+    def write(self, result):
+        if self.parquet:
+            pa, pq = require_pyarrow()
+            table = pa.table(result)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+            return
+        if self.writer is None:
+            self.file = open(self.path, 'w', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(list(result))
+        self.writer.writerows(zip(*result.values()))
+
+    def close(self):
+        if self.parquet and self.writer is not None:
+            self.writer.close()
+        if self.file is not None:
+            self.file.close()
+
+
+def evaluate_stream(path, options, workers, chunk_rows):
+    """Yields result chunks in input order. At most 2 chunks per worker are in flight."""
+    jobs = ((first, chunk, options) for first, chunk in _numbered(read_chunks(path, chunk_rows)))
+    if workers <= 1:
+        yield from map(evaluate_chunk, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(evaluate_chunk, job))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _numbered(chunks):
+    first = 0
+    for chunk in chunks:
+        yield first, chunk
+        first += len(chunk['site_id'])
+
+
+def run(args):
+    options = {'iterations': args.iterations, 'seed': args.seed, 'metric': args.metric}
+    started = time.time()
+    writer = ResultWriter(args.output)
+    sites = 0
+    try:
+        for result in evaluate_stream(args.input, options, args.workers, args.chunk_size):
+            writer.write(result)
+            sites += len(result['site_id'])
+            print(f'  {sites} sites', end='\r', flush=True)
+    finally:
+        writer.close()
+    print(f'Appraised {sites} sites in {time.time() - started:.1f}s -> {args.output}')
+    return 0
+
+
+# --- Parity against the TypeScript models ---
+def parity(args):
+    """Re-evaluates fixtures/portfolio/sites.csv and compares with expected.json, which
+    fixtures/portfolio/generate.ts writes from the app's own TypeScript models."""
+    with open(os.path.join(args.fixtures, 'expected.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    sites_csv = os.path.join(args.fixtures, 'sites.csv')
+    checks = [
+        ('daily_demand_m3', lambda s: s['specs']['dailyDemandM3']),
+        ('flow_rate_m3h', lambda s: s['specs']['flowRateM3H']),
+        ('total_dynamic_head', lambda s: s['specs']['totalDynamicHead']),
+        ('pump_power_kw', lambda s: s['specs']['pumpPowerKW']),
+        ('pv_array_kw', lambda s: s['specs']['pvArrayKW']),
+        ('capex_civils', lambda s: s['capexCivils']),
+        ('capex_equip', lambda s: s['capexEquip']),
+        ('capex_solar', lambda s: s['summary']['capexSolar']),
+        ('capex_handpump', lambda s: s['summary']['capexHandpump']),
+        ('solar_net_value', lambda s: s['summary']['netEconomicValueSolar']),
+        ('handpump_net_value', lambda s: s['summary']['netEconomicValueHandpump']),
+        ('solar_cashflow', lambda s: s['summary']['totalSolarFinNPV']),
+        ('handpump_cashflow', lambda s: s['summary']['totalHandpumpFinNPV']),
+    ]
+    failures = 0
+    compared = 0
+    for metric in ('economic', 'financial'):
+        options = {'iterations': expected['iterations'], 'seed': expected['seed'], 'metric': metric}
+        rows = [site for chunk in evaluate_stream(sites_csv, options, 1, 4)
+                for site in (dict(zip(chunk, values)) for values in zip(*chunk.values()))]
+        mc_checks = [
+            ('mc_solar_win_rate', lambda s, m=metric: s['monteCarlo'][m]['solarWinRate']),
+            ('mc_win_rate_lo', lambda s, m=metric: s['monteCarlo'][m]['winRateInterval'][0]),
+            ('mc_win_rate_hi', lambda s, m=metric: s['monteCarlo'][m]['winRateInterval'][1]),
+            ('mc_p5', lambda s, m=metric: s['monteCarlo'][m]['p5']),
+            ('mc_p50', lambda s, m=metric: s['monteCarlo'][m]['p50']),
+            ('mc_p95', lambda s, m=metric: s['monteCarlo'][m]['p95']),
+        ]
+        for row, site in zip(rows, expected['sites']):
+            for column, get in (checks if metric == 'economic' else []) + mc_checks:
+                want, got = get(site), row[column]
+                compared += 1
+                if not math.isclose(got, want, rel_tol=args.rtol, abs_tol=1e-6):
+                    failures += 1
+                    print(f'MISMATCH {site["siteId"]} {metric} {column}: python={got!r} ts={want!r}')
+    print(f'{compared - failures}/{compared} values match the TypeScript models '
+          f'({len(expected["sites"])} sites, rtol={args.rtol:g})')
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Size and appraise a portfolio of sites (NPV, BoQ, Monte Carlo).')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help='Evaluate every site in a CSV/Parquet file')
+    p_run.add_argument('input', help='Sites file (.csv or .parquet)')
+    p_run.add_argument('output', help='Results file (.csv or .parquet)')
+    p_run.add_argument('--iterations', type=int, default=10000,
+                       help='Monte Carlo scenarios per site; 0 skips the simulation (default: 10000)')
+    p_run.add_argument('--metric', choices=['economic', 'financial'], default='economic',
+                       help='Differential the Monte Carlo ranks on (default: economic)')
+    p_run.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                       help=f'Base seed; site i uses seed + i (default: {DEFAULT_SEED})')
+    p_run.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parallel processes (default: all cores)')
+    p_run.add_argument('--chunk-size', type=int, default=256, help='Sites per chunk (default: 256)')
+
+    p_parity = sub.add_parser('parity', help='Check the NumPy models against the TypeScript fixtures')
+    p_parity.add_argument('--fixtures', default=FIXTURES, help=f'Fixture directory (default: {FIXTURES})')
+    p_parity.add_argument('--rtol', type=float, default=1e-9, help='Relative tolerance (default: 1e-9)')
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else parity(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
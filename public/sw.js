@@ -0,0 +1,318 @@
+// --- SPWS service worker: app shell, cache-first map data, offline site packs ---
+// The shell (index, hashed bundles, CDN css/fonts) is served cache-first with the index
+// revalidated from the network, so the app opens without a connection. Basemap tiles and
+// the raster COGs go into one data cache that is bounded in bytes and evicted least
+// recently used first. Entries prefetched for a site (see services/offlineService.ts) are
+// tagged with its id; untagged entries are evicted before any tagged one. Building
+// footprints are not cached here: BuildingTileCache already keeps decoded tiles in IndexedDB.
+//
+// Page <-> worker messages go over a MessageChannel port:
+//   { type: 'prefetch', site, urls }  -> progress messages, then { type: 'done', ... };
+//                                        { type: 'cancel' } on the same port stops it early
+//   { type: 'inventory' }             -> { type: 'inventory', sites, totalBytes, budget }
+//   { type: 'remove-site', site }     -> { type: 'done' }
+
+const SHELL_CACHE = 'spws-shell-v1';
+const DATA_CACHE = 'spws-data-v1';
+const META_DB = 'spws-sw';
+const META_STORE = 'entries';
+const SHELL_URLS = ['./', './index.html'];
+
+const TILE_HOSTS = [/(^|\.)tile\.openstreetmap\.org$/, /^server\.arcgisonline\.com$/, /(^|\.)tile\.opentopomap\.org$/, /^mt\d\.google\.com$/];
+const CDN_HOSTS = [/^unpkg\.com$/, /^fonts\.googleapis\.com$/, /^fonts\.gstatic\.com$/, /^ajax\.googleapis\.com$/];
+
+const MIN_BUDGET = 64 * 1024 * 1024;
+const MAX_BUDGET = 1024 * 1024 * 1024;
+const PREFETCH_CONCURRENCY = 4; // Tile servers rate-limit bulk downloads; keep this low
+const META_FLUSH_MS = 5000;
+
+// --- Entry metadata (IndexedDB, mirrored in memory) ---
+// url -> { url, bytes, sites: string[], lastUsed }
+let entries = null;
+let totalBytes = 0;
+const dirty = new Set();
+let flushTimer = null;
+
+const openMeta = () => new Promise((resolve, reject) => {
+    const req = indexedDB.open(META_DB, 1);
+    req.onupgradeneeded = () => req.result.createObjectStore(META_STORE, { keyPath: 'url' });
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+});
+
+let metaDb = null;
+const meta = () => (metaDb = metaDb || openMeta());
+
+const loadEntries = async () => {
+    if (entries) return entries;
+    const db = await meta();
+    const all = await new Promise((resolve, reject) => {
+        const req = db.transaction(META_STORE, 'readonly').objectStore(META_STORE).getAll();
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+    if (!entries) {
+        entries = new Map(all.map(e => [e.url, e]));
+        totalBytes = all.reduce((sum, e) => sum + e.bytes, 0);
+    }
+    return entries;
+};
+
+const flushMeta = async () => {
+    flushTimer = null;
+    if (dirty.size === 0) return;
+    const urls = Array.from(dirty);
+    dirty.clear();
+    const db = await meta();
+    const tx = db.transaction(META_STORE, 'readwrite');
+    const store = tx.objectStore(META_STORE);
+    urls.forEach(url => {
+        const entry = entries.get(url);
+        if (entry) store.put(entry);
+        else store.delete(url);
+    });
+    await new Promise(resolve => { tx.oncomplete = resolve; tx.onerror = resolve; tx.onabort = resolve; });
+};
+
+const markDirty = url => {
+    dirty.add(url);
+    if (!flushTimer) flushTimer = setTimeout(flushMeta, META_FLUSH_MS);
+};
+
+// Half of what the browser grants the origin, within [MIN_BUDGET, MAX_BUDGET]
+let budgetPromise = null;
+const budget = () => (budgetPromise = budgetPromise || (async () => {
+    try {
+        const { quota } = await self.navigator.storage.estimate();
+        if (quota) return Math.max(MIN_BUDGET, Math.min(MAX_BUDGET, quota / 2));
+    } catch (e) { /* estimate() unsupported */ }
+    return 512 * 1024 * 1024;
+})());
+
+// One eviction pass at a time: prefetch workers and background tile refreshes all call this,
+// and passes walking the same snapshot would delete and subtract the same entries twice
+let evicting = null;
+const evict = () => (evicting = evicting || evictPass().finally(() => { evicting = null; }));
+
+const evictPass = async () => {
+    const limit = await budget();
+    const cache = await caches.open(DATA_CACHE);
+    // Stores that land mid-pass add bytes after the snapshot, so re-check once it is used up
+    while (totalBytes > limit) {
+        const order = Array.from(entries.values())
+            .sort((a, b) => (a.sites.length > 0) - (b.sites.length > 0) || a.lastUsed - b.lastUsed);
+        if (order.length === 0) return;
+        for (const entry of order) {
+            if (totalBytes <= limit * 0.9) return; // Leave headroom so eviction does not run per tile
+            if (entries.get(entry.url) !== entry) continue; // Removed or replaced since the snapshot
+            entries.delete(entry.url);
+            totalBytes -= entry.bytes;
+            markDirty(entry.url);
+            await cache.delete(entry.url);
+        }
+    }
+};
+
+const store = async (url, response, site) => {
+    await loadEntries();
+    const bytes = (await response.clone().blob()).size;
+    const cache = await caches.open(DATA_CACHE);
+    await cache.put(url, response);
+    const previous = entries.get(url);
+    if (previous) totalBytes -= previous.bytes;
+    const sites = previous ? previous.sites : [];
+    if (site && !sites.includes(site)) sites.push(site);
+    entries.set(url, { url, bytes, sites, lastUsed: Date.now() });
+    totalBytes += bytes;
+    markDirty(url);
+    await evict();
+};
+
+const touch = async (url, site) => {
+    await loadEntries();
+    const entry = entries.get(url);
+    if (!entry) return;
+    entry.lastUsed = Date.now();
+    if (site && !entry.sites.includes(site)) entry.sites.push(site);
+    markDirty(url);
+};
+
+// --- Request routing ---
+const isTile = url => TILE_HOSTS.some(re => re.test(url.hostname));
+const isRaster = url => url.origin === self.location.origin && /\/maps\/[^/]+\.tif$/.test(url.pathname);
+const isShell = url => (url.origin === self.location.origin && !url.pathname.includes('/maps/')) || CDN_HOSTS.some(re => re.test(url.hostname));
+
+// Byte range of a fully cached file, so geotiff's range reads work offline
+const sliceResponse = async (cached, rangeHeader) => {
+    const blob = await cached.blob();
+    const m = /bytes=(\d+)-(\d*)/.exec(rangeHeader || '');
+    if (!m) return new Response(blob, { status: 200, headers: cached.headers });
+    const start = Number(m[1]);
+    const end = m[2] ? Math.min(Number(m[2]), blob.size - 1) : blob.size - 1;
+    if (start >= blob.size) return new Response(null, { status: 416, headers: { 'Content-Range': `bytes */${blob.size}` } });
+    return new Response(blob.slice(start, end + 1), {
+        status: 206,
+        headers: {
+            'Content-Type': cached.headers.get('Content-Type') || 'image/tiff',
+            'Content-Length': String(end - start + 1),
+            'Content-Range': `bytes ${start}-${end}/${blob.size}`,
+            'Accept-Ranges': 'bytes'
+        }
+    });
+};
+
+// Rasters are a few MB each: the first range read triggers one full download in the background
+const rasterLoads = new Map();
+const cacheWholeFile = (url, site) => {
+    if (!rasterLoads.has(url)) {
+        rasterLoads.set(url, fetch(url)
+            .then(res => { if (res.ok && res.status === 200) return store(url, res, site); })
+            .catch(() => { })
+            .finally(() => rasterLoads.delete(url)));
+    }
+    return rasterLoads.get(url);
+};
+
+const serveTile = async (request) => {
+    const cache = await caches.open(DATA_CACHE);
+    const cached = await cache.match(request.url);
+    if (cached) { touch(request.url).catch(() => { }); return cached; }
+    const res = await fetch(request);
+    if (res.ok) store(request.url, res.clone()).catch(() => { }); // Caching is best-effort
+    return res;
+};
+
+const serveRaster = async (event) => {
+    const { request } = event;
+    const cache = await caches.open(DATA_CACHE);
+    const cached = await cache.match(request.url);
+    if (cached) { touch(request.url).catch(() => { }); return sliceResponse(cached, request.headers.get('Range')); }
+    event.waitUntil(cacheWholeFile(request.url));
+    return fetch(request);
+};
+
+// Navigations go to the network first so a deploy is picked up; everything else in the
+// shell is content-hashed or versioned on the CDN, so the cache wins
+const serveShell = async (request) => {
+    const cache = await caches.open(SHELL_CACHE);
+    if (request.mode === 'navigate') {
+        try {
+            const res = await fetch(request);
+            if (res.ok) cache.put('./index.html', res.clone());
+            return res;
+        } catch (e) {
+            return (await cache.match('./index.html')) || (await cache.match('./')) || Response.error();
+        }
+    }
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const res = await fetch(request);
+    if (res.ok || res.type === 'opaque') cache.put(request, res.clone());
+    return res;
+};
+
+self.addEventListener('install', event => {
+    event.waitUntil(caches.open(SHELL_CACHE).then(cache => cache.addAll(SHELL_URLS)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const keep = [SHELL_CACHE, DATA_CACHE];
+        for (const key of await caches.keys()) {
+            if (key.startsWith('spws-') && !keep.includes(key)) await caches.delete(key);
+        }
+        await self.clients.claim();
+    })());
+});
+
+self.addEventListener('fetch', event => {
+    const { request } = event;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    // manifest.json is small and changes with build_cogs.py: always ask the network first
+    if (url.pathname.endsWith('/maps/manifest.json')) {
+        event.respondWith(fetch(request).then(res => {
+            if (res.ok) caches.open(SHELL_CACHE).then(cache => cache.put(request, res.clone()));
+            return res;
+        }).catch(() => caches.match(request).then(res => res || Response.error())));
+        return;
+    }
+    if (isTile(url)) event.respondWith(serveTile(request));
+    else if (isRaster(url)) event.respondWith(serveRaster(event));
+    else if (isShell(url) && !request.headers.has('Range')) event.respondWith(serveShell(request));
+});
+
+// --- Site packs ---
+const prefetch = async (site, urls, port) => {
+    await loadEntries();
+    const cache = await caches.open(DATA_CACHE);
+    let next = 0, done = 0, failed = 0, bytes = 0, cancelled = false;
+    // The page cancels over the same port; requests already in flight still finish
+    port.onmessage = e => { if (e.data?.type === 'cancel') cancelled = true; };
+    const worker = async () => {
+        while (next < urls.length && !cancelled) {
+            const url = urls[next++];
+            try {
+                if (await cache.match(url)) {
+                    await touch(url, site);
+                } else {
+                    const res = await fetch(url, { mode: 'cors' });
+                    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+                    await store(url, res, site);
+                }
+                bytes += entries.get(url)?.bytes || 0;
+            } catch (e) {
+                failed++;
+            }
+            done++;
+            if (done % 10 === 0 || done === urls.length) port.postMessage({ type: 'progress', done, total: urls.length, failed, bytes });
+        }
+    };
+    await Promise.all(Array.from({ length: Math.min(PREFETCH_CONCURRENCY, urls.length) }, worker));
+    await flushMeta();
+    port.postMessage({ type: 'done', done, failed, bytes, cancelled });
+};
+
+const inventory = async () => {
+    await loadEntries();
+    const sites = {};
+    entries.forEach(entry => {
+        const keys = entry.sites.length > 0 ? entry.sites : [''];
+        keys.forEach(site => {
+            const s = sites[site] || (sites[site] = { site, bytes: 0, entries: 0 });
+            s.bytes += entry.bytes;
+            s.entries++;
+        });
+    });
+    return { type: 'inventory', sites: Object.values(sites), totalBytes, budget: await budget() };
+};
+
+// Untags the site's entries; ones no other site uses are deleted
+const removeSite = async (site) => {
+    await loadEntries();
+    const cache = await caches.open(DATA_CACHE);
+    for (const entry of Array.from(entries.values())) {
+        if (!entry.sites.includes(site)) continue;
+        entry.sites = entry.sites.filter(s => s !== site);
+        markDirty(entry.url);
+        if (entry.sites.length === 0 && entries.get(entry.url) === entry) {
+            entries.delete(entry.url);
+            totalBytes -= entry.bytes;
+            await cache.delete(entry.url);
+        }
+    }
+    await flushMeta();
+    return { type: 'done' };
+};
+
+self.addEventListener('message', event => {
+    const port = event.ports[0];
+    const msg = event.data || {};
+    if (!port) return;
+    let work;
+    if (msg.type === 'prefetch') work = prefetch(msg.site, msg.urls || [], port);
+    else if (msg.type === 'inventory') work = inventory().then(reply => port.postMessage(reply));
+    else if (msg.type === 'remove-site') work = removeSite(msg.site).then(reply => port.postMessage(reply));
+    else return;
+    event.waitUntil(work.catch(e => port.postMessage({ type: 'error', message: String(e) })));
+});
@@ -1,14 +1,15 @@
-import re
+"""Patch set: service coverage inputs, state and the original spatial analysis effect.
 
-file_path = r'c:\Users\jrobertson\Downloads\SPWS1\components\SiteMap.tsx'
+Run on its own (``python restore_features.py [--dry-run] [--root DIR]``) or through patch_engine.py.
+"""
 
-with open(file_path, 'r', encoding='utf-8') as f:
-    content = f.read()
+import sys
 
-# 1. Add State Variables
-# Look for the buildingsLoading state
-state_pattern = r'(const \[buildingsLoading, setBuildingsLoading\] = useState\(false\);)'
-new_state = r'''\1
+from patch_engine import insert_after, insert_before, main
+
+SITEMAP = 'components/SiteMap.tsx'
+
+NEW_STATE = '''
 
     // Spatial Analysis State
     const [bufferDistance, setBufferDistance] = useState(50); // meters
@@ -16,13 +17,7 @@ new_state = r'''\1
     const [servedPop, setServedPop] = useState(0);
     const [unservedPop, setUnservedPop] = useState(0);'''
 
-content = re.sub(state_pattern, new_state, content)
-
-# 2. Add UI Inputs
-# Insert before the "Target Population" input
-ui_pattern = r'(<div className="space-y-4 text-sm">\s*<div><label className="block text-gray-600 text-xs font-bold mb-1">Target Population)'
-new_ui = r'''<div className="space-y-4 text-sm">
-                    {/* Spatial Analysis Inputs */}
+COVERAGE_INPUTS = r'''{/* Spatial Analysis Inputs */}
                     <div className="p-2 bg-blue-50 rounded border border-blue-100 mb-2">
                         <h4 className="font-bold text-blue-800 text-xs mb-2">Service Coverage</h4>
                         <div className="space-y-2">
@@ -50,15 +45,9 @@ new_ui = r'''<div className="space-y-4 text-sm">
                             </div>
                         </div>
                     </div>
-                    <div><label className="block text-gray-600 text-xs font-bold mb-1">Target Population'''
-
-content = re.sub(ui_pattern, new_ui, content)
+                    '''
 
-# 3. Add Analysis Logic
-# Insert before the return statement
-logic_pattern = r'(return \(\s*<div className="flex flex-col)'
-analysis_logic = r'''
-    // Spatial Analysis Logic
+ANALYSIS = r'''// Spatial Analysis Logic
     useEffect(() => {
         if (!osmBuildingLayerRef.current || !mapInstanceRef.current) return;
 
@@ -128,11 +117,15 @@ analysis_logic = r'''
 
     }, [bufferDistance, peoplePerBuilding, showOSMBuildings, buildingsLoading, counts]);
 
-    \1'''
+    '''
 
-content = re.sub(logic_pattern, analysis_logic, content)
+PATCHES = [
+    insert_after(SITEMAP, 'const [buildingsLoading, setBuildingsLoading] = useState(false);', NEW_STATE, name='coverage-state'),
+    insert_before(SITEMAP, '<div><label className="block text-gray-600 text-xs font-bold mb-1">Target Population',
+                  COVERAGE_INPUTS, name='coverage-inputs'),
+    insert_before(SITEMAP, 'return (\n        <div className="flex flex-col', ANALYSIS, name='coverage-analysis', loose=True),
+]
 
-with open(file_path, 'w', encoding='utf-8') as f:
-    f.write(content)
 
-print("Successfully restored spatial analysis features!")
+if __name__ == '__main__':
+    sys.exit(main(patches=PATCHES))
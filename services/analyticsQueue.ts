@@ -0,0 +1,172 @@
+import { openDb, idbGetAll, idbPut, idbDelete } from '../utils/idb';
+
+// --- Outbound analytics queue ---
+// Reports and feedback are written to IndexedDB before any network attempt, so a record
+// survives a dropped connection or a closed tab. Each flush sends everything pending. A
+// backend that advertises `batch` gets it as one request, gzip-compressed (base64 in the
+// JSON body, since no-cors requests cannot set Content-Encoding). Older deployments get one
+// legacy request per record. Flushes run when the browser is idle and when connectivity
+// returns; failures back off exponentially.
+
+export type QueuedAction = 'log_report' | 'feedback';
+
+interface QueuedItem {
+    id: string; // Time-ordered, so sorting by id replays in submission order
+    action: QueuedAction;
+    payload: Record<string, unknown>;
+    createdAt: number;
+}
+
+const DB_NAME = 'spws-analytics';
+const DB_VERSION = 1;
+const STORE = 'outbox';
+const MAX_BATCH = 50;
+const COMPRESS_OVER_BYTES = 1024;
+const BACKOFF_BASE_MS = 2000;
+const BACKOFF_MAX_MS = 5 * 60 * 1000;
+
+const db = () => openDb(DB_NAME, DB_VERSION, d => {
+    if (!d.objectStoreNames.contains(STORE)) d.createObjectStore(STORE, { keyPath: 'id' });
+});
+
+// --- Helper: gzip + base64 (null when CompressionStream is unavailable) ---
+const gzipBase64 = async (text: string): Promise<string | null> => {
+    if (typeof CompressionStream === 'undefined') return null;
+    const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'));
+    const bytes = new Uint8Array(await new Response(stream).arrayBuffer());
+    let binary = '';
+    for (let i = 0; i < bytes.length; i += 0x8000) binary += String.fromCharCode(...bytes.subarray(i, i + 0x8000));
+    return btoa(binary);
+};
+
+// Idle callback where supported (not Safari), otherwise a short timeout
+const whenIdle = (fn: () => void) => {
+    if (typeof requestIdleCallback !== 'undefined') requestIdleCallback(() => fn(), { timeout: 5000 });
+    else setTimeout(fn, 200);
+};
+
+export const createAnalyticsQueue = (endpoint: string) => {
+    const pending = new Map<string, QueuedItem>(); // Mirror of the store; the only copy without IndexedDB
+    let loaded: Promise<void> | null = null;
+    let supportsBatch: Promise<boolean> | null = null;
+    let flushing = false;
+    let attempt = 0;
+    let retryTimer: ReturnType<typeof setTimeout> | null = null;
+    let seq = 0;
+
+    const load = () => {
+        if (!loaded) {
+            loaded = db().then(d => idbGetAll<QueuedItem>(d, STORE)).then(items => {
+                items.forEach(item => { if (!pending.has(item.id)) pending.set(item.id, item); });
+            });
+        }
+        return loaded;
+    };
+
+    // A CORS-readable probe; deployments that predate `batch` answer "Unknown action"
+    const probeBatch = () => {
+        if (!supportsBatch) {
+            supportsBatch = fetch(`${endpoint}?action=capabilities`)
+                .then(res => res.ok ? res.json() : null)
+                .then(data => Array.isArray(data?.capabilities) && data.capabilities.includes('batch'))
+                .catch(() => {
+                    supportsBatch = null; // Offline: ask again next flush
+                    return false;
+                });
+        }
+        return supportsBatch;
+    };
+
+    const post = (body: string) => fetch(endpoint, {
+        method: 'POST',
+        // Opaque response: a resolved fetch is the only delivery signal available
+        mode: 'no-cors',
+        headers: { 'Content-Type': 'application/json' },
+        body,
+        keepalive: body.length < 60000
+    });
+
+    const remove = async (items: QueuedItem[]) => {
+        const d = await db();
+        await Promise.all(items.map(item => {
+            pending.delete(item.id);
+            return idbDelete(d, STORE, item.id);
+        }));
+    };
+
+    // Items leave the outbox as soon as their request resolves, so a failure part-way
+    // through the legacy path never re-sends what was already delivered
+    const deliver = async (items: QueuedItem[]) => {
+        if (items.length > 1 && await probeBatch()) {
+            const json = JSON.stringify({ action: 'batch', items: items.map(i => ({ action: i.action, ...i.payload })) });
+            const packed = json.length > COMPRESS_OVER_BYTES ? await gzipBase64(json) : null;
+            await post(packed ? JSON.stringify({ action: 'batch', encoding: 'gzip+base64', data: packed }) : json);
+            await remove(items);
+            return;
+        }
+        for (const item of items) {
+            await post(JSON.stringify({ action: item.action, ...item.payload }));
+            await remove([item]);
+        }
+    };
+
+    const scheduleRetry = () => {
+        if (retryTimer) return;
+        // Full jitter keeps many reconnecting clients from retrying in lockstep
+        const cap = Math.min(BACKOFF_MAX_MS, BACKOFF_BASE_MS * Math.pow(2, attempt - 1));
+        retryTimer = setTimeout(() => { retryTimer = null; flush(); }, cap / 2 + Math.random() * cap / 2);
+    };
+
+    const flush = async (): Promise<void> => {
+        await load();
+        if (flushing || pending.size === 0) return;
+        if (typeof navigator !== 'undefined' && navigator.onLine === false) return; // 'online' will call back
+        flushing = true;
+        try {
+            const items = Array.from(pending.values()).sort((a, b) => a.id < b.id ? -1 : 1);
+            for (let i = 0; i < items.length; i += MAX_BATCH) {
+                await deliver(items.slice(i, i + MAX_BATCH));
+            }
+            attempt = 0;
+        } catch (e) {
+            attempt++;
+            console.warn(`Analytics: delivery failed, retry #${attempt} scheduled`, e);
+            scheduleRetry();
+        } finally {
+            flushing = false;
+        }
+        if (pending.size > 0 && attempt === 0) whenIdle(flush); // Enqueued while sending
+    };
+
+    if (typeof window !== 'undefined') {
+        window.addEventListener('online', () => {
+            attempt = 0;
+            if (retryTimer) { clearTimeout(retryTimer); retryTimer = null; }
+            flush();
+        });
+    }
+    whenIdle(flush); // Deliver anything left over from a previous session
+
+    return {
+        enqueue: async (action: QueuedAction, payload: Record<string, unknown>) => {
+            const item: QueuedItem = {
+                id: `${Date.now().toString(36).padStart(9, '0')}-${(seq++).toString(36).padStart(4, '0')}-${Math.random().toString(36).slice(2, 6)}`,
+                action,
+                payload,
+                createdAt: Date.now()
+            };
+            pending.set(item.id, item);
+            await idbPut(await db(), STORE, item);
+            whenIdle(flush);
+        },
+
+        flush,
+
+        pendingCount: async () => {
+            await load();
+            return pending.size;
+        }
+    };
+};
+
+export type AnalyticsQueue = ReturnType<typeof createAnalyticsQueue>;
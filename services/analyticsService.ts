@@ -1,15 +1,36 @@
 
 import { DashboardStats, ReportLog } from "../types";
+import { AnalyticsQueue, createAnalyticsQueue } from "./analyticsQueue";
 
 const SESSION_START_KEY = "mw_tool_session_start";
+const STATS_CACHE_KEY = "mw_tool_stats_cache";
 // Google Apps Script Web App URL
-const GOOGLE_SCRIPT_URL = 'https://script.google.com/macros/s/AKfycby81CUAJylE7mTbvW9mtbP-7E8_ZgxFLt3BoEdJgt0prGduCa0CzhFu2r26O0-KIkJ5/exec';
+// Set VITE_ANALYTICS_URL=http://localhost:5000/exec to use the local backend (python app.py) instead
+const GOOGLE_SCRIPT_URL = import.meta.env.VITE_ANALYTICS_URL || 'https://script.google.com/macros/s/AKfycby81CUAJylE7mTbvW9mtbP-7E8_ZgxFLt3BoEdJgt0prGduCa0CzhFu2r26O0-KIkJ5/exec';
+
+// Reports and feedback go through a persistent outbox (IndexedDB) that batches, compresses
+// and retries, so nothing is lost when the connection drops mid-session
+let queue: AnalyticsQueue | null = null;
+const getQueue = () => {
+  if (!queue) queue = createAnalyticsQueue(GOOGLE_SCRIPT_URL);
+  return queue;
+};
+
+const EMPTY_STATS: DashboardStats = {
+  totalReports: 0,
+  totalPopulationServed: 0,
+  totalCapexEstimated: 0,
+  avgTimeSpentSeconds: 0,
+  solarWinRate: 0,
+  recentLogs: []
+};
 
 export const AnalyticsService = {
 
   // 1. Session Management
   startSession: () => {
     sessionStorage.setItem(SESSION_START_KEY, Date.now().toString());
+    getQueue(); // Starts delivering anything left in the outbox by a previous session
   },
 
   getSessionDuration: (): number => {
@@ -19,58 +40,46 @@ export const AnalyticsService = {
     return Math.round(diff / 1000); // Seconds
   },
 
-  // 2. Log Generation (Send to Google Script)
+  // 2. Log Generation (Queued for the Google Script)
   logReport: async (logData: Omit<ReportLog, 'id' | 'timestamp' | 'timeSpentSeconds'>) => {
     try {
-      const payload = {
-        action: 'log_report',
+      // The id lets the backend drop a report that a retry delivers twice
+      await getQueue().enqueue('log_report', {
         ...logData,
+        id: Math.random().toString(36).substr(2, 9),
+        timestamp: new Date().toISOString(),
         timeSpentSeconds: AnalyticsService.getSessionDuration()
-      };
-
-      // Send to Google Script
-      // mode: 'no-cors' is often required for Google Scripts to avoid CORS errors on simple writes,
-      // but it prevents reading the response.
-      await fetch(GOOGLE_SCRIPT_URL, {
-        method: 'POST',
-        mode: 'no-cors',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(payload),
       });
-
-      console.log("Analytics: Report sent to Google Script");
+      console.log("Analytics: Report queued for delivery");
     } catch (e) {
-      console.warn("Analytics: Failed to log report", e);
+      console.warn("Analytics: Failed to queue report", e);
     }
   },
 
-  // 3. Feedback Submission
+  // 3. Feedback Submission (resolves once stored; delivery happens when online)
   sendFeedback: async (message: string) => {
     try {
-      const payload = {
-        action: 'feedback',
+      await getQueue().enqueue('feedback', {
         message: message,
         timestamp: new Date().toISOString()
-      };
-
-      await fetch(GOOGLE_SCRIPT_URL, {
-        method: 'POST',
-        mode: 'no-cors',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(payload),
       });
-
-      console.log("Feedback sent to Google Script");
+      console.log("Feedback queued for delivery");
     } catch (e) {
       console.error("Feedback error", e);
       throw e;
     }
   },
 
+  // Last stats snapshot, for showing the Dashboard instantly while it revalidates
+  getCachedStats: (): { stats: DashboardStats, savedAt: number } | null => {
+    try {
+      const raw = localStorage.getItem(STATS_CACHE_KEY);
+      return raw ? JSON.parse(raw) : null;
+    } catch {
+      return null;
+    }
+  },
+
   // 4. Analytics Retrieval
   getDashboardStats: async (): Promise<DashboardStats> => {
     try {
@@ -97,6 +106,11 @@ export const AnalyticsService = {
         if (!Array.isArray(data.recentLogs)) {
           data.recentLogs = [];
         }
+        try {
+          localStorage.setItem(STATS_CACHE_KEY, JSON.stringify({ stats: data, savedAt: Date.now() }));
+        } catch (e) {
+          console.warn("Analytics: Could not cache stats snapshot", e);
+        }
         return data as DashboardStats;
       } else {
         console.warn("Received data but it doesn't match DashboardStats interface:", data);
@@ -107,15 +121,8 @@ export const AnalyticsService = {
       console.warn("Error loading stats from Google Script (Falling back to empty stats):", e);
       console.error("CORS Error Detected? Please check 'GOOGLE_APPS_SCRIPT_SETUP.md' in your project root for deployment instructions.");
 
-      // Fallback to empty stats so the dashboard works even if script fails
-      return {
-        totalReports: 0,
-        totalPopulationServed: 0,
-        totalCapexEstimated: 0,
-        avgTimeSpentSeconds: 0,
-        solarWinRate: 0,
-        recentLogs: []
-      };
+      // Fallback to the last snapshot (or empty stats) so the dashboard works even if script fails
+      return AnalyticsService.getCachedStats()?.stats || EMPTY_STATS;
     }
   }
 };
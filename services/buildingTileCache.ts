@@ -0,0 +1,158 @@
+import { deserialize } from 'flatgeobuf/lib/mjs/geojson';
+import { LruCache } from '../utils/lruCache';
+import { openDb, idbGet, idbPut, idbDelete } from '../utils/idb';
+import { TileCoord, tileBounds, tileKey } from '../utils/tiles';
+import { Perf } from '../utils/perf';
+
+// --- Google/Microsoft Open Buildings: tile-keyed footprint cache ---
+// The country FlatGeobuf is queried one fixed XYZ tile at a time. Decoded features are kept
+// in an in-memory LRU and persisted to IndexedDB under `${iso}/${z}/${x}/${y}`, so panning
+// back over an area (or reopening the app) never re-downloads buildings we already have.
+
+export const BUILDING_TILE_ZOOM = 15; // ~1.2 km tiles at Malawi latitudes
+const MEMORY_TILES = 256;
+const DB_NAME = 'spws-buildings';
+const DB_VERSION = 1;
+const STORE = 'fgbTiles';
+
+export interface BuildingTile {
+    key: string; // `${iso}/${z}/${x}/${y}`
+    features: any[]; // GeoJSON Features owned by this tile
+    bytes: number; // Approximate decoded size, used for cache inventory
+    cachedAt: number;
+}
+
+export interface BuildingCacheStats {
+    tileRequests: number;
+    memoryHits: number;
+    dbHits: number;
+    networkTiles: number;
+    hitRate: number; // Fraction of tile requests served without network (0-1)
+    bytesFetched: number; // Network bytes reported by Resource Timing for the FGB host
+    featuresDecoded: number;
+}
+
+export const fgbUrlForCountry = (iso: string) =>
+    `https://data.source.coop/vida/google-microsoft-open-buildings/flatgeobuf/by_country/country_iso=${iso}/${iso}.fgb`;
+
+const FGB_HOST = 'https://data.source.coop/';
+
+const memory = new LruCache<string, BuildingTile>(MEMORY_TILES);
+const db = () => openDb(DB_NAME, DB_VERSION, d => {
+    if (!d.objectStoreNames.contains(STORE)) d.createObjectStore(STORE, { keyPath: 'key' });
+});
+
+const stats: BuildingCacheStats = { tileRequests: 0, memoryHits: 0, dbHits: 0, networkTiles: 0, hitRate: 0, bytesFetched: 0, featuresDecoded: 0 };
+
+// Resource Timing gives real transfer sizes for the FlatGeobuf range requests. Cross-origin
+// hosts only report sizes when they send Timing-Allow-Origin; otherwise this stays at 0.
+let byteObserver: PerformanceObserver | null = null;
+const ensureByteObserver = () => {
+    if (byteObserver || typeof PerformanceObserver === 'undefined') return;
+    try {
+        byteObserver = new PerformanceObserver(list => {
+            list.getEntries().forEach(entry => {
+                if (!entry.name.startsWith(FGB_HOST)) return;
+                const res = entry as PerformanceResourceTiming;
+                stats.bytesFetched += res.transferSize || res.encodedBodySize || 0;
+            });
+        });
+        byteObserver.observe({ type: 'resource', buffered: false });
+    } catch (e) {
+        byteObserver = null;
+    }
+};
+
+// Rough in-memory size of a GeoJSON polygon feature (8 bytes per ordinate + overhead)
+const estimateFeatureBytes = (feature: any) => {
+    const coords = feature.geometry?.coordinates;
+    if (!coords) return 64;
+    const flat = (feature.geometry.type === 'MultiPolygon' ? coords.flat(2) : coords.flat(1)) as number[][];
+    return 64 + flat.length * 16;
+};
+
+// Reference point used to assign a feature to exactly one tile (bbox centre of the outer ring)
+const featureAnchor = (feature: any): [number, number] | null => {
+    const geom = feature.geometry;
+    if (!geom) return null;
+    const ring: number[][] | undefined = geom.type === 'Polygon' ? geom.coordinates[0] : geom.type === 'MultiPolygon' ? geom.coordinates[0]?.[0] : undefined;
+    if (!ring || ring.length === 0) return null;
+    let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+    for (const [x, y] of ring) {
+        if (x < minX) minX = x; if (x > maxX) maxX = x;
+        if (y < minY) minY = y; if (y > maxY) maxY = y;
+    }
+    return [(minX + maxX) / 2, (minY + maxY) / 2];
+};
+
+const recordRequest = (hit: 'memory' | 'db' | 'network') => {
+    stats.tileRequests++;
+    if (hit === 'memory') stats.memoryHits++;
+    else if (hit === 'db') stats.dbHits++;
+    else stats.networkTiles++;
+    stats.hitRate = (stats.memoryHits + stats.dbHits) / stats.tileRequests;
+};
+
+const fetchTile = async (iso: string, tile: TileCoord, key: string, signal: AbortSignal): Promise<BuildingTile | null> => {
+    const b = tileBounds(tile);
+    const rect = { minX: b.west, minY: b.south, maxX: b.east, maxY: b.north };
+    const features: any[] = [];
+    let bytes = 0;
+    const done = Perf.start('buildings.fgbTile'); // Range requests and decode are interleaved
+
+    // Note: deserialize uses fetch internally with Range headers. It has no AbortSignal, so
+    // abandoning the iterator (return from the loop) is what stops further range requests.
+    const iter = deserialize(fgbUrlForCountry(iso), rect);
+    for await (const feature of iter) {
+        if (signal.aborted) return null;
+        stats.featuresDecoded++;
+        // The FGB index matches on bbox overlap, so edge buildings come back for two tiles.
+        // Keep only those anchored inside this tile (west/south edges inclusive).
+        const anchor = featureAnchor(feature);
+        if (!anchor || anchor[0] < b.west || anchor[0] >= b.east || anchor[1] < b.south || anchor[1] >= b.north) continue;
+        const slim = { type: 'Feature', properties: {}, geometry: (feature as any).geometry };
+        bytes += estimateFeatureBytes(slim);
+        features.push(slim);
+    }
+    if (signal.aborted) return null;
+    done({ items: features.length, bytes });
+    return { key, features, bytes, cachedAt: Date.now() };
+};
+
+export const BuildingTileCache = {
+    getStats: (): BuildingCacheStats => ({ ...stats }),
+
+    // Returns the tile's features from memory, IndexedDB or the network (in that order).
+    // Resolves to null if the signal aborts before the tile is complete.
+    getTile: async (iso: string, tile: TileCoord, signal: AbortSignal): Promise<BuildingTile | null> => {
+        ensureByteObserver();
+        const key = `${iso}/${tileKey(tile)}`;
+
+        const inMemory = memory.get(key);
+        if (inMemory) { recordRequest('memory'); return inMemory; }
+
+        const stored = await Perf.timeAsync('buildings.dbTile', async () => idbGet<BuildingTile>(await db(), STORE, key));
+        if (signal.aborted) return null;
+        if (stored) {
+            memory.set(key, stored);
+            recordRequest('db');
+            return stored;
+        }
+
+        const fetched = await fetchTile(iso, tile, key, signal);
+        if (!fetched) return null;
+        recordRequest('network');
+        memory.set(key, fetched);
+        idbPut(await db(), STORE, fetched); // Fire and forget, persistence is best-effort
+        return fetched;
+    },
+
+    // Drops tiles (by `${iso}/${z}/${x}/${y}` key) from memory and IndexedDB
+    deleteTiles: async (keys: string[]) => {
+        const d = await db();
+        for (const key of keys) {
+            memory.delete(key);
+            await idbDelete(d, STORE, key);
+        }
+    }
+};
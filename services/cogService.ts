@@ -0,0 +1,201 @@
+import { fromUrl, GeoTIFFImage } from 'geotiff';
+import { LruCache } from '../utils/lruCache';
+import { TileCoord, tileMercatorBounds } from '../utils/tiles';
+
+// --- Cloud Optimized GeoTIFF access for the hydrogeology layers ---
+// Which files make up each layer is listed in public/maps/manifest.json. Files are opened
+// with HTTP range requests: only the header is read on open, and each map tile reads just
+// the internal blocks it overlaps from the overview level that matches the zoom. Decoded
+// tiles are kept in a shared LRU so toggling a layer off and on redraws from memory.
+
+export type RasterLayerId = 'dtw' | 'gw' | 'dem' | 'hillshade';
+
+export interface RasterPart {
+    file: string; // Relative to maps/
+    bounds: [number, number, number, number]; // EPSG:3857 [minX, minY, maxX, maxY]
+    nodata: number;
+}
+
+// Written by build_cogs.py so the map can stretch colours without scanning pixels
+export interface RasterLayerStats {
+    min: number; // Lower stretch percentile
+    max: number; // Upper stretch percentile
+    percentiles: [number, number];
+    dataMin: number;
+    dataMax: number;
+    validPixels: number;
+    histogram: { min: number; max: number; density: number[] };
+}
+
+export interface RasterLayerEntry {
+    bounds?: [number, number, number, number];
+    parts: RasterPart[];
+    stats?: RasterLayerStats | null;
+}
+
+export interface RasterManifest {
+    version: number;
+    crs: string;
+    layers: Partial<Record<RasterLayerId, RasterLayerEntry>>;
+}
+
+const MAPS_BASE = 'maps/';
+const MANIFEST_URL = `${MAPS_BASE}manifest.json`;
+const TILE_CACHE_BYTES = 64 * 1024 * 1024; // 256 decoded 256x256 float32 tiles
+const TILE_CACHE_ENTRIES = 1024;
+
+interface CogLevel {
+    image: GeoTIFFImage;
+    width: number;
+    height: number;
+    resX: number; // metres per pixel (overview extents match the base image)
+    resY: number;
+}
+
+interface OpenCog {
+    originX: number;
+    originY: number;
+    levels: CogLevel[]; // Full resolution first, then overviews from fine to coarse
+}
+
+let manifestPromise: Promise<RasterManifest | null> | null = null;
+const cogs = new Map<string, Promise<OpenCog>>();
+const tiles = new LruCache<string, Float32Array>(TILE_CACHE_ENTRIES, TILE_CACHE_BYTES, t => t.byteLength);
+const tileLoads = new Map<string, Promise<Float32Array | null>>();
+
+const openCog = (part: RasterPart): Promise<OpenCog> => {
+    let cog = cogs.get(part.file);
+    if (!cog) {
+        cog = (async () => {
+            const tiff = await fromUrl(`${MAPS_BASE}${part.file}`);
+            const count = await tiff.getImageCount();
+            const first = await tiff.getImage(0);
+            const [originX, originY] = first.getOrigin();
+            const [baseResX, baseResY] = first.getResolution().map(Math.abs);
+            const levels: CogLevel[] = [];
+            for (let i = 0; i < count; i++) {
+                const image = i === 0 ? first : await tiff.getImage(i);
+                // Only reduced-resolution pages are overviews (skip masks and other subfiles)
+                if (i > 0 && !(image.fileDirectory.NewSubfileType & 1)) continue;
+                const width = image.getWidth();
+                const height = image.getHeight();
+                levels.push({
+                    image, width, height,
+                    resX: baseResX * first.getWidth() / width,
+                    resY: baseResY * first.getHeight() / height
+                });
+            }
+            levels.sort((a, b) => a.resX - b.resX);
+            return { originX, originY, levels };
+        })();
+        // Let a failed open be retried on the next request
+        cog.catch(() => cogs.delete(part.file));
+        cogs.set(part.file, cog);
+    }
+    return cog;
+};
+
+// Samples one map tile (nearest neighbour) from the overview closest to the screen resolution.
+// Nodata and pixels outside the file become NaN.
+const decodeTile = async (part: RasterPart, tile: TileCoord, size: number): Promise<Float32Array | null> => {
+    const b = tileMercatorBounds(tile);
+    const cog = await openCog(part);
+    const mpp = (b.maxX - b.minX) / size;
+
+    // Coarsest level that is still at least as fine as one screen pixel
+    let level = cog.levels[0];
+    for (const l of cog.levels) if (l.resX <= mpp) level = l;
+
+    const px0 = (b.minX - cog.originX) / level.resX;
+    const py0 = (cog.originY - b.maxY) / level.resY;
+    const stepX = mpp / level.resX, stepY = mpp / level.resY;
+    const wx0 = Math.max(0, Math.floor(px0)), wx1 = Math.min(level.width, Math.ceil(px0 + size * stepX));
+    const wy0 = Math.max(0, Math.floor(py0)), wy1 = Math.min(level.height, Math.ceil(py0 + size * stepY));
+    if (wx1 <= wx0 || wy1 <= wy0) return null;
+
+    const rasters = await level.image.readRasters({ window: [wx0, wy0, wx1, wy1], samples: [0] });
+    const src = (rasters as ArrayLike<unknown>)[0] as ArrayLike<number>;
+    const windowW = wx1 - wx0;
+
+    const out = new Float32Array(size * size).fill(NaN);
+    for (let j = 0; j < size; j++) {
+        const sy = Math.floor(py0 + (j + 0.5) * stepY);
+        if (sy < wy0 || sy >= wy1) continue;
+        const rowOffset = (sy - wy0) * windowW - wx0;
+        for (let i = 0; i < size; i++) {
+            const sx = Math.floor(px0 + (i + 0.5) * stepX);
+            if (sx < wx0 || sx >= wx1) continue;
+            const v = src[rowOffset + sx];
+            if (v !== part.nodata) out[j * size + i] = v;
+        }
+    }
+    return out;
+};
+
+const intersects = (part: RasterPart, tile: TileCoord) => {
+    const b = tileMercatorBounds(tile);
+    const [minX, minY, maxX, maxY] = part.bounds;
+    return b.maxX > minX && b.minX < maxX && b.maxY > minY && b.minY < maxY;
+};
+
+export const CogService = {
+    // Fetched once per session; resolves null if the manifest is missing or malformed
+    loadManifest: (): Promise<RasterManifest | null> => {
+        if (!manifestPromise) {
+            manifestPromise = fetch(MANIFEST_URL)
+                .then(res => {
+                    if (!res.ok) throw new Error(`Failed to fetch ${MANIFEST_URL}`);
+                    return res.json() as Promise<RasterManifest>;
+                })
+                .catch(e => {
+                    console.error('Raster manifest unavailable', e);
+                    manifestPromise = null;
+                    return null;
+                });
+        }
+        return manifestPromise;
+    },
+
+    // Values for one XYZ tile of one part (row-major, size x size), or null if they don't overlap
+    readTile: (part: RasterPart, tile: TileCoord, size = 256): Promise<Float32Array | null> => {
+        if (!intersects(part, tile)) return Promise.resolve(null);
+        const key = `${part.file}/${size}/${tile.z}/${tile.x}/${tile.y}`;
+        const cached = tiles.get(key);
+        if (cached) return Promise.resolve(cached);
+        const inFlight = tileLoads.get(key);
+        if (inFlight) return inFlight;
+
+        const load = decodeTile(part, tile, size)
+            .then(data => {
+                if (data) tiles.set(key, data);
+                return data;
+            })
+            .catch(e => {
+                console.warn(`COG tile read failed for ${key}`, e);
+                return null;
+            })
+            .finally(() => tileLoads.delete(key));
+        tileLoads.set(key, load);
+        return load;
+    },
+
+    // Valid pixel values from the coarsest overview of each part (for contrast stretching)
+    sampleOverview: async (parts: RasterPart[]): Promise<number[]> => {
+        const values: number[] = [];
+        for (const part of parts) {
+            try {
+                const cog = await openCog(part);
+                const level = cog.levels[cog.levels.length - 1];
+                const rasters = await level.image.readRasters({ samples: [0] });
+                const band = (rasters as ArrayLike<unknown>)[0] as ArrayLike<number>;
+                for (let i = 0; i < band.length; i++) {
+                    const v = band[i];
+                    if (v !== part.nodata && Number.isFinite(v)) values.push(v);
+                }
+            } catch (e) {
+                console.warn(`Overview read failed for ${part.file}`, e);
+            }
+        }
+        return values;
+    }
+};
@@ -0,0 +1,86 @@
+import { classifyCoverage, packCoverageBits } from '../utils/coverage';
+import type { CoverageWorkerMessage, CoverageWorkerRequest } from '../workers/coverageWorker';
+
+// --- Coverage Client ---
+// Owns the coverage worker for one map instance. Building centroids are registered once per
+// footprint load (`setDataset`); each `classify` call supersedes any request still in
+// flight, whose promise then resolves to null so callers can simply drop it.
+
+export interface CoverageBits {
+    datasetId: number;
+    bits: Uint8Array;
+    servedCount: number;
+    unservedCount: number;
+}
+
+export const createCoverageClient = () => {
+    let worker: Worker | null = null;
+    let datasetId = -1;
+    let centroids: Float64Array = new Float64Array(0); // Retained for the synchronous fallback
+    let nextRequestId = 0;
+    const pending = new Map<number, (result: CoverageBits | null) => void>();
+
+    const settle = (requestId: number, result: CoverageBits | null) => {
+        const resolve = pending.get(requestId);
+        if (!resolve) return;
+        pending.delete(requestId);
+        resolve(result);
+    };
+
+    try {
+        worker = new Worker(new URL('../workers/coverageWorker.ts', import.meta.url), { type: 'module' });
+        worker.onmessage = (e: MessageEvent<CoverageWorkerMessage>) => {
+            if (e.data.type === 'stale') return settle(e.data.requestId, null);
+            const { requestId, datasetId: resultDataset, bits, servedCount, unservedCount } = e.data;
+            // Results for a replaced dataset are stale even if no newer classify was issued
+            settle(requestId, resultDataset === datasetId ? { datasetId: resultDataset, bits, servedCount, unservedCount } : null);
+        };
+        worker.onerror = (e) => {
+            console.warn('Coverage worker failed, falling back to main thread', e);
+            worker?.terminate();
+            worker = null;
+            pending.forEach(resolve => resolve(null));
+            pending.clear();
+        };
+    } catch (e) {
+        console.warn('Web Workers unavailable, coverage runs on the main thread', e);
+        worker = null;
+    }
+
+    const post = (msg: CoverageWorkerRequest) => worker!.postMessage(msg);
+
+    return {
+        // Registers a new set of building centroids and returns its dataset id
+        setDataset: (packed: Float64Array): number => {
+            datasetId++;
+            centroids = packed;
+            if (worker) post({ type: 'dataset', datasetId, centroids: packed });
+            return datasetId;
+        },
+
+        classify: (servicePoints: Float64Array, bufferDistance: number): Promise<CoverageBits | null> => {
+            const requestId = nextRequestId++;
+            // Anything still pending is now stale
+            Array.from(pending.keys()).forEach(id => settle(id, null));
+
+            if (!worker) {
+                const result = classifyCoverage(centroids, servicePoints, bufferDistance);
+                return Promise.resolve({ datasetId, bits: packCoverageBits(result.status), servedCount: result.servedCount, unservedCount: result.unservedCount });
+            }
+
+            return new Promise(resolve => {
+                pending.set(requestId, resolve);
+                post({ type: 'classify', requestId, datasetId, servicePoints, bufferDistance });
+            });
+        },
+
+        dispose: () => {
+            pending.forEach(resolve => resolve(null));
+            pending.clear();
+            worker?.terminate();
+            worker = null;
+        }
+    };
+};
+
+export type CoverageClient = ReturnType<typeof createCoverageClient>;
@@ -0,0 +1,232 @@
+import { fromUrl, GeoTIFFImage } from 'geotiff';
+import { LruCache } from '../utils/lruCache';
+import { CogService } from './cogService';
+import { Perf } from '../utils/perf';
+
+// --- Elevation Service: local DEM sampling with remote fallback ---
+// Ground elevations come from the shipped 30 m DEM COG (the manifest's `dem` layer).
+// Only the header is read up front; each 256x256 block is range-requested and decoded the
+// first time a query touches it and then answered from memory with bilinear interpolation.
+// Points outside the raster (or on nodata) fall back to Open-Meteo in batched requests.
+
+const MERCATOR_R = 6378137; // EPSG:3857 sphere radius
+const RAD = Math.PI / 180;
+const DEFAULT_NODATA = -9999;
+const BLOCK_CACHE_SIZE = 96; // 256x256 float32 blocks, ~24 MB at most
+const POINT_CACHE_SIZE = 4096;
+const REMOTE_BATCH = 100; // Open-Meteo accepts up to 100 coordinates per request
+const COORD_PRECISION = 1e6; // ~0.1 m, keys for the point cache
+
+export interface LatLngLike {
+    lat: number;
+    lng: number;
+}
+
+interface DemRaster {
+    image: GeoTIFFImage;
+    width: number;
+    height: number;
+    originX: number; // Mercator x of the top-left corner
+    originY: number;
+    resX: number; // metres per pixel
+    resY: number;
+    blockW: number;
+    blockH: number;
+    blocksAcross: number;
+    nodata: number;
+}
+
+let demPromise: Promise<DemRaster | null> | null = null;
+const blocks = new LruCache<number, Float32Array>(BLOCK_CACHE_SIZE);
+const blockLoads = new Map<number, Promise<Float32Array | null>>();
+const points = new LruCache<string, number>(POINT_CACHE_SIZE);
+
+const openDem = (): Promise<DemRaster | null> => {
+    if (!demPromise) {
+        demPromise = (async () => {
+            try {
+                const part = (await CogService.loadManifest())?.layers.dem?.parts[0];
+                if (!part) throw new Error('No DEM listed in the raster manifest');
+                const tiff = await fromUrl(`maps/${part.file}`);
+                const image = await tiff.getImage(0); // Full-resolution page
+                const [originX, originY] = image.getOrigin();
+                const [resX, resY] = image.getResolution();
+                const nodata = image.getGDALNoData();
+                const width = image.getWidth();
+                const blockW = image.getTileWidth();
+                return {
+                    image, width, height: image.getHeight(), originX, originY,
+                    resX: Math.abs(resX), resY: Math.abs(resY),
+                    blockW, blockH: image.getTileHeight(),
+                    blocksAcross: Math.ceil(width / blockW),
+                    nodata: nodata ?? DEFAULT_NODATA
+                };
+            } catch (e) {
+                console.warn('Local DEM unavailable, elevations will use Open-Meteo', e);
+                return null;
+            }
+        })();
+    }
+    return demPromise;
+};
+
+const loadBlock = (dem: DemRaster, bx: number, by: number): Promise<Float32Array | null> => {
+    const id = by * dem.blocksAcross + bx;
+    const cached = blocks.get(id);
+    if (cached) return Promise.resolve(cached);
+    const inFlight = blockLoads.get(id);
+    if (inFlight) return inFlight;
+
+    const x0 = bx * dem.blockW, y0 = by * dem.blockH;
+    const x1 = Math.min(x0 + dem.blockW, dem.width), y1 = Math.min(y0 + dem.blockH, dem.height);
+    const load = dem.image.readRasters({ window: [x0, y0, x1, y1], samples: [0] })
+        .then(rasters => {
+            const data = (rasters as ArrayLike<unknown>)[0] as Float32Array;
+            blocks.set(id, data);
+            return data;
+        })
+        .catch((e: unknown) => {
+            console.warn('DEM block read failed', e);
+            return null;
+        })
+        .finally(() => blockLoads.delete(id));
+    blockLoads.set(id, load);
+    return load;
+};
+
+// --- Helper: Fractional pixel position of a lat/lng (pixel centres at integer values) ---
+const toPixel = (dem: DemRaster, lat: number, lng: number): [number, number] => {
+    const x = MERCATOR_R * lng * RAD;
+    const y = MERCATOR_R * Math.log(Math.tan(Math.PI / 4 + lat * RAD / 2));
+    return [(x - dem.originX) / dem.resX - 0.5, (dem.originY - y) / dem.resY - 0.5];
+};
+
+const insideRaster = (dem: DemRaster, px: number, py: number) =>
+    px >= -0.5 && py >= -0.5 && px <= dem.width - 0.5 && py <= dem.height - 0.5;
+
+// Block ids covering the 2x2 interpolation neighbourhood of a pixel position
+const neighbourBlocks = (dem: DemRaster, px: number, py: number, out: Set<number>) => {
+    const cx0 = Math.max(0, Math.floor(px)), cx1 = Math.min(dem.width - 1, Math.floor(px) + 1);
+    const cy0 = Math.max(0, Math.floor(py)), cy1 = Math.min(dem.height - 1, Math.floor(py) + 1);
+    for (const cy of [cy0, cy1]) {
+        for (const cx of [cx0, cx1]) {
+            out.add(Math.floor(cy / dem.blockH) * dem.blocksAcross + Math.floor(cx / dem.blockW));
+        }
+    }
+};
+
+const pixelValue = (dem: DemRaster, loaded: Map<number, Float32Array | null>, cx: number, cy: number): number | null => {
+    const bx = Math.floor(cx / dem.blockW), by = Math.floor(cy / dem.blockH);
+    const block = loaded.get(by * dem.blocksAcross + bx);
+    if (!block) return null;
+    const blockW = Math.min(dem.blockW, dem.width - bx * dem.blockW);
+    const v = block[(cy - by * dem.blockH) * blockW + (cx - bx * dem.blockW)];
+    return v === dem.nodata || !Number.isFinite(v) ? null : v;
+};
+
+// Bilinear interpolation; nodata neighbours are dropped and the remaining weights renormalised
+const bilinear = (dem: DemRaster, loaded: Map<number, Float32Array | null>, px: number, py: number): number | null => {
+    const fx = Math.floor(px), fy = Math.floor(py);
+    const tx = px - fx, ty = py - fy;
+    let sum = 0, weight = 0;
+    for (let j = 0; j < 2; j++) {
+        for (let i = 0; i < 2; i++) {
+            const w = (i ? tx : 1 - tx) * (j ? ty : 1 - ty);
+            if (w === 0) continue;
+            const cx = Math.min(dem.width - 1, Math.max(0, fx + i));
+            const cy = Math.min(dem.height - 1, Math.max(0, fy + j));
+            const v = pixelValue(dem, loaded, cx, cy);
+            if (v === null) continue;
+            sum += v * w;
+            weight += w;
+        }
+    }
+    return weight > 0 ? sum / weight : null;
+};
+
+// Samples the DEM for every point; entries outside coverage (or on nodata) stay null
+const sampleLocal = async (pts: LatLngLike[]): Promise<(number | null)[]> => {
+    const result: (number | null)[] = pts.map(() => null);
+    const dem = await openDem();
+    if (!dem) return result;
+
+    const pixels = pts.map(p => toPixel(dem, p.lat, p.lng));
+    const needed = new Set<number>();
+    pixels.forEach(([px, py]) => { if (insideRaster(dem, px, py)) neighbourBlocks(dem, px, py, needed); });
+
+    const loaded = new Map<number, Float32Array | null>();
+    await Promise.all(Array.from(needed).map(async id => {
+        loaded.set(id, await loadBlock(dem, id % dem.blocksAcross, Math.floor(id / dem.blocksAcross)));
+    }));
+
+    pixels.forEach(([px, py], i) => {
+        if (insideRaster(dem, px, py)) result[i] = bilinear(dem, loaded, px, py);
+    });
+    return result;
+};
+
+// Open-Meteo lookup for the given points; failed batches leave their entries null
+const fetchRemote = async (pts: LatLngLike[]): Promise<(number | null)[]> => {
+    const result: (number | null)[] = pts.map(() => null);
+    for (let start = 0; start < pts.length; start += REMOTE_BATCH) {
+        const batch = pts.slice(start, start + REMOTE_BATCH);
+        const lats = batch.map(p => p.lat).join(',');
+        const lngs = batch.map(p => p.lng).join(',');
+        try {
+            const res = await fetch(`https://api.open-meteo.com/v1/elevation?latitude=${lats}&longitude=${lngs}`);
+            const data = await res.json();
+            const elevs: unknown[] = data.elevation || [];
+            elevs.forEach((e, i) => { if (typeof e === 'number' && i < batch.length) result[start + i] = e; });
+        } catch (e) {
+            console.error("Remote elevation fetch failed", e);
+        }
+    }
+    return result;
+};
+
+const pointKey = (p: LatLngLike) => `${Math.round(p.lat * COORD_PRECISION)},${Math.round(p.lng * COORD_PRECISION)}`;
+
+// --- Helper: Fill missing profile elevations by linear interpolation along the path ---
+// Leading/trailing gaps take the nearest known value; an entirely unknown path stays empty.
+export const fillElevationGaps = (elevs: (number | null)[], dists: number[]): number[] | null => {
+    const known = elevs.map((e, i) => (e === null ? -1 : i)).filter(i => i >= 0);
+    if (known.length === 0) return null;
+    return elevs.map((e, i) => {
+        if (e !== null) return e;
+        let k = 0;
+        while (k < known.length && known[k] < i) k++;
+        if (k === 0) return elevs[known[0]]!;
+        if (k === known.length) return elevs[known[known.length - 1]]!;
+        const a = known[k - 1], b = known[k];
+        const span = dists[b] - dists[a];
+        const t = span > 0 ? (dists[i] - dists[a]) / span : 0;
+        return elevs[a]! + (elevs[b]! - elevs[a]!) * t;
+    });
+};
+
+export const ElevationService = {
+    // Resolves null only when neither the DEM nor the remote API can answer
+    getElevation: async (lat: number, lng: number): Promise<number | null> => {
+        const [elev] = await ElevationService.getElevations([{ lat, lng }]);
+        return elev;
+    },
+
+    // Batched lookup: cache first, then the DEM, then one remote pass for whatever is left
+    getElevations: async (pts: LatLngLike[]): Promise<(number | null)[]> => {
+        const result: (number | null)[] = pts.map(p => points.get(pointKey(p)) ?? null);
+        const missing = result.map((e, i) => (e === null ? i : -1)).filter(i => i >= 0);
+        if (missing.length === 0) return result;
+
+        const local = await Perf.timeAsync('elevation.dem', () => sampleLocal(missing.map(i => pts[i])), () => ({ items: missing.length }));
+        const remoteIdx = missing.filter((_, k) => local[k] === null);
+        missing.forEach((i, k) => { result[i] = local[k]; });
+
+        if (remoteIdx.length > 0) {
+            const remote = await Perf.timeAsync('elevation.remote', () => fetchRemote(remoteIdx.map(i => pts[i])), () => ({ items: remoteIdx.length }));
+            remoteIdx.forEach((i, k) => { result[i] = remote[k]; });
+        }
+
+        missing.forEach(i => { if (result[i] !== null) points.set(pointKey(pts[i]), result[i]!); });
+        return result;
+    }
+};
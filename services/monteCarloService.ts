@@ -0,0 +1,106 @@
+import { SimulationResult } from '../types';
+import { MonteCarloOptions, MonteCarloProgress, SimMetric } from '../utils/monteCarlo';
+import { createSimulationRun, MonteCarloModel } from '../utils/simulation';
+import type { MonteCarloWorkerMessage, MonteCarloWorkerRequest } from '../workers/monteCarloWorker';
+
+// --- Monte Carlo Client ---
+// Owns the simulation worker. Each `run` supersedes any run still in flight, whose promise
+// then resolves to null; a run that fails rejects instead. Without worker support (or once
+// the worker has crashed, including for the run it was busy with) the run happens on the
+// main thread in batches, yielding between them so progress still renders.
+
+const FALLBACK_BATCH = 20000;
+
+export const createMonteCarloClient = () => {
+    let worker: Worker | null = null;
+    let nextRequestId = 0;
+    let active: {
+        requestId: number,
+        resolve: (r: SimulationResult | null) => void,
+        reject: (e: Error) => void,
+        onProgress?: (p: MonteCarloProgress) => void,
+        args: [MonteCarloModel, SimMetric, Partial<MonteCarloOptions>]
+    } | null = null;
+
+    const settle = (result: SimulationResult | null) => {
+        const current = active;
+        active = null;
+        current?.resolve(result);
+    };
+
+    const fail = (requestId: number, error: unknown) => {
+        if (active?.requestId !== requestId) return; // Superseded anyway
+        const current = active;
+        active = null;
+        current.reject(error instanceof Error ? error : new Error(String(error)));
+    };
+
+    try {
+        worker = new Worker(new URL('../workers/monteCarloWorker.ts', import.meta.url), { type: 'module' });
+        worker.onmessage = (e: MessageEvent<MonteCarloWorkerMessage>) => {
+            const msg = e.data;
+            if (!active || msg.requestId !== active.requestId) return; // Stale
+            if (msg.type === 'progress') active.onProgress?.(msg.progress);
+            else if (msg.type === 'error') fail(msg.requestId, new Error(msg.message));
+            else settle(msg.result);
+        };
+        worker.onerror = (e) => {
+            console.warn('Monte Carlo worker failed, falling back to main thread', e);
+            worker?.terminate();
+            worker = null;
+            if (active) startOnMainThread(active.requestId, ...active.args);
+        };
+    } catch (e) {
+        console.warn('Web Workers unavailable, Monte Carlo runs on the main thread', e);
+        worker = null;
+    }
+
+    const runOnMainThread = async (requestId: number, model: MonteCarloModel, metric: SimMetric, options: Partial<MonteCarloOptions>) => {
+        const sim = createSimulationRun(model, metric, options);
+        while (!sim.step(FALLBACK_BATCH)) {
+            active?.onProgress?.(sim.progress());
+            await new Promise(resolve => setTimeout(resolve, 0));
+            if (active?.requestId !== requestId) return;
+        }
+        if (active?.requestId === requestId) settle(sim.finish());
+    };
+
+    const startOnMainThread = (requestId: number, model: MonteCarloModel, metric: SimMetric, options: Partial<MonteCarloOptions>) => {
+        runOnMainThread(requestId, model, metric, options).catch(e => fail(requestId, e));
+    };
+
+    return {
+        run: (
+            model: MonteCarloModel,
+            metric: SimMetric,
+            options: Partial<MonteCarloOptions> = {},
+            onProgress?: (progress: MonteCarloProgress) => void
+        ): Promise<SimulationResult | null> => {
+            settle(null); // Anything still running is now stale
+            const requestId = nextRequestId++;
+            return new Promise((resolve, reject) => {
+                active = { requestId, resolve, reject, onProgress, args: [model, metric, options] };
+                if (worker) {
+                    const msg: MonteCarloWorkerRequest = { type: 'run', requestId, model, metric, options };
+                    worker.postMessage(msg);
+                } else {
+                    startOnMainThread(requestId, model, metric, options);
+                }
+            });
+        },
+
+        cancel: () => {
+            if (!active) return;
+            if (worker) worker.postMessage({ type: 'cancel', requestId: nextRequestId++ } as MonteCarloWorkerRequest);
+            settle(null);
+        },
+
+        dispose: () => {
+            settle(null);
+            worker?.terminate();
+            worker = null;
+        }
+    };
+};
+
+export type MonteCarloClient = ReturnType<typeof createMonteCarloClient>;
@@ -0,0 +1,201 @@
+import { openDb, idbGetAll, idbPut, idbDelete } from '../utils/idb';
+import { LatLngBox, MERCATOR_HALF_EXTENT, TileCoord, tileCountInBox, tilesInBox } from '../utils/tiles';
+import { BuildingTileCache, BUILDING_TILE_ZOOM } from './buildingTileCache';
+import { CogService } from './cogService';
+
+// --- Offline field mode ---
+// public/sw.js caches the app shell and serves basemap tiles and raster COGs cache-first
+// from a byte-bounded LRU. "Prepare site" fills that cache for a bounding box ahead of a
+// field visit: basemap tiles over a zoom range, every raster part that overlaps the box,
+// and the building footprint tiles (kept by BuildingTileCache in IndexedDB). Sites are
+// recorded here so the inventory can show what each one holds.
+
+export type BasemapStyle = 'street' | 'satellite' | 'topo' | 'hybrid';
+
+export const BASEMAP_URLS: Record<BasemapStyle, string> = {
+    street: 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
+    satellite: 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+    topo: 'https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png',
+    hybrid: 'https://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}'
+};
+
+// Public tile servers forbid bulk downloads; this keeps one site to a village-sized area
+export const MAX_SITE_TILES = 3000;
+
+export interface OfflineSite {
+    id: string;
+    name: string;
+    box: LatLngBox;
+    minZoom: number;
+    maxZoom: number;
+    styles: BasemapStyle[];
+    iso: string;
+    buildingTiles: string[]; // BuildingTileCache keys
+    buildingBytes: number;
+    createdAt: number;
+}
+
+export interface SiteInventory {
+    site: OfflineSite;
+    cachedBytes: number; // Tiles and rasters held by the service worker for this site
+    entries: number;
+}
+
+export interface OfflineInventory {
+    sites: SiteInventory[];
+    browsingBytes: number; // Cached while panning, not tied to a site (evicted first)
+    totalBytes: number;
+    budget: number;
+    workerActive: boolean;
+}
+
+export interface PrepareProgress {
+    phase: 'tiles' | 'buildings';
+    done: number;
+    total: number;
+    failed: number;
+}
+
+const DB_NAME = 'spws-offline';
+const DB_VERSION = 1;
+const STORE = 'sites';
+const WORKER_URL = './sw.js';
+
+const db = () => openDb(DB_NAME, DB_VERSION, d => {
+    if (!d.objectStoreNames.contains(STORE)) d.createObjectStore(STORE, { keyPath: 'id' });
+});
+
+// Same subdomain choice as Leaflet's TileLayer, so prefetched URLs match what the map requests
+export const tileUrl = (template: string, t: TileCoord) => template
+    .replace('{s}', 'abc'[Math.abs(t.x + t.y) % 3])
+    .replace('{z}', String(t.z)).replace('{x}', String(t.x)).replace('{y}', String(t.y));
+
+export const countSiteTiles = (box: LatLngBox, minZoom: number, maxZoom: number, styles: BasemapStyle[]) => {
+    let n = 0;
+    for (let z = minZoom; z <= maxZoom; z++) n += tileCountInBox(box, z);
+    return n * styles.length;
+};
+
+const toMercator = (lat: number, lng: number): [number, number] => [
+    lng * MERCATOR_HALF_EXTENT / 180,
+    Math.log(Math.tan((90 + lat) * Math.PI / 360)) * MERCATOR_HALF_EXTENT / Math.PI
+];
+
+const worker = async (): Promise<ServiceWorker | null> => {
+    if (typeof navigator === 'undefined' || !('serviceWorker' in navigator)) return null;
+    const reg = await navigator.serviceWorker.getRegistration();
+    return reg?.active ?? null;
+};
+
+// --- Helper: One request to the worker; intermediate messages go to onMessage ---
+// Aborting the signal asks the worker to stop early; it still replies with what it got done
+const callWorker = async <T>(message: unknown, onMessage?: (data: Omit<PrepareProgress, 'phase'>) => void, signal?: AbortSignal): Promise<T | null> => {
+    const active = await worker();
+    if (!active) return null;
+    return new Promise<T>((resolve, reject) => {
+        const channel = new MessageChannel();
+        const onAbort = () => channel.port1.postMessage({ type: 'cancel' });
+        channel.port1.onmessage = e => {
+            const data = e.data;
+            if (data?.type === 'progress') { onMessage?.(data); return; }
+            signal?.removeEventListener('abort', onAbort);
+            channel.port1.close();
+            if (data?.type === 'error') reject(new Error(data.message));
+            else resolve(data as T);
+        };
+        active.postMessage(message, [channel.port2]);
+        if (signal?.aborted) onAbort();
+        else signal?.addEventListener('abort', onAbort, { once: true });
+    });
+};
+
+// Production builds only: under `vite dev` a cache-first worker would serve stale modules
+export const registerOfflineWorker = () => {
+    if (typeof navigator === 'undefined' || !('serviceWorker' in navigator)) return;
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register(WORKER_URL).catch(e => console.warn('Offline: service worker registration failed', e));
+    });
+};
+
+export const OfflineService = {
+    prepareSite: async (
+        opts: { name: string, box: LatLngBox, minZoom: number, maxZoom: number, styles: BasemapStyle[], iso: string },
+        onProgress: (p: PrepareProgress) => void,
+        signal: AbortSignal
+    ): Promise<OfflineSite> => {
+        const site: OfflineSite = { ...opts, id: `site-${Date.now().toString(36)}`, buildingTiles: [], buildingBytes: 0, createdAt: Date.now() };
+
+        // 1. Basemap tiles and raster parts, fetched and tagged by the worker
+        const urls: string[] = [];
+        for (let z = opts.minZoom; z <= opts.maxZoom; z++) {
+            const tiles = tilesInBox(opts.box, z);
+            opts.styles.forEach(style => tiles.forEach(t => urls.push(tileUrl(BASEMAP_URLS[style], t))));
+        }
+        if (urls.length > MAX_SITE_TILES) throw new Error(`${urls.length} tiles requested; reduce the area or zoom range (limit ${MAX_SITE_TILES})`);
+        const manifest = await CogService.loadManifest();
+        const [minX, minY] = toMercator(opts.box.south, opts.box.west);
+        const [maxX, maxY] = toMercator(opts.box.north, opts.box.east);
+        Object.values(manifest?.layers ?? {}).forEach(entry => entry?.parts.forEach(part => {
+            const [pMinX, pMinY, pMaxX, pMaxY] = part.bounds;
+            if (pMaxX > minX && pMinX < maxX && pMaxY > minY && pMinY < maxY) urls.push(new URL(`maps/${part.file}`, location.href).href);
+        }));
+
+        onProgress({ phase: 'tiles', done: 0, total: urls.length, failed: 0 });
+        const result = await callWorker<{ done: number, failed: number }>(
+            { type: 'prefetch', site: site.id, urls },
+            p => onProgress({ phase: 'tiles', done: p.done, total: p.total, failed: p.failed }),
+            signal
+        );
+        if (!result) console.warn('Offline: no active service worker, only building footprints will be stored');
+
+        // 2. Building footprints (decoded tiles persist in IndexedDB)
+        const tiles = tilesInBox(opts.box, BUILDING_TILE_ZOOM);
+        let failed = 0;
+        for (let i = 0; i < tiles.length && !signal.aborted; i++) {
+            onProgress({ phase: 'buildings', done: i, total: tiles.length, failed });
+            const tile = await BuildingTileCache.getTile(opts.iso, tiles[i], signal).catch(e => {
+                console.warn(`Offline: building tile ${tiles[i].z}/${tiles[i].x}/${tiles[i].y} failed`, e);
+                return null;
+            });
+            if (tile) {
+                site.buildingTiles.push(tile.key);
+                site.buildingBytes += tile.bytes;
+            } else if (!signal.aborted) {
+                failed++;
+            }
+        }
+        onProgress({ phase: 'buildings', done: tiles.length, total: tiles.length, failed });
+
+        await idbPut(await db(), STORE, site);
+        return site;
+    },
+
+    inventory: async (): Promise<OfflineInventory> => {
+        const sites = await idbGetAll<OfflineSite>(await db(), STORE);
+        const reply = await callWorker<{ sites: { site: string, bytes: number, entries: number }[], totalBytes: number, budget: number }>({ type: 'inventory' });
+        const bySite = new Map((reply?.sites ?? []).map(s => [s.site, s]));
+        return {
+            sites: sites.sort((a, b) => b.createdAt - a.createdAt).map(site => ({
+                site,
+                cachedBytes: bySite.get(site.id)?.bytes ?? 0,
+                entries: bySite.get(site.id)?.entries ?? 0
+            })),
+            browsingBytes: bySite.get('')?.bytes ?? 0,
+            totalBytes: reply?.totalBytes ?? 0,
+            budget: reply?.budget ?? 0,
+            workerActive: !!reply
+        };
+    },
+
+    // Building tiles another site still lists are kept
+    removeSite: async (id: string) => {
+        const d = await db();
+        const sites = await idbGetAll<OfflineSite>(d, STORE);
+        const site = sites.find(s => s.id === id);
+        if (!site) return;
+        const stillUsed = new Set(sites.filter(s => s.id !== id).flatMap(s => s.buildingTiles));
+        await BuildingTileCache.deleteTiles(site.buildingTiles.filter(key => !stillUsed.has(key)));
+        await callWorker({ type: 'remove-site', site: id });
+        await idbDelete(d, STORE, id);
+    }
+};
@@ -0,0 +1,116 @@
+import { LruCache } from '../utils/lruCache';
+import { openDb, idbGet, idbPut } from '../utils/idb';
+import { FootprintData } from '../utils/footprints';
+import { fetchOverpassBuildings } from '../utils/overpass';
+import { LatLngBox, TileCoord, tileBounds, tileKey } from '../utils/tiles';
+import { Perf } from '../utils/perf';
+import type { OverpassWorkerRequest, OverpassWorkerResult } from '../workers/overpassWorker';
+
+// --- OpenStreetMap buildings: tile-keyed footprint cache ---
+// Overpass is queried one fixed XYZ tile at a time rather than for the whole viewport, so a
+// zoomed-out view never sends one huge query that times out. Tiles are fetched and packed
+// in the Overpass worker, kept in an in-memory LRU and persisted to IndexedDB under
+// `${z}/${x}/${y}`. OSM is edited continuously, so stored tiles expire after a month.
+
+export const OSM_TILE_ZOOM = 15; // Same grid as the FlatGeobuf cache
+const MEMORY_TILES = 256;
+const MAX_AGE_MS = 30 * 24 * 60 * 60 * 1000;
+const DB_NAME = 'spws-osm';
+const DB_VERSION = 1;
+const STORE = 'osmTiles';
+
+export interface OsmTile {
+    key: string; // `${z}/${x}/${y}`
+    data: FootprintData; // Buildings anchored in this tile
+    bytes: number; // Size of the Overpass response
+    cachedAt: number;
+}
+
+type Packed = { data: FootprintData, bytes: number };
+
+const memory = new LruCache<string, OsmTile>(MEMORY_TILES);
+const db = () => openDb(DB_NAME, DB_VERSION, d => {
+    if (!d.objectStoreNames.contains(STORE)) d.createObjectStore(STORE, { keyPath: 'key' });
+});
+
+// --- Overpass worker (one per page, started on the first network fetch) ---
+let worker: Worker | null | undefined; // undefined until tried; null when unavailable
+let nextRequestId = 0;
+const pending = new Map<number, { resolve: (r: Packed) => void, reject: (e: Error) => void }>();
+
+const getWorker = () => {
+    if (worker !== undefined) return worker;
+    try {
+        worker = new Worker(new URL('../workers/overpassWorker.ts', import.meta.url), { type: 'module' });
+        worker.onmessage = (e: MessageEvent<OverpassWorkerResult>) => {
+            const msg = e.data;
+            const request = pending.get(msg.requestId);
+            if (!request) return; // Cancelled
+            pending.delete(msg.requestId);
+            if (msg.type === 'result') request.resolve({ data: msg.data, bytes: msg.bytes });
+            else request.reject(new Error(msg.message));
+        };
+        worker.onerror = (e) => {
+            console.warn('OSM: Overpass worker failed, falling back to main thread', e);
+            worker?.terminate();
+            worker = null;
+            pending.forEach(request => request.reject(new Error('Overpass worker failed')));
+            pending.clear();
+        };
+    } catch (e) {
+        console.warn('OSM: Web Workers unavailable, Overpass tiles are parsed on the main thread', e);
+        worker = null;
+    }
+    return worker;
+};
+
+const post = (w: Worker, msg: OverpassWorkerRequest) => w.postMessage(msg);
+
+// Resolves null if the signal aborts first (the worker then aborts the fetch)
+const fetchPacked = (box: LatLngBox, signal: AbortSignal): Promise<Packed | null> => {
+    if (signal.aborted) return Promise.resolve(null);
+    const w = getWorker();
+    if (!w) return fetchOverpassBuildings(box, signal).catch(e => { if (signal.aborted) return null; throw e; });
+
+    return new Promise((resolve, reject) => {
+        const requestId = nextRequestId++;
+        const onAbort = () => {
+            pending.delete(requestId);
+            post(w, { type: 'cancel', requestId });
+            resolve(null);
+        };
+        pending.set(requestId, {
+            resolve: r => { signal.removeEventListener('abort', onAbort); resolve(r); },
+            reject: e => { signal.removeEventListener('abort', onAbort); reject(e); }
+        });
+        signal.addEventListener('abort', onAbort, { once: true });
+        post(w, { type: 'fetch', requestId, box });
+    });
+};
+
+export const OsmTileCache = {
+    // Returns the tile's buildings from memory, IndexedDB or Overpass (in that order).
+    // Resolves to null if the signal aborts first; rejects if Overpass fails.
+    getTile: async (tile: TileCoord, signal: AbortSignal): Promise<OsmTile | null> => {
+        const key = tileKey(tile);
+
+        const inMemory = memory.get(key);
+        if (inMemory) return inMemory;
+
+        const stored = await idbGet<OsmTile>(await db(), STORE, key);
+        if (signal.aborted) return null;
+        if (stored && Date.now() - stored.cachedAt < MAX_AGE_MS) {
+            memory.set(key, stored);
+            return stored;
+        }
+
+        const done = Perf.start('osm.tile');
+        const fetched = await fetchPacked(tileBounds(tile), signal);
+        if (!fetched) return null;
+        done({ items: fetched.data.count, bytes: fetched.bytes });
+        const result: OsmTile = { key, data: fetched.data, bytes: fetched.bytes, cachedAt: Date.now() };
+        memory.set(key, result);
+        idbPut(await db(), STORE, result); // Fire and forget, persistence is best-effort
+        return result;
+    }
+};
@@ -0,0 +1,130 @@
+import { openDb, idbGet, idbGetAll, idbPut, idbDelete } from '../utils/idb';
+import { EncodedSections, packProject, SECTION_NAMES, SectionName, sectionHash, unpackProject } from '../utils/projectCodec';
+
+// --- Project persistence ---
+// Each project is a small record (name, save time, one hash per section) plus one stored
+// blob per section under `${projectId}/${section}`. A save re-encodes everything, which is
+// cheap, but only writes the sections whose hash changed, so moving a tap rewrites the
+// design section and leaves profiles and parameters alone. Files use the same sections
+// packed into one container (utils/projectCodec).
+
+export interface ProjectRecord {
+    id: string;
+    name: string;
+    savedAt: number;
+    hashes: Partial<Record<SectionName, string>>;
+    bytes: number; // Total encoded size of the stored sections
+}
+
+export interface ProjectSaveResult {
+    written: SectionName[];
+    bytesWritten: number;
+    ms: number;
+}
+
+const DB_NAME = 'spws-projects';
+const DB_VERSION = 1;
+const PROJECTS = 'projects';
+const SECTIONS = 'sections';
+const KEEP_PROJECTS = 10; // Autosaves of older projects beyond this are pruned
+export const PROJECT_FILE_EXTENSION = '.spws';
+
+const db = () => openDb(DB_NAME, DB_VERSION, d => {
+    if (!d.objectStoreNames.contains(PROJECTS)) d.createObjectStore(PROJECTS, { keyPath: 'id' });
+    if (!d.objectStoreNames.contains(SECTIONS)) d.createObjectStore(SECTIONS);
+});
+
+const sectionKey = (id: string, name: SectionName) => `${id}/${name}`;
+
+// Last record written per project, so a save compares hashes without a read
+const known = new Map<string, ProjectRecord>();
+
+export const newProjectId = () => `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 8)}`;
+
+const prune = async (keepId: string) => {
+    const d = await db();
+    const records = await idbGetAll<ProjectRecord>(d, PROJECTS);
+    const stale = records.filter(r => r.id !== keepId).sort((a, b) => b.savedAt - a.savedAt).slice(KEEP_PROJECTS - 1);
+    for (const record of stale) {
+        for (const name of SECTION_NAMES) await idbDelete(d, SECTIONS, sectionKey(record.id, name));
+        await idbDelete(d, PROJECTS, record.id);
+        known.delete(record.id);
+    }
+};
+
+export const ProjectStore = {
+    save: async (id: string, name: string, encoded: EncodedSections): Promise<ProjectSaveResult> => {
+        const t0 = performance.now();
+        const d = await db();
+        const previous = known.get(id) ?? await idbGet<ProjectRecord>(d, PROJECTS, id);
+        const record: ProjectRecord = { id, name, savedAt: Date.now(), hashes: {}, bytes: 0 };
+        const written: SectionName[] = [];
+        let bytesWritten = 0;
+
+        for (const section of SECTION_NAMES) {
+            const buf = encoded[section];
+            if (!buf) continue;
+            const hash = sectionHash(buf);
+            record.hashes[section] = hash;
+            record.bytes += buf.length;
+            if (previous?.hashes[section] === hash) continue;
+            // Sections first: until the record below lands, a reload still trusts the old hashes
+            if (!await idbPut(d, SECTIONS, buf, sectionKey(id, section))) {
+                // Not stored (e.g. quota): keep the old hash so load still trusts the old bytes
+                // and the next save sees a change and retries
+                if (previous?.hashes[section]) record.hashes[section] = previous.hashes[section];
+                else delete record.hashes[section];
+                continue;
+            }
+            written.push(section);
+            bytesWritten += buf.length;
+        }
+
+        // Old projects are trimmed before the new record lands; a failure there must not fail the save
+        if (!previous) await prune(id).catch(e => console.warn('Projects: could not remove old projects', e));
+        if (written.length > 0 || !previous || previous.name !== name) {
+            // A record that did not land is not remembered, so the next save writes it again
+            if (!await idbPut(d, PROJECTS, record)) return { written, bytesWritten, ms: performance.now() - t0 };
+        } else {
+            record.savedAt = previous.savedAt;
+        }
+        known.set(id, record);
+        return { written, bytesWritten, ms: performance.now() - t0 };
+    },
+
+    // Sections whose stored bytes no longer match the record (an interrupted save) are left out
+    load: async (id: string): Promise<{ record: ProjectRecord, sections: EncodedSections } | null> => {
+        const d = await db();
+        const record = await idbGet<ProjectRecord>(d, PROJECTS, id);
+        if (!record) return null;
+        const sections: EncodedSections = {};
+        for (const name of SECTION_NAMES) {
+            if (!record.hashes[name]) continue;
+            const buf = await idbGet<Uint8Array>(d, SECTIONS, sectionKey(id, name));
+            if (buf && sectionHash(buf) === record.hashes[name]) sections[name] = buf;
+            else console.warn(`Projects: section ${name} of ${id} is missing or stale, skipping it`);
+        }
+        known.set(id, record);
+        return { record, sections };
+    },
+
+    latest: async (): Promise<ProjectRecord | null> => {
+        const records = await idbGetAll<ProjectRecord>(await db(), PROJECTS);
+        return records.reduce<ProjectRecord | null>((best, r) => !best || r.savedAt > best.savedAt ? r : best, null);
+    },
+
+    exportFile: (name: string, encoded: EncodedSections) => {
+        const blob = new Blob([packProject(encoded) as BlobPart], { type: 'application/octet-stream' });
+        const url = URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = `${(name || 'project').replace(/[^\w\- ]+/g, '_')}${PROJECT_FILE_EXTENSION}`;
+        document.body.appendChild(a);
+        a.click();
+        a.remove();
+        setTimeout(() => URL.revokeObjectURL(url), 1000);
+    },
+
+    importFile: async (file: Blob): Promise<EncodedSections> =>
+        unpackProject(new Uint8Array(await file.arrayBuffer()))
+};
@@ -0,0 +1,432 @@
+import html2canvas from 'html2canvas';
+import { GState, jsPDF } from 'jspdf';
+import { LruCache } from '../utils/lruCache';
+import { ellipsePath, parsePathData, pointsPath, rectPath } from '../utils/svgPath';
+
+// --- PDF report builder ---
+// Exports a rendered report element to an A4 PDF:
+// 1. Waits until the report has actually rendered: no map still loading tiles
+//    ([data-report-pending]), no image still loading, every Recharts container has drawn
+//    its SVG, and the DOM has stopped changing for a moment.
+// 2. Splits the report into sections (elements marked [data-report-section], otherwise
+//    vertically stacked children, recursing into anything taller than a page) and
+//    rasterises them one at a time, so peak memory is one section's canvas, not the report.
+// 3. Draws every SVG (Recharts charts, icons, the schematic's pipe network) as PDF paths
+//    and text over the raster, in which it is hidden.
+// 4. Elements marked [data-report-snapshot="<key>"] (the schematic map) are rasterised once
+//    per key and size and served from an LRU cache on later exports.
+// CSS page breaks (break-before-page / break-after-page) start a new page.
+
+const PAGE_W = 210; // mm, A4 portrait
+const PAGE_H = 297;
+const MARGIN = 5;
+const CONTENT_W = PAGE_W - 2 * MARGIN;
+const CONTENT_H = PAGE_H - 2 * MARGIN;
+const KEEP_WITH_NEXT_MM = 40; // Headings move to the next page unless this much of what follows fits
+const RASTER_SCALE = 2;
+const MAX_CANVAS_PX = 4096 * 4096; // Scale is reduced for sections that would exceed this
+const JPEG_QUALITY = 0.95;
+const QUIET_MS = 150; // DOM must be unchanged this long before capture
+const READY_TIMEOUT_MS = 20000; // Export anyway after this, with whatever has rendered
+const MM_TO_PT = 72 / 25.4;
+
+const HIDDEN = 'data-report-hidden';
+const UNSUPPORTED_SVG = 'image, foreignObject, pattern, mask, filter, use';
+const SKIP_TAGS = new Set(['defs', 'clippath', 'title', 'desc', 'style', 'lineargradient', 'radialgradient', 'marker', 'symbol', 'metadata']);
+
+const snapshots = new LruCache<string, string>(8, 48 * 1024 * 1024, url => url.length);
+
+export interface ReportStats {
+    totalMs: number;
+    waitMs: number; // Until tiles, charts and layout had settled
+    settled: boolean; // False if the wait timed out and the export went ahead anyway
+    sections: number;
+    pages: number;
+    peakCanvas: { width: number, height: number }; // px; the largest single canvas allocated
+    snapshotHits: number;
+}
+
+// Stable key for data-report-snapshot: FNV-1a over the JSON of whatever the snapshot shows
+export const snapshotKey = (value: unknown): string => {
+    const s = JSON.stringify(value) ?? '';
+    let h = 0x811c9dc5;
+    for (let i = 0; i < s.length; i++) {
+        h ^= s.charCodeAt(i);
+        h = Math.imul(h, 0x01000193);
+    }
+    return (h >>> 0).toString(16).padStart(8, '0');
+};
+
+// --- Helper: Rendered and not excluded from the report ---
+const visible = (el: Element) => el.getClientRects().length > 0 && !el.closest('[data-html2canvas-ignore]');
+
+const cacheKey = (el: HTMLElement) => {
+    const r = el.getBoundingClientRect();
+    return `${el.dataset.reportSnapshot}@${Math.round(r.width)}x${Math.round(r.height)}`;
+};
+
+// --- Readiness ---
+const isReady = (root: HTMLElement) => {
+    // A cached snapshot will not be re-rendered, so its tiles need not finish loading
+    const cached = Array.from(root.querySelectorAll<HTMLElement>('[data-report-snapshot]')).filter(el => snapshots.has(cacheKey(el)));
+    const needed = (el: Element) => visible(el) && !cached.some(c => c.contains(el));
+    if (Array.from(root.querySelectorAll('[data-report-pending]')).some(needed)) return false;
+    if (Array.from(root.querySelectorAll('img')).some(img => !img.complete && needed(img))) return false;
+    return Array.from(root.querySelectorAll('.recharts-responsive-container')).every(c => !visible(c) || c.querySelector('svg.recharts-surface'));
+};
+
+const whenReportReady = (root: HTMLElement): Promise<boolean> => new Promise(resolve => {
+    let quiet: ReturnType<typeof setTimeout> | undefined;
+    const check = () => {
+        clearTimeout(quiet);
+        if (isReady(root)) quiet = setTimeout(() => { if (isReady(root)) finish(true); }, QUIET_MS);
+    };
+    const observer = new MutationObserver(check);
+    const deadline = setTimeout(() => finish(false), READY_TIMEOUT_MS);
+    const finish = (settled: boolean) => {
+        observer.disconnect();
+        root.removeEventListener('load', check, true);
+        root.removeEventListener('error', check, true);
+        clearTimeout(quiet);
+        clearTimeout(deadline);
+        resolve(settled);
+    };
+    observer.observe(root, { subtree: true, childList: true, attributes: true, characterData: true });
+    // Image load events do not bubble, but they do pass through the capture phase
+    root.addEventListener('load', check, true);
+    root.addEventListener('error', check, true);
+    check();
+});
+
+// --- Sections ---
+type Block = { kind: 'section', el: HTMLElement } | { kind: 'break' };
+
+// Side-by-side children (grid columns) must stay together
+const stackedVertically = (el: HTMLElement) => {
+    let bottom = -Infinity;
+    for (const child of Array.from(el.children)) {
+        if (!visible(child)) continue;
+        const r = child.getBoundingClientRect();
+        if (r.height === 0) continue;
+        if (r.top < bottom - 1) return false;
+        bottom = r.bottom;
+    }
+    return true;
+};
+
+const collectBlocks = (node: HTMLElement, pageHeightPx: number, out: Block[] = []): Block[] => {
+    Array.from(node.children).forEach(child => {
+        if (!(child instanceof HTMLElement) || !visible(child)) return;
+        const cs = getComputedStyle(child);
+        if (cs.breakBefore === 'page' || cs.pageBreakBefore === 'always') out.push({ kind: 'break' });
+        const height = child.getBoundingClientRect().height;
+        if (height > 0) {
+            const split = !child.hasAttribute('data-report-section') && child.tagName !== 'TABLE' && child.children.length > 0 &&
+                (height > pageHeightPx || child.querySelector('[data-report-section]') !== null) && stackedVertically(child);
+            if (split) collectBlocks(child, pageHeightPx, out);
+            else out.push({ kind: 'section', el: child });
+        }
+        if (cs.breakAfter === 'page' || cs.pageBreakAfter === 'always') out.push({ kind: 'break' });
+    });
+    return out;
+};
+
+const isHeading = (el: HTMLElement) => /^H[1-6]$/.test(el.tagName) || (el.children.length === 1 && /^H[1-6]$/.test(el.children[0].tagName));
+
+// --- Raster ---
+const rasterize = async (el: HTMLElement, hide: Element[], stats: ReportStats) => {
+    const rect = el.getBoundingClientRect();
+    const scale = Math.min(RASTER_SCALE, Math.sqrt(MAX_CANVAS_PX / Math.max(1, rect.width * rect.height)));
+    hide.forEach(h => h.setAttribute(HIDDEN, ''));
+    try {
+        const canvas = await html2canvas(el, {
+            scale, useCORS: true, logging: false, backgroundColor: '#ffffff',
+            onclone: (doc: Document) => {
+                const style = doc.createElement('style');
+                style.textContent = `[${HIDDEN}] { visibility: hidden !important; }`;
+                doc.head.appendChild(style);
+            }
+        });
+        if (canvas.width * canvas.height > stats.peakCanvas.width * stats.peakCanvas.height) {
+            stats.peakCanvas = { width: canvas.width, height: canvas.height };
+        }
+        const url = canvas.toDataURL('image/jpeg', JPEG_QUALITY);
+        canvas.width = canvas.height = 0; // Release the backing store now, not at the next GC
+        return url;
+    } finally {
+        hide.forEach(h => h.removeAttribute(HIDDEN));
+    }
+};
+
+const vectorSvgs = (el: Element) => Array.from(el.querySelectorAll('svg')).filter(svg =>
+    !svg.parentElement?.closest('svg') && visible(svg) && !svg.querySelector(UNSUPPORTED_SVG)
+);
+
+const snapshotImage = async (el: HTMLElement, stats: ReportStats) => {
+    const key = cacheKey(el);
+    const hit = snapshots.get(key);
+    if (hit) { stats.snapshotHits++; return hit; }
+    const url = await rasterize(el, vectorSvgs(el), stats);
+    // A map with failed tiles is not worth keeping: the next export retries them
+    if (!el.hasAttribute('data-report-incomplete')) snapshots.set(key, url);
+    return url;
+};
+
+// --- Vectors ---
+// Maps client (CSS px) coordinates to page mm for one placement of a section
+interface Placement {
+    x: number; // mm, page position of the section's top-left corner
+    y: number;
+    left: number; // px, client position of the same corner
+    top: number;
+    mmPerPx: number;
+}
+
+type Rgb = [number, number, number];
+
+const toPage = (p: Placement, m: DOMMatrix, x: number, y: number): [number, number] => [
+    p.x + (m.a * x + m.c * y + m.e - p.left) * p.mmPerPx,
+    p.y + (m.b * x + m.d * y + m.f - p.top) * p.mmPerPx
+];
+
+const matrixScale = (m: DOMMatrix) => Math.sqrt(Math.abs(m.a * m.d - m.b * m.c));
+
+const parseColor = (value: string): { rgb: Rgb, alpha: number } | null => {
+    const m = /rgba?\(\s*([\d.]+)[\s,]+([\d.]+)[\s,]+([\d.]+)(?:[\s,/]+([\d.]+%?))?\s*\)/.exec(value);
+    if (!m) return null;
+    const alpha = m[4] === undefined ? 1 : m[4].endsWith('%') ? parseFloat(m[4]) / 100 : parseFloat(m[4]);
+    return alpha > 0 ? { rgb: [+m[1], +m[2], +m[3]], alpha } : null;
+};
+
+// Gradients fall back to their first stop
+const parsePaint = (value: string, svg: SVGSVGElement) => {
+    const ref = /url\(\s*["']?#([^"')]+)["']?\s*\)/.exec(value);
+    if (!ref) return parseColor(value);
+    const stop = svg.querySelector(`#${CSS.escape(ref[1])} stop`);
+    if (!stop) return null;
+    const cs = getComputedStyle(stop);
+    const color = parseColor(cs.stopColor);
+    return color && { rgb: color.rgb, alpha: color.alpha * parseFloat(cs.stopOpacity || '1') };
+};
+
+const shapePath = (el: SVGElement): string => {
+    switch (el.tagName.toLowerCase()) {
+        case 'path': return el.getAttribute('d') ?? '';
+        case 'rect': {
+            const r = el as SVGRectElement;
+            return rectPath(r.x.baseVal.value, r.y.baseVal.value, r.width.baseVal.value, r.height.baseVal.value);
+        }
+        case 'circle': {
+            const c = el as SVGCircleElement;
+            return ellipsePath(c.cx.baseVal.value, c.cy.baseVal.value, c.r.baseVal.value, c.r.baseVal.value);
+        }
+        case 'ellipse': {
+            const e = el as SVGEllipseElement;
+            return ellipsePath(e.cx.baseVal.value, e.cy.baseVal.value, e.rx.baseVal.value, e.ry.baseVal.value);
+        }
+        case 'line': {
+            const l = el as SVGLineElement;
+            return `M${l.x1.baseVal.value},${l.y1.baseVal.value}L${l.x2.baseVal.value},${l.y2.baseVal.value}`;
+        }
+        case 'polyline': return pointsPath(el.getAttribute('points') ?? '', false);
+        case 'polygon': return pointsPath(el.getAttribute('points') ?? '', true);
+        default: return '';
+    }
+};
+
+const withOpacity = (pdf: jsPDF, fill: number, stroke: number) => {
+    if (fill < 1 || stroke < 1) pdf.setGState(new GState({ opacity: fill, 'stroke-opacity': stroke }));
+};
+
+const drawShape = (pdf: jsPDF, el: SVGGraphicsElement, svg: SVGSVGElement, opacity: number, p: Placement) => {
+    const m = el.getScreenCTM();
+    const segments = parsePathData(shapePath(el));
+    if (!m || segments.length < 2) return;
+    const cs = getComputedStyle(el);
+    const fill = parsePaint(cs.fill, svg);
+    const stroke = parsePaint(cs.stroke, svg);
+    const lineWidth = (parseFloat(cs.strokeWidth) || 0) * matrixScale(m) * p.mmPerPx;
+    const stroked = stroke !== null && lineWidth > 0;
+    if (!fill && !stroked) return;
+
+    pdf.saveGraphicsState();
+    withOpacity(pdf, opacity * parseFloat(cs.fillOpacity || '1') * (fill?.alpha ?? 1), opacity * parseFloat(cs.strokeOpacity || '1') * (stroke?.alpha ?? 1));
+    if (fill) pdf.setFillColor(...fill.rgb);
+    if (stroked) {
+        pdf.setDrawColor(...stroke.rgb);
+        pdf.setLineWidth(lineWidth);
+        pdf.setLineCap(cs.strokeLinecap as 'butt' | 'round' | 'square');
+        pdf.setLineJoin(cs.strokeLinejoin === 'round' || cs.strokeLinejoin === 'bevel' ? cs.strokeLinejoin : 'miter');
+        const dash = (cs.strokeDasharray.match(/[\d.]+/g) ?? []).map(d => parseFloat(d) * matrixScale(m) * p.mmPerPx);
+        if (dash.some(d => d > 0)) pdf.setLineDashPattern(dash.length % 2 ? [...dash, ...dash] : dash, 0);
+    }
+    segments.forEach(s => {
+        if (s.op === 'Z') pdf.close();
+        else if (s.op === 'C') {
+            const [x1, y1] = toPage(p, m, s.x1, s.y1), [x2, y2] = toPage(p, m, s.x2, s.y2), [x, y] = toPage(p, m, s.x, s.y);
+            pdf.curveTo(x1, y1, x2, y2, x, y);
+        } else {
+            const [x, y] = toPage(p, m, s.x, s.y);
+            if (s.op === 'M') pdf.moveTo(x, y); else pdf.lineTo(x, y);
+        }
+    });
+    const evenOdd = cs.fillRule === 'evenodd';
+    if (fill && stroked) { if (evenOdd) pdf.fillStrokeEvenOdd(); else pdf.fillStroke(); }
+    else if (fill) { if (evenOdd) pdf.fillEvenOdd(); else pdf.fill(); }
+    else pdf.stroke();
+    pdf.restoreGraphicsState();
+};
+
+const drawText = (pdf: jsPDF, text: SVGTextElement, svg: SVGSVGElement, opacity: number, p: Placement) => {
+    const spans = text.querySelectorAll('tspan');
+    const runs: SVGTextContentElement[] = spans.length ? Array.from(spans) : [text];
+    runs.forEach(run => {
+        const str = run.textContent ?? '';
+        const n = run.getNumberOfChars();
+        const m = run.getScreenCTM();
+        if (!str.trim() || n === 0 || !m) return;
+        const cs = getComputedStyle(run);
+        const fill = parsePaint(cs.fill, svg);
+        if (!fill) return;
+
+        let start: DOMPoint, end: DOMPoint;
+        try { start = run.getStartPositionOfChar(0); end = run.getEndPositionOfChar(n - 1); }
+        catch { return; } // Not laid out
+        const [sx, sy] = toPage(p, m, start.x, start.y);
+        const [ex, ey] = toPage(p, m, end.x, end.y);
+        const angle = Math.atan2(ey - sy, ex - sx);
+
+        pdf.saveGraphicsState();
+        withOpacity(pdf, opacity * parseFloat(cs.fillOpacity || '1') * fill.alpha, 1);
+        const bold = cs.fontWeight === 'bold' || parseInt(cs.fontWeight) >= 600;
+        pdf.setFont('helvetica', bold ? 'bold' : 'normal');
+        pdf.setFontSize(parseFloat(cs.fontSize) * matrixScale(m) * p.mmPerPx * MM_TO_PT);
+        pdf.setTextColor(...fill.rgb);
+        // Helvetica's advance widths differ from the browser font: keep the anchor point
+        // (start, middle or end of the run) where the browser placed it
+        const f = cs.textAnchor === 'middle' ? 0.5 : cs.textAnchor === 'end' ? 1 : 0;
+        const shift = pdf.getTextWidth(str) * f;
+        const x = sx + (ex - sx) * f - Math.cos(angle) * shift;
+        const y = sy + (ey - sy) * f - Math.sin(angle) * shift;
+        pdf.text(str, x, y, { angle: -angle * 180 / Math.PI });
+        pdf.restoreGraphicsState();
+    });
+};
+
+const drawSvg = (pdf: jsPDF, svg: SVGSVGElement, p: Placement) => {
+    const walk = (node: Element, opacity: number) => {
+        Array.from(node.children).forEach(el => {
+            const tag = el.tagName.toLowerCase();
+            if (!(el instanceof SVGGraphicsElement) || SKIP_TAGS.has(tag)) return;
+            const cs = getComputedStyle(el);
+            if (cs.display === 'none') return;
+            const alpha = opacity * parseFloat(cs.opacity || '1');
+            if (tag === 'g' || tag === 'svg' || tag === 'a') walk(el, alpha);
+            else if (cs.visibility === 'hidden') return;
+            else if (tag === 'text') drawText(pdf, el as SVGTextElement, svg, alpha, p);
+            else drawShape(pdf, el, svg, alpha, p);
+        });
+    };
+    walk(svg, parseFloat(getComputedStyle(svg).opacity || '1'));
+};
+
+// --- Helper: Restrict painting to a page-space rectangle until the next restore ---
+const clipTo = (pdf: jsPDF, x: number, y: number, w: number, h: number) => {
+    pdf.moveTo(x, y);
+    pdf.lineTo(x + w, y);
+    pdf.lineTo(x + w, y + h);
+    pdf.lineTo(x, y + h);
+    pdf.close();
+    pdf.clip();
+    pdf.discardPath();
+};
+
+// --- Helper: Capture one section and return a painter that places it at a page position ---
+const captureSection = async (el: HTMLElement, index: number, mmPerPx: number, stats: ReportStats) => {
+    const rect = el.getBoundingClientRect();
+    const snapshotEls = [el, ...Array.from(el.querySelectorAll<HTMLElement>('[data-report-snapshot]'))]
+        .filter(s => s.hasAttribute('data-report-snapshot') && visible(s));
+    const svgs = vectorSvgs(el);
+
+    const snaps: { url: string, rect: DOMRect }[] = [];
+    for (const s of snapshotEls) snaps.push({ url: await snapshotImage(s, stats), rect: s.getBoundingClientRect() });
+    const image = snapshotEls[0] === el ? null : await rasterize(el, [...svgs, ...snapshotEls], stats);
+    // Map overlays are clipped to the map, as the browser clips them to its container
+    const clips = svgs.map(svg => snapshotEls.find(s => s.contains(svg))?.getBoundingClientRect() ?? null);
+
+    return (pdf: jsPDF, x: number, y: number) => {
+        const p: Placement = { x, y, left: rect.left, top: rect.top, mmPerPx };
+        const at = (r: DOMRect): [number, number, number, number] =>
+            [x + (r.left - rect.left) * mmPerPx, y + (r.top - rect.top) * mmPerPx, r.width * mmPerPx, r.height * mmPerPx];
+        if (image) pdf.addImage(image, 'JPEG', x, y, rect.width * mmPerPx, rect.height * mmPerPx, `section-${index}`, 'FAST');
+        snaps.forEach((s, i) => pdf.addImage(s.url, 'JPEG', ...at(s.rect), `snapshot-${index}-${i}`, 'FAST'));
+        svgs.forEach((svg, i) => {
+            const clip = clips[i];
+            pdf.saveGraphicsState();
+            if (clip) clipTo(pdf, ...at(clip));
+            drawSvg(pdf, svg, p);
+            pdf.restoreGraphicsState();
+        });
+    };
+};
+
+export const exportReport = async (root: HTMLElement, filename: string): Promise<ReportStats> => {
+    const t0 = performance.now();
+    await document.fonts?.ready;
+    const settled = await whenReportReady(root);
+    const stats: ReportStats = {
+        totalMs: 0, waitMs: Math.round(performance.now() - t0), settled,
+        sections: 0, pages: 1, peakCanvas: { width: 0, height: 0 }, snapshotHits: 0
+    };
+    if (!settled) console.warn(`Report: content still rendering after ${READY_TIMEOUT_MS} ms, exporting what is there`);
+
+    const rootRect = root.getBoundingClientRect();
+    const mmPerPx = CONTENT_W / rootRect.width;
+    const blocks = collectBlocks(root, CONTENT_H / mmPerPx);
+    const pdf = new jsPDF({ unit: 'mm', format: 'a4', orientation: 'portrait' });
+    const bottom = PAGE_H - MARGIN;
+    let y = MARGIN;
+    let prevBottom: number | null = null; // px, bottom of the last section placed on this page
+
+    const newPage = () => { pdf.addPage(); stats.pages++; y = MARGIN; prevBottom = null; };
+
+    for (let i = 0; i < blocks.length; i++) {
+        const block = blocks[i];
+        if (block.kind === 'break') { if (y > MARGIN) newPage(); continue; }
+
+        const rect = block.el.getBoundingClientRect();
+        const h = rect.height * mmPerPx;
+        const next = blocks[i + 1];
+        const keep = isHeading(block.el) && next?.kind === 'section' ? Math.min(KEEP_WITH_NEXT_MM, next.el.getBoundingClientRect().height * mmPerPx) : 0;
+        let gap = prevBottom === null ? 0 : Math.max(0, rect.top - prevBottom) * mmPerPx;
+        if (y > MARGIN && y + gap + h + keep > bottom) { newPage(); gap = 0; }
+        y += gap;
+
+        const paint = await captureSection(block.el, stats.sections++, mmPerPx, stats);
+        const x = MARGIN + (rect.left - rootRect.left) * mmPerPx;
+        if (y + h <= bottom + 0.01) {
+            paint(pdf, x, y);
+            y += h;
+        } else {
+            // Taller than a page: draw it once per page, shifted up and clipped to the margins
+            for (let top = y; ; top -= CONTENT_H) {
+                pdf.saveGraphicsState();
+                clipTo(pdf, 0, MARGIN, PAGE_W, CONTENT_H);
+                paint(pdf, x, top);
+                pdf.restoreGraphicsState();
+                if (top + h <= bottom) { y = top + h; break; }
+                newPage();
+            }
+        }
+        prevBottom = rect.bottom;
+    }
+
+    pdf.save(filename);
+    stats.totalMs = Math.round(performance.now() - t0);
+    const { width, height } = stats.peakCanvas;
+    console.info(
+        `Report: ${filename} — ${stats.pages} pages, ${stats.sections} sections in ${stats.totalMs} ms (waited ${stats.waitMs} ms); ` +
+        `peak canvas ${width}×${height} px (${(width * height * 4 / 1048576).toFixed(1)} MB), ${stats.snapshotHits} cached map snapshot(s)`
+    );
+    return stats;
+};
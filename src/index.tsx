@@ -1,8 +1,11 @@
 import React from 'react';
 import ReactDOM from 'react-dom/client';
 import App from '../App';
+import { registerOfflineWorker } from '../services/offlineService';
 import './index.css';
 
+if (import.meta.env.PROD) registerOfflineWorker();
+
 ReactDOM.createRoot(document.getElementById('root')!).render(
     <React.StrictMode>
         <App />
@@ -71,6 +71,7 @@ export interface SystemSpecs {
   pumpPowerKW: number;
   pvArrayKW: number;
   pipeDiameterMM: number;
+  tankM3?: number; // Set by a design-search choice; standard sizing holds one day's demand
   // Institutional Counts
   countSchools: number;
   countClinics: number;
@@ -190,6 +191,13 @@ export interface SimulationResult {
   handpumpWins: number;
   solarWinRate: number;
   distribution: MonteCarloStat[];
+  iterations: number; // Scenarios actually run (fewer than requested if stopped early)
+  seed: number; // Re-running with the same seed reproduces the result exactly
+  converged: boolean; // True if the run stopped early on win-rate precision
+  winRateInterval: [number, number]; // 95% interval on solarWinRate (%)
+  p5: number; // Quantiles of the Solar - Handpump differential
+  p50: number;
+  p95: number;
 }
 
 // --- ANALYTICS & DASHBOARD TYPES ---
@@ -215,8 +223,14 @@ export interface ReportLog {
   solarNetValue: number;
   handpumpNetValue: number;
   winner: 'Solar' | 'Handpump';
+
+  // Client timings at generation (see utils/perf.ts), so slow field devices show up in the logs
+  perf?: PerfDigest;
 }
 
+// Metric name -> [samples, p50 ms, p95 ms], times to 0.1 ms
+export type PerfDigest = Record<string, [number, number, number]>;
+
 export interface DashboardStats {
   totalReports: number;
   totalPopulationServed: number;
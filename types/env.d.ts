@@ -0,0 +1,9 @@
+// Build-time settings read through Vite's import.meta.env (set in .env.local)
+interface ImportMetaEnv {
+    readonly VITE_ANALYTICS_URL?: string; // e.g. http://localhost:5000/exec for the local app.py backend
+    readonly PROD: boolean; // true in `vite build` output
+}
+
+interface ImportMeta {
+    readonly env: ImportMetaEnv;
+}
@@ -1,18 +1,18 @@
-import re
+"""Patch set: population Sync button (SiteMap.tsx) and extended report logging (App.tsx).
 
-# File Paths
-sitemap_path = r'c:\Users\jrobertson\Downloads\SPWS1\components\SiteMap.tsx'
-app_path = r'c:\Users\jrobertson\Downloads\SPWS1\App.tsx'
+Run on its own (``python update_pop_and_log.py [--dry-run] [--root DIR]``) or through patch_engine.py.
+"""
 
-# --- 1. Update SiteMap.tsx: Add Sync Button ---
-with open(sitemap_path, 'r', encoding='utf-8') as f:
-    sitemap_content = f.read()
+import sys
 
-# Find the Target Population input
-# We want to replace the div containing the label and input with a more complex one
-target_pop_pattern = r'(<div><label className="block text-gray-600 text-xs font-bold mb-1">Target Population</label><input type="number" value={population} onChange={e => setPopulation\(parseFloat\(e.target.value\) \|\| 0\)} className="w-full p-2 border rounded" /></div>)'
+from patch_engine import main, replace, replace_block
 
-new_target_pop = r'''<div>
+SITEMAP = 'components/SiteMap.tsx'
+APP = 'App.tsx'
+
+OLD_TARGET_POP = '<div><label className="block text-gray-600 text-xs font-bold mb-1">Target Population</label><input type="number" value={population} onChange={e => setPopulation(parseFloat(e.target.value) || 0)} className="w-full p-2 border rounded" /></div>'
+
+NEW_TARGET_POP = '''<div>
                         <label className="block text-gray-600 text-xs font-bold mb-1">Target Population</label>
                         <div className="flex gap-2">
                             <input type="number" value={population} onChange={e => setPopulation(parseFloat(e.target.value) || 0)} className="w-full p-2 border rounded" />
@@ -29,25 +29,7 @@ new_target_pop = r'''<div>
                         </div>
                     </div>'''
 
-sitemap_content = sitemap_content.replace(
-    '<div><label className="block text-gray-600 text-xs font-bold mb-1">Target Population</label><input type="number" value={population} onChange={e => setPopulation(parseFloat(e.target.value) || 0)} className="w-full p-2 border rounded" /></div>',
-    new_target_pop
-)
-
-with open(sitemap_path, 'w', encoding='utf-8') as f:
-    f.write(sitemap_content)
-
-print("Updated SiteMap.tsx with Sync Button.")
-
-# --- 2. Update App.tsx: Enhance Logging ---
-with open(app_path, 'r', encoding='utf-8') as f:
-    app_content = f.read()
-
-# Find the AnalyticsService.logReport call
-# We will replace the entire object passed to logReport
-log_pattern = r'AnalyticsService\.logReport\(\{[\s\S]*?\}\);'
-
-new_log_call = r'''AnalyticsService.logReport({
+LOG_REPORT = '''AnalyticsService.logReport({
             siteName: projectDetails.siteName,
             contractNumber: projectDetails.contractNumber,
             location: systemGeometry ? systemGeometry.center : { lat: 0, lng: 0 },
@@ -76,9 +58,13 @@ new_log_call = r'''AnalyticsService.logReport({
             }
         });'''
 
-app_content = re.sub(log_pattern, new_log_call, app_content)
+PATCHES = [
+    # Target Population gets a Sync button fed by the spatial estimate
+    replace(SITEMAP, OLD_TARGET_POP, NEW_TARGET_POP, name='target-pop-sync'),
+    # Report logging carries the hydraulic inputs, specs, BoQ total and pipeline lengths
+    replace_block(APP, 'AnalyticsService.logReport({', '});', LOG_REPORT, name='log-report-extended'),
+]
 
-with open(app_path, 'w', encoding='utf-8') as f:
-    f.write(app_content)
 
-print("Updated App.tsx with enhanced logging.")
+if __name__ == '__main__':
+    sys.exit(main(patches=PATCHES))
@@ -0,0 +1,175 @@
+import { BoQItem, HydraulicInputs, SystemSpecs } from '../types';
+import { DESIGN_COSTS, HOURLY_DEMAND_PATTERN, INSTITUTIONAL_DEMAND, PIPE_CATALOGUE, TANK_SIZES_M3 } from '../constants';
+import { headLossHW } from './hydraulics';
+import type { DesignSearchOptions } from './designOptimizer';
+
+// --- System sizing & Bill of Quantities ---
+// Pure function of the drawn quantities, so the map, the portfolio engine (portfolio.py)
+// and its parity fixtures all size a site the same way. A DesignChoice (from the design
+// search in utils/designOptimizer.ts) replaces the standard sizing; without one the result
+// is exactly the standard design that portfolio.py mirrors.
+
+export interface SiteQuantities {
+    population: number;
+    risingLen: number; // m
+    mainLen: number;
+    distLen: number;
+    hasRisingMain: boolean;
+    taps: number;
+    schools: number;
+    clinics: number;
+    gardens: number;
+    hasGrid: boolean;
+    boreholeElevation?: number; // m; both must be known (non-zero) to replace elevationDifference
+    tankElevation?: number;
+    mainLines?: { id: string, length: number }[]; // Per-line lengths, needed to price a DesignChoice
+}
+
+// Sizes picked by the design search; everything else is sized as standard
+export interface DesignChoice {
+    risingDiameterMM: number;
+    mainDiameters: Record<string, number>; // mm per main line id (63 when missing)
+    pvRatio: number; // PV array kWp per pump kW
+    tankM3: number;
+    limits?: DesignSearchOptions; // Searched under these; re-checked on every calculation (defaults when missing)
+}
+
+const PV_DERATE = 0.75; // Array output at the pump vs. nameplate (heat, soiling, wiring, controller)
+const SUN_START_H = 8;
+const SUN_END_H = 16;
+
+// $/m of pipe material for a catalogue diameter
+export const pipeRate = (diameterMM: number) =>
+    PIPE_CATALOGUE.find(p => p.diameterMM === diameterMM)?.costPerM ?? DESIGN_COSTS.PIPE_HDPE_63MM;
+
+// Smallest standard tank holding the volume
+export const tankSizeFor = (volumeM3: number) => {
+    const size = TANK_SIZES_M3.find(v => v >= volumeM3);
+    const step = TANK_SIZES_M3[TANK_SIZES_M3.length - 1];
+    return size ?? Math.ceil(volumeM3 / step) * step;
+};
+
+// Hourly pump output as a share of its rated flow. Irradiance follows a half sine between
+// 08:00 and 16:00 scaled to the peak sun hours; an oversized array reaches the pump's rating
+// earlier and holds it through midday, so it delivers the day's volume at a lower rated flow.
+export const pumpingProfile = (pvRatio: number, peakSunHours: number): Float64Array => {
+    const span = SUN_END_H - SUN_START_H;
+    let sum = 0;
+    for (let h = SUN_START_H; h <= SUN_END_H; h++) sum += Math.sin(((h - SUN_START_H) / span) * Math.PI);
+    const out = new Float64Array(24);
+    for (let h = SUN_START_H; h <= SUN_END_H; h++) {
+        const sun = Math.sin(((h - SUN_START_H) / span) * Math.PI) * peakSunHours / sum;
+        out[h] = Math.min(1, pvRatio * sun * PV_DERATE);
+    }
+    return out;
+};
+
+// Storage (m3) that carries the demand pattern through the pumping day: the spread of the
+// running balance when the pump delivers exactly the daily demand
+export const storageNeed = (profile: Float64Array, dailyDemandM3: number) => {
+    const pumped = profile.reduce((acc, v) => acc + v, 0);
+    const patternSum = HOURLY_DEMAND_PATTERN.reduce((acc, v) => acc + v, 0);
+    let level = 0, lo = 0, hi = 0;
+    for (let h = 0; h < 24; h++) {
+        level += dailyDemandM3 * (profile[h] / pumped - HOURLY_DEMAND_PATTERN[h] / patternSum);
+        if (level < lo) lo = level;
+        if (level > hi) hi = level;
+    }
+    return hi - lo;
+};
+
+export const designSystem = (site: SiteQuantities, inputs: HydraulicInputs, choice?: DesignChoice | null): { specs: SystemSpecs, boq: BoQItem[] } => {
+    const { risingLen: rLen, mainLen: mLen, distLen: dLen, schools: countSchools, clinics: countClinics, gardens: countGardens, hasGrid } = site;
+    const totalPipeLen = rLen + mLen + dLen;
+
+    const domesticDemandM3 = (site.population * inputs.dailyDemandPerCapita) / 1000;
+    const institutionalDemandM3 = (
+        (countSchools * INSTITUTIONAL_DEMAND.SCHOOL) +
+        (countClinics * INSTITUTIONAL_DEMAND.CLINIC) +
+        (countGardens * INSTITUTIONAL_DEMAND.GARDEN)
+    ) / 1000;
+
+    const dailyDemandM3 = domesticDemandM3 + institutionalDemandM3;
+    // A chosen PV ratio sets the pumping day and so the rated flow
+    const flowRateM3H = choice
+        ? dailyDemandM3 / pumpingProfile(choice.pvRatio, inputs.peakSunHours).reduce((acc, v) => acc + v, 0)
+        : dailyDemandM3 / inputs.peakSunHours;
+    const risingDiameterMM = choice?.risingDiameterMM ?? 63;
+    const tankM3 = choice ? choice.tankM3 : dailyDemandM3;
+
+    // Engineering
+    let staticHead = inputs.staticWaterLevel + inputs.tankHeight;
+    if (site.boreholeElevation && site.tankElevation) {
+        const elevDiff = Math.max(0, site.tankElevation - site.boreholeElevation);
+        staticHead = inputs.staticWaterLevel + elevDiff + inputs.tankHeight;
+    }
+    // The tank decouples the pump from the distribution network, so only the rising main's
+    // friction counts towards TDH; the flat factor remains for sketches without one
+    const frictionHead = site.hasRisingMain ? headLossHW(rLen, flowRateM3H, risingDiameterMM) : totalPipeLen * inputs.frictionLossFactor;
+    const totalDynamicHead = staticHead + frictionHead;
+    const hydraulicPowerKW = (flowRateM3H * totalDynamicHead * 9.81) / (3600 * inputs.pumpEfficiency);
+    const pumpPowerKW = hydraulicPowerKW * 1.2;
+    const pvArrayKW = pumpPowerKW * (choice?.pvRatio ?? 1.5);
+
+    const specs: SystemSpecs = {
+        dailyDemandM3, domesticDemandM3, institutionalDemandM3, totalDynamicHead, flowRateM3H, pumpPowerKW, pvArrayKW, pipeDiameterMM: risingDiameterMM,
+        countSchools, countClinics, countGardens, hasGrid
+    };
+    if (choice) specs.tankM3 = tankM3;
+
+    // Generate BoQ
+    const boq: BoQItem[] = [];
+    // Civils
+    boq.push({ id: 'c1', category: 'Civils', item: 'Borehole Drilling & Construction', unit: 'm', qty: inputs.boreholeDepth, rate: DESIGN_COSTS.DRILLING_PER_M, amount: Math.round(inputs.boreholeDepth * DESIGN_COSTS.DRILLING_PER_M) });
+    boq.push({ id: 'c2', category: 'Civils', item: 'Borehole Siting & Mob/Demob', unit: 'LS', qty: 1, rate: DESIGN_COSTS.DRILLING_BASE, amount: Math.round(DESIGN_COSTS.DRILLING_BASE) });
+    boq.push({ id: 'c3', category: 'Civils', item: `Tank Stand (${inputs.tankHeight}m) & Base`, unit: 'Sum', qty: 1, rate: DESIGN_COSTS.TANK_STAND_6M, amount: Math.round(DESIGN_COSTS.TANK_STAND_6M) });
+    boq.push({ id: 'c4', category: 'Civils', item: 'Fencing & Site Works', unit: 'Sum', qty: 1, rate: DESIGN_COSTS.FENCE_CIVILS, amount: Math.round(DESIGN_COSTS.FENCE_CIVILS) });
+    boq.push({ id: 'c5', category: 'Civils', item: 'Tap Stand Construction', unit: 'No', qty: site.taps, rate: DESIGN_COSTS.DISTRIBUTION_POINTS, amount: Math.round(site.taps * DESIGN_COSTS.DISTRIBUTION_POINTS) });
+
+    // Network
+    boq.push({ id: 'n1', category: 'Network', item: 'Trenching & Backfill', unit: 'm', qty: Math.round(totalPipeLen), rate: DESIGN_COSTS.TRENCHING_PER_M, amount: Math.round(totalPipeLen * DESIGN_COSTS.TRENCHING_PER_M) });
+    const risingRate = pipeRate(risingDiameterMM);
+    if (rLen > 0) boq.push({ id: 'n2', category: 'Network', item: `Rising Main (HDPE ${risingDiameterMM}mm)`, unit: 'm', qty: Math.round(rLen), rate: risingRate, amount: Math.round(Math.round(rLen) * risingRate) });
+    if (choice && site.mainLines) {
+        // One line item per chosen diameter, largest first
+        const byDiameter = new Map<number, number>();
+        site.mainLines.forEach(ml => {
+            const d = choice.mainDiameters[ml.id] ?? 63;
+            byDiameter.set(d, (byDiameter.get(d) || 0) + ml.length);
+        });
+        [...byDiameter.entries()].sort((a, b) => b[0] - a[0]).forEach(([d, len]) => {
+            if (len > 0) boq.push({ id: `n3-${d}`, category: 'Network', item: `Main Line (HDPE ${d}mm)`, unit: 'm', qty: Math.round(len), rate: pipeRate(d), amount: Math.round(Math.round(len) * pipeRate(d)) });
+        });
+    } else if (mLen > 0) {
+        boq.push({ id: 'n3', category: 'Network', item: 'Main Line (HDPE 63mm)', unit: 'm', qty: Math.round(mLen), rate: DESIGN_COSTS.PIPE_HDPE_63MM, amount: Math.round(Math.round(mLen) * DESIGN_COSTS.PIPE_HDPE_63MM) });
+    }
+    if (dLen > 0) boq.push({ id: 'n4', category: 'Network', item: 'Distribution (HDPE 32mm)', unit: 'm', qty: Math.round(dLen), rate: DESIGN_COSTS.PIPE_HDPE_32MM, amount: Math.round(Math.round(dLen) * DESIGN_COSTS.PIPE_HDPE_32MM) });
+
+    // Institutional connections
+    const instCount = countSchools + countClinics + countGardens;
+    if (instCount > 0) {
+        boq.push({ id: 'n5', category: 'Network', item: 'Institution Connections (Fittings/Meter)', unit: 'No', qty: instCount, rate: DESIGN_COSTS.INSTITUTION_CONNECTION, amount: instCount * DESIGN_COSTS.INSTITUTION_CONNECTION });
+    }
+
+    // Mechanical
+    const tankCost = DESIGN_COSTS.TANK_STEEL_BASE + (tankM3 * DESIGN_COSTS.TANK_PER_M3);
+    boq.push({ id: 'm1', category: 'Mechanical', item: `Steel Tank (${Math.ceil(tankM3)}m3)`, unit: 'No', qty: 1, rate: Math.round(tankCost), amount: Math.round(tankCost) });
+    const pumpCost = DESIGN_COSTS.PUMP_BASE + (pumpPowerKW * DESIGN_COSTS.PUMP_PER_KW);
+    boq.push({ id: 'm2', category: 'Mechanical', item: `Submersible Pump (${pumpPowerKW.toFixed(1)}kW)`, unit: 'No', qty: 1, rate: Math.round(pumpCost), amount: Math.round(pumpCost) });
+
+    // Electrical
+    const pvCost = DESIGN_COSTS.PV_STRUCTURE_BASE + (pvArrayKW * DESIGN_COSTS.PV_PER_KW);
+    boq.push({ id: 'e1', category: 'Electrical', item: `Solar Array (${pvArrayKW.toFixed(2)}kWp) & Structure`, unit: 'kW', qty: Math.ceil(pvArrayKW), rate: DESIGN_COSTS.PV_PER_KW, amount: Math.round(pvCost) });
+    boq.push({ id: 'e2', category: 'Electrical', item: 'Solar Pump Inverter/Controller', unit: 'No', qty: 1, rate: 1500, amount: 1500 });
+    if (hasGrid) {
+        boq.push({ id: 'e3', category: 'Electrical', item: 'Mini-Grid Kiosk / Charging Station', unit: 'Sum', qty: 1, rate: 4500, amount: 4500 });
+    }
+
+    return { specs, boq };
+};
+
+// Solar CapEx split used by the auto-scaler: civil works vs equipment
+export const boqCapex = (boq: BoQItem[]) => ({
+    civils: boq.filter(i => i.category === 'Civils' || i.category === 'Network').reduce((acc, i) => acc + i.amount, 0),
+    equip: boq.filter(i => i.category === 'Mechanical' || i.category === 'Electrical').reduce((acc, i) => acc + i.amount, 0)
+});
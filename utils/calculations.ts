@@ -1,4 +1,5 @@
-import { GlobalParams, HandpumpParams, SolarSystemParams, FinancialResult, ComparisonSummary, BenefitsParams, AdditionalBenefitsParams, RevenueParams, SystemSpecs, SimulationResult, MonteCarloStat } from '../types';
+import { GlobalParams, HandpumpParams, SolarSystemParams, FinancialResult, ComparisonSummary, BenefitsParams, AdditionalBenefitsParams, RevenueParams, SystemSpecs, SimulationResult } from '../types';
+import { createMonteCarloRun, MonteCarloOptions } from './monteCarlo';
 
 export const calculateNPV = (
     global: GlobalParams,
@@ -134,62 +135,13 @@ export const calculateNPV = (
     return { yearlyData: results, summary };
 };
 
+// Synchronous run (the UI uses the Monte Carlo worker; see services/monteCarloService.ts)
 export const runMonteCarloSimulation = (
     summary: ComparisonSummary,
-    simMetric: 'economic' | 'financial'
+    simMetric: 'economic' | 'financial',
+    options: Partial<MonteCarloOptions> = {}
 ): SimulationResult => {
-    const iterations = 10000;
-    const diffs: number[] = [];
-    let sWins = 0;
-
-    for (let i = 0; i < iterations; i++) {
-        const rand = () => 1 + (Math.random() * 0.4 - 0.2);
-
-        const sCap = summary.capexSolar * rand();
-        const hCap = summary.capexHandpump * rand();
-        const sOpex = summary.opexSolarNPV * rand();
-        const hOpex = summary.opexHandpumpNPV * rand();
-
-        const sTimeVal = summary.timeSavedSolarNPV * rand();
-        const hTimeVal = summary.timeSavedHandpumpNPV * rand();
-        const sHealthVal = summary.healthBenefitSolarNPV * rand();
-        const hHealthVal = summary.healthBenefitHandpumpNPV * rand();
-
-        const sAddVal = (summary.valueSchoolNPV + summary.valueClinicNPV + summary.valueGardenNPV + summary.valueEnergyNPV + summary.valueCarbonNPV) * rand();
-        const sRisk = summary.theftRiskNPV * rand();
-
-        let sNet = 0;
-        let hNet = 0;
-
-        if (simMetric === 'financial') {
-            const sRev = summary.revenueSolarNPV * rand();
-            const hRev = summary.revenueHandpumpNPV * rand();
-            // Financial: Revenue - Opex (Assuming CapEx covered externally as per new requirement)
-            sNet = sRev - sOpex;
-            hNet = hRev - hOpex;
-        } else {
-            // Economic: All Benefits - All Costs (Including CapEx)
-            sNet = (sTimeVal + sHealthVal + sAddVal) - (sCap + sOpex + sRisk);
-            hNet = (hTimeVal + hHealthVal) - (hCap + hOpex);
-        }
-
-        if (sNet > hNet) sWins++;
-        diffs.push(sNet - hNet);
-    }
-
-    diffs.sort((a, b) => a - b);
-    const bins = 40;
-    const min = diffs[0];
-    const max = diffs[diffs.length - 1];
-    const range = max - min;
-    const binSize = range / bins;
-
-    const dist: MonteCarloStat[] = [];
-    for (let b = 0; b < bins; b++) {
-        const start = min + b * binSize;
-        const end = start + binSize;
-        const count = diffs.filter(d => d >= start && d < end).length;
-        dist.push({ binStart: start, binEnd: end, count, label: `${(start / 1000).toFixed(0)}k` });
-    }
-    return { solarWins: sWins, handpumpWins: iterations - sWins, solarWinRate: (sWins / iterations) * 100, distribution: dist };
+    const run = createMonteCarloRun(summary, simMetric, options);
+    while (!run.step(10000)) { /* Batches only matter for early stopping here */ }
+    return run.finish();
 };
@@ -0,0 +1,93 @@
+import * as L from 'leaflet';
+import { CogService, RasterPart } from '../services/cogService';
+
+// --- Leaflet grid layer that renders COG parts tile by tile ---
+// Each map tile asks CogService for the matching window of every part it overlaps and
+// colours it through a 256-step palette lookup table. The stretch (min/max) is read on every
+// draw, so `redraw()` after a contrast change re-colours cached values without any I/O.
+
+export interface RasterRamp {
+    min: number;
+    max: number;
+    palette: string[];
+}
+
+const LUT_STEPS = 256;
+
+// --- Helper: Linear RGB palette ramp (same interpolation as chroma.scale) ---
+export const buildPaletteLut = (palette: string[]): Uint8ClampedArray => {
+    const stops = palette.map(hex => {
+        const h = hex.replace('#', '');
+        const full = h.length === 3 ? h.split('').map(c => c + c).join('') : h;
+        return [0, 2, 4].map(o => parseInt(full.slice(o, o + 2), 16));
+    });
+    const lut = new Uint8ClampedArray(LUT_STEPS * 3);
+    for (let i = 0; i < LUT_STEPS; i++) {
+        const t = i / (LUT_STEPS - 1) * (stops.length - 1);
+        const k = Math.min(Math.floor(t), stops.length - 2);
+        const f = stops.length > 1 ? t - k : 0;
+        const a = stops[Math.max(0, k)], b = stops[Math.min(stops.length - 1, k + 1)];
+        for (let c = 0; c < 3; c++) lut[i * 3 + c] = a[c] + (b[c] - a[c]) * f;
+    }
+    return lut;
+};
+
+export interface CogTileLayerOptions {
+    parts: RasterPart[];
+    getRamp: () => RasterRamp; // Read at draw time so contrast changes only need redraw()
+    opacity?: number;
+}
+
+// --- Helper: Union of part bounds as Leaflet LatLngBounds (tiles outside are never requested) ---
+const partsToLatLngBounds = (parts: RasterPart[]): L.LatLngBounds => {
+    const bounds = L.latLngBounds([]);
+    parts.forEach(({ bounds: [minX, minY, maxX, maxY] }) => {
+        bounds.extend(L.CRS.EPSG3857.unproject(L.point(minX, minY)));
+        bounds.extend(L.CRS.EPSG3857.unproject(L.point(maxX, maxY)));
+    });
+    return bounds;
+};
+
+export const createCogTileLayer = ({ parts, getRamp, opacity = 1 }: CogTileLayerOptions): L.GridLayer => {
+    let lut: Uint8ClampedArray | null = null;
+    let lutPalette = '';
+
+    const CogLayer = (L.GridLayer as any).extend({
+        createTile(coords: L.Coords, done: (err: Error | undefined, tile: HTMLElement) => void) {
+            const size = this.getTileSize();
+            const canvas = document.createElement('canvas');
+            canvas.width = size.x;
+            canvas.height = size.y;
+
+            Promise.all(parts.map(part => CogService.readTile(part, coords, size.x))).then(results => {
+                const { min, max, palette } = getRamp();
+                if (palette.join() !== lutPalette) { lut = buildPaletteLut(palette); lutPalette = palette.join(); }
+                const ctx = canvas.getContext('2d');
+                if (!ctx || !lut || results.every(r => !r)) { done(undefined, canvas); return; }
+
+                const img = ctx.createImageData(size.x, size.y);
+                const px = img.data;
+                const span = max - min || 1;
+                // Later parts only paint where earlier parts had no data
+                results.forEach(values => {
+                    if (!values) return;
+                    for (let i = 0; i < values.length; i++) {
+                        const v = values[i];
+                        if (v !== v || px[i * 4 + 3] !== 0) continue; // NaN = nodata
+                        const t = Math.max(0, Math.min(LUT_STEPS - 1, Math.round((v - min) / span * (LUT_STEPS - 1))));
+                        px[i * 4] = lut![t * 3];
+                        px[i * 4 + 1] = lut![t * 3 + 1];
+                        px[i * 4 + 2] = lut![t * 3 + 2];
+                        px[i * 4 + 3] = 255;
+                    }
+                });
+                ctx.putImageData(img, 0, 0);
+                done(undefined, canvas);
+            }).catch(e => done(e, canvas));
+
+            return canvas;
+        }
+    });
+
+    return new CogLayer({ opacity, bounds: partsToLatLngBounds(parts), updateWhenZooming: false }) as L.GridLayer;
+};
@@ -0,0 +1,77 @@
+import { SpatialGrid } from './spatialIndex';
+
+// --- Service Coverage Classification ---
+// Buildings are represented by packed centroids [lat0, lng0, lat1, lng1, ...] and service
+// points (taps, schools, clinics, gardens, grid kiosks) the same way. A building is served
+// when its centroid is within `bufferDistance` metres of any service point.
+
+export const COVERAGE_UNSERVED = 0;
+export const COVERAGE_SERVED = 1;
+
+export interface CoverageResult {
+    status: Uint8Array; // One entry per building (COVERAGE_SERVED / COVERAGE_UNSERVED)
+    servedCount: number;
+    unservedCount: number;
+}
+
+export const buildPointIndex = (points: ArrayLike<number>, cellSizeM: number): SpatialGrid => {
+    let refLat = 0;
+    const n = points.length / 2;
+    for (let i = 0; i < n; i++) refLat += points[i * 2];
+    const grid = new SpatialGrid(n > 0 ? refLat / n : 0, cellSizeM);
+    for (let i = 0; i < n; i++) grid.addPoint(i, points[i * 2], points[i * 2 + 1]);
+    return grid;
+};
+
+// Cell size equal to the buffer keeps each query to a 3x3 neighbourhood
+export const buildServiceIndex = (servicePoints: ArrayLike<number>, bufferDistance: number): SpatialGrid =>
+    buildPointIndex(servicePoints, Math.max(bufferDistance, 10));
+
+// Classifies buildings [start, end) into `status`; returns the number served in that range
+export const classifyCoverageRange = (
+    grid: SpatialGrid,
+    centroids: ArrayLike<number>,
+    bufferDistance: number,
+    status: Uint8Array,
+    start: number,
+    end: number
+): number => {
+    let served = 0;
+    for (let i = start; i < end; i++) {
+        if (grid.anyPointWithin(centroids[i * 2], centroids[i * 2 + 1], bufferDistance)) {
+            status[i] = COVERAGE_SERVED;
+            served++;
+        } else {
+            status[i] = COVERAGE_UNSERVED;
+        }
+    }
+    return served;
+};
+
+export const classifyCoverage = (
+    centroids: ArrayLike<number>,
+    servicePoints: ArrayLike<number>,
+    bufferDistance: number
+): CoverageResult => {
+    const count = centroids.length / 2;
+    const status = new Uint8Array(count);
+    let servedCount = 0;
+
+    if (servicePoints.length > 0) {
+        const grid = buildServiceIndex(servicePoints, bufferDistance);
+        servedCount = classifyCoverageRange(grid, centroids, bufferDistance, status, 0, count);
+    }
+
+    return { status, servedCount, unservedCount: count - servedCount };
+};
+
+// --- Compact served/unserved bitmask (1 bit per building) ---
+export const packCoverageBits = (status: Uint8Array): Uint8Array => {
+    const bits = new Uint8Array((status.length + 7) >> 3);
+    for (let i = 0; i < status.length; i++) {
+        if (status[i] === COVERAGE_SERVED) bits[i >> 3] |= 1 << (i & 7);
+    }
+    return bits;
+};
+
+export const coverageBit = (bits: Uint8Array, i: number): number => (bits[i >> 3] >> (i & 7)) & 1;
@@ -0,0 +1,496 @@
+import { DEFAULT_DESIGN_SEARCH, PIPE_CATALOGUE, PV_RATIOS } from '../constants';
+import { HydraulicInputs, SystemSpecs } from '../types';
+import { DesignChoice, designSystem, pumpingProfile, SiteQuantities, storageNeed, tankSizeFor } from './boq';
+import { calculateNPV } from './calculations';
+import { headLossHW, NetworkSolution, PipeNetworkBuild, solveNetwork } from './hydraulics';
+import { NpvInputs } from './npvBatch';
+
+// --- Design search: lifecycle-cost sizing of pipes, tank, pump and PV array ---
+// The tank decouples the two halves of the system, so they are searched separately:
+//   * Plant: every rising-main diameter x PV ratio. The PV ratio sets the pumping day and so
+//     the pump's rated flow, TDH and the storage the tank must carry; each combination is
+//     priced through designSystem. A handful of combinations, scored exhaustively.
+//   * Network: one catalogue diameter per main line, by branch and bound. Flows in a branched
+//     network follow from the demands alone, so every tap's head loss through every line at
+//     every diameter is computed once up front; a design is then a sum of cached losses.
+//     A partial assignment is cut when even the largest remaining pipes cannot beat the
+//     pressure of a known design that costs no more than its cheapest completion.
+// The surviving designs form the Pareto frontier of cost vs. minimum tap pressure; the best
+// design is the cheapest one on it that meets the pressure limit.
+//
+// In a looped network resizing a pipe moves flow between the paths, so the cached losses
+// only rank designs: each frontier design is re-solved with solveNetwork and scored on the
+// solved heads and flows before the frontier and the best design are settled.
+//
+// Costs are DESIGN_COSTS prices; the objective adds the discounted OPEX, replacements and
+// theft losses of calculateNPV, which grow linearly with CAPEX.
+
+export interface DesignSearchOptions {
+    minTapPressure: number; // m at the worst tap
+    maxVelocity: number; // m/s in the rising main and the mains
+    minStorageDays: number; // Tank floor, as a share of a day's demand
+}
+
+// Everything the search needs from the drawn network (built once per calculation)
+export interface DesignProblem {
+    site: SiteQuantities;
+    lines: { id: string, name: string, length: number, maxFlowM3H: number }[];
+    // Per tap with a known ground level: ground level, then the links from the tank to it (CSR)
+    tapElevation: Float64Array;
+    tapBaseHead: Float64Array; // m; tank water level less losses in the fixed-size connection
+    tapPathStart: Int32Array;
+    tapPathLinks: Int32Array;
+    linkLine: Int32Array; // Main line of each link on a path
+    linkLength: Float64Array;
+    linkFlowM3H: Float64Array;
+    // Checks against the network as solved
+    build: PipeNetworkBuild;
+    tapNodes: Int32Array;
+    tapHead: Float64Array; // m; solved head at each tap, for the sizes it was solved with
+    looped: boolean; // More links than a tree needs among the nodes fed by the tank
+    unconnectedTaps: number; // Taps with a ground level but no path to the tank
+}
+
+export interface DesignCandidate {
+    choice: DesignChoice | null; // null for the standard sizing
+    capex: number; // BoQ total
+    lifecycleCost: number; // CAPEX plus discounted OPEX, replacements and theft
+    minPressure: number; // m at the worst tap; NaN when no tap has a ground level
+    maxVelocity: number; // m/s
+    specs: SystemSpecs;
+}
+
+export interface DesignSearchResult {
+    best: DesignCandidate | null; // null when no design meets the limits (see reason)
+    standard: DesignCandidate;
+    frontier: DesignCandidate[]; // Ascending cost and minimum pressure
+    evaluated: number; // Complete designs scored
+    pruned: number; // Partial designs cut by the bounds
+    space: number; // Designs in the full search space
+    exhaustive: boolean; // False if the node budget ran out first
+    reason?: string;
+}
+
+const MAX_WORK = 2e7; // Branch-and-bound budget (tap pressures touched) per search
+const MAX_LOOP_WORK = 2e5; // Links solved (solves × network links) refining the best design of a looped network
+const STANDARD_DIAMETER_MM = 63;
+
+const velocity = (flowM3H: number, diameterMM: number) =>
+    flowM3H / 3600 / (Math.PI * Math.pow(diameterMM / 1000, 2) / 4);
+
+// --- Helper: Problem from a solved distribution network ---
+// taps: attachment index (into build.attachmentNodes) and ground level of each tap
+export const createDesignProblem = (
+    site: SiteQuantities,
+    build: PipeNetworkBuild,
+    solution: NetworkSolution,
+    lines: { id: string, name: string }[],
+    taps: { attachment: number, elevation: number }[],
+    sourceHead: number
+): DesignProblem => {
+    const { network, sourceNode, linkLine } = build;
+    const linkCount = network.linkFrom.length;
+    const flowM3H = new Float64Array(linkCount);
+    for (let l = 0; l < linkCount; l++) flowM3H[l] = Math.abs(solution.flows[l]) * 3600;
+
+    const lineLength = new Float64Array(lines.length);
+    const lineFlow = new Float64Array(lines.length);
+    for (let l = 0; l < linkCount; l++) {
+        const i = linkLine[l];
+        if (i < 0) continue;
+        lineLength[i] += network.linkLength[l];
+        if (flowM3H[l] > lineFlow[i]) lineFlow[i] = flowM3H[l];
+    }
+
+    // Path to every node from a breadth-first tree rooted at the tank (in a branched network
+    // this is the path the water takes; loops are flagged and checked by re-solving)
+    const adjStart = new Int32Array(network.nodeCount + 1);
+    for (let l = 0; l < linkCount; l++) { adjStart[network.linkFrom[l] + 1]++; adjStart[network.linkTo[l] + 1]++; }
+    for (let n = 0; n < network.nodeCount; n++) adjStart[n + 1] += adjStart[n];
+    const adj = new Int32Array(linkCount * 2);
+    const fill = adjStart.slice(0, network.nodeCount);
+    for (let l = 0; l < linkCount; l++) { adj[fill[network.linkFrom[l]]++] = l; adj[fill[network.linkTo[l]]++] = l; }
+    const parentLink = new Int32Array(network.nodeCount).fill(-1);
+    const seen = new Uint8Array(network.nodeCount);
+    const queue = [sourceNode];
+    seen[sourceNode] = 1;
+    for (let q = 0; q < queue.length; q++) {
+        const n = queue[q];
+        for (let k = adjStart[n]; k < adjStart[n + 1]; k++) {
+            const l = adj[k];
+            const m = network.linkFrom[l] === n ? network.linkTo[l] : network.linkFrom[l];
+            if (seen[m]) continue;
+            seen[m] = 1;
+            parentLink[m] = l;
+            queue.push(m);
+        }
+    }
+
+    let fedLinks = 0;
+    for (let l = 0; l < linkCount; l++) if (seen[network.linkFrom[l]] && seen[network.linkTo[l]]) fedLinks++;
+
+    const tapElevation: number[] = [], tapBaseHead: number[] = [], pathStart: number[] = [0], pathLinks: number[] = [];
+    const tapNodes: number[] = [], tapHead: number[] = [];
+    const keptLinks = new Map<number, number>(); // Network link -> index in the problem's link arrays
+    const linkIds: number[] = [];
+    let unconnectedTaps = 0;
+    taps.forEach(({ attachment, elevation }) => {
+        let n = build.attachmentNodes[attachment];
+        if (!seen[n]) { unconnectedTaps++; return; } // Reported by the search
+        tapNodes.push(n);
+        tapHead.push(solution.heads[n]);
+        let head = sourceHead;
+        while (n !== sourceNode) {
+            const l = parentLink[n];
+            if (linkLine[l] < 0) {
+                head -= headLossHW(network.linkLength[l], flowM3H[l], network.linkDiameter[l], network.linkRoughness[l]);
+            } else {
+                let id = keptLinks.get(l);
+                if (id === undefined) { id = linkIds.length; keptLinks.set(l, id); linkIds.push(l); }
+                pathLinks.push(id);
+            }
+            n = network.linkFrom[l] === n ? network.linkTo[l] : network.linkFrom[l];
+        }
+        tapElevation.push(elevation);
+        tapBaseHead.push(head);
+        pathStart.push(pathLinks.length);
+    });
+
+    return {
+        site,
+        lines: lines.map((line, i) => ({ ...line, length: lineLength[i], maxFlowM3H: lineFlow[i] })),
+        tapElevation: Float64Array.from(tapElevation),
+        tapBaseHead: Float64Array.from(tapBaseHead),
+        tapPathStart: Int32Array.from(pathStart),
+        tapPathLinks: Int32Array.from(pathLinks),
+        linkLine: Int32Array.from(linkIds.map(l => linkLine[l])),
+        linkLength: Float64Array.from(linkIds.map(l => network.linkLength[l])),
+        linkFlowM3H: Float64Array.from(linkIds.map(l => flowM3H[l])),
+        build,
+        tapNodes: Int32Array.from(tapNodes),
+        tapHead: Float64Array.from(tapHead),
+        looped: fedLinks > queue.length - 1,
+        unconnectedTaps
+    };
+};
+
+// --- Helper: Solve the network with the given main-line sizes (worst tap and fastest main) ---
+const solveSizes = (problem: DesignProblem, diameterOf: (line: number) => number) => {
+    const { network, linkLine } = problem.build;
+    const linkDiameter = network.linkDiameter.slice();
+    for (let l = 0; l < linkDiameter.length; l++) if (linkLine[l] >= 0) linkDiameter[l] = diameterOf(linkLine[l]);
+    const solution = solveNetwork({ ...network, linkDiameter });
+    let minPressure = Infinity, maxVelocity = 0;
+    problem.tapNodes.forEach((n, t) => { minPressure = Math.min(minPressure, solution.heads[n] - problem.tapElevation[t]); });
+    for (let l = 0; l < linkDiameter.length; l++) {
+        if (linkLine[l] >= 0) maxVelocity = Math.max(maxVelocity, velocity(Math.abs(solution.flows[l]) * 3600, linkDiameter[l]));
+    }
+    return { minPressure, maxVelocity };
+};
+
+// --- Helper: Why an applied choice breaks its limits (null while it meets them) ---
+// Demand, taps and mains keep changing after a design is applied, so the choice is checked on
+// every calculation against the specs it produced and the network as solved with its sizes.
+export const checkDesignChoice = (
+    choice: DesignChoice,
+    specs: SystemSpecs,
+    problem: DesignProblem | null,
+    inputs: HydraulicInputs
+): string | null => {
+    const limits = choice.limits ?? DEFAULT_DESIGN_SEARCH;
+    const daily = specs.dailyDemandM3;
+    const need = Math.max(storageNeed(pumpingProfile(choice.pvRatio, inputs.peakSunHours), daily), limits.minStorageDays * daily);
+    if (choice.tankM3 < need - 1e-6) return `the ${choice.tankM3} m³ tank is below the ${Math.ceil(need)} m³ of storage the demand now needs`;
+    if (!problem) return null; // No tank: nothing downstream to check
+    if (problem.site.hasRisingMain && velocity(specs.flowRateM3H, choice.risingDiameterMM) > limits.maxVelocity + 1e-9) {
+        return `the rising main now runs above ${limits.maxVelocity} m/s`;
+    }
+    const unsized = problem.lines.find(l => choice.mainDiameters[l.id] === undefined);
+    if (unsized) return `${unsized.name} was drawn after the sizes were picked`;
+    const fast = problem.lines.find(l => velocity(l.maxFlowM3H, choice.mainDiameters[l.id]) > limits.maxVelocity + 1e-9);
+    if (fast) return `${fast.name} now runs above ${limits.maxVelocity} m/s`;
+    let worst = Infinity;
+    problem.tapHead.forEach((head, t) => { worst = Math.min(worst, head - problem.tapElevation[t]); });
+    if (worst < limits.minTapPressure - 1e-3) return `the worst tap is down to ${worst.toFixed(1)} m, below the ${limits.minTapPressure} m limit`;
+    return null;
+};
+
+// --- Helper: Lifecycle cost as a function of CAPEX ---
+// calculateNPV charges the solar system's OPEX and replacements (independent of CAPEX) and a
+// theft loss proportional to CAPEX, so one evaluation at a unit CAPEX gives both terms.
+export const lifecycleCostModel = (npv: NpvInputs, layout: string, specs: SystemSpecs | null) => {
+    const { yearlyData, summary } = calculateNPV(
+        npv.global, { ...npv.solar, capexDrillingAndCivil: 0, capexEquip: 1 }, npv.handpump, npv.revenue, npv.benefits, npv.additionalBenefits, layout, specs
+    );
+    const fixed = yearlyData.reduce((acc, y) => acc + y.solarCost / Math.pow(1 + npv.global.discountRate / 100, y.year), 0);
+    const perCapex = 1 + summary.theftRiskNPV;
+    return (capex: number) => capex * perCapex + fixed;
+};
+
+const boqTotal = (site: SiteQuantities, inputs: HydraulicInputs, choice: DesignChoice | null) => {
+    const { specs, boq } = designSystem(site, inputs, choice);
+    return { specs, capex: boq.reduce((acc, item) => acc + item.amount, 0) };
+};
+
+export const optimizeDesign = (
+    problem: DesignProblem,
+    inputs: HydraulicInputs,
+    options: DesignSearchOptions,
+    lifecycleCost: (capex: number) => number
+): DesignSearchResult => {
+    const { site, lines } = problem;
+    const M = lines.length;
+    const K = PIPE_CATALOGUE.length;
+    const T = problem.tapElevation.length;
+    const catalogue = PIPE_CATALOGUE.map(p => p.diameterMM);
+    const rates = PIPE_CATALOGUE.map(p => p.costPerM);
+
+    // 1. Cached head loss of every tap through every main line at every diameter, held per
+    // line for the taps downstream of it: lineTaps[j] loses loss[j * K + k] at size k
+    const perTap = new Map<number, Float64Array>(); // line * T + tap -> loss per size
+    for (let t = 0; t < T; t++) {
+        for (let j = problem.tapPathStart[t]; j < problem.tapPathStart[t + 1]; j++) {
+            const l = problem.tapPathLinks[j];
+            const key = problem.linkLine[l] * T + t;
+            let row = perTap.get(key);
+            if (!row) { row = new Float64Array(K); perTap.set(key, row); }
+            for (let k = 0; k < K; k++) row[k] += headLossHW(problem.linkLength[l], problem.linkFlowM3H[l], catalogue[k]);
+        }
+    }
+    const keys = [...perTap.keys()].sort((a, b) => a - b);
+    const lineTapStart = new Int32Array(M + 1);
+    keys.forEach(key => { lineTapStart[Math.floor(key / T) + 1]++; });
+    for (let i = 0; i < M; i++) lineTapStart[i + 1] += lineTapStart[i];
+    const lineTaps = Int32Array.from(keys.map(key => key % T));
+    const loss = new Float64Array(keys.length * K);
+    keys.forEach((key, j) => loss.set(perTap.get(key)!, j * K));
+
+    const pressure = new Float64Array(T); // At each tap for the sizes being evaluated
+    const resetPressure = () => { for (let t = 0; t < T; t++) pressure[t] = problem.tapBaseHead[t] - problem.tapElevation[t]; };
+    const applySize = (i: number, k: number, sign: number) => {
+        for (let j = lineTapStart[i]; j < lineTapStart[i + 1]; j++) pressure[lineTaps[j]] -= sign * loss[j * K + k];
+    };
+    const minPressure = () => {
+        let min = Infinity;
+        for (let t = 0; t < T; t++) if (pressure[t] < min) min = pressure[t];
+        return min;
+    };
+
+    // 2. Standard sizing, for comparison
+    const standardIndex = catalogue.indexOf(STANDARD_DIAMETER_MM);
+    resetPressure();
+    for (let i = 0; i < M; i++) applySize(i, standardIndex, 1);
+    const std = boqTotal(site, inputs, null);
+    const stdSolved = problem.looped ? solveSizes(problem, () => STANDARD_DIAMETER_MM) : null;
+    const standard: DesignCandidate = {
+        choice: null, capex: std.capex, lifecycleCost: lifecycleCost(std.capex), specs: std.specs,
+        minPressure: T > 0 ? stdSolved?.minPressure ?? minPressure() : NaN,
+        maxVelocity: Math.max(
+            site.hasRisingMain ? velocity(std.specs.flowRateM3H, STANDARD_DIAMETER_MM) : 0,
+            stdSolved?.maxVelocity ?? Math.max(0, ...lines.map(l => velocity(l.maxFlowM3H, STANDARD_DIAMETER_MM)))
+        )
+    };
+    const plantSpace = (site.hasRisingMain ? K : 1) * PV_RATIOS.length;
+    const result: DesignSearchResult = {
+        best: null, standard, frontier: [], evaluated: 0, pruned: 0, space: plantSpace * Math.pow(K, M), exhaustive: true
+    };
+    const daily = std.specs.dailyDemandM3;
+    if (daily <= 0) return { ...result, reason: 'No demand to design for.' };
+    if (problem.unconnectedTaps > 0) {
+        const taps = problem.unconnectedTaps === 1 ? '1 tap is' : `${problem.unconnectedTaps} taps are`;
+        return { ...result, reason: `${taps} not connected to the tank; join their mains to it before sizing.` };
+    }
+
+    // 3. Plant: rising main x PV ratio, mains held at the standard size
+    const standardMains: Record<string, number> = {};
+    lines.forEach(l => { standardMains[l.id] = STANDARD_DIAMETER_MM; });
+    let bestPlant: { choice: DesignChoice, capex: number, velocity: number } | null = null;
+    for (const pvRatio of PV_RATIOS) {
+        const profile = pumpingProfile(pvRatio, inputs.peakSunHours);
+        const tankM3 = tankSizeFor(Math.max(storageNeed(profile, daily), options.minStorageDays * daily));
+        for (const risingDiameterMM of site.hasRisingMain ? catalogue : [STANDARD_DIAMETER_MM]) {
+            const choice: DesignChoice = { risingDiameterMM, mainDiameters: standardMains, pvRatio, tankM3, limits: options };
+            const { specs, capex } = boqTotal(site, inputs, choice);
+            result.evaluated++;
+            const v = site.hasRisingMain ? velocity(specs.flowRateM3H, risingDiameterMM) : 0;
+            if (v > options.maxVelocity) continue;
+            if (!bestPlant || capex < bestPlant.capex) bestPlant = { choice, capex, velocity: v };
+        }
+    }
+    if (!bestPlant) return { ...result, reason: `No catalogue pipe keeps the rising main under ${options.maxVelocity} m/s.` };
+
+    // 4. Network: per-line domains (velocity-feasible sizes, cheapest first)
+    const domains: number[][] = [];
+    for (let i = 0; i < M; i++) {
+        const allowed = catalogue.map((_, k) => k).filter(k => velocity(lines[i].maxFlowM3H, catalogue[k]) <= options.maxVelocity);
+        if (allowed.length === 0) return { ...result, reason: `No catalogue pipe keeps ${lines[i].name} under ${options.maxVelocity} m/s.` };
+        domains.push(allowed.sort((a, b) => rates[a] - rates[b]));
+    }
+    const largest = domains.map(d => d[d.length - 1]);
+
+    // Frontier: ascending cost with strictly rising pressure
+    const fCost: number[] = [], fPressure: number[] = [], fAssign: Int32Array[] = [];
+    const bestAt = (cost: number) => { // Highest pressure among frontier designs costing <= cost
+        let lo = 0, hi = fCost.length;
+        while (lo < hi) { const mid = (lo + hi) >> 1; if (fCost[mid] <= cost) lo = mid + 1; else hi = mid; }
+        return lo > 0 ? fPressure[lo - 1] : -Infinity;
+    };
+    const addToFrontier = (cost: number, p: number, assign: Int32Array) => {
+        if (p < 0 || bestAt(cost) >= p) return;
+        let at = 0;
+        while (at < fCost.length && fCost[at] < cost) at++;
+        let end = at;
+        while (end < fCost.length && fPressure[end] <= p) end++;
+        fCost.splice(at, end - at, cost);
+        fPressure.splice(at, end - at, p);
+        fAssign.splice(at, end - at, assign.slice());
+    };
+
+    // Seed the frontier greedily: start from the largest pipes and keep stepping down the
+    // line whose next size saves the most per metre of pressure lost. Every step is a design,
+    // so the bounds have incumbents across the whole pressure range from the start.
+    const assign = Int32Array.from(largest);
+    const stepOf = Int32Array.from(domains.map(d => d.length - 1)); // Position in each domain
+    resetPressure();
+    let seedCost = 0;
+    for (let i = 0; i < M; i++) { applySize(i, assign[i], 1); seedCost += lines[i].length * rates[assign[i]]; }
+    for (;;) {
+        const now = T > 0 ? minPressure() : 0;
+        addToFrontier(seedCost, now, assign);
+        result.evaluated++;
+        let move = -1, moveScore = -Infinity;
+        for (let i = 0; i < M; i++) {
+            if (stepOf[i] === 0) continue;
+            const from = assign[i], to = domains[i][stepOf[i] - 1];
+            let after = now; // Only the taps below this line lose pressure
+            for (let j = lineTapStart[i]; j < lineTapStart[i + 1]; j++) after = Math.min(after, pressure[lineTaps[j]] + loss[j * K + from] - loss[j * K + to]);
+            const score = lines[i].length * (rates[from] - rates[to]) / Math.max(1e-6, now - after);
+            if (score > moveScore) { move = i; moveScore = score; }
+        }
+        if (move < 0) break;
+        const from = assign[move], to = domains[move][--stepOf[move]];
+        applySize(move, from, -1);
+        applySize(move, to, 1);
+        seedCost -= lines[move].length * (rates[from] - rates[to]);
+        assign[move] = to;
+    }
+
+    // Branch and bound. Longest (costliest) lines are decided first, so bounds tighten early.
+    const order = lines.map((_, i) => i).sort((a, b) => lines[b].length - lines[a].length);
+    const restCost = new Float64Array(M + 1); // Cheapest sizes for the undecided lines
+    const restLoss = new Float64Array((M + 1) * T); // Least loss per tap (largest sizes) from them
+    for (let d = M - 1; d >= 0; d--) {
+        const i = order[d];
+        restCost[d] = restCost[d + 1] + lines[i].length * rates[domains[i][0]];
+        restLoss.copyWithin(d * T, (d + 1) * T, (d + 2) * T);
+        for (let j = lineTapStart[i]; j < lineTapStart[i + 1]; j++) restLoss[d * T + lineTaps[j]] += loss[j * K + largest[i]];
+    }
+
+    resetPressure();
+    let work = 0;
+    const search = (depth: number, cost: number) => {
+        if (work >= MAX_WORK) { result.exhaustive = false; return; }
+        work += T + 1;
+        let bound = T > 0 ? Infinity : 0; // Highest minimum pressure still reachable
+        for (let t = 0; t < T; t++) bound = Math.min(bound, pressure[t] - restLoss[depth * T + t]);
+        if (depth === M) {
+            result.evaluated++;
+            addToFrontier(cost, bound, assign);
+            return;
+        }
+        if (bound < 0 || bestAt(cost + restCost[depth]) >= bound) { result.pruned++; return; }
+        const i = order[depth];
+        for (const k of domains[i]) {
+            assign[i] = k;
+            applySize(i, k, 1);
+            search(depth + 1, cost + lines[i].length * rates[k]);
+            applySize(i, k, -1);
+            if (T === 0) break; // Without tap levels only cost matters: the cheapest size wins
+        }
+    };
+    search(0, 0);
+
+    // 5. Price the frontier as complete designs
+    const plant = bestPlant;
+    result.frontier = fAssign.map((a, f) => {
+        const mainDiameters: Record<string, number> = {};
+        lines.forEach((l, i) => { mainDiameters[l.id] = catalogue[a[i]]; });
+        const choice: DesignChoice = { ...plant.choice, mainDiameters };
+        const { specs, capex } = boqTotal(site, inputs, choice);
+        return {
+            choice, capex, specs, lifecycleCost: lifecycleCost(capex),
+            minPressure: T > 0 ? fPressure[f] : NaN,
+            maxVelocity: Math.max(plant.velocity, ...lines.map((l, i) => velocity(l.maxFlowM3H, catalogue[a[i]])))
+        };
+    });
+    if (problem.looped) {
+        // Re-score on solved flows. Designs that break the velocity limit are dropped, and so are
+        // designs that a cheaper one now matches.
+        const scored = result.frontier.map(c => {
+            const solved = solveSizes(problem, i => c.choice!.mainDiameters[lines[i].id]);
+            return { ...c, minPressure: T > 0 ? solved.minPressure : NaN, maxVelocity: Math.max(plant.velocity, solved.maxVelocity) };
+        }).filter(c => c.maxVelocity <= options.maxVelocity);
+
+        // The cached losses assumed tree flows. From the cheapest design that meets the limits,
+        // take the move that saves most while the solved network still meets them: one line a
+        // size down, or one down and another up (flow shifts between the two).
+        const start = scored.find(c => !(c.minPressure < options.minTapPressure));
+        if (start) {
+            const sizes = lines.map((l, i) => domains[i].indexOf(catalogue.indexOf(start.choice!.mainDiameters[l.id])));
+            const costAt = (i: number, step: number) => lines[i].length * rates[domains[i][step]];
+            const maxSolves = Math.max(10, Math.floor(MAX_LOOP_WORK / problem.build.network.linkFrom.length));
+            let solves = 0, refined: DesignCandidate | null = null;
+            for (let improved = true; improved;) {
+                improved = false;
+                const moves: { down: number, up: number, saving: number }[] = [];
+                for (let i = 0; i < M; i++) {
+                    if (sizes[i] === 0) continue;
+                    const down = costAt(i, sizes[i]) - costAt(i, sizes[i] - 1);
+                    moves.push({ down: i, up: -1, saving: down });
+                    for (let j = 0; j < M; j++) {
+                        if (j === i || sizes[j] === domains[j].length - 1) continue;
+                        const saving = down - (costAt(j, sizes[j] + 1) - costAt(j, sizes[j]));
+                        if (saving > 0) moves.push({ down: i, up: j, saving });
+                    }
+                }
+                moves.sort((a, b) => b.saving - a.saving);
+                for (const { down, up } of moves) {
+                    if (solves++ >= maxSolves) break;
+                    sizes[down]--;
+                    if (up >= 0) sizes[up]++;
+                    const solved = solveSizes(problem, j => catalogue[domains[j][sizes[j]]]);
+                    if (solved.maxVelocity <= options.maxVelocity && !(solved.minPressure < options.minTapPressure)) {
+                        const mainDiameters: Record<string, number> = {};
+                        lines.forEach((l, j) => { mainDiameters[l.id] = catalogue[domains[j][sizes[j]]]; });
+                        const choice: DesignChoice = { ...plant.choice, mainDiameters };
+                        const { specs, capex } = boqTotal(site, inputs, choice);
+                        refined = {
+                            choice, capex, specs, lifecycleCost: lifecycleCost(capex),
+                            minPressure: T > 0 ? solved.minPressure : NaN, maxVelocity: Math.max(plant.velocity, solved.maxVelocity)
+                        };
+                        improved = true;
+                        break;
+                    }
+                    sizes[down]++;
+                    if (up >= 0) sizes[up]--;
+                }
+            }
+            if (refined) scored.push(refined);
+        }
+        let best = -Infinity;
+        result.frontier = scored.sort((a, b) => a.capex - b.capex).filter(c => {
+            if (T === 0) return true;
+            if (c.minPressure <= best) return false;
+            best = c.minPressure;
+            return true;
+        });
+        result.exhaustive = false; // Ranked on tree flows, so cheaper loop sizings may remain
+    }
+    result.best = result.frontier.find(c => !(c.minPressure < options.minTapPressure)) ?? null;
+    if (!result.best) {
+        result.reason = result.frontier.length === 0 && problem.looped
+            ? `No sizing keeps every main under ${options.maxVelocity} m/s once flow shifts around the loops.`
+            : `Even the largest pipes leave a tap below ${options.minTapPressure} m; raise the tank or move the taps.`;
+    }
+    return result;
+};
@@ -0,0 +1,251 @@
+import * as L from 'leaflet';
+import { buildPaletteLut } from './cogTileLayer';
+import { coverageBit } from './coverage';
+import { FootprintData } from './footprints';
+
+// --- Building footprints on one canvas ---
+// Footprints are packed once into typed arrays (utils/footprints.ts: Web Mercator vertices,
+// ring and building offsets, bounding boxes, centroids) and drawn onto a single canvas, batched into one path
+// per status class. Served/unserved comes from the coverage worker's bitmask, so a new
+// analysis result is one redraw rather than a style write per polygon. The level of detail
+// follows the zoom: outlines close in, centroid dots further out, a density heatmap beyond.
+
+export type FootprintMode = 'polygons' | 'dots' | 'heatmap';
+
+export interface FootprintStyle {
+    fillColor: string; // #rrggbb
+    fillOpacity: number;
+    color: string;
+    weight: number;
+}
+
+export interface FootprintFrameStats {
+    buildings: number; // Loaded
+    drawn: number; // Inside the padded viewport
+    mode: FootprintMode;
+    frameMs: number;
+}
+
+export interface FootprintLayerOptions {
+    style: FootprintStyle; // Until a coverage result arrives
+    onFrame?: (stats: FootprintFrameStats) => void;
+}
+
+export interface FootprintLayer extends L.Layer {
+    setData: (data: FootprintData | null) => void; // Clears any coverage result
+    getData: () => FootprintData | null;
+    setCoverage: (bits: Uint8Array | null) => void; // One bit per building, from the coverage worker
+}
+
+const SERVED_STYLE: FootprintStyle = { fillColor: '#22c55e', fillOpacity: 0.5, color: '#22c55e', weight: 2 };
+const UNSERVED_STYLE: FootprintStyle = { fillColor: '#ef4444', fillOpacity: 0.3, color: '#ef4444', weight: 1 };
+
+const POLYGON_MIN_ZOOM = 16;
+const DOT_MIN_ZOOM = 14;
+const MAX_POLYGONS = 30000; // More outlines than this in view draw as dots whatever the zoom
+const HEAT_CELL_PX = 6;
+const PADDING = 0.25; // Canvas extends this fraction of the view beyond each edge, so short pans stay drawn
+const PANE = 'footprintPane';
+
+export const createFootprintLayer = ({ style, onFrame }: FootprintLayerOptions): FootprintLayer => {
+    const styles = [style, UNSERVED_STYLE, SERVED_STYLE]; // Indexed by status class
+    const statusLut = buildPaletteLut([UNSERVED_STYLE.fillColor, SERVED_STYLE.fillColor]);
+    const baseLut = buildPaletteLut([style.fillColor]);
+
+    let map: L.Map | null = null;
+    let canvas: HTMLCanvasElement | null = null;
+    let data: FootprintData | null = null;
+    let coverage: Uint8Array | null = null;
+    let origin: L.LatLng | null = null; // Top-left corner of the last frame, for zoom animation
+    let pending = 0;
+    // Visible building indices bucketed by status class, reused between frames
+    let buckets: Uint32Array[] = [];
+    const bucketSize = [0, 0, 0];
+
+    const statusOf = (i: number) => coverage ? 1 + coverageBit(coverage, i) : 0;
+
+    const drawPolygons = (ctx: CanvasRenderingContext2D, d: FootprintData, scale: number, ox: number, oy: number) => {
+        styles.forEach((s, cls) => {
+            if (bucketSize[cls] === 0) return;
+            ctx.beginPath();
+            const list = buckets[cls];
+            for (let k = 0; k < bucketSize[cls]; k++) {
+                const i = list[k];
+                for (let r = d.buildingStart[i]; r < d.buildingStart[i + 1]; r++) {
+                    const end = d.ringStart[r + 1];
+                    let v = d.ringStart[r];
+                    ctx.moveTo(d.xy[v * 2] * scale - ox, d.xy[v * 2 + 1] * scale - oy);
+                    for (v++; v < end; v++) ctx.lineTo(d.xy[v * 2] * scale - ox, d.xy[v * 2 + 1] * scale - oy);
+                    ctx.closePath();
+                }
+            }
+            ctx.globalAlpha = s.fillOpacity;
+            ctx.fillStyle = s.fillColor;
+            ctx.fill('evenodd');
+            ctx.globalAlpha = 1;
+            ctx.strokeStyle = s.color;
+            ctx.lineWidth = s.weight;
+            ctx.stroke();
+        });
+    };
+
+    const drawDots = (ctx: CanvasRenderingContext2D, d: FootprintData, scale: number, ox: number, oy: number, zoom: number) => {
+        const r = zoom >= 15 ? 2 : 1.5;
+        styles.forEach((s, cls) => {
+            if (bucketSize[cls] === 0) return;
+            ctx.beginPath();
+            const list = buckets[cls];
+            for (let k = 0; k < bucketSize[cls]; k++) {
+                const i = list[k];
+                const x = (d.bbox[i * 4] + d.bbox[i * 4 + 2]) / 2 * scale - ox;
+                const y = (d.bbox[i * 4 + 1] + d.bbox[i * 4 + 3]) / 2 * scale - oy;
+                ctx.rect(x - r, y - r, 2 * r, 2 * r);
+            }
+            ctx.fillStyle = s.fillColor;
+            ctx.fill();
+        });
+    };
+
+    // Counts per HEAT_CELL_PX cell, rendered small and scaled up smoothly. Opacity follows
+    // density; colour follows the served share once coverage is known.
+    const drawHeatmap = (ctx: CanvasRenderingContext2D, d: FootprintData, scale: number, ox: number, oy: number, w: number, h: number) => {
+        const gw = Math.ceil(w / HEAT_CELL_PX), gh = Math.ceil(h / HEAT_CELL_PX);
+        const total = new Float32Array(gw * gh);
+        const served = new Float32Array(gw * gh);
+        let max = 0;
+        for (let cls = 0; cls < 3; cls++) {
+            const list = buckets[cls];
+            for (let k = 0; k < bucketSize[cls]; k++) {
+                const i = list[k];
+                const cx = Math.floor(((d.bbox[i * 4] + d.bbox[i * 4 + 2]) / 2 * scale - ox) / HEAT_CELL_PX);
+                const cy = Math.floor(((d.bbox[i * 4 + 1] + d.bbox[i * 4 + 3]) / 2 * scale - oy) / HEAT_CELL_PX);
+                if (cx < 0 || cy < 0 || cx >= gw || cy >= gh) continue;
+                const c = cy * gw + cx;
+                total[c]++;
+                if (cls === 2) served[c]++;
+                if (total[c] > max) max = total[c];
+            }
+        }
+        if (max === 0) return;
+
+        const small = document.createElement('canvas');
+        small.width = gw;
+        small.height = gh;
+        const sctx = small.getContext('2d');
+        if (!sctx) return;
+        const img = sctx.createImageData(gw, gh);
+        const px = img.data;
+        for (let c = 0; c < total.length; c++) {
+            if (total[c] === 0) continue;
+            const lut = coverage ? statusLut : baseLut;
+            const t = coverage ? Math.round(served[c] / total[c] * 255) : 0;
+            px[c * 4] = lut[t * 3];
+            px[c * 4 + 1] = lut[t * 3 + 1];
+            px[c * 4 + 2] = lut[t * 3 + 2];
+            px[c * 4 + 3] = Math.round(40 + 200 * Math.sqrt(total[c] / max));
+        }
+        sctx.putImageData(img, 0, 0);
+        ctx.imageSmoothingEnabled = true;
+        ctx.drawImage(small, 0, 0, gw * HEAT_CELL_PX, gh * HEAT_CELL_PX);
+    };
+
+    const draw = () => {
+        if (!map || !canvas) return;
+        const t0 = performance.now();
+        const size = map.getSize();
+        const pad = size.multiplyBy(PADDING).round();
+        const topLeft = map.containerPointToLayerPoint(L.point(-pad.x, -pad.y)).round();
+        const w = size.x + 2 * pad.x, h = size.y + 2 * pad.y;
+        const dpr = window.devicePixelRatio || 1;
+
+        L.DomUtil.setPosition(canvas, topLeft);
+        origin = map.layerPointToLatLng(topLeft);
+        canvas.width = Math.round(w * dpr);
+        canvas.height = Math.round(h * dpr);
+        canvas.style.width = `${w}px`;
+        canvas.style.height = `${h}px`;
+        const ctx = canvas.getContext('2d');
+        if (!ctx) return;
+        ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+        ctx.lineJoin = 'round';
+
+        const zoom = map.getZoom();
+        const d = data;
+        if (!d || d.count === 0) {
+            onFrame?.({ buildings: 0, drawn: 0, mode: 'polygons', frameMs: performance.now() - t0 });
+            return;
+        }
+
+        // Canvas pixel (0, 0) in world pixels at this zoom
+        const scale = 256 * Math.pow(2, zoom);
+        const pixelOrigin = map.getPixelOrigin();
+        const ox = pixelOrigin.x + topLeft.x, oy = pixelOrigin.y + topLeft.y;
+        const minX = ox / scale, minY = oy / scale, maxX = (ox + w) / scale, maxY = (oy + h) / scale;
+
+        if (buckets.length === 0 || buckets[0].length < d.count) buckets = [0, 1, 2].map(() => new Uint32Array(d.count));
+        bucketSize.fill(0);
+        for (let i = 0; i < d.count; i++) {
+            const b = i * 4;
+            if (d.bbox[b + 2] < minX || d.bbox[b] > maxX || d.bbox[b + 3] < minY || d.bbox[b + 1] > maxY) continue;
+            const cls = statusOf(i);
+            buckets[cls][bucketSize[cls]++] = i;
+        }
+        const drawn = bucketSize[0] + bucketSize[1] + bucketSize[2];
+
+        const mode: FootprintMode = zoom >= POLYGON_MIN_ZOOM && drawn <= MAX_POLYGONS ? 'polygons' : zoom >= DOT_MIN_ZOOM ? 'dots' : 'heatmap';
+        if (mode === 'polygons') drawPolygons(ctx, d, scale, ox, oy);
+        else if (mode === 'dots') drawDots(ctx, d, scale, ox, oy, zoom);
+        else drawHeatmap(ctx, d, scale, ox, oy, w, h);
+
+        onFrame?.({ buildings: d.count, drawn, mode, frameMs: performance.now() - t0 });
+    };
+
+    // Data and coverage changes can arrive in bursts; draw once per animation frame
+    const schedule = () => {
+        if (!map || pending) return;
+        pending = requestAnimationFrame(() => { pending = 0; draw(); });
+    };
+
+    // Scale the last frame along with the map during zoom animations; moveend redraws
+    const animateZoom = (e: L.ZoomAnimEvent) => {
+        if (!map || !canvas || !origin) return;
+        const mapPane = map.getPane('mapPane')!;
+        const newPixelOrigin = map.project(e.center, e.zoom).subtract(map.getSize().divideBy(2)).add(L.DomUtil.getPosition(mapPane)).round();
+        L.DomUtil.setTransform(canvas, map.project(origin, e.zoom).subtract(newPixelOrigin), map.getZoomScale(e.zoom, map.getZoom()));
+    };
+
+    const FootprintCanvas = (L.Layer as any).extend({
+        onAdd(m: L.Map) {
+            map = m;
+            // Own pane between tiles (200) and overlays (400), so pipes and markers stay on top and clickable
+            const pane = m.getPane(PANE) ?? m.createPane(PANE);
+            pane.style.zIndex = '350';
+            pane.style.pointerEvents = 'none';
+            canvas = L.DomUtil.create('canvas', `leaflet-zoom-${m.options.zoomAnimation ? 'animated' : 'hide'}`, pane) as HTMLCanvasElement;
+            draw();
+        },
+        onRemove() {
+            if (pending) cancelAnimationFrame(pending);
+            pending = 0;
+            canvas?.remove();
+            canvas = null;
+            map = null;
+        },
+        getEvents() {
+            return { moveend: draw, viewreset: draw, resize: draw, zoomanim: animateZoom };
+        },
+        setData(next: FootprintData | null) {
+            data = next;
+            coverage = null;
+            schedule();
+        },
+        getData() {
+            return data;
+        },
+        setCoverage(bits: Uint8Array | null) {
+            coverage = bits;
+            schedule();
+        }
+    });
+    return new FootprintCanvas();
+};
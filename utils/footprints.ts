@@ -0,0 +1,105 @@
+// --- Packed building footprints ---
+// The typed-array form shared by the footprint layer, the coverage worker and the tile
+// caches. Kept free of Leaflet and the DOM so workers can pack footprints themselves.
+
+export interface FootprintData {
+    count: number; // Buildings
+    xy: Float64Array; // Web Mercator vertices, [x, y] in 0-1 world units, all rings of all buildings
+    ringStart: Uint32Array; // First vertex of each ring; rings + 1 entries
+    buildingStart: Uint32Array; // First ring of each building; count + 1 entries
+    bbox: Float64Array; // [minX, minY, maxX, maxY] per building, world units
+    centroids: Float64Array; // [lat, lng] per building (bounds centre, as the coverage worker expects)
+}
+
+const MAX_LAT = 85.0511287798; // Web Mercator limit, as Leaflet's EPSG:3857
+
+// --- Helper: Web Mercator world units (0-1, y down), matching Leaflet's EPSG:3857 pixel space ---
+const mercX = (lng: number) => (lng + 180) / 360;
+const mercY = (lat: number) => {
+    const s = Math.sin(Math.max(-MAX_LAT, Math.min(MAX_LAT, lat)) * Math.PI / 180);
+    return 0.5 - Math.log((1 + s) / (1 - s)) / (4 * Math.PI);
+};
+
+// Polygon and MultiPolygon features become one building each; other geometries are skipped
+const polygonsOf = (feature: any): number[][][][] => {
+    const g = feature?.geometry;
+    if (g?.type === 'Polygon') return [g.coordinates];
+    if (g?.type === 'MultiPolygon') return g.coordinates;
+    return [];
+};
+
+export const packFootprints = (features: any[]): FootprintData => {
+    let count = 0, rings = 0, vertices = 0;
+    features.forEach(f => {
+        const polys = polygonsOf(f);
+        if (polys.length === 0) return;
+        count++;
+        polys.forEach(p => p.forEach(r => { rings++; vertices += r.length; }));
+    });
+
+    const data: FootprintData = {
+        count,
+        xy: new Float64Array(vertices * 2),
+        ringStart: new Uint32Array(rings + 1),
+        buildingStart: new Uint32Array(count + 1),
+        bbox: new Float64Array(count * 4),
+        centroids: new Float64Array(count * 2)
+    };
+    let b = 0, r = 0, v = 0;
+    features.forEach(f => {
+        const polys = polygonsOf(f);
+        if (polys.length === 0) return;
+        data.buildingStart[b] = r;
+        let west = Infinity, south = Infinity, east = -Infinity, north = -Infinity;
+        polys.forEach(p => p.forEach(ring => {
+            data.ringStart[r++] = v;
+            ring.forEach(([lng, lat]) => {
+                data.xy[v * 2] = mercX(lng);
+                data.xy[v * 2 + 1] = mercY(lat);
+                v++;
+                if (lng < west) west = lng;
+                if (lng > east) east = lng;
+                if (lat < south) south = lat;
+                if (lat > north) north = lat;
+            });
+        }));
+        data.bbox.set([mercX(west), mercY(north), mercX(east), mercY(south)], b * 4);
+        data.centroids[b * 2] = (south + north) / 2;
+        data.centroids[b * 2 + 1] = (west + east) / 2;
+        b++;
+    });
+    data.buildingStart[count] = r;
+    data.ringStart[rings] = v;
+    return data;
+};
+
+// Concatenates packed sets (e.g. one per FlatGeobuf tile) without re-reading any GeoJSON
+export const mergeFootprints = (parts: FootprintData[]): FootprintData => {
+    const sum = (f: (d: FootprintData) => number) => parts.reduce((acc, d) => acc + f(d), 0);
+    const count = sum(d => d.count);
+    const rings = sum(d => d.ringStart.length - 1);
+    const vertices = sum(d => d.xy.length / 2);
+    const out: FootprintData = {
+        count,
+        xy: new Float64Array(vertices * 2),
+        ringStart: new Uint32Array(rings + 1),
+        buildingStart: new Uint32Array(count + 1),
+        bbox: new Float64Array(count * 4),
+        centroids: new Float64Array(count * 2)
+    };
+    let b = 0, r = 0, v = 0;
+    parts.forEach(d => {
+        const dRings = d.ringStart.length - 1;
+        out.xy.set(d.xy, v * 2);
+        out.bbox.set(d.bbox, b * 4);
+        out.centroids.set(d.centroids, b * 2);
+        for (let i = 0; i < dRings; i++) out.ringStart[r + i] = d.ringStart[i] + v;
+        for (let i = 0; i < d.count; i++) out.buildingStart[b + i] = d.buildingStart[i] + r;
+        b += d.count;
+        r += dRings;
+        v += d.xy.length / 2;
+    });
+    out.buildingStart[count] = r;
+    out.ringStart[rings] = v;
+    return out;
+};
@@ -0,0 +1,413 @@
+import { PipelineProfile } from '../types';
+import { haversineMeters } from './spatialIndex';
+import { LatLngPoint } from './networkModel';
+
+// --- Pipe network hydraulics (Hazen-Williams, global gradient method) ---
+// Flows and heads are solved together with the Todini & Pilati gradient method used by
+// EPANET: each Newton step linearises every link's head loss and solves one sparse,
+// symmetric positive-definite system for the junction heads. Branched and looped layouts
+// are handled the same way. The sparse LDL^T factorisation eliminates nodes in
+// minimum-degree order, which produces no fill on trees and very little on village-scale
+// loops, so a 2,000-node network solves in a few milliseconds.
+
+export const HW_EXPONENT = 1.852;
+export const DEFAULT_HW_C = 140; // HDPE
+
+const MIN_FLOW = 1e-6; // m3/s; keeps the gradient finite on dead ends and idle links
+const MIN_LINK_LENGTH = 0.01; // m
+const NODE_KEY_DIGITS = 6; // ~10 cm: vertices closer than this are one junction
+
+// Head loss (m) = r * Q^1.852 with Q in m3/s
+export const hwResistance = (lengthM: number, diameterMM: number, roughness = DEFAULT_HW_C) =>
+    10.67 * lengthM * Math.pow(roughness, -HW_EXPONENT) * Math.pow(diameterMM / 1000, -4.87);
+
+export const headLossHW = (lengthM: number, flowM3H: number, diameterMM: number, roughness = DEFAULT_HW_C) => {
+    const Q = flowM3H / 3600;
+    if (Q === 0 || diameterMM === 0) return 0;
+    return hwResistance(lengthM, diameterMM, roughness) * Math.pow(Math.abs(Q), HW_EXPONENT);
+};
+
+// Node/link arrays; links are directed from -> to, and a positive flow runs that way
+export interface PipeNetwork {
+    nodeCount: number;
+    demand: Float64Array; // m3/s withdrawn at each node
+    fixedHead: Float64Array; // m; NaN for junctions, the water level for tanks/reservoirs
+    linkFrom: Int32Array;
+    linkTo: Int32Array;
+    linkLength: Float64Array; // m
+    linkDiameter: Float64Array; // mm
+    linkRoughness: Float64Array; // Hazen-Williams C
+}
+
+export interface NetworkSolution {
+    heads: Float64Array; // m; NaN for nodes with no path to a fixed head
+    flows: Float64Array; // m3/s
+    unreached: Int32Array; // Nodes with no path to a fixed head (left out of the solve)
+    iterations: number;
+    converged: boolean; // False while any node is unreached
+}
+
+export interface SolveOptions {
+    maxIterations: number;
+    tolerance: number; // sum|dQ| / sum|Q|, as EPANET's accuracy setting
+}
+
+const DEFAULT_SOLVE: SolveOptions = { maxIterations: 40, tolerance: 1e-4 };
+
+// --- Helper: Symbolic LDL^T structure (elimination order, fill pattern, update plan) ---
+const analyseSparsity = (junctionCount: number, edges: [number, number][]) => {
+    const adj: Set<number>[] = Array.from({ length: junctionCount }, () => new Set<number>());
+    edges.forEach(([a, b]) => { adj[a].add(b); adj[b].add(a); });
+
+    // Minimum degree via a lazy binary heap of (degree, node); stale entries are skipped on pop
+    const heap: number[] = [];
+    const less = (a: number, b: number) => heap[a * 2] < heap[b * 2] || (heap[a * 2] === heap[b * 2] && heap[a * 2 + 1] < heap[b * 2 + 1]);
+    const swap = (a: number, b: number) => {
+        const d = heap[a * 2], v = heap[a * 2 + 1];
+        heap[a * 2] = heap[b * 2]; heap[a * 2 + 1] = heap[b * 2 + 1];
+        heap[b * 2] = d; heap[b * 2 + 1] = v;
+    };
+    const push = (degree: number, v: number) => {
+        heap.push(degree, v);
+        for (let i = heap.length / 2 - 1; i > 0 && less(i, (i - 1) >> 1); i = (i - 1) >> 1) swap(i, (i - 1) >> 1);
+    };
+    const pop = (): [number, number] => {
+        const top: [number, number] = [heap[0], heap[1]];
+        const last = heap.length / 2 - 1;
+        swap(0, last);
+        heap.length -= 2;
+        for (let i = 0; ;) {
+            const l = i * 2 + 1, r = l + 1;
+            let m = i;
+            if (l < last && less(l, m)) m = l;
+            if (r < last && less(r, m)) m = r;
+            if (m === i) break;
+            swap(i, m);
+            i = m;
+        }
+        return top;
+    };
+
+    const eliminated = new Uint8Array(junctionCount);
+    const order = new Int32Array(junctionCount);
+    const pattern: number[][] = new Array(junctionCount);
+    for (let v = 0; v < junctionCount; v++) push(adj[v].size, v);
+    for (let step = 0; step < junctionCount; step++) {
+        let best: number, degree: number;
+        do { [degree, best] = pop(); } while (eliminated[best] || degree !== adj[best].size);
+        const nbrs = Array.from(adj[best]);
+        order[step] = best;
+        pattern[best] = nbrs;
+        eliminated[best] = 1;
+        for (const u of nbrs) adj[u].delete(best);
+        for (let i = 0; i < nbrs.length; i++) {
+            for (let j = i + 1; j < nbrs.length; j++) { adj[nbrs[i]].add(nbrs[j]); adj[nbrs[j]].add(nbrs[i]); }
+        }
+        for (const u of nbrs) push(adj[u].size, u);
+    }
+
+    // Slots 0..n-1 hold the diagonal; off-diagonal entries (original plus fill) follow
+    const offSlots = new Map<number, number>();
+    const slot = (a: number, b: number) => {
+        if (a === b) return a;
+        const key = a < b ? a * junctionCount + b : b * junctionCount + a;
+        let s = offSlots.get(key);
+        if (s === undefined) { s = junctionCount + offSlots.size; offSlots.set(key, s); }
+        return s;
+    };
+
+    const patStart = new Int32Array(junctionCount + 1);
+    const patNode: number[] = [];
+    const patSlot: number[] = [];
+    const opStart = new Int32Array(junctionCount + 1);
+    const ops: number[] = []; // (target, sourceA, sourceB) triplets
+    for (let step = 0; step < junctionCount; step++) {
+        const v = order[step];
+        const nbrs = pattern[v];
+        patStart[step] = patNode.length;
+        opStart[step] = ops.length / 3;
+        nbrs.forEach(u => { patNode.push(u); patSlot.push(slot(v, u)); });
+        for (let i = 0; i < nbrs.length; i++) {
+            for (let j = i; j < nbrs.length; j++) ops.push(slot(nbrs[i], nbrs[j]), slot(v, nbrs[i]), slot(v, nbrs[j]));
+        }
+    }
+    patStart[junctionCount] = patNode.length;
+    opStart[junctionCount] = ops.length / 3;
+
+    return {
+        order, slot, patStart, opStart,
+        patNode: Int32Array.from(patNode),
+        patSlot: Int32Array.from(patSlot),
+        ops: Int32Array.from(ops),
+        slotCount: junctionCount + offSlots.size
+    };
+};
+
+// --- Helper: In-place LDL^T factorisation followed by a solve of A x = b (b becomes x) ---
+const factorAndSolve = (sym: ReturnType<typeof analyseSparsity>, val: Float64Array, b: Float64Array) => {
+    const { order, patStart, patNode, patSlot, opStart, ops } = sym;
+    const n = order.length;
+    for (let step = 0; step < n; step++) {
+        const v = order[step];
+        const d = val[v];
+        for (let o = opStart[step]; o < opStart[step + 1]; o++) {
+            val[ops[o * 3]] -= val[ops[o * 3 + 1]] * val[ops[o * 3 + 2]] / d;
+        }
+        for (let p = patStart[step]; p < patStart[step + 1]; p++) val[patSlot[p]] /= d;
+    }
+    // L z = b, then D w = z, then L^T x = w
+    for (let step = 0; step < n; step++) {
+        const v = order[step];
+        for (let p = patStart[step]; p < patStart[step + 1]; p++) b[patNode[p]] -= val[patSlot[p]] * b[v];
+    }
+    for (let v = 0; v < n; v++) b[v] /= val[v];
+    for (let step = n - 1; step >= 0; step--) {
+        const v = order[step];
+        let x = b[v];
+        for (let p = patStart[step]; p < patStart[step + 1]; p++) x -= val[patSlot[p]] * b[patNode[p]];
+        b[v] = x;
+    }
+};
+
+export const solveNetwork = (net: PipeNetwork, options: Partial<SolveOptions> = {}): NetworkSolution => {
+    const opts = { ...DEFAULT_SOLVE, ...options };
+    const { nodeCount, linkFrom, linkTo, fixedHead, demand } = net;
+    const linkCount = linkFrom.length;
+
+    // Only nodes connected to a fixed head have a defined pressure
+    const nodeLinks: number[][] = Array.from({ length: nodeCount }, () => []);
+    for (let k = 0; k < linkCount; k++) { nodeLinks[linkFrom[k]].push(k); nodeLinks[linkTo[k]].push(k); }
+    const reached = new Uint8Array(nodeCount);
+    const queue: number[] = [];
+    for (let i = 0; i < nodeCount; i++) if (!isNaN(fixedHead[i])) { reached[i] = 1; queue.push(i); }
+    while (queue.length) {
+        const i = queue.pop()!;
+        nodeLinks[i].forEach(k => {
+            const j = linkFrom[k] === i ? linkTo[k] : linkFrom[k];
+            if (!reached[j]) { reached[j] = 1; queue.push(j); }
+        });
+    }
+
+    const junction = new Int32Array(nodeCount).fill(-1);
+    let junctionCount = 0;
+    for (let i = 0; i < nodeCount; i++) if (reached[i] && isNaN(fixedHead[i])) junction[i] = junctionCount++;
+
+    const activeLinks: number[] = [];
+    const edges: [number, number][] = [];
+    for (let k = 0; k < linkCount; k++) {
+        if (!reached[linkFrom[k]]) continue;
+        activeLinks.push(k);
+        const a = junction[linkFrom[k]], b = junction[linkTo[k]];
+        if (a >= 0 && b >= 0 && a !== b) edges.push([a, b]);
+    }
+    const sym = analyseSparsity(junctionCount, edges);
+    const linkSlot = new Int32Array(linkCount).fill(-1);
+    activeLinks.forEach(k => {
+        const a = junction[linkFrom[k]], b = junction[linkTo[k]];
+        if (a >= 0 && b >= 0 && a !== b) linkSlot[k] = sym.slot(a, b);
+    });
+
+    const resistance = new Float64Array(linkCount);
+    const flows = new Float64Array(linkCount);
+    activeLinks.forEach(k => {
+        resistance[k] = hwResistance(Math.max(MIN_LINK_LENGTH, net.linkLength[k]), net.linkDiameter[k], net.linkRoughness[k]);
+        const area = Math.PI * Math.pow(net.linkDiameter[k] / 1000, 2) / 4;
+        flows[k] = area * 0.3; // ~1 ft/s, EPANET's starting velocity
+    });
+
+    const heads = new Float64Array(nodeCount).fill(NaN);
+    for (let i = 0; i < nodeCount; i++) if (!isNaN(fixedHead[i])) heads[i] = fixedHead[i];
+    const val = new Float64Array(sym.slotCount);
+    const rhs = new Float64Array(junctionCount);
+    const p = new Float64Array(linkCount);
+    const c = new Float64Array(linkCount);
+
+    let iterations = 0;
+    let converged = junctionCount === 0;
+    while (!converged && iterations < opts.maxIterations) {
+        iterations++;
+        val.fill(0);
+        for (let i = 0; i < nodeCount; i++) if (junction[i] >= 0) rhs[junction[i]] = -demand[i];
+
+        for (const k of activeLinks) {
+            const q = flows[k];
+            const aq = Math.max(Math.abs(q), MIN_FLOW);
+            const rq = resistance[k] * Math.pow(aq, HW_EXPONENT - 1);
+            // Linearised link: Q' = c + p * (H_from - H_to)
+            p[k] = 1 / (HW_EXPONENT * rq);
+            c[k] = q - p[k] * rq * q;
+            const a = junction[linkFrom[k]], b = junction[linkTo[k]];
+            if (a >= 0) { val[a] += p[k]; rhs[a] -= c[k]; }
+            if (b >= 0) { val[b] += p[k]; rhs[b] += c[k]; }
+            if (linkSlot[k] >= 0) val[linkSlot[k]] -= p[k];
+            else if (a >= 0 && b < 0) rhs[a] += p[k] * heads[linkTo[k]];
+            else if (b >= 0 && a < 0) rhs[b] += p[k] * heads[linkFrom[k]];
+        }
+
+        factorAndSolve(sym, val, rhs);
+        for (let i = 0; i < nodeCount; i++) if (junction[i] >= 0) heads[i] = rhs[junction[i]];
+
+        let change = 0, total = 0;
+        for (const k of activeLinks) {
+            const q = c[k] + p[k] * (heads[linkFrom[k]] - heads[linkTo[k]]);
+            change += Math.abs(q - flows[k]);
+            total += Math.abs(q);
+            flows[k] = q;
+        }
+        converged = change <= opts.tolerance * Math.max(total, MIN_FLOW);
+    }
+
+    const unreached: number[] = [];
+    for (let i = 0; i < nodeCount; i++) if (!reached[i]) unreached.push(i);
+    return { heads, flows, unreached: Int32Array.from(unreached), iterations, converged: converged && unreached.length === 0 };
+};
+
+// --- Layout -> graph ---
+// The tank is the single fixed-head source. Every main line is split at its vertices and at
+// the points where distribution lines join it; coincident points become one junction, which
+// is how branches and loops between mains are picked up.
+
+export interface LineAttachment {
+    point: LatLngPoint; // The tap or institution
+    lineId: string | null; // Main line it connects to, or null for straight to the tank
+    segIndex: number;
+    attach: LatLngPoint; // Connection point on that main line (or the tank)
+    demand: number; // m3/s
+    diameterMM: number;
+}
+
+export interface NetworkLayout {
+    source: LatLngPoint;
+    sourceHead: number; // m
+    mains: { id: string, path: LatLngPoint[], diameterMM: number }[];
+    attachments: LineAttachment[];
+    roughness?: number;
+}
+
+// Nodes along one main line in chainage order, for interpolating heads onto profiles
+export interface LineNodes {
+    nodes: Int32Array;
+    chainage: Float64Array; // m from the line start
+}
+
+export const buildPipeNetwork = (layout: NetworkLayout) => {
+    const roughness = layout.roughness ?? DEFAULT_HW_C;
+    const keyToNode = new Map<string, number>();
+    const demand: number[] = [];
+    const from: number[] = [], to: number[] = [], length: number[] = [], diameter: number[] = [];
+    const linkLine: number[] = []; // Index into layout.mains, -1 for attachment links
+
+    const nodeAt = (p: LatLngPoint) => {
+        const key = `${p.lat.toFixed(NODE_KEY_DIGITS)},${p.lng.toFixed(NODE_KEY_DIGITS)}`;
+        let n = keyToNode.get(key);
+        if (n === undefined) { n = demand.length; keyToNode.set(key, n); demand.push(0); }
+        return n;
+    };
+    const addLink = (a: number, b: number, len: number, dia: number, line: number) => {
+        if (a === b) return;
+        from.push(a); to.push(b); length.push(len); diameter.push(dia); linkLine.push(line);
+    };
+
+    const sourceNode = nodeAt(layout.source);
+    const byLine = new Map<string, LineAttachment[]>();
+    layout.attachments.forEach(att => {
+        if (att.lineId === null) return;
+        const list = byLine.get(att.lineId) || [];
+        list.push(att);
+        byLine.set(att.lineId, list);
+    });
+
+    const lineNodes = new Map<string, LineNodes>();
+    layout.mains.forEach((main, lineIndex) => {
+        const path = main.path;
+        if (path.length < 2) return;
+        const vertexChainage = [0];
+        for (let i = 1; i < path.length; i++) {
+            vertexChainage.push(vertexChainage[i - 1] + haversineMeters(path[i - 1].lat, path[i - 1].lng, path[i].lat, path[i].lng));
+        }
+        const stops: { chainage: number, point: LatLngPoint }[] = path.map((p, i) => ({ chainage: vertexChainage[i], point: p }));
+        (byLine.get(main.id) || []).forEach(att => {
+            const s = Math.min(att.segIndex, path.length - 2);
+            stops.push({ chainage: vertexChainage[s] + haversineMeters(path[s].lat, path[s].lng, att.attach.lat, att.attach.lng), point: att.attach });
+        });
+        stops.sort((a, b) => a.chainage - b.chainage);
+
+        const nodes: number[] = [];
+        const chainage: number[] = [];
+        stops.forEach(stop => {
+            const n = nodeAt(stop.point);
+            const prev = nodes.length ? nodes[nodes.length - 1] : -1;
+            if (prev >= 0) addLink(prev, n, stop.chainage - chainage[chainage.length - 1], main.diameterMM, lineIndex);
+            if (n !== prev) { nodes.push(n); chainage.push(stop.chainage); }
+        });
+        lineNodes.set(main.id, { nodes: Int32Array.from(nodes), chainage: Float64Array.from(chainage) });
+    });
+
+    const attachmentNodes = layout.attachments.map(att => {
+        const n = nodeAt(att.point);
+        demand[n] += att.demand;
+        const target = att.lineId === null ? sourceNode : nodeAt(att.attach);
+        addLink(target, n, haversineMeters(att.attach.lat, att.attach.lng, att.point.lat, att.point.lng), att.diameterMM, -1);
+        return n;
+    });
+
+    const nodeCount = demand.length;
+    const fixedHead = new Float64Array(nodeCount).fill(NaN);
+    fixedHead[sourceNode] = layout.sourceHead;
+    const network: PipeNetwork = {
+        nodeCount,
+        demand: Float64Array.from(demand),
+        fixedHead,
+        linkFrom: Int32Array.from(from),
+        linkTo: Int32Array.from(to),
+        linkLength: Float64Array.from(length),
+        linkDiameter: Float64Array.from(diameter),
+        linkRoughness: new Float64Array(from.length).fill(roughness)
+    };
+    return { network, sourceNode, lineNodes, linkLine: Int32Array.from(linkLine), attachmentNodes: Int32Array.from(attachmentNodes) };
+};
+
+export type PipeNetworkBuild = ReturnType<typeof buildPipeNetwork>;
+
+// Head at a chainage along a main line; head loss is linear in length within a link
+export const headAtChainage = (line: LineNodes, heads: Float64Array, d: number): number => {
+    const { nodes, chainage } = line;
+    if (nodes.length === 0) return NaN;
+    if (d <= chainage[0]) return heads[nodes[0]];
+    let lo = 0, hi = nodes.length - 1;
+    if (d >= chainage[hi]) return heads[nodes[hi]];
+    while (hi - lo > 1) {
+        const mid = (lo + hi) >> 1;
+        if (chainage[mid] <= d) lo = mid; else hi = mid;
+    }
+    const t = (d - chainage[lo]) / (chainage[hi] - chainage[lo] || 1);
+    return heads[nodes[lo]] + (heads[nodes[hi]] - heads[nodes[lo]]) * t;
+};
+
+// --- Pipeline profiles ---
+const PROFILE_HIGH_PRESSURE_M = 100; // Flagged above this head (m) at a point
+
+// Cumulative distance (m) at every vertex of a (densified) profile path
+export const profileChainage = (pts: LatLngPoint[]): number[] => {
+    const dists: number[] = [];
+    let total = 0;
+    pts.forEach((p, i) => {
+        if (i > 0) total += haversineMeters(pts[i - 1].lat, pts[i - 1].lng, p.lat, p.lng);
+        dists.push(total);
+    });
+    return dists;
+};
+
+// Profile rows from chainage, ground level and the hydraulic grade at each chainage
+export const profileRows = (dists: number[], elevs: number[], hglAt: (d: number) => number): PipelineProfile['data'] =>
+    dists.map((dist, i) => {
+        const hgl = hglAt(dist);
+        const pressure = hgl - (elevs[i] - 1); // At a tap ~1 m above ground
+        return {
+            dist,
+            elevation: elevs[i],
+            hgl,
+            pressure,
+            risk: pressure < 0 ? 'negative_pressure' : pressure > PROFILE_HIGH_PRESSURE_M ? 'high_pressure' : null
+        };
+    });
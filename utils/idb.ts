@@ -0,0 +1,80 @@
+// --- Minimal promise wrappers around IndexedDB ---
+// One database per feature area; stores are created in `upgrade`. All helpers resolve to
+// undefined / no-op (idbPut to false) when IndexedDB is unavailable (private mode, old
+// WebViews) so callers can treat persistence as best-effort.
+
+export const idbAvailable = () => typeof indexedDB !== 'undefined';
+
+const requestToPromise = <T>(req: IDBRequest<T>): Promise<T> => new Promise((resolve, reject) => {
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+});
+
+const dbCache = new Map<string, Promise<IDBDatabase | null>>();
+
+export const openDb = (name: string, version: number, upgrade: (db: IDBDatabase) => void): Promise<IDBDatabase | null> => {
+    const key = `${name}@${version}`;
+    if (!dbCache.has(key)) {
+        dbCache.set(key, new Promise(resolve => {
+            if (!idbAvailable()) { resolve(null); return; }
+            try {
+                const req = indexedDB.open(name, version);
+                req.onupgradeneeded = () => upgrade(req.result);
+                req.onsuccess = () => resolve(req.result);
+                req.onerror = () => { console.warn(`IndexedDB ${name} unavailable`, req.error); resolve(null); };
+                req.onblocked = () => resolve(null);
+            } catch (e) {
+                console.warn(`IndexedDB ${name} unavailable`, e);
+                resolve(null);
+            }
+        }));
+    }
+    return dbCache.get(key)!;
+};
+
+export const idbGet = async <T>(db: IDBDatabase | null, store: string, key: IDBValidKey): Promise<T | undefined> => {
+    if (!db) return undefined;
+    try {
+        return await requestToPromise(db.transaction(store, 'readonly').objectStore(store).get(key)) as T | undefined;
+    } catch (e) {
+        console.warn(`IndexedDB read failed (${store})`, e);
+        return undefined;
+    }
+};
+
+export const idbGetAll = async <T>(db: IDBDatabase | null, store: string): Promise<T[]> => {
+    if (!db) return [];
+    try {
+        return await requestToPromise(db.transaction(store, 'readonly').objectStore(store).getAll()) as T[];
+    } catch (e) {
+        console.warn(`IndexedDB read failed (${store})`, e);
+        return [];
+    }
+};
+
+// Resolves false when the write did not land (no database, quota exceeded, aborted)
+export const idbPut = async (db: IDBDatabase | null, store: string, value: unknown, key?: IDBValidKey): Promise<boolean> => {
+    if (!db) return false;
+    try {
+        const tx = db.transaction(store, 'readwrite');
+        tx.objectStore(store).put(value, key);
+        await new Promise<void>((resolve, reject) => {
+            tx.oncomplete = () => resolve();
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+        return true;
+    } catch (e) {
+        console.warn(`IndexedDB write failed (${store})`, e);
+        return false;
+    }
+};
+
+export const idbDelete = async (db: IDBDatabase | null, store: string, key: IDBValidKey): Promise<void> => {
+    if (!db) return;
+    try {
+        await requestToPromise(db.transaction(store, 'readwrite').objectStore(store).delete(key));
+    } catch (e) {
+        console.warn(`IndexedDB delete failed (${store})`, e);
+    }
+};
@@ -0,0 +1,56 @@
+// --- Least-Recently-Used cache ---
+// Map iteration order is insertion order, so re-inserting on access keeps the oldest entry first.
+// An optional size function bounds the cache by total weight (e.g. bytes) as well as entry count.
+
+export class LruCache<K, V> {
+    private entries = new Map<K, V>();
+    private weights = new Map<K, number>();
+    private totalWeight = 0;
+
+    constructor(
+        private readonly maxEntries: number,
+        private readonly maxWeight = Infinity,
+        private readonly weigh: (value: V) => number = () => 1
+    ) { }
+
+    get size() { return this.entries.size; }
+    get weight() { return this.totalWeight; }
+
+    has(key: K) { return this.entries.has(key); }
+
+    get(key: K): V | undefined {
+        if (!this.entries.has(key)) return undefined;
+        const value = this.entries.get(key)!;
+        this.entries.delete(key);
+        this.entries.set(key, value);
+        return value;
+    }
+
+    set(key: K, value: V) {
+        this.delete(key);
+        const w = this.weigh(value);
+        this.entries.set(key, value);
+        this.weights.set(key, w);
+        this.totalWeight += w;
+        while (this.entries.size > this.maxEntries || (this.totalWeight > this.maxWeight && this.entries.size > 1)) {
+            const oldest = this.entries.keys().next().value as K;
+            this.delete(oldest);
+        }
+    }
+
+    delete(key: K) {
+        if (!this.entries.has(key)) return false;
+        this.totalWeight -= this.weights.get(key) || 0;
+        this.entries.delete(key);
+        this.weights.delete(key);
+        return true;
+    }
+
+    clear() {
+        this.entries.clear();
+        this.weights.clear();
+        this.totalWeight = 0;
+    }
+
+    keys() { return Array.from(this.entries.keys()); }
+}
@@ -0,0 +1,189 @@
+import { ComparisonSummary, MonteCarloStat, SimulationResult } from '../types';
+import { createRng, DEFAULT_SEED } from './random';
+
+// --- Monte Carlo Engine (Solar vs Handpump NPV differential) ---
+// Every uncertain NPV term is scaled by an independent uniform factor in [1 - spread, 1 + spread].
+// Because solarNet - handpumpNet is linear in those terms, each scenario reduces to a signed
+// weight vector dotted with its factors, written straight into a Float64Array. Runs are
+// stepped in batches so a worker can report progress and stop early once the solar
+// win-rate confidence interval is tight enough.
+
+export type SimMetric = 'economic' | 'financial';
+
+export interface MonteCarloOptions {
+    iterations: number; // Upper bound on scenarios
+    seed: number;
+    bins: number;
+    spread: number; // 0.2 = every term varies by ±20%
+    earlyStop: boolean;
+    targetHalfWidth: number; // Stop once the 95% win-rate interval is within ± this many percentage points
+    minIterations: number; // Never stop early before this many scenarios
+}
+
+export const DEFAULT_MONTE_CARLO: MonteCarloOptions = {
+    iterations: 10000,
+    seed: DEFAULT_SEED,
+    bins: 40,
+    spread: 0.2,
+    earlyStop: false,
+    targetHalfWidth: 0.5,
+    minIterations: 10000
+};
+
+export interface MonteCarloProgress {
+    done: number;
+    total: number;
+    solarWinRate: number; // %
+    halfWidth: number; // 95% interval half-width on solarWinRate, percentage points
+}
+
+const Z_95 = 1.96;
+
+// --- Helper: Signed weights so that sum(w[k] * factor[k]) = solarNet - handpumpNet ---
+const differentialWeights = (s: ComparisonSummary, metric: SimMetric): Float64Array => {
+    if (metric === 'financial') {
+        // Financial: Revenue - Opex (CapEx covered externally)
+        return Float64Array.from([s.revenueSolarNPV, -s.opexSolarNPV, -s.revenueHandpumpNPV, s.opexHandpumpNPV]);
+    }
+    // Economic: All Benefits - All Costs (Including CapEx)
+    const additional = s.valueSchoolNPV + s.valueClinicNPV + s.valueGardenNPV + s.valueEnergyNPV + s.valueCarbonNPV;
+    return Float64Array.from([
+        s.timeSavedSolarNPV, s.healthBenefitSolarNPV, additional,
+        -s.capexSolar, -s.opexSolarNPV, -s.theftRiskNPV,
+        -s.timeSavedHandpumpNPV, -s.healthBenefitHandpumpNPV,
+        s.capexHandpump, s.opexHandpumpNPV
+    ]);
+};
+
+// --- Helper: 95% Wilson score interval for a proportion (as fractions) ---
+export const wilsonInterval = (successes: number, n: number): [number, number] => {
+    if (n === 0) return [0, 1];
+    const p = successes / n;
+    const z2 = Z_95 * Z_95;
+    const denom = 1 + z2 / n;
+    const centre = (p + z2 / (2 * n)) / denom;
+    const half = Z_95 * Math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / denom;
+    return [Math.max(0, centre - half), Math.min(1, centre + half)];
+};
+
+// --- Helper: k-th smallest value (in-place quickselect, reorders the array) ---
+const selectKth = (a: Float64Array, k: number): number => {
+    let lo = 0, hi = a.length - 1;
+    while (hi > lo) {
+        const pivot = a[(lo + hi) >> 1];
+        let i = lo, j = hi;
+        while (i <= j) {
+            while (a[i] < pivot) i++;
+            while (a[j] > pivot) j--;
+            if (i <= j) {
+                const t = a[i]; a[i] = a[j]; a[j] = t;
+                i++; j--;
+            }
+        }
+        if (k <= j) hi = j;
+        else if (k >= i) lo = i;
+        else break;
+    }
+    return a[k];
+};
+
+// Linearly interpolated quantile (same definition as numpy's default)
+export const quantile = (values: Float64Array, q: number): number => {
+    const n = values.length;
+    if (n === 0) return NaN;
+    const pos = q * (n - 1);
+    const k = Math.floor(pos);
+    const lower = selectKth(values, k);
+    if (pos === k) return lower;
+    // After selection everything above index k is >= lower; the next order statistic is their minimum
+    let upper = Infinity;
+    for (let i = k + 1; i < n; i++) if (values[i] < upper) upper = values[i];
+    return lower + (upper - lower) * (pos - k);
+};
+
+// Single pass histogram over [min, max]; the maximum lands in the last bin
+export const buildHistogram = (values: Float64Array, bins: number, min: number, max: number): MonteCarloStat[] => {
+    const range = max - min || 1;
+    const binSize = range / bins;
+    const counts = new Uint32Array(bins);
+    for (let i = 0; i < values.length; i++) {
+        const b = Math.floor((values[i] - min) / binSize);
+        counts[b >= bins ? bins - 1 : b < 0 ? 0 : b]++;
+    }
+    const dist: MonteCarloStat[] = [];
+    for (let b = 0; b < bins; b++) {
+        const start = min + b * binSize;
+        dist.push({ binStart: start, binEnd: start + binSize, count: counts[b], label: `${(start / 1000).toFixed(0)}k` });
+    }
+    return dist;
+};
+
+export const createMonteCarloRun = (summary: ComparisonSummary, metric: SimMetric, options: Partial<MonteCarloOptions> = {}) => {
+    const opts: MonteCarloOptions = { ...DEFAULT_MONTE_CARLO, ...options };
+    const total = Math.max(1, Math.floor(opts.iterations));
+    const weights = differentialWeights(summary, metric);
+    const terms = weights.length;
+    const base = weights.reduce((acc, w) => acc + w * (1 - opts.spread), 0);
+    const scaled = weights.map(w => w * 2 * opts.spread); // factor = (1 - spread) + 2 * spread * u
+    const rng = createRng(opts.seed);
+    const diffs = new Float64Array(total);
+    let done = 0;
+    let wins = 0;
+    let converged = false;
+
+    const progress = (): MonteCarloProgress => {
+        const [lo, hi] = wilsonInterval(wins, done);
+        return { done, total, solarWinRate: done ? wins / done * 100 : 0, halfWidth: (hi - lo) * 50 };
+    };
+
+    return {
+        total,
+
+        // Runs up to `count` more scenarios; returns true once the run is complete
+        step: (count: number): boolean => {
+            const end = Math.min(total, done + count);
+            for (let i = done; i < end; i++) {
+                let d = base;
+                for (let k = 0; k < terms; k++) d += scaled[k] * rng();
+                diffs[i] = d;
+                if (d > 0) wins++;
+            }
+            done = end;
+            if (opts.earlyStop && done >= opts.minIterations && done < total && progress().halfWidth <= opts.targetHalfWidth) {
+                converged = true;
+            }
+            return converged || done >= total;
+        },
+
+        progress,
+
+        finish: (): SimulationResult => {
+            const values = diffs.subarray(0, done);
+            let min = Infinity, max = -Infinity;
+            for (let i = 0; i < values.length; i++) {
+                const v = values[i];
+                if (v < min) min = v;
+                if (v > max) max = v;
+            }
+            const distribution = buildHistogram(values, opts.bins, min, max);
+            const [lo, hi] = wilsonInterval(wins, done);
+            // Quantiles reorder the buffer, so they come after the histogram
+            const p5 = quantile(values, 0.05);
+            const p50 = quantile(values, 0.5);
+            const p95 = quantile(values, 0.95);
+            return {
+                solarWins: wins,
+                handpumpWins: done - wins,
+                solarWinRate: done ? (wins / done) * 100 : 0,
+                distribution,
+                iterations: done,
+                seed: opts.seed,
+                converged,
+                winRateInterval: [lo * 100, hi * 100],
+                p5, p50, p95
+            };
+        }
+    };
+};
+
+export type MonteCarloRun = ReturnType<typeof createMonteCarloRun>;
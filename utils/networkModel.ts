@@ -0,0 +1,272 @@
+import { closestPointOnSegment, haversineMeters, SpatialGrid } from './spatialIndex';
+import { LruCache } from './lruCache';
+
+// --- Persistent pipe network model ---
+// SiteMap keeps its Leaflet layers as the source of truth for geometry; this model mirrors
+// each pipe's vertices under a stable id together with derived values (length). Syncing a
+// line whose vertices have not moved is a hash comparison, so only edited lines are
+// re-measured. Lines touched since the last `takeDirty` are reported so callers can
+// limit follow-up work (profiles, redraws) to them.
+
+export type NetworkLineKind = 'rising' | 'main' | 'dist';
+
+export interface LatLngPoint {
+    lat: number;
+    lng: number;
+}
+
+interface NetworkLine {
+    kind: NetworkLineKind;
+    hash: string;
+    path: LatLngPoint[];
+    length: number; // m
+}
+
+// 1e-7 degrees is ~1 cm, below anything a map click can distinguish
+export const vertexHash = (path: LatLngPoint[]): string =>
+    path.map(p => `${p.lat.toFixed(7)},${p.lng.toFixed(7)}`).join(';');
+
+export const pathLength = (path: LatLngPoint[]): number => {
+    let len = 0;
+    for (let i = 0; i < path.length - 1; i++) len += haversineMeters(path[i].lat, path[i].lng, path[i + 1].lat, path[i + 1].lng);
+    return len;
+};
+
+// --- Helper: Insert vertices along each segment so no gap exceeds spacingM ---
+export const densifyPath = <T extends LatLngPoint>(path: T[], spacingM: number): LatLngPoint[] => {
+    if (path.length < 2 || !(spacingM > 0)) return path.map(p => ({ lat: p.lat, lng: p.lng }));
+    const out: LatLngPoint[] = [{ lat: path[0].lat, lng: path[0].lng }];
+    for (let i = 1; i < path.length; i++) {
+        const a = path[i - 1], b = path[i];
+        const steps = Math.max(1, Math.ceil(haversineMeters(a.lat, a.lng, b.lat, b.lng) / spacingM));
+        for (let s = 1; s <= steps; s++) {
+            const t = s / steps;
+            out.push({ lat: a.lat + (b.lat - a.lat) * t, lng: a.lng + (b.lng - a.lng) * t });
+        }
+    }
+    return out;
+};
+
+export const createNetworkModel = () => {
+    const lines = new Map<string, NetworkLine>();
+    const dirty = new Set<string>();
+
+    return {
+        // Upserts a line; returns true if its geometry changed
+        syncLine: (id: string, kind: NetworkLineKind, path: LatLngPoint[]): boolean => {
+            const hash = vertexHash(path);
+            const current = lines.get(id);
+            if (current && current.hash === hash && current.kind === kind) return false;
+            lines.set(id, { kind, hash, path: path.map(p => ({ lat: p.lat, lng: p.lng })), length: pathLength(path) });
+            dirty.add(id);
+            return true;
+        },
+
+        // Drops every line of `kind` whose id is not in `keep`
+        retain: (kind: NetworkLineKind, keep: Iterable<string>) => {
+            const keepSet = new Set(keep);
+            lines.forEach((line, id) => {
+                if (line.kind === kind && !keepSet.has(id)) {
+                    lines.delete(id);
+                    dirty.add(id);
+                }
+            });
+        },
+
+        get: (id: string) => lines.get(id),
+        length: (id: string) => lines.get(id)?.length ?? 0,
+
+        totalLength: (kind: NetworkLineKind): number => {
+            let total = 0;
+            lines.forEach(line => { if (line.kind === kind) total += line.length; });
+            return total;
+        },
+
+        // Ids added, moved or removed since the previous call
+        takeDirty: (): string[] => {
+            const ids = Array.from(dirty);
+            dirty.clear();
+            return ids;
+        }
+    };
+};
+
+export type NetworkModel = ReturnType<typeof createNetworkModel>;
+
+// --- Per-line memo keyed by vertex hash ---
+// Holds promises, so concurrent requests for the same unchanged line share one computation.
+// Rejected entries, and results `keep` turns down (a stand-in for a failed lookup), are
+// evicted so a transient failure is retried on the next request.
+export const createPathMemo = <T>(maxEntries = 64, keep: (value: T) => boolean = () => true) => {
+    const cache = new LruCache<string, Promise<T>>(maxEntries);
+    return (path: LatLngPoint[], compute: () => Promise<T>): Promise<T> => {
+        const key = vertexHash(path);
+        const hit = cache.get(key);
+        if (hit) return hit;
+        const pending = compute();
+        cache.set(key, pending);
+        pending.then(value => { if (!keep(value)) cache.delete(key); }, () => cache.delete(key));
+        return pending;
+    };
+};
+
+// --- Auto-connections: nearest attachment point for each tap / institution ---
+// Every feature joins the closest point on any main line, or the tank itself when that is
+// strictly nearer. Ties between segments resolve to the first line drawn (then the first
+// segment along it), as a sequential scan in drawing order would.
+//
+// The index keeps the main-line segments in a SpatialGrid and remembers each feature's best
+// line hit, so a recalculation only searches for features that moved or were added. Drawing
+// a new line checks the cached hits against that line alone, deleting one re-searches only
+// the features that were attached to it, and moving the tank is one distance per feature.
+
+export interface ConnectionRequest {
+    id: string;
+    point: LatLngPoint;
+}
+
+export interface Connection {
+    featureId: string;
+    lineId: string | null; // null: connected straight to the tank
+    segIndex: number;
+    point: LatLngPoint; // Attachment point on the main (or the tank)
+    dist: number; // m
+}
+
+interface IndexedLine {
+    id: string;
+    hash: string;
+    path: LatLngPoint[];
+}
+
+interface CachedHit {
+    lat: number;
+    lng: number;
+    line: Connection | null; // Best main-line hit; the tank is compared on output
+}
+
+const MIN_CELL_M = 5;
+const MAX_CELL_M = 500;
+
+// --- Helper: Best hit on one line, replacing `best` only when strictly closer ---
+const scanLine = (featureId: string, p: LatLngPoint, line: IndexedLine, best: Connection | null): Connection | null => {
+    const path = line.path;
+    for (let i = 0; i < path.length - 1; i++) {
+        const cp = closestPointOnSegment(p.lat, p.lng, path[i].lat, path[i].lng, path[i + 1].lat, path[i + 1].lng);
+        const dist = haversineMeters(p.lat, p.lng, cp.lat, cp.lng);
+        if (!best || dist < best.dist) best = { featureId, lineId: line.id, segIndex: i, point: cp, dist };
+    }
+    return best;
+};
+
+export const createConnectionIndex = () => {
+    let lines: IndexedLine[] = [];
+    let grid: SpatialGrid | null = null;
+    let segLine: number[] = []; // Segment slot -> index into `lines`
+    let segIndex: number[] = []; // Segment slot -> segment number along its line
+    let tank: LatLngPoint | null = null;
+    const cache = new Map<string, CachedHit>();
+
+    const addToGrid = (from: number) => {
+        for (let l = from; l < lines.length; l++) {
+            const path = lines[l].path;
+            for (let i = 0; i < path.length - 1; i++) {
+                if (!grid) {
+                    // Cell size follows the drawn segments so a search touches a handful of cells
+                    let total = 0, count = 0;
+                    lines.forEach(line => { total += pathLength(line.path); count += Math.max(0, line.path.length - 1); });
+                    grid = new SpatialGrid(path[i].lat, Math.min(MAX_CELL_M, Math.max(MIN_CELL_M, total / Math.max(1, count))));
+                }
+                grid.addSegment(segLine.length, path[i].lat, path[i].lng, path[i + 1].lat, path[i + 1].lng);
+                segLine.push(l);
+                segIndex.push(i);
+            }
+        }
+    };
+
+    const search = (featureId: string, p: LatLngPoint): Connection | null => {
+        const hit = grid?.nearestSegment(p.lat, p.lng);
+        if (!hit) return null;
+        return { featureId, lineId: lines[segLine[hit.id]].id, segIndex: segIndex[hit.id], point: { lat: hit.lat, lng: hit.lng }, dist: hit.dist };
+    };
+
+    return {
+        // Re-indexes after lines are drawn, deleted or moved. Returns true if anything changed.
+        setMains: (mains: { id: string, path: LatLngPoint[] }[]): boolean => {
+            const next: IndexedLine[] = mains.map(m => ({ id: m.id, hash: vertexHash(m.path), path: m.path.map(p => ({ lat: p.lat, lng: p.lng })) }));
+            const same = (a: IndexedLine, b: IndexedLine) => a.id === b.id && a.hash === b.hash;
+            let prefix = 0;
+            while (prefix < lines.length && prefix < next.length && same(lines[prefix], next[prefix])) prefix++;
+            if (prefix === lines.length && prefix === next.length) return false;
+
+            if (prefix === lines.length) {
+                // Lines appended: segments go in after the existing ones, so slot order is
+                // still drawing order, and a cached hit only changes if a new line is strictly closer
+                const added = next.slice(prefix);
+                lines = next;
+                addToGrid(prefix);
+                cache.forEach((entry, featureId) => {
+                    const p = { lat: entry.lat, lng: entry.lng };
+                    added.forEach(line => { entry.line = scanLine(featureId, p, line, entry.line); });
+                });
+                return true;
+            }
+
+            // Deleted or moved lines: rebuild, and re-search only features whose hit was on a
+            // line that is gone or changed (every other hit is still the first-drawn minimum)
+            const kept = new Set(next.filter(line => lines.some(old => same(old, line))).map(line => line.id));
+            const movedOrAdded = next.some(line => !kept.has(line.id));
+            lines = next;
+            grid = null;
+            segLine = [];
+            segIndex = [];
+            addToGrid(0);
+            if (movedOrAdded) cache.clear();
+            else cache.forEach((entry, featureId) => { if (entry.line && !kept.has(entry.line.lineId!)) cache.delete(featureId); });
+            return true;
+        },
+
+        // Tank moves only change which features prefer the tank, never their line hit
+        setTank: (next: LatLngPoint | null): boolean => {
+            if (next === tank || (next && tank && next.lat === tank.lat && next.lng === tank.lng)) return false;
+            tank = next ? { lat: next.lat, lng: next.lng } : null;
+            return true;
+        },
+
+        // Connections in request order. Unmoved features reuse their cached line hit.
+        connect: (requests: ConnectionRequest[]): Connection[] => {
+            const out: Connection[] = [];
+            const seen = new Set<string>();
+            requests.forEach(({ id, point: p }) => {
+                seen.add(id);
+                let entry = cache.get(id);
+                if (!entry || entry.lat !== p.lat || entry.lng !== p.lng) {
+                    entry = { lat: p.lat, lng: p.lng, line: search(id, p) };
+                    cache.set(id, entry);
+                }
+                let best = entry.line;
+                if (tank) {
+                    const dist = haversineMeters(p.lat, p.lng, tank.lat, tank.lng);
+                    if (!best || dist < best.dist) best = { featureId: id, lineId: null, segIndex: 0, point: { lat: tank.lat, lng: tank.lng }, dist };
+                }
+                if (best) out.push(best);
+            });
+            cache.forEach((_, id) => { if (!seen.has(id)) cache.delete(id); });
+            return out;
+        }
+    };
+};
+
+export type ConnectionIndex = ReturnType<typeof createConnectionIndex>;
+
+// One-off search (bench, tests of the index); SiteMap keeps a ConnectionIndex between edits
+export const nearestConnections = (
+    requests: ConnectionRequest[],
+    mains: { id: string, path: LatLngPoint[] }[],
+    tank: LatLngPoint | null
+): Connection[] => {
+    const index = createConnectionIndex();
+    index.setMains(mains);
+    index.setTank(tank);
+    return index.connect(requests);
+};
@@ -0,0 +1,339 @@
+import { GlobalParams, SolarSystemParams, HandpumpParams, RevenueParams, BenefitsParams, AdditionalBenefitsParams, SystemSpecs, SimulationResult } from '../types';
+import { createRng, DEFAULT_SEED, Rng } from './random';
+import { buildHistogram, quantile, wilsonInterval, MonteCarloProgress, SimMetric } from './monteCarlo';
+
+// --- Batched lifecycle NPV kernel ---
+// Evaluates the same year-by-year model as `calculateNPV` for N parameter vectors at once.
+// Parameters are stored structure-of-arrays (one Float64Array column per input), and the
+// growth and discount factors are carried as running products. No objects are allocated
+// per year or per row, so 100k full-model evaluations fit comfortably inside a second.
+
+export interface NpvInputs {
+    global: GlobalParams;
+    solar: SolarSystemParams;
+    handpump: HandpumpParams;
+    revenue: RevenueParams;
+    benefits: BenefitsParams;
+    additionalBenefits: AdditionalBenefitsParams;
+}
+
+// Every numeric model input, with the label used in sensitivity charts
+export const NPV_PARAMS = [
+    { key: 'global.population', label: 'Population' },
+    { key: 'global.populationGrowthRate', label: 'Population growth (%)' },
+    { key: 'global.projectLifespan', label: 'Project lifespan (yrs)', integer: true },
+    { key: 'global.discountRate', label: 'Discount rate (%)' },
+    { key: 'solar.capexDrillingAndCivil', label: 'Solar civils CapEx' },
+    { key: 'solar.capexEquip', label: 'Solar equipment CapEx' },
+    { key: 'solar.opexAnnual', label: 'Solar OpEx' },
+    { key: 'solar.replacementCost', label: 'Solar replacement cost' },
+    { key: 'solar.replacementInterval', label: 'Solar replacement interval', integer: true },
+    { key: 'solar.theftProbability', label: 'Theft probability (%)' },
+    { key: 'handpump.usersPerPump', label: 'Users per handpump' },
+    { key: 'handpump.capexPerUnit', label: 'Handpump CapEx' },
+    { key: 'handpump.opexAnnualPerUnit', label: 'Handpump OpEx' },
+    { key: 'handpump.rehabCostPerUnit', label: 'Handpump rehab cost' },
+    { key: 'handpump.rehabInterval', label: 'Handpump rehab interval', integer: true },
+    { key: 'revenue.tariffSolarPerMonth', label: 'Solar tariff' },
+    { key: 'revenue.tariffHandpumpPerMonth', label: 'Handpump tariff' },
+    { key: 'revenue.collectionEfficiencySolar', label: 'Solar collection (%)' },
+    { key: 'revenue.collectionEfficiencyHandpump', label: 'Handpump collection (%)' },
+    { key: 'revenue.householdSize', label: 'Household size' },
+    { key: 'revenue.carbonCreditPricePerM3', label: 'Carbon credit price' },
+    { key: 'revenue.govtSubsidyFraction', label: 'Govt subsidy (%)' },
+    { key: 'benefits.hourlyWage', label: 'Value of time' },
+    { key: 'benefits.timeSpentBaseline', label: 'Collection time (baseline)' },
+    { key: 'benefits.timeSpentHandpump', label: 'Collection time (handpump)' },
+    { key: 'benefits.timeSpentSolar', label: 'Collection time (solar)' },
+    { key: 'benefits.healthPremiumSolar', label: 'Health premium (solar)' },
+    { key: 'benefits.healthPremiumHandpump', label: 'Health premium (handpump)' },
+    { key: 'additionalBenefits.valueSchool', label: 'Value per school' },
+    { key: 'additionalBenefits.valueClinic', label: 'Value per clinic' },
+    { key: 'additionalBenefits.valueGarden', label: 'Value per garden' },
+    { key: 'additionalBenefits.valueEnergy', label: 'Value of energy' }
+] as const;
+
+export type NpvParamKey = typeof NPV_PARAMS[number]['key'];
+
+export interface NpvParamBatch {
+    size: number;
+    columns: Record<NpvParamKey, Float64Array>;
+}
+
+export interface NpvBatchResult {
+    solarNetValue: Float64Array; // Discounted economic value incl. CapEx (= summary.netEconomicValueSolar)
+    handpumpNetValue: Float64Array;
+    solarCashflow: Float64Array; // Cumulative operational cash flow (= summary.totalSolarFinNPV)
+    handpumpCashflow: Float64Array;
+}
+
+export type ParamDistribution =
+    | { kind: 'uniform', low: number, high: number }
+    | { kind: 'triangular', low: number, mode: number, high: number }
+    | { kind: 'normal', mean: number, sd: number, min?: number, max?: number };
+
+export type NpvDistributions = Partial<Record<NpvParamKey, ParamDistribution>>;
+
+const isInteger = (key: NpvParamKey) => NPV_PARAMS.some(p => p.key === key && 'integer' in p);
+
+export const getParam = (inputs: NpvInputs, key: NpvParamKey): number => {
+    const [group, field] = key.split('.') as [keyof NpvInputs, string];
+    return (inputs[group] as unknown as Record<string, number>)[field] || 0;
+};
+
+// --- Batch construction ---
+export const createParamBatch = (inputs: NpvInputs, size: number): NpvParamBatch => {
+    const columns = {} as Record<NpvParamKey, Float64Array>;
+    NPV_PARAMS.forEach(({ key }) => { columns[key] = new Float64Array(size).fill(getParam(inputs, key)); });
+    return { size, columns };
+};
+
+const sampleOne = (d: ParamDistribution, rng: Rng): number => {
+    if (d.kind === 'uniform') return d.low + (d.high - d.low) * rng();
+    if (d.kind === 'triangular') {
+        const u = rng();
+        const span = d.high - d.low;
+        if (span <= 0) return d.mode;
+        const f = (d.mode - d.low) / span;
+        return u < f
+            ? d.low + Math.sqrt(u * span * (d.mode - d.low))
+            : d.high - Math.sqrt((1 - u) * span * (d.high - d.mode));
+    }
+    // Box-Muller; clamped to the optional bounds
+    const u1 = rng() || Number.MIN_VALUE;
+    const v = d.mean + d.sd * Math.sqrt(-2 * Math.log(u1)) * Math.cos(2 * Math.PI * rng());
+    return Math.min(d.max ?? Infinity, Math.max(d.min ?? -Infinity, v));
+};
+
+// Fills rows [start, end) of every distributed column with independent draws
+export const sampleParamBatch = (batch: NpvParamBatch, distributions: NpvDistributions, rng: Rng, start = 0, end = batch.size) => {
+    (Object.keys(distributions) as NpvParamKey[]).forEach(key => {
+        const d = distributions[key]!;
+        const col = batch.columns[key];
+        const round = isInteger(key);
+        for (let i = start; i < end; i++) {
+            const v = sampleOne(d, rng);
+            col[i] = round ? Math.max(1, Math.round(v)) : v;
+        }
+    });
+};
+
+// Triangular ±spread around each current value; structural counts stay fixed
+const FIXED_KEYS: NpvParamKey[] = ['global.projectLifespan', 'global.population', 'handpump.usersPerPump', 'revenue.householdSize'];
+
+export const defaultDistributions = (inputs: NpvInputs, spread = 0.2): NpvDistributions => {
+    const dists: NpvDistributions = {};
+    NPV_PARAMS.forEach(({ key }) => {
+        if (FIXED_KEYS.includes(key)) return;
+        const v = getParam(inputs, key);
+        if (v === 0) return;
+        if (isInteger(key)) {
+            dists[key] = { kind: 'uniform', low: Math.max(1, v - 1.5), high: v + 1.5 }; // ±1 year after rounding
+        } else {
+            const lo = v * (1 - spread), hi = v * (1 + spread);
+            dists[key] = { kind: 'triangular', low: Math.min(lo, hi), mode: v, high: Math.max(lo, hi) };
+        }
+    });
+    return dists;
+};
+
+// --- The kernel ---
+export const evaluateNpvBatch = (batch: NpvParamBatch, specs: SystemSpecs | null, out?: NpvBatchResult, start = 0, end = batch.size): NpvBatchResult => {
+    const n = batch.size;
+    const res = out || {
+        solarNetValue: new Float64Array(n), handpumpNetValue: new Float64Array(n),
+        solarCashflow: new Float64Array(n), handpumpCashflow: new Float64Array(n)
+    };
+    const c = batch.columns;
+    const pop0 = c['global.population'], growth = c['global.populationGrowthRate'], life = c['global.projectLifespan'], disc = c['global.discountRate'];
+    const sCivil = c['solar.capexDrillingAndCivil'], sEquip = c['solar.capexEquip'], sOpex = c['solar.opexAnnual'];
+    const sRepl = c['solar.replacementCost'], sReplInt = c['solar.replacementInterval'], theftP = c['solar.theftProbability'];
+    const users = c['handpump.usersPerPump'], hCapexUnit = c['handpump.capexPerUnit'], hOpexUnit = c['handpump.opexAnnualPerUnit'];
+    const hRehab = c['handpump.rehabCostPerUnit'], hRehabInt = c['handpump.rehabInterval'];
+    const tariffS = c['revenue.tariffSolarPerMonth'], tariffH = c['revenue.tariffHandpumpPerMonth'];
+    const collS = c['revenue.collectionEfficiencySolar'], collH = c['revenue.collectionEfficiencyHandpump'];
+    const hhSize = c['revenue.householdSize'], carbonPrice = c['revenue.carbonCreditPricePerM3'], subsidy = c['revenue.govtSubsidyFraction'];
+    const wage = c['benefits.hourlyWage'], tBase = c['benefits.timeSpentBaseline'], tHand = c['benefits.timeSpentHandpump'], tSolar = c['benefits.timeSpentSolar'];
+    const healthS = c['benefits.healthPremiumSolar'], healthH = c['benefits.healthPremiumHandpump'];
+    const vSchool = c['additionalBenefits.valueSchool'], vClinic = c['additionalBenefits.valueClinic'];
+    const vGarden = c['additionalBenefits.valueGarden'], vEnergy = c['additionalBenefits.valueEnergy'];
+
+    for (let i = start; i < end; i++) {
+        const solarCapex = sCivil[i] + sEquip[i];
+        const pumps = Math.ceil(pop0[i] / users[i]);
+        const annualVolumeM3 = specs ? specs.dailyDemandM3 * 365 : pop0[i] * 30 / 1000 * 365;
+        const carbonRev = annualVolumeM3 * carbonPrice[i];
+        const theftCost = solarCapex * (theftP[i] / 100);
+        const solarAdd = specs
+            ? specs.countSchools * vSchool[i] + specs.countClinics * vClinic[i] + specs.countGardens * vGarden[i] + (specs.hasGrid ? vEnergy[i] : 0)
+            : 0;
+        const tariffSPerPerson = tariffS[i] * 12 * (collS[i] / 100) / hhSize[i];
+        const tariffHPerPerson = tariffH[i] * 12 * (collH[i] / 100) / hhSize[i];
+        const subsidyShare = subsidy[i] / 100;
+        const solarTimePerPerson = ((tBase[i] - tSolar[i]) / 60) * 365 * wage[i] * 0.5;
+        const hpTimePerPerson = ((tBase[i] - tHand[i]) / 60) * 365 * wage[i] * 0.5;
+        const hOpexYear = pumps * hOpexUnit[i], hRehabCost = pumps * hRehab[i];
+        const g = 1 + growth[i] / 100, r = 1 + disc[i] / 100;
+        const years = life[i], replInt = sReplInt[i], rehabInt = hRehabInt[i];
+
+        let pop = pop0[i], df = 1;
+        let sCum = 0, hCum = 0;
+        let sNet = -solarCapex, hNet = -(pumps * hCapexUnit[i]);
+        for (let year = 1; year <= years; year++) {
+            pop *= g;
+            df *= r;
+            const sCost = sOpex[i] + (year % replInt === 0 ? sRepl[i] : 0);
+            const hCost = hOpexYear + (year % rehabInt === 0 ? hRehabCost : 0);
+            const tariffRev = pop * tariffSPerPerson;
+            const sRev = tariffRev + carbonRev + tariffRev * subsidyShare;
+            const hRev = pop * tariffHPerPerson;
+            sCum += sRev - sCost;
+            hCum += hRev - hCost;
+            const sTime = Math.max(0, solarTimePerPerson * pop);
+            const hTime = Math.max(0, hpTimePerPerson * pop);
+            sNet += ((tariffRev + sTime + pop * healthS[i] + solarAdd + carbonRev) - (sCost + theftCost)) / df;
+            hNet += ((hRev + hTime + pop * healthH[i]) - hCost) / df;
+        }
+        res.solarNetValue[i] = sNet;
+        res.handpumpNetValue[i] = hNet;
+        res.solarCashflow[i] = sCum;
+        res.handpumpCashflow[i] = hCum;
+    }
+    return res;
+};
+
+// Solar minus handpump for the chosen metric
+export const npvDifferential = (res: NpvBatchResult, metric: SimMetric, i: number): number =>
+    metric === 'financial' ? res.solarCashflow[i] - res.handpumpCashflow[i] : res.solarNetValue[i] - res.handpumpNetValue[i];
+
+// --- Full-model Monte Carlo (same step/progress/finish contract as createMonteCarloRun) ---
+export interface FullModelOptions {
+    iterations: number;
+    seed: number;
+    bins: number;
+    earlyStop: boolean;
+    targetHalfWidth: number;
+    minIterations: number;
+    distributions?: NpvDistributions; // Defaults to ±20% triangular on every non-structural input
+}
+
+export const createFullModelRun = (inputs: NpvInputs, specs: SystemSpecs | null, metric: SimMetric, options: Partial<FullModelOptions> = {}) => {
+    const opts: FullModelOptions = { iterations: 10000, seed: DEFAULT_SEED, bins: 40, earlyStop: false, targetHalfWidth: 0.5, minIterations: 10000, ...options };
+    const total = Math.max(1, Math.floor(opts.iterations));
+    const distributions = opts.distributions || defaultDistributions(inputs);
+    // Inputs and outputs are held for one step at a time and reused; only the differential
+    // outlives a step, since the histogram and quantiles need every value
+    let batch: NpvParamBatch | null = null;
+    let out: NpvBatchResult | null = null;
+    const diffs = new Float64Array(total);
+    const rng = createRng(opts.seed);
+    let done = 0, wins = 0, converged = false;
+
+    const progress = (): MonteCarloProgress => {
+        const [lo, hi] = wilsonInterval(wins, done);
+        return { done, total, solarWinRate: done ? wins / done * 100 : 0, halfWidth: (hi - lo) * 50 };
+    };
+
+    return {
+        total,
+
+        step: (count: number): boolean => {
+            const end = Math.min(total, done + count);
+            const n = end - done;
+            if (!batch || batch.size < n) {
+                batch = createParamBatch(inputs, n);
+                out = {
+                    solarNetValue: new Float64Array(n), handpumpNetValue: new Float64Array(n),
+                    solarCashflow: new Float64Array(n), handpumpCashflow: new Float64Array(n)
+                };
+            }
+            sampleParamBatch(batch, distributions, rng, 0, n);
+            evaluateNpvBatch(batch, specs, out!, 0, n);
+            for (let i = 0; i < n; i++) {
+                const d = npvDifferential(out!, metric, i);
+                diffs[done + i] = d;
+                if (d > 0) wins++;
+            }
+            done = end;
+            if (opts.earlyStop && done >= opts.minIterations && done < total && progress().halfWidth <= opts.targetHalfWidth) {
+                converged = true;
+            }
+            return converged || done >= total;
+        },
+
+        progress,
+
+        finish: (): SimulationResult => {
+            const values = diffs.subarray(0, done);
+            let min = Infinity, max = -Infinity;
+            for (let i = 0; i < values.length; i++) {
+                if (values[i] < min) min = values[i];
+                if (values[i] > max) max = values[i];
+            }
+            const distribution = buildHistogram(values, opts.bins, min, max);
+            const [lo, hi] = wilsonInterval(wins, done);
+            const p5 = quantile(values, 0.05);
+            const p50 = quantile(values, 0.5);
+            const p95 = quantile(values, 0.95);
+            return {
+                solarWins: wins, handpumpWins: done - wins, solarWinRate: done ? (wins / done) * 100 : 0,
+                distribution, iterations: done, seed: opts.seed, converged,
+                winRateInterval: [lo * 100, hi * 100], p5, p50, p95
+            };
+        }
+    };
+};
+
+// --- Tornado / one-at-a-time sensitivity ---
+export interface TornadoBar {
+    key: NpvParamKey;
+    label: string;
+    lowInput: number;
+    highInput: number;
+    lowOutput: number; // Solar - Handpump differential with this input at its low value
+    highOutput: number;
+    swing: number; // |highOutput - lowOutput|
+}
+
+export interface TornadoResult {
+    baseOutput: number;
+    bars: TornadoBar[]; // Largest swing first
+}
+
+// Low/high value for an input: the distribution's bounds (normal: mean ± 1.645 sd, i.e. P5/P95)
+const distributionRange = (d: ParamDistribution): [number, number] => {
+    if (d.kind === 'normal') {
+        return [Math.max(d.min ?? -Infinity, d.mean - 1.645 * d.sd), Math.min(d.max ?? Infinity, d.mean + 1.645 * d.sd)];
+    }
+    return [d.low, d.high];
+};
+
+export const tornadoSensitivity = (inputs: NpvInputs, specs: SystemSpecs | null, metric: SimMetric, distributions: NpvDistributions = defaultDistributions(inputs)): TornadoResult => {
+    const keys = Object.keys(distributions) as NpvParamKey[];
+    // Row 0 is the base case, then a low and a high row per input, all evaluated in one call
+    const batch = createParamBatch(inputs, 1 + keys.length * 2);
+    const ranges = keys.map(key => {
+        const [lo, hi] = distributionRange(distributions[key]!);
+        return isInteger(key) ? [Math.max(1, Math.round(lo)), Math.round(hi)] : [lo, hi];
+    });
+    keys.forEach((key, k) => {
+        batch.columns[key][1 + k * 2] = ranges[k][0];
+        batch.columns[key][2 + k * 2] = ranges[k][1];
+    });
+    const res = evaluateNpvBatch(batch, specs);
+    const bars = keys.map((key, k) => {
+        const lowOutput = npvDifferential(res, metric, 1 + k * 2);
+        const highOutput = npvDifferential(res, metric, 2 + k * 2);
+        return {
+            key,
+            label: NPV_PARAMS.find(p => p.key === key)!.label,
+            lowInput: ranges[k][0],
+            highInput: ranges[k][1],
+            lowOutput,
+            highOutput,
+            swing: Math.abs(highOutput - lowOutput)
+        };
+    });
+    bars.sort((a, b) => b.swing - a.swing);
+    return { baseOutput: npvDifferential(res, metric, 0), bars };
+};
@@ -0,0 +1,46 @@
+import { FootprintData, packFootprints } from './footprints';
+import { LatLngBox } from './tiles';
+
+// --- OSM buildings from Overpass, one tile at a time ---
+// Shared by the Overpass worker and its main-thread fallback. Overpass returns every way
+// that touches the box, so a building on a tile edge comes back for both tiles; it is kept
+// only by the tile holding its bounds centre (west/south edges inclusive), as the FlatGeobuf
+// cache does, so merged tiles never double-count a building.
+
+const OVERPASS_URL = 'https://overpass-api.de/api/interpreter';
+const QUERY_TIMEOUT_S = 25; // A z15 tile is small enough to answer well inside this
+
+export const overpassBuildingsUrl = (box: LatLngBox) => {
+    const bbox = `${box.south},${box.west},${box.north},${box.east}`;
+    const query = `[out:json][timeout:${QUERY_TIMEOUT_S}];(way["building"](${bbox}););out geom;`;
+    return `${OVERPASS_URL}?data=${encodeURIComponent(query)}`;
+};
+
+export const parseOverpassBuildings = (json: any, box: LatLngBox): FootprintData => {
+    const features: any[] = [];
+    (json?.elements || []).forEach((element: any) => {
+        if (element.type !== 'way' || !Array.isArray(element.geometry) || element.geometry.length < 3) return;
+        let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+        const ring = element.geometry.map((node: any) => {
+            if (node.lon < minX) minX = node.lon; if (node.lon > maxX) maxX = node.lon;
+            if (node.lat < minY) minY = node.lat; if (node.lat > maxY) maxY = node.lat;
+            return [node.lon, node.lat];
+        });
+        const x = (minX + maxX) / 2, y = (minY + maxY) / 2;
+        if (x < box.west || x >= box.east || y < box.south || y >= box.north) return;
+        features.push({ type: 'Feature', properties: {}, geometry: { type: 'Polygon', coordinates: [ring] } });
+    });
+    return packFootprints(features);
+};
+
+// Fetches and packs one box. Throws on HTTP errors (Overpass answers 429/504 when busy), on
+// a query that ran out of time (a 200 whose remark reports it, with partial data) and on
+// abort, so an incomplete tile is never cached.
+export const fetchOverpassBuildings = async (box: LatLngBox, signal?: AbortSignal): Promise<{ data: FootprintData, bytes: number }> => {
+    const res = await fetch(overpassBuildingsUrl(box), { signal });
+    if (!res.ok) throw new Error(`Overpass responded ${res.status}`);
+    const text = await res.text();
+    const json = JSON.parse(text);
+    if (typeof json.remark === 'string' && json.remark.includes('runtime error')) throw new Error(`Overpass: ${json.remark}`);
+    return { data: parseOverpassBuildings(json, box), bytes: text.length };
+};
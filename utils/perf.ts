@@ -0,0 +1,110 @@
+import { PerfDigest } from '../types';
+
+// --- Performance instrumentation ---
+// Hot paths report their duration (plus bytes and item counts where they have them) under a
+// dotted name, e.g. `coverage.classify`. Each name keeps its last PERF_WINDOW samples in a ring
+// buffer, so recording is two performance.now() calls and an array write; percentiles are
+// only computed when something asks for a summary. While the overlay is open, every sample
+// is also emitted as a performance.measure so it shows up in the browser's profiler.
+
+export interface PerfExtra {
+    bytes?: number;
+    items?: number;
+}
+
+export interface PerfSummary {
+    name: string;
+    count: number; // All samples since the last reset, not just the window
+    p50: number;
+    p95: number;
+    max: number;
+    lastMs: number;
+    bytes: number; // Totals since the last reset
+    items: number;
+}
+
+export const PERF_WINDOW = 128;
+
+interface Series {
+    samples: Float64Array;
+    count: number;
+    lastMs: number;
+    bytes: number;
+    items: number;
+}
+
+const series = new Map<string, Series>();
+let measuring = false;
+
+const percentile = (sorted: Float64Array, q: number) =>
+    sorted.length === 0 ? 0 : sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+
+const summarize = (name: string, s: Series): PerfSummary => {
+    const sorted = s.samples.slice(0, Math.min(s.count, PERF_WINDOW)).sort();
+    return {
+        name, count: s.count, p50: percentile(sorted, 0.5), p95: percentile(sorted, 0.95),
+        max: sorted.length ? sorted[sorted.length - 1] : 0, lastMs: s.lastMs, bytes: s.bytes, items: s.items
+    };
+};
+
+const record = (name: string, start: number, extra?: PerfExtra) => {
+    const end = performance.now();
+    const ms = end - start;
+    let s = series.get(name);
+    if (!s) {
+        s = { samples: new Float64Array(PERF_WINDOW), count: 0, lastMs: 0, bytes: 0, items: 0 };
+        series.set(name, s);
+    }
+    s.samples[s.count % PERF_WINDOW] = ms;
+    s.count++;
+    s.lastMs = ms;
+    s.bytes += extra?.bytes ?? 0;
+    s.items += extra?.items ?? 0;
+    if (measuring) {
+        try { performance.measure(name, { start, end, detail: extra }); } catch { /* User Timing L3 unsupported */ }
+    }
+};
+
+export const Perf = {
+    // Starts a sample; call the returned function once the work is done
+    start: (name: string) => {
+        const t0 = performance.now();
+        return (extra?: PerfExtra) => record(name, t0, extra);
+    },
+
+    time: <T>(name: string, fn: () => T, extra?: (result: T) => PerfExtra): T => {
+        const t0 = performance.now();
+        const result = fn();
+        record(name, t0, extra?.(result));
+        return result;
+    },
+
+    // Rejections are recorded too (their duration is still what the user waited)
+    timeAsync: async <T>(name: string, fn: () => Promise<T>, extra?: (result: T) => PerfExtra): Promise<T> => {
+        const t0 = performance.now();
+        try {
+            const result = await fn();
+            record(name, t0, extra?.(result));
+            return result;
+        } catch (e) {
+            record(name, t0);
+            throw e;
+        }
+    },
+
+    summaries: (): PerfSummary[] =>
+        Array.from(series.entries(), ([name, s]) => summarize(name, s)).sort((a, b) => a.name.localeCompare(b.name)),
+
+    digest: (): PerfDigest => {
+        const out: PerfDigest = {};
+        series.forEach((s, name) => {
+            const { count, p50, p95 } = summarize(name, s);
+            out[name] = [count, Math.round(p50 * 10) / 10, Math.round(p95 * 10) / 10];
+        });
+        return out;
+    },
+
+    setMeasuring: (on: boolean) => { measuring = on; },
+
+    reset: () => { series.clear(); }
+};
@@ -0,0 +1,334 @@
+import { AdditionalBenefitsParams, BenefitsParams, GlobalParams, HandpumpParams, HydraulicInputs, ProjectDetails, RevenueParams, SolarSystemParams, VillageLayout } from '../types';
+import { DesignChoice } from './boq';
+import { LatLngPoint } from './networkModel';
+
+// --- Project snapshots: versioned binary container of independently hashed sections ---
+// A file is the magic "SPWP", a format version, then (section id, byte length, payload)
+// records. Readers skip section ids they do not know, so newer sections can be added
+// without bumping the version. Geometry and profile elevations are binary: coordinates are
+// quantized to 1e-7 degrees (~1 cm, the same precision vertexHash keys on) and elevations to
+// centimetres, then delta-encoded as zigzag LEB128 varints, so neighbouring taps and
+// vertices cost a few bytes each. The small parameter groups are stored as UTF-8 JSON.
+
+export const PROJECT_FORMAT_VERSION = 1;
+const MAGIC = [0x53, 0x50, 0x57, 0x50]; // "SPWP"
+const COORD_SCALE = 1e7;
+const ELEV_SCALE = 100;
+
+export type InstitutionType = 'school' | 'clinic' | 'garden' | 'grid';
+const INSTITUTION_TYPES: InstitutionType[] = ['school', 'clinic', 'garden', 'grid'];
+
+export interface DesignNode extends LatLngPoint {
+    elev: number | null;
+}
+
+export interface DesignSnapshot {
+    view: { lat: number, lng: number, zoom: number };
+    borehole: DesignNode | null;
+    tank: DesignNode | null;
+    taps: (DesignNode & { id: string })[];
+    institutions: (LatLngPoint & { id: string, type: InstitutionType })[];
+    mainLines: { id: string, path: LatLngPoint[] }[];
+}
+
+// Ground levels sampled along one pipe ('rising' or a main line id), one per densified vertex
+export interface ProfileSnapshot {
+    lineId: string;
+    elevs: number[];
+}
+
+export interface CoverageSnapshot {
+    bufferDistance: number;
+    peoplePerBuilding: number;
+    servedPop: number;
+    unservedPop: number;
+}
+
+export interface ProjectParams {
+    projectDetails: ProjectDetails;
+    global: GlobalParams;
+    solar: SolarSystemParams;
+    handpump: HandpumpParams;
+    revenue: RevenueParams;
+    benefits: BenefitsParams;
+    additionalBenefits: AdditionalBenefitsParams;
+    layout: VillageLayout;
+    autoScaleSolar: boolean;
+    designApplied: boolean;
+    designChoice?: DesignChoice | null; // Absent in files saved before the design search
+    simulation: { metric: 'economic' | 'financial', iterations: number, seed: number, earlyStop: boolean, model: 'full' | 'summary' };
+}
+
+export type BoqOverrides = Record<string, number>; // BoQ item id -> user-entered rate
+
+export interface ProjectSections {
+    design: DesignSnapshot;
+    profiles: ProfileSnapshot[];
+    inputs: HydraulicInputs;
+    params: ProjectParams;
+    boq: BoqOverrides;
+    coverage: CoverageSnapshot;
+}
+
+export type SectionName = keyof ProjectSections;
+
+// What a freshly mounted map needs to rebuild a design without fetching anything
+export interface RestoredDesign {
+    design: DesignSnapshot;
+    profiles: ProfileSnapshot[];
+    coverage: CoverageSnapshot | null;
+}
+
+export type EncodedSections = Partial<Record<SectionName, Uint8Array>>;
+
+// Ids are part of the file format: never renumber, only append
+const SECTION_IDS: Record<SectionName, number> = { design: 1, profiles: 2, inputs: 3, params: 4, boq: 5, coverage: 6 };
+export const SECTION_NAMES = Object.keys(SECTION_IDS) as SectionName[];
+
+// --- Helper: Growable byte buffer ---
+const createByteWriter = (initial = 256) => {
+    let buf = new Uint8Array(initial);
+    let len = 0;
+    const ensure = (n: number) => {
+        if (len + n <= buf.length) return;
+        const next = new Uint8Array(Math.max(buf.length * 2, len + n));
+        next.set(buf.subarray(0, len));
+        buf = next;
+    };
+    // Unsigned LEB128; plain arithmetic so values up to 2^53 survive (bitwise ops are 32-bit)
+    const uint = (n: number) => {
+        ensure(8);
+        while (n >= 0x80) {
+            buf[len++] = (n % 0x80) | 0x80;
+            n = Math.floor(n / 0x80);
+        }
+        buf[len++] = n;
+    };
+    return {
+        uint,
+        int: (n: number) => uint(n >= 0 ? n * 2 : -n * 2 - 1), // Zigzag
+        bytes: (b: Uint8Array) => { ensure(b.length); buf.set(b, len); len += b.length; },
+        finish: () => buf.slice(0, len)
+    };
+};
+
+const createByteReader = (buf: Uint8Array) => {
+    let pos = 0;
+    const uint = (): number => {
+        let n = 0, scale = 1, b: number;
+        do {
+            if (pos >= buf.length) throw new Error('Project file is truncated');
+            b = buf[pos++];
+            n += (b & 0x7f) * scale;
+            scale *= 0x80;
+        } while (b & 0x80);
+        return n;
+    };
+    return {
+        uint,
+        int: () => { const z = uint(); return z % 2 === 0 ? z / 2 : -(z + 1) / 2; },
+        bytes: (n: number) => {
+            if (pos + n > buf.length) throw new Error('Project file is truncated');
+            pos += n;
+            return buf.subarray(pos - n, pos);
+        }
+    };
+};
+
+type ByteWriter = ReturnType<typeof createByteWriter>;
+type ByteReader = ReturnType<typeof createByteReader>;
+
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+const writeString = (w: ByteWriter, s: string) => { const b = textEncoder.encode(s); w.uint(b.length); w.bytes(b); };
+const readString = (r: ByteReader) => textDecoder.decode(r.bytes(r.uint()));
+
+// --- Helper: Delta coder for a stream of quantized points (state runs across a section) ---
+const createPointWriter = (w: ByteWriter) => {
+    let lat = 0, lng = 0;
+    return (p: LatLngPoint) => {
+        const qLat = Math.round(p.lat * COORD_SCALE), qLng = Math.round(p.lng * COORD_SCALE);
+        w.int(qLat - lat);
+        w.int(qLng - lng);
+        lat = qLat;
+        lng = qLng;
+    };
+};
+
+const createPointReader = (r: ByteReader) => {
+    let lat = 0, lng = 0;
+    return (): LatLngPoint => {
+        lat += r.int();
+        lng += r.int();
+        return { lat: lat / COORD_SCALE, lng: lng / COORD_SCALE };
+    };
+};
+
+// Nullable elevations: 0 is "unknown", otherwise 1 + zigzag delta from the previous known level
+const createElevWriter = (w: ByteWriter) => {
+    let prev = 0;
+    return (elev: number | null) => {
+        if (elev === null || !Number.isFinite(elev)) { w.uint(0); return; }
+        const q = Math.round(elev * ELEV_SCALE);
+        const d = q - prev;
+        w.uint((d >= 0 ? d * 2 : -d * 2 - 1) + 1);
+        prev = q;
+    };
+};
+
+const createElevReader = (r: ByteReader) => {
+    let prev = 0;
+    return (): number | null => {
+        const v = r.uint();
+        if (v === 0) return null;
+        const z = v - 1;
+        prev += z % 2 === 0 ? z / 2 : -(z + 1) / 2;
+        return prev / ELEV_SCALE;
+    };
+};
+
+// --- Section codecs ---
+const encodeDesign = (d: DesignSnapshot): Uint8Array => {
+    const w = createByteWriter(64 + d.taps.length * 16);
+    const point = createPointWriter(w);
+    const elev = createElevWriter(w);
+    point(d.view);
+    w.uint(Math.max(0, Math.round(d.view.zoom)));
+    [d.borehole, d.tank].forEach(node => {
+        w.uint(node ? 1 : 0);
+        if (node) { point(node); elev(node.elev); }
+    });
+    w.uint(d.taps.length);
+    d.taps.forEach(t => { writeString(w, t.id); point(t); elev(t.elev); });
+    w.uint(d.institutions.length);
+    d.institutions.forEach(inst => { writeString(w, inst.id); w.uint(INSTITUTION_TYPES.indexOf(inst.type)); point(inst); });
+    w.uint(d.mainLines.length);
+    d.mainLines.forEach(ml => { writeString(w, ml.id); w.uint(ml.path.length); ml.path.forEach(point); });
+    return w.finish();
+};
+
+const decodeDesign = (buf: Uint8Array): DesignSnapshot => {
+    const r = createByteReader(buf);
+    const point = createPointReader(r);
+    const elev = createElevReader(r);
+    const view = { ...point(), zoom: r.uint() };
+    const [borehole, tank] = [0, 1].map(() => r.uint() ? { ...point(), elev: elev() } : null);
+    const taps = Array.from({ length: r.uint() }, () => {
+        const id = readString(r);
+        return { id, ...point(), elev: elev() };
+    });
+    const institutions = Array.from({ length: r.uint() }, () => {
+        const id = readString(r);
+        const type = INSTITUTION_TYPES[r.uint()] || 'school';
+        return { id, type, ...point() };
+    });
+    const mainLines = Array.from({ length: r.uint() }, () => {
+        const id = readString(r);
+        return { id, path: Array.from({ length: r.uint() }, point) };
+    });
+    return { view, borehole, tank, taps, institutions, mainLines };
+};
+
+const encodeProfiles = (profiles: ProfileSnapshot[]): Uint8Array => {
+    const w = createByteWriter();
+    w.uint(profiles.length);
+    profiles.forEach(p => {
+        writeString(w, p.lineId);
+        w.uint(p.elevs.length);
+        const elev = createElevWriter(w);
+        p.elevs.forEach(elev);
+    });
+    return w.finish();
+};
+
+const decodeProfiles = (buf: Uint8Array): ProfileSnapshot[] => {
+    const r = createByteReader(buf);
+    return Array.from({ length: r.uint() }, () => {
+        const lineId = readString(r);
+        const n = r.uint();
+        const elev = createElevReader(r);
+        return { lineId, elevs: Array.from({ length: n }, () => elev() ?? 0) };
+    });
+};
+
+const encodeJson = (value: unknown) => textEncoder.encode(JSON.stringify(value));
+const decodeJson = (buf: Uint8Array) => JSON.parse(textDecoder.decode(buf));
+
+export const encodeSection = <K extends SectionName>(name: K, value: ProjectSections[K]): Uint8Array => {
+    if (name === 'design') return encodeDesign(value as DesignSnapshot);
+    if (name === 'profiles') return encodeProfiles(value as ProfileSnapshot[]);
+    return encodeJson(value);
+};
+
+export const decodeSection = <K extends SectionName>(name: K, buf: Uint8Array): ProjectSections[K] => {
+    if (name === 'design') return decodeDesign(buf) as ProjectSections[K];
+    if (name === 'profiles') return decodeProfiles(buf) as ProjectSections[K];
+    return decodeJson(buf);
+};
+
+export const encodeSections = (sections: Partial<ProjectSections>): EncodedSections => {
+    const out: EncodedSections = {};
+    SECTION_NAMES.forEach(name => {
+        if (sections[name] !== undefined) out[name] = encodeSection(name, sections[name]!);
+    });
+    return out;
+};
+
+// A section that fails to decode is dropped rather than failing the whole project
+export const decodeSections = (encoded: EncodedSections): Partial<ProjectSections> => {
+    const out: Partial<ProjectSections> = {};
+    SECTION_NAMES.forEach(name => {
+        const buf = encoded[name];
+        if (!buf) return;
+        try {
+            (out as any)[name] = decodeSection(name, buf);
+        } catch (e) {
+            console.warn(`Projects: could not decode section ${name}`, e);
+        }
+    });
+    return out;
+};
+
+// FNV-1a over the encoded bytes; equal hashes mean the section does not need rewriting
+export const sectionHash = (buf: Uint8Array): string => {
+    let h = 0x811c9dc5;
+    for (let i = 0; i < buf.length; i++) {
+        h ^= buf[i];
+        h = Math.imul(h, 0x01000193);
+    }
+    return `${(h >>> 0).toString(16).padStart(8, '0')}-${buf.length}`;
+};
+
+// --- Container ---
+export const packProject = (encoded: EncodedSections): Uint8Array => {
+    const w = createByteWriter();
+    w.bytes(new Uint8Array(MAGIC));
+    w.uint(PROJECT_FORMAT_VERSION);
+    const names = SECTION_NAMES.filter(name => encoded[name]);
+    w.uint(names.length);
+    names.forEach(name => {
+        const buf = encoded[name]!;
+        w.uint(SECTION_IDS[name]);
+        w.uint(buf.length);
+        w.bytes(buf);
+    });
+    return w.finish();
+};
+
+export const unpackProject = (file: Uint8Array): EncodedSections => {
+    const r = createByteReader(file);
+    const magic = r.bytes(MAGIC.length);
+    if (MAGIC.some((b, i) => magic[i] !== b)) throw new Error('Not an SPWS project file');
+    const version = r.uint();
+    if (version > PROJECT_FORMAT_VERSION) throw new Error(`Project file version ${version} is newer than this app supports (${PROJECT_FORMAT_VERSION})`);
+    const byId = new Map(SECTION_NAMES.map(name => [SECTION_IDS[name], name]));
+    const out: EncodedSections = {};
+    const count = r.uint();
+    for (let i = 0; i < count; i++) {
+        const name = byId.get(r.uint());
+        const buf = r.bytes(r.uint());
+        if (name) out[name] = buf.slice();
+    }
+    return out;
+};
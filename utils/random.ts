@@ -0,0 +1,25 @@
+// --- Seedable pseudo-random numbers ---
+// Reports must be reproducible, so simulations never use Math.random. mulberry32 is small,
+// fast and has a 2^32 period, which is plenty for the draw counts used here.
+
+export type Rng = () => number;
+
+export const DEFAULT_SEED = 20240601;
+
+// Uniform floats in [0, 1)
+export const createRng = (seed: number): Rng => {
+    let a = seed >>> 0;
+    return () => {
+        a = (a + 0x6D2B79F5) >>> 0;
+        let t = a;
+        t = Math.imul(t ^ (t >>> 15), t | 1);
+        t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+};
+
+export const fillUniform = (rng: Rng, out: Float64Array, lo = 0, hi = 1): Float64Array => {
+    const span = hi - lo;
+    for (let i = 0; i < out.length; i++) out[i] = lo + rng() * span;
+    return out;
+};
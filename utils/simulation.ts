@@ -0,0 +1,17 @@
+import { ComparisonSummary, SystemSpecs } from '../types';
+import { createMonteCarloRun, MonteCarloOptions, SimMetric } from './monteCarlo';
+import { createFullModelRun, NpvDistributions, NpvInputs } from './npvBatch';
+
+// --- Simulation model selection ---
+// 'summary' jitters the aggregate NPV terms of a ComparisonSummary (fast, coarse).
+// 'full' re-runs the year-by-year cash flow for every scenario with sampled inputs.
+
+export type MonteCarloModel =
+    | { kind: 'summary', summary: ComparisonSummary }
+    | { kind: 'full', inputs: NpvInputs, specs: SystemSpecs | null, distributions?: NpvDistributions };
+
+// Both engines share the step / progress / finish contract
+export const createSimulationRun = (model: MonteCarloModel, metric: SimMetric, options: Partial<MonteCarloOptions> = {}) =>
+    model.kind === 'full'
+        ? createFullModelRun(model.inputs, model.specs, metric, { ...options, distributions: model.distributions })
+        : createMonteCarloRun(model.summary, metric, options);
@@ -0,0 +1,204 @@
+// --- Spatial Index: metric uniform grid over points and segments ---
+// Coordinates are projected into a local equirectangular frame (metres) scaled at a
+// reference latitude and bucketed into square cells, so a query only visits the cells
+// overlapping its radius. Final acceptance always uses the exact great-circle distance,
+// which keeps results identical to the brute-force Leaflet `distanceTo` loops.
+
+export const EARTH_RADIUS_M = 6371000; // Same radius as L.CRS.Earth
+const RAD = Math.PI / 180;
+const M_PER_DEG = EARTH_RADIUS_M * RAD;
+
+// Candidate searches are widened by this factor so the flat projection can never
+// exclude a feature whose great-circle distance is inside the radius.
+const SEARCH_MARGIN = 1.05;
+
+// Cell coordinates are offset into positive range and packed into one exact integer key
+const CELL_OFFSET = 1 << 25;
+const CELL_STRIDE = 1 << 26;
+
+// --- Helper: Great-circle distance (same arithmetic as L.CRS.Earth.distance) ---
+export const haversineMeters = (lat1: number, lng1: number, lat2: number, lng2: number): number => {
+    const phi1 = lat1 * RAD;
+    const phi2 = lat2 * RAD;
+    const sinDLat = Math.sin((lat2 - lat1) * RAD / 2);
+    const sinDLon = Math.sin((lng2 - lng1) * RAD / 2);
+    const a = sinDLat * sinDLat + Math.cos(phi1) * Math.cos(phi2) * sinDLon * sinDLon;
+    const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
+    return EARTH_RADIUS_M * c;
+};
+
+// --- Helper: Closest point on segment AB to P (lat/lng degree space, as in SiteMap) ---
+export const closestPointOnSegment = (
+    pLat: number, pLng: number,
+    aLat: number, aLng: number,
+    bLat: number, bLng: number
+): { lat: number, lng: number } => {
+    const C = bLat - aLat;
+    const D = bLng - aLng;
+    const lenSq = C * C + D * D;
+    let param = -1;
+    if (lenSq !== 0) param = ((pLat - aLat) * C + (pLng - aLng) * D) / lenSq;
+    if (param < 0) return { lat: aLat, lng: aLng };
+    if (param > 1) return { lat: bLat, lng: bLng };
+    return { lat: aLat + param * C, lng: aLng + param * D };
+};
+
+export interface NearestSegment {
+    id: number;
+    lat: number;
+    lng: number;
+    dist: number;
+}
+
+export class SpatialGrid {
+    readonly cellSize: number;
+    private readonly kx: number; // metres per degree of longitude at the reference latitude
+
+    private pointCells = new Map<number, number[]>(); // cell key -> point slots
+    private pointCoords: number[] = []; // lat, lng pairs
+    private pointIds: number[] = [];
+
+    private segmentCells = new Map<number, number[]>(); // cell key -> segment slots
+    private segmentCoords: number[] = []; // aLat, aLng, bLat, bLng quads
+    private segmentIds: number[] = [];
+    private segmentSeen = new Uint32Array(0);
+    private queryStamp = 0;
+    private segBounds = { minX: Infinity, maxX: -Infinity, minY: Infinity, maxY: -Infinity };
+
+    constructor(refLat: number, cellSizeM: number) {
+        this.kx = M_PER_DEG * Math.cos(refLat * RAD);
+        this.cellSize = Math.max(1, cellSizeM);
+    }
+
+    get pointCount() { return this.pointIds.length; }
+    get segmentCount() { return this.segmentIds.length; }
+
+    private cellX(lng: number) { return Math.floor(lng * this.kx / this.cellSize); }
+    private cellY(lat: number) { return Math.floor(lat * M_PER_DEG / this.cellSize); }
+    private key(cx: number, cy: number) { return (cx + CELL_OFFSET) * CELL_STRIDE + (cy + CELL_OFFSET); }
+
+    private push(cells: Map<number, number[]>, cx: number, cy: number, slot: number) {
+        const k = this.key(cx, cy);
+        const bucket = cells.get(k);
+        if (bucket) bucket.push(slot); else cells.set(k, [slot]);
+    }
+
+    addPoint(id: number, lat: number, lng: number) {
+        const slot = this.pointIds.length;
+        this.pointIds.push(id);
+        this.pointCoords.push(lat, lng);
+        this.push(this.pointCells, this.cellX(lng), this.cellY(lat), slot);
+    }
+
+    addSegment(id: number, aLat: number, aLng: number, bLat: number, bLng: number) {
+        const slot = this.segmentIds.length;
+        this.segmentIds.push(id);
+        this.segmentCoords.push(aLat, aLng, bLat, bLng);
+        // Register the segment in every cell its bounding box touches
+        const x0 = Math.min(this.cellX(aLng), this.cellX(bLng));
+        const x1 = Math.max(this.cellX(aLng), this.cellX(bLng));
+        const y0 = Math.min(this.cellY(aLat), this.cellY(bLat));
+        const y1 = Math.max(this.cellY(aLat), this.cellY(bLat));
+        for (let cx = x0; cx <= x1; cx++) {
+            for (let cy = y0; cy <= y1; cy++) this.push(this.segmentCells, cx, cy, slot);
+        }
+        const b = this.segBounds;
+        b.minX = Math.min(b.minX, x0); b.maxX = Math.max(b.maxX, x1);
+        b.minY = Math.min(b.minY, y0); b.maxY = Math.max(b.maxY, y1);
+    }
+
+    // Ids of indexed points within radiusM (great-circle) of (lat, lng)
+    pointsWithin(lat: number, lng: number, radiusM: number, out: number[] = []): number[] {
+        this.scanPoints(lat, lng, radiusM, id => { out.push(id); return false; });
+        return out;
+    }
+
+    // True if any indexed point lies within radiusM (great-circle) of (lat, lng)
+    anyPointWithin(lat: number, lng: number, radiusM: number): boolean {
+        return this.scanPoints(lat, lng, radiusM, () => true);
+    }
+
+    // Visits points inside the radius; stops early when the visitor returns true
+    private scanPoints(lat: number, lng: number, radiusM: number, visit: (id: number) => boolean): boolean {
+        if (this.pointIds.length === 0) return false;
+        const r = radiusM * SEARCH_MARGIN + 1;
+        const x = lng * this.kx, y = lat * M_PER_DEG;
+        const cx0 = Math.floor((x - r) / this.cellSize), cx1 = Math.floor((x + r) / this.cellSize);
+        const cy0 = Math.floor((y - r) / this.cellSize), cy1 = Math.floor((y + r) / this.cellSize);
+        const coords = this.pointCoords;
+        for (let cx = cx0; cx <= cx1; cx++) {
+            for (let cy = cy0; cy <= cy1; cy++) {
+                const bucket = this.pointCells.get(this.key(cx, cy));
+                if (!bucket) continue;
+                for (let i = 0; i < bucket.length; i++) {
+                    const s = bucket[i];
+                    if (haversineMeters(lat, lng, coords[s * 2], coords[s * 2 + 1]) <= radiusM) {
+                        if (visit(this.pointIds[s])) return true;
+                    }
+                }
+            }
+        }
+        return false;
+    }
+
+    // Nearest segment within maxRadiusM using the SiteMap closest-point rule. Ties go to the
+    // segment inserted first, matching a sequential `dist < minDist` scan.
+    // Searches outward ring by ring and stops once no unvisited cell can beat the best hit.
+    nearestSegment(lat: number, lng: number, maxRadiusM = Infinity): NearestSegment | null {
+        const n = this.segmentIds.length;
+        if (n === 0) return null;
+        if (this.segmentSeen.length < n) this.segmentSeen = new Uint32Array(Math.max(n, this.segmentSeen.length * 2));
+        const stamp = ++this.queryStamp;
+
+        const pcx = this.cellX(lng), pcy = this.cellY(lat);
+        const b = this.segBounds;
+        const maxRing = Math.max(Math.abs(pcx - b.minX), Math.abs(pcx - b.maxX), Math.abs(pcy - b.minY), Math.abs(pcy - b.maxY));
+        const coords = this.segmentCoords;
+
+        let bestSlot = -1;
+        let bestDist = Infinity;
+        let bestLat = 0, bestLng = 0;
+        let visited = 0;
+
+        const visitCell = (cx: number, cy: number) => {
+            if (cx < b.minX || cx > b.maxX || cy < b.minY || cy > b.maxY) return;
+            const bucket = this.segmentCells.get(this.key(cx, cy));
+            if (!bucket) return;
+            for (let i = 0; i < bucket.length; i++) {
+                const slot = bucket[i];
+                if (this.segmentSeen[slot] === stamp) continue;
+                this.segmentSeen[slot] = stamp;
+                visited++;
+                const s = slot * 4;
+                const cp = closestPointOnSegment(lat, lng, coords[s], coords[s + 1], coords[s + 2], coords[s + 3]);
+                const dist = haversineMeters(lat, lng, cp.lat, cp.lng);
+                if (dist > maxRadiusM) continue;
+                if (dist < bestDist || (dist === bestDist && slot < bestSlot)) {
+                    bestSlot = slot; bestDist = dist; bestLat = cp.lat; bestLng = cp.lng;
+                }
+            }
+        };
+
+        for (let ring = 0; ring <= maxRing && visited < n; ring++) {
+            // Unvisited segments lie entirely outside rings 0..ring-1, so at least (ring - 1) cells away
+            const lowerBound = Math.max(0, ring - 1) * this.cellSize / SEARCH_MARGIN;
+            if (lowerBound > maxRadiusM || lowerBound > bestDist) break;
+
+            if (ring === 0) { visitCell(pcx, pcy); continue; }
+            // Walk only the part of the ring perimeter that overlaps the occupied extent
+            const cxFrom = Math.max(pcx - ring, b.minX), cxTo = Math.min(pcx + ring, b.maxX);
+            const cyFrom = Math.max(pcy - ring + 1, b.minY), cyTo = Math.min(pcy + ring - 1, b.maxY);
+            for (let cx = cxFrom; cx <= cxTo; cx++) {
+                visitCell(cx, pcy - ring);
+                visitCell(cx, pcy + ring);
+            }
+            for (let cy = cyFrom; cy <= cyTo; cy++) {
+                visitCell(pcx - ring, cy);
+                visitCell(pcx + ring, cy);
+            }
+        }
+
+        if (bestSlot < 0) return null;
+        return { id: this.segmentIds[bestSlot], lat: bestLat, lng: bestLng, dist: bestDist };
+    }
+}
@@ -0,0 +1,78 @@
+// --- Minimal external state store ---
+// One state object, replaced (never mutated) on every update. setState keeps the reference of
+// every key whose value did not change, so a component that selects one slice (or one field)
+// only re-renders when that slice changes. React binds to it through hooks/useStore.
+
+type Updater<S> = Partial<S> | ((state: S) => Partial<S>);
+
+export const createStore = <S extends object>(initial: S) => {
+    let state = initial;
+    const listeners = new Set<() => void>();
+
+    return {
+        getState: () => state,
+
+        // Listeners only run when at least one key actually changed
+        setState: (update: Updater<S>) => {
+            const patch = typeof update === 'function' ? update(state) : update;
+            let next: S | null = null;
+            for (const key in patch) {
+                if (Object.is(state[key], patch[key])) continue;
+                next = next ?? { ...state };
+                next[key] = patch[key] as S[typeof key];
+            }
+            if (!next) return;
+            state = next;
+            listeners.forEach(listener => listener());
+        },
+
+        subscribe: (listener: () => void) => {
+            listeners.add(listener);
+            return () => { listeners.delete(listener); };
+        }
+    };
+};
+
+export type Store<S extends object> = ReturnType<typeof createStore<S>>;
+
+// Setter with React's setState signature (value or updater) for one key
+export const createSetter = <S extends object, K extends keyof S>(store: Store<S>, key: K) =>
+    (value: S[K] | ((prev: S[K]) => S[K])) => store.setState(s => {
+        const patch: Partial<S> = {};
+        patch[key] = typeof value === 'function' ? (value as (prev: S[K]) => S[K])(s[key]) : value;
+        return patch;
+    });
+
+export const shallowEqual = <T>(a: T, b: T) => {
+    if (Object.is(a, b)) return true;
+    if (typeof a !== 'object' || typeof b !== 'object' || !a || !b) return false;
+    const ka = Object.keys(a) as (keyof T)[];
+    if (ka.length !== Object.keys(b).length) return false;
+    return ka.every(k => Object.is(a[k], b[k]));
+};
+
+// --- Helper: Derived value memoized on the exact inputs it reads ---
+// `inputs` picks the fields (not whole objects) the computation depends on; `compute` only
+// runs again when one of them changes. The last result is shared by every caller.
+export const createSelector = <S, D extends readonly unknown[], R>(inputs: (state: S) => readonly [...D], compute: (...deps: D) => R) => {
+    let lastDeps: readonly unknown[] | null = null;
+    let lastResult: R;
+    return (state: S): R => {
+        const deps = inputs(state);
+        if (lastDeps && deps.length === lastDeps.length && deps.every((d, i) => Object.is(d, lastDeps![i]))) return lastResult;
+        lastDeps = deps;
+        lastResult = compute(...(deps as D));
+        return lastResult;
+    };
+};
+
+// --- Helper: Keep the previous selection while `same` says nothing relevant changed ---
+// For inputs where only some fields matter: a new object that agrees on them is not a change.
+export const createStableSelector = <S, T>(select: (state: S) => T, same: (prev: T, next: T) => boolean) => {
+    let last: { value: T } | null = null;
+    return (state: S): T => {
+        const next = select(state);
+        if (!last || (next !== last.value && !same(last.value, next))) last = { value: next };
+        return last.value;
+    };
+};
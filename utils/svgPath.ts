@@ -0,0 +1,177 @@
+// --- SVG path data → absolute moves, lines and cubic Béziers ---
+// PDF path operators only know straight lines and cubics, so relative commands, H/V,
+// shorthand and quadratic curves and elliptical arcs are all normalised here. Recharts emits
+// M/L/C/A/Z (arcs for rounded bars and dots); the rest covers icons and map overlays.
+
+export type PathSegment =
+    | { op: 'M' | 'L', x: number, y: number }
+    | { op: 'C', x1: number, y1: number, x2: number, y2: number, x: number, y: number }
+    | { op: 'Z' };
+
+const ARGS: Record<string, number> = { M: 2, L: 2, H: 1, V: 1, C: 6, S: 4, Q: 4, T: 2, A: 7, Z: 0 };
+const NUMBER = /^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?/;
+
+// --- Helper: Split path data into commands with numeric arguments. Arc flags are single
+// characters and may be written without separators ("a1 1 0 011 1"). ---
+const tokenize = (d: string): { cmd: string, args: number[] }[] => {
+    const out: { cmd: string, args: number[] }[] = [];
+    let i = 0;
+    let current: { cmd: string, args: number[] } | null = null;
+    while (i < d.length) {
+        const ch = d[i];
+        if (/[\s,]/.test(ch)) { i++; continue; }
+        if (/[a-zA-Z]/.test(ch)) {
+            if (ARGS[ch.toUpperCase()] === undefined) break; // Unknown command: stop, as browsers do
+            current = { cmd: ch, args: [] };
+            out.push(current);
+            i++;
+            continue;
+        }
+        if (!current) break;
+        const isFlag = current.cmd.toUpperCase() === 'A' && [3, 4].includes(current.args.length % 7);
+        if (isFlag && (ch === '0' || ch === '1')) { current.args.push(ch === '1' ? 1 : 0); i++; continue; }
+        const m = NUMBER.exec(d.slice(i, i + 64));
+        if (!m) break;
+        current.args.push(parseFloat(m[0]));
+        i += m[0].length;
+    }
+    return out;
+};
+
+// --- Helper: Elliptical arc (SVG endpoint parameterisation) as cubic Béziers of at most
+// 90° each. See SVG 1.1 implementation notes F.6.5. ---
+const arcToCubics = (
+    x1: number, y1: number, rxIn: number, ryIn: number, angleDeg: number,
+    largeArc: boolean, sweep: boolean, x2: number, y2: number
+): PathSegment[] => {
+    if (x1 === x2 && y1 === y2) return [];
+    let rx = Math.abs(rxIn), ry = Math.abs(ryIn);
+    if (rx === 0 || ry === 0) return [{ op: 'L', x: x2, y: y2 }];
+
+    const phi = angleDeg * Math.PI / 180;
+    const cos = Math.cos(phi), sin = Math.sin(phi);
+    const dx = (x1 - x2) / 2, dy = (y1 - y2) / 2;
+    const xp = cos * dx + sin * dy;
+    const yp = -sin * dx + cos * dy;
+
+    // Scale up radii that are too small to span the endpoints
+    const lambda = (xp * xp) / (rx * rx) + (yp * yp) / (ry * ry);
+    if (lambda > 1) { rx *= Math.sqrt(lambda); ry *= Math.sqrt(lambda); }
+
+    const num = rx * rx * ry * ry - rx * rx * yp * yp - ry * ry * xp * xp;
+    const den = rx * rx * yp * yp + ry * ry * xp * xp;
+    const coef = (largeArc === sweep ? -1 : 1) * Math.sqrt(Math.max(0, num / den));
+    const cxp = coef * rx * yp / ry;
+    const cyp = -coef * ry * xp / rx;
+    const cx = cos * cxp - sin * cyp + (x1 + x2) / 2;
+    const cy = sin * cxp + cos * cyp + (y1 + y2) / 2;
+
+    const angle = (ux: number, uy: number, vx: number, vy: number) => Math.atan2(ux * vy - uy * vx, ux * vx + uy * vy);
+    const theta1 = angle(1, 0, (xp - cxp) / rx, (yp - cyp) / ry);
+    let delta = angle((xp - cxp) / rx, (yp - cyp) / ry, (-xp - cxp) / rx, (-yp - cyp) / ry);
+    if (!sweep && delta > 0) delta -= 2 * Math.PI;
+    if (sweep && delta < 0) delta += 2 * Math.PI;
+
+    const pieces = Math.max(1, Math.ceil(Math.abs(delta) / (Math.PI / 2) - 1e-9));
+    const step = delta / pieces;
+    const k = 4 / 3 * Math.tan(step / 4);
+    // Unit-circle point → ellipse point
+    const map = (ux: number, uy: number) => ({ x: cx + rx * ux * cos - ry * uy * sin, y: cy + rx * ux * sin + ry * uy * cos });
+    const out: PathSegment[] = [];
+    for (let p = 0, t = theta1; p < pieces; p++, t += step) {
+        const t2 = t + step;
+        const a = map(Math.cos(t) - k * Math.sin(t), Math.sin(t) + k * Math.cos(t));
+        const b = map(Math.cos(t2) + k * Math.sin(t2), Math.sin(t2) - k * Math.cos(t2));
+        const end = p === pieces - 1 ? { x: x2, y: y2 } : map(Math.cos(t2), Math.sin(t2));
+        out.push({ op: 'C', x1: a.x, y1: a.y, x2: b.x, y2: b.y, x: end.x, y: end.y });
+    }
+    return out;
+};
+
+export const parsePathData = (d: string): PathSegment[] => {
+    const out: PathSegment[] = [];
+    let x = 0, y = 0; // Current point
+    let sx = 0, sy = 0; // Subpath start
+    let cx = 0, cy = 0; // Last control point, for S/T reflection
+    let prev = '';
+
+    tokenize(d).forEach(({ cmd, args }) => {
+        const upper = cmd.toUpperCase();
+        const rel = cmd !== upper;
+        const n = ARGS[upper];
+        if (n === 0) {
+            out.push({ op: 'Z' });
+            x = sx; y = sy;
+            prev = 'Z';
+            return;
+        }
+        for (let i = 0; i + n <= args.length; i += n) {
+            const a = args.slice(i, i + n);
+            const ox = rel ? x : 0, oy = rel ? y : 0;
+            // Extra coordinate pairs after a moveto are implicit linetos
+            const op = upper === 'M' && i > 0 ? 'L' : upper;
+            switch (op) {
+                case 'M':
+                    x = sx = a[0] + ox; y = sy = a[1] + oy;
+                    out.push({ op: 'M', x, y });
+                    break;
+                case 'L':
+                    x = a[0] + ox; y = a[1] + oy;
+                    out.push({ op: 'L', x, y });
+                    break;
+                case 'H':
+                    x = a[0] + ox;
+                    out.push({ op: 'L', x, y });
+                    break;
+                case 'V':
+                    y = a[0] + oy;
+                    out.push({ op: 'L', x, y });
+                    break;
+                case 'C':
+                    out.push({ op: 'C', x1: a[0] + ox, y1: a[1] + oy, x2: a[2] + ox, y2: a[3] + oy, x: a[4] + ox, y: a[5] + oy });
+                    cx = a[2] + ox; cy = a[3] + oy; x = a[4] + ox; y = a[5] + oy;
+                    break;
+                case 'S': {
+                    const smooth = prev === 'C' || prev === 'S';
+                    const x1 = smooth ? 2 * x - cx : x, y1 = smooth ? 2 * y - cy : y;
+                    out.push({ op: 'C', x1, y1, x2: a[0] + ox, y2: a[1] + oy, x: a[2] + ox, y: a[3] + oy });
+                    cx = a[0] + ox; cy = a[1] + oy; x = a[2] + ox; y = a[3] + oy;
+                    break;
+                }
+                case 'Q':
+                case 'T': {
+                    let qx: number, qy: number, ex: number, ey: number;
+                    if (op === 'Q') { qx = a[0] + ox; qy = a[1] + oy; ex = a[2] + ox; ey = a[3] + oy; }
+                    else {
+                        const smooth = prev === 'Q' || prev === 'T';
+                        qx = smooth ? 2 * x - cx : x; qy = smooth ? 2 * y - cy : y; ex = a[0] + ox; ey = a[1] + oy;
+                    }
+                    // Degree elevation: a quadratic is a cubic with controls 2/3 of the way to Q
+                    out.push({ op: 'C', x1: x + 2 / 3 * (qx - x), y1: y + 2 / 3 * (qy - y), x2: ex + 2 / 3 * (qx - ex), y2: ey + 2 / 3 * (qy - ey), x: ex, y: ey });
+                    cx = qx; cy = qy; x = ex; y = ey;
+                    break;
+                }
+                case 'A': {
+                    const ex = a[5] + ox, ey = a[6] + oy;
+                    out.push(...arcToCubics(x, y, a[0], a[1], a[2], a[3] !== 0, a[4] !== 0, ex, ey));
+                    x = ex; y = ey;
+                    break;
+                }
+            }
+            prev = op;
+        }
+    });
+    return out;
+};
+
+// Shapes as path data, so everything goes through the same emitter
+export const rectPath = (x: number, y: number, w: number, h: number) => `M${x},${y}H${x + w}V${y + h}H${x}Z`;
+export const ellipsePath = (cx: number, cy: number, rx: number, ry: number) =>
+    `M${cx - rx},${cy}A${rx},${ry} 0 1 0 ${cx + rx},${cy}A${rx},${ry} 0 1 0 ${cx - rx},${cy}Z`;
+export const pointsPath = (points: string, close: boolean) => {
+    const nums = (points.match(/[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?/g) ?? []).map(Number);
+    if (nums.length < 4) return '';
+    let d = `M${nums[0]},${nums[1]}`;
+    for (let i = 2; i + 1 < nums.length; i += 2) d += `L${nums[i]},${nums[i + 1]}`;
+    return close ? d + 'Z' : d;
+};
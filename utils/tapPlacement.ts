@@ -0,0 +1,245 @@
+import { buildServiceIndex, COVERAGE_SERVED, classifyCoverageRange } from './coverage';
+import { LatLngPoint } from './networkModel';
+import { EARTH_RADIUS_M, haversineMeters, SpatialGrid } from './spatialIndex';
+
+// --- Tap placement: maximum coverage over sites along the mains ---
+// Candidate sites are sampled along the drawn main lines, on the line and offset to either
+// side up to the allowed tap-to-main distance. Each candidate covers the buildings within
+// the service buffer that no existing tap or institution already serves. Taps are chosen
+// greedily by marginal gain (lazy evaluation: gains only shrink, so a stale heap entry is
+// an upper bound and only the top one is ever re-checked), then improved by swapping a
+// chosen tap for an unchosen candidate while that strictly increases coverage.
+//
+// Cover sets are held both ways (candidate -> buildings, building -> candidates), so
+// choosing or dropping a tap updates exactly the gains it affects instead of rescoring.
+
+export interface TapPlacementOptions {
+    bufferDistance: number; // m; a building this close to a tap is served
+    maxTapToMain: number; // m; candidates are offset from the mains by at most this
+    budget?: number; // New taps allowed (default: as many as still add coverage)
+    targetCoverage?: number; // Stop once this fraction (0-1) of all buildings is served
+    candidateSpacing?: number; // m along the mains (default: half the buffer)
+}
+
+export interface TapPlacementResult {
+    taps: LatLngPoint[];
+    newlyServed: number; // Buildings served by the new taps only
+    served: number; // Buildings served including existing taps and institutions
+    total: number;
+    candidates: number; // Sites that could serve at least one building
+    swaps: number; // Improvements made by the refinement passes
+}
+
+const MAX_CANDIDATES = 2000; // Spacing widens on long networks to stay under this
+const MIN_SPACING_M = 5;
+const MAX_SWAP_PASSES = 4;
+const RAD = Math.PI / 180;
+const M_PER_DEG = EARTH_RADIUS_M * RAD;
+
+// --- Helper: Sites along each main, on the line and offset perpendicular to it ---
+export const sampleTapCandidates = (mains: LatLngPoint[][], spacingM: number, maxOffsetM: number): Float64Array => {
+    const offsets = maxOffsetM >= 2 * MIN_SPACING_M ? [0, maxOffsetM / 2, -maxOffsetM / 2, maxOffsetM, -maxOffsetM]
+        : maxOffsetM > 0 ? [0, maxOffsetM, -maxOffsetM] : [0];
+    let length = 0;
+    mains.forEach(path => {
+        for (let i = 1; i < path.length; i++) length += haversineMeters(path[i - 1].lat, path[i - 1].lng, path[i].lat, path[i].lng);
+    });
+    const spacing = Math.max(spacingM, MIN_SPACING_M, length * offsets.length / MAX_CANDIDATES);
+
+    const out: number[] = [];
+    mains.forEach(path => {
+        let start = 0, next = 0; // Chainage at the segment start, and of the next sample
+        for (let i = 1; i < path.length; i++) {
+            const a = path[i - 1], b = path[i];
+            const segLen = haversineMeters(a.lat, a.lng, b.lat, b.lng);
+            if (segLen === 0) continue;
+            // Unit normal in a local metric frame
+            const kx = M_PER_DEG * Math.cos(((a.lat + b.lat) / 2) * RAD);
+            const dx = (b.lng - a.lng) * kx, dy = (b.lat - a.lat) * M_PER_DEG;
+            const norm = Math.hypot(dx, dy);
+            const nx = -dy / norm, ny = dx / norm;
+            for (; next <= start + segLen; next += spacing) {
+                const t = (next - start) / segLen;
+                const lat = a.lat + (b.lat - a.lat) * t, lng = a.lng + (b.lng - a.lng) * t;
+                offsets.forEach(o => out.push(lat + (ny * o) / M_PER_DEG, lng + (nx * o) / kx));
+            }
+            start += segLen;
+        }
+    });
+    return Float64Array.from(out);
+};
+
+// --- Helper: Binary max-heap of candidate ids keyed by (possibly stale) gain ---
+const createGainHeap = (capacity: number) => {
+    const ids = new Int32Array(capacity);
+    const keys = new Float64Array(capacity);
+    let size = 0;
+    const swap = (i: number, j: number) => {
+        const id = ids[i]; ids[i] = ids[j]; ids[j] = id;
+        const k = keys[i]; keys[i] = keys[j]; keys[j] = k;
+    };
+    return {
+        get size() { return size; },
+        push: (id: number, key: number) => {
+            let i = size++;
+            ids[i] = id; keys[i] = key;
+            while (i > 0) {
+                const parent = (i - 1) >> 1;
+                if (keys[parent] >= keys[i]) break;
+                swap(i, parent);
+                i = parent;
+            }
+        },
+        pop: (): [number, number] => {
+            const top: [number, number] = [ids[0], keys[0]];
+            size--;
+            if (size > 0) {
+                ids[0] = ids[size]; keys[0] = keys[size];
+                let i = 0;
+                for (;;) {
+                    const l = 2 * i + 1, r = l + 1;
+                    let m = i;
+                    if (l < size && keys[l] > keys[m]) m = l;
+                    if (r < size && keys[r] > keys[m]) m = r;
+                    if (m === i) break;
+                    swap(i, m);
+                    i = m;
+                }
+            }
+            return top;
+        }
+    };
+};
+
+export const optimizeTapPlacement = (
+    centroids: Float64Array, // [lat, lng] per building
+    mains: LatLngPoint[][],
+    existingPoints: Float64Array, // Taps and institutions kept as they are, [lat, lng] pairs
+    options: TapPlacementOptions
+): TapPlacementResult => {
+    const n = centroids.length / 2;
+    const { bufferDistance, maxTapToMain } = options;
+    const budget = options.budget ?? Infinity;
+    const targetCount = options.targetCoverage !== undefined ? Math.ceil(Math.min(1, options.targetCoverage) * n) : Infinity;
+
+    // 1. Buildings already served stay out of every gain
+    const status = new Uint8Array(n);
+    const served = existingPoints.length > 0
+        ? classifyCoverageRange(buildServiceIndex(existingPoints, bufferDistance), centroids, bufferDistance, status, 0, n)
+        : 0;
+    const empty: TapPlacementResult = { taps: [], newlyServed: 0, served, total: n, candidates: 0, swaps: 0 };
+    if (n === 0 || mains.length === 0 || budget <= 0 || served >= targetCount) return empty;
+
+    const grid = new SpatialGrid(centroids[0], Math.max(bufferDistance, 10));
+    for (let i = 0; i < n; i++) if (status[i] !== COVERAGE_SERVED) grid.addPoint(i, centroids[i * 2], centroids[i * 2 + 1]);
+
+    // 2. Candidate cover sets (CSR), dropping sites that serve nobody new
+    const sites = sampleTapCandidates(mains, options.candidateSpacing ?? bufferDistance / 2, maxTapToMain);
+    const siteIdx: number[] = [];
+    const coverStart: number[] = [0];
+    const coverItems: number[] = [];
+    const hits: number[] = [];
+    for (let s = 0; s < sites.length / 2; s++) {
+        hits.length = 0;
+        grid.pointsWithin(sites[s * 2], sites[s * 2 + 1], bufferDistance, hits);
+        if (hits.length === 0) continue;
+        siteIdx.push(s);
+        for (let k = 0; k < hits.length; k++) coverItems.push(hits[k]);
+        coverStart.push(coverItems.length);
+    }
+    const m = siteIdx.length;
+    if (m === 0) return empty;
+
+    // Inverse lists: building -> candidates covering it
+    const invStart = new Uint32Array(n + 1);
+    for (let k = 0; k < coverItems.length; k++) invStart[coverItems[k] + 1]++;
+    for (let i = 0; i < n; i++) invStart[i + 1] += invStart[i];
+    const invItems = new Uint32Array(coverItems.length);
+    const fill = invStart.slice(0, n);
+    for (let c = 0; c < m; c++) {
+        for (let k = coverStart[c]; k < coverStart[c + 1]; k++) invItems[fill[coverItems[k]]++] = c;
+    }
+
+    // 3. Greedy with lazily re-checked gains
+    const gain = new Int32Array(m); // Uncovered buildings each candidate would serve
+    for (let c = 0; c < m; c++) gain[c] = coverStart[c + 1] - coverStart[c];
+    const coverCount = new Uint16Array(n); // Chosen taps covering each building
+    const chosen = new Uint8Array(m);
+    const picks: number[] = [];
+    let newlyServed = 0;
+
+    const add = (c: number) => {
+        chosen[c] = 1;
+        for (let k = coverStart[c]; k < coverStart[c + 1]; k++) {
+            const b = coverItems[k];
+            if (coverCount[b]++ > 0) continue;
+            newlyServed++;
+            for (let j = invStart[b]; j < invStart[b + 1]; j++) gain[invItems[j]]--;
+        }
+    };
+    const remove = (c: number) => {
+        chosen[c] = 0;
+        for (let k = coverStart[c]; k < coverStart[c + 1]; k++) {
+            const b = coverItems[k];
+            if (--coverCount[b] > 0) continue;
+            newlyServed--;
+            for (let j = invStart[b]; j < invStart[b + 1]; j++) gain[invItems[j]]++;
+        }
+    };
+
+    const heap = createGainHeap(m);
+    for (let c = 0; c < m; c++) heap.push(c, gain[c]);
+    while (heap.size > 0 && picks.length < budget && served + newlyServed < targetCount) {
+        const [c, key] = heap.pop();
+        if (gain[c] <= 0) continue;
+        if (key !== gain[c]) { heap.push(c, gain[c]); continue; } // Stale: re-file at its true gain
+        add(c);
+        picks.push(c);
+    }
+
+    // 4. Swap refinement: replace a tap when some candidate serves more than it alone does
+    const bonus = new Int32Array(m); // Buildings a candidate would pick up once the tap goes
+    const touched: number[] = [];
+    let swaps = 0;
+    for (let pass = 0; pass < MAX_SWAP_PASSES; pass++) {
+        let improved = false;
+        for (let p = 0; p < picks.length; p++) {
+            const t = picks[p];
+            let loss = 0;
+            for (let k = coverStart[t]; k < coverStart[t + 1]; k++) {
+                const b = coverItems[k];
+                if (coverCount[b] !== 1) continue;
+                loss++;
+                for (let j = invStart[b]; j < invStart[b + 1]; j++) {
+                    const c = invItems[j];
+                    if (bonus[c]++ === 0) touched.push(c);
+                }
+            }
+            let best = -1, bestGain = loss;
+            for (let c = 0; c < m; c++) {
+                if (!chosen[c] && gain[c] + bonus[c] > bestGain) { best = c; bestGain = gain[c] + bonus[c]; }
+            }
+            touched.forEach(c => { bonus[c] = 0; });
+            touched.length = 0;
+            if (best < 0) continue;
+            remove(t);
+            add(best);
+            picks[p] = best;
+            swaps++;
+            improved = true;
+        }
+        if (!improved) break;
+    }
+
+    // 5. Taps left with nothing of their own to serve are dropped
+    const kept = picks.filter(t => {
+        for (let k = coverStart[t]; k < coverStart[t + 1]; k++) if (coverCount[coverItems[k]] === 1) return true;
+        remove(t);
+        return false;
+    });
+
+    return {
+        taps: kept.map(c => ({ lat: sites[siteIdx[c] * 2], lng: sites[siteIdx[c] * 2 + 1] })),
+        newlyServed, served: served + newlyServed, total: n, candidates: m, swaps
+    };
+};
@@ -0,0 +1,63 @@
+// --- Web Mercator (XYZ) tile helpers ---
+// Shared by the building-footprint caches so tiles line up with basemap tiles.
+
+export interface TileCoord { z: number; x: number; y: number; }
+
+export interface LatLngBox { south: number; west: number; north: number; east: number; }
+
+const MAX_LAT = 85.05112878;
+
+export const lngToTileX = (lng: number, z: number) => Math.floor((lng + 180) / 360 * (1 << z));
+
+export const latToTileY = (lat: number, z: number) => {
+    const clamped = Math.max(-MAX_LAT, Math.min(MAX_LAT, lat));
+    const rad = clamped * Math.PI / 180;
+    return Math.floor((1 - Math.log(Math.tan(rad) + 1 / Math.cos(rad)) / Math.PI) / 2 * (1 << z));
+};
+
+const tileXToLng = (x: number, z: number) => x / (1 << z) * 360 - 180;
+
+const tileYToLat = (y: number, z: number) => {
+    const n = Math.PI - 2 * Math.PI * y / (1 << z);
+    return 180 / Math.PI * Math.atan(0.5 * (Math.exp(n) - Math.exp(-n)));
+};
+
+export const tileKey = (t: TileCoord) => `${t.z}/${t.x}/${t.y}`;
+
+export const tileBounds = (t: TileCoord): LatLngBox => ({
+    west: tileXToLng(t.x, t.z),
+    east: tileXToLng(t.x + 1, t.z),
+    north: tileYToLat(t.y, t.z),
+    south: tileYToLat(t.y + 1, t.z)
+});
+
+// All tiles at zoom z intersecting the box, ordered from the box centre outwards
+export const tilesInBox = (box: LatLngBox, z: number): TileCoord[] => {
+    const max = (1 << z) - 1;
+    const x0 = Math.max(0, lngToTileX(box.west, z)), x1 = Math.min(max, lngToTileX(box.east, z));
+    const y0 = Math.max(0, latToTileY(box.north, z)), y1 = Math.min(max, latToTileY(box.south, z));
+    const tiles: TileCoord[] = [];
+    for (let x = x0; x <= x1; x++) {
+        for (let y = y0; y <= y1; y++) tiles.push({ z, x, y });
+    }
+    const cx = (x0 + x1) / 2, cy = (y0 + y1) / 2;
+    return tiles.sort((a, b) => ((a.x - cx) ** 2 + (a.y - cy) ** 2) - ((b.x - cx) ** 2 + (b.y - cy) ** 2));
+};
+
+export const tileCountInBox = (box: LatLngBox, z: number) =>
+    (lngToTileX(box.east, z) - lngToTileX(box.west, z) + 1) * (latToTileY(box.south, z) - latToTileY(box.north, z) + 1);
+
+// --- EPSG:3857 metre bounds of a tile (for rasters stored in Web Mercator) ---
+export const MERCATOR_HALF_EXTENT = 20037508.342789244; // pi * 6378137
+
+export interface MercatorBox { minX: number; minY: number; maxX: number; maxY: number; }
+
+export const tileMercatorBounds = (t: TileCoord): MercatorBox => {
+    const size = 2 * MERCATOR_HALF_EXTENT / (1 << t.z);
+    return {
+        minX: -MERCATOR_HALF_EXTENT + t.x * size,
+        maxX: -MERCATOR_HALF_EXTENT + (t.x + 1) * size,
+        maxY: MERCATOR_HALF_EXTENT - t.y * size,
+        minY: MERCATOR_HALF_EXTENT - (t.y + 1) * size
+    };
+};
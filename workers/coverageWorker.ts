@@ -0,0 +1,73 @@
+/// <reference lib="webworker" />
+import { buildServiceIndex, classifyCoverageRange, packCoverageBits } from '../utils/coverage';
+
+// --- Coverage Worker ---
+// Holds the packed building centroids for the active footprint layer and classifies them
+// against the current service points. Work is processed in chunks so a newer request can
+// pre-empt an older one mid-way instead of queueing behind it.
+
+export type CoverageWorkerRequest =
+    | { type: 'dataset', datasetId: number, centroids: Float64Array }
+    | { type: 'classify', requestId: number, datasetId: number, servicePoints: Float64Array, bufferDistance: number };
+
+export interface CoverageWorkerResult {
+    type: 'result';
+    requestId: number;
+    datasetId: number;
+    bits: Uint8Array; // 1 bit per building, set when served
+    servedCount: number;
+    unservedCount: number;
+}
+
+export type CoverageWorkerMessage =
+    | CoverageWorkerResult
+    | { type: 'stale', requestId: number, datasetId: number }; // Dataset replaced before or during the request
+
+const CHUNK_SIZE = 16384;
+
+let datasetId = -1;
+let centroids: Float64Array = new Float64Array(0);
+let latestRequestId = -1;
+
+const yieldToQueue = () => new Promise<void>(resolve => setTimeout(resolve, 0));
+
+const post = (msg: CoverageWorkerMessage, transfer: Transferable[] = []) => (self as unknown as DedicatedWorkerGlobalScope).postMessage(msg, transfer);
+
+const classify = async (req: Extract<CoverageWorkerRequest, { type: 'classify' }>) => {
+    // A dataset message can land at any yield; the request stays on the centroids it started with
+    const points = centroids;
+    const dataset = datasetId;
+    const count = points.length / 2;
+    const status = new Uint8Array(count);
+    let servedCount = 0;
+
+    if (req.servicePoints.length > 0) {
+        const grid = buildServiceIndex(req.servicePoints, req.bufferDistance);
+        for (let start = 0; start < count; start += CHUNK_SIZE) {
+            if (start > 0) {
+                await yieldToQueue();
+                if (req.requestId !== latestRequestId) return; // Superseded
+                if (dataset !== datasetId) return post({ type: 'stale', requestId: req.requestId, datasetId: dataset });
+            }
+            servedCount += classifyCoverageRange(grid, points, req.bufferDistance, status, start, Math.min(count, start + CHUNK_SIZE));
+        }
+    }
+
+    const bits = packCoverageBits(status);
+    post({ type: 'result', requestId: req.requestId, datasetId: dataset, bits, servedCount, unservedCount: count - servedCount }, [bits.buffer]);
+};
+
+self.onmessage = (e: MessageEvent<CoverageWorkerRequest>) => {
+    const msg = e.data;
+    if (msg.type === 'dataset') {
+        datasetId = msg.datasetId;
+        centroids = msg.centroids;
+    } else if (msg.type === 'classify') {
+        latestRequestId = msg.requestId;
+        if (msg.datasetId !== datasetId) { // Dataset replaced since the request was made
+            post({ type: 'stale', requestId: msg.requestId, datasetId: msg.datasetId });
+            return;
+        }
+        classify(msg);
+    }
+};
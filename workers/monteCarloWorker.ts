@@ -0,0 +1,46 @@
+/// <reference lib="webworker" />
+import { SimulationResult } from '../types';
+import { MonteCarloOptions, MonteCarloProgress, SimMetric } from '../utils/monteCarlo';
+import { createSimulationRun, MonteCarloModel } from '../utils/simulation';
+
+// --- Monte Carlo Worker ---
+// Runs the simulation in batches, posting progress after each one. A newer `run` (or a
+// `cancel`) pre-empts the current run at the next batch boundary. A run that throws
+// answers with an `error` message.
+
+export type MonteCarloWorkerRequest =
+    | { type: 'run', requestId: number, model: MonteCarloModel, metric: SimMetric, options: Partial<MonteCarloOptions> }
+    | { type: 'cancel', requestId: number };
+
+export type MonteCarloWorkerMessage =
+    | { type: 'progress', requestId: number, progress: MonteCarloProgress }
+    | { type: 'result', requestId: number, result: SimulationResult }
+    | { type: 'error', requestId: number, message: string };
+
+const BATCH_SIZE = 50000;
+
+let latestRequestId = -1;
+
+const yieldToQueue = () => new Promise<void>(resolve => setTimeout(resolve, 0));
+const post = (msg: MonteCarloWorkerMessage) => (self as unknown as DedicatedWorkerGlobalScope).postMessage(msg);
+
+const run = async (req: Extract<MonteCarloWorkerRequest, { type: 'run' }>) => {
+    try {
+        const sim = createSimulationRun(req.model, req.metric, req.options);
+        while (!sim.step(BATCH_SIZE)) {
+            post({ type: 'progress', requestId: req.requestId, progress: sim.progress() });
+            await yieldToQueue();
+            if (req.requestId !== latestRequestId) return; // Superseded or cancelled
+        }
+        post({ type: 'result', requestId: req.requestId, result: sim.finish() });
+    } catch (e) {
+        // A rejected async run never reaches the page's onerror, so report it
+        post({ type: 'error', requestId: req.requestId, message: e instanceof Error ? e.message : String(e) });
+    }
+};
+
+self.onmessage = (e: MessageEvent<MonteCarloWorkerRequest>) => {
+    const msg = e.data;
+    latestRequestId = msg.requestId;
+    if (msg.type === 'run') run(msg);
+};
@@ -0,0 +1,42 @@
+/// <reference lib="webworker" />
+import { FootprintData } from '../utils/footprints';
+import { fetchOverpassBuildings } from '../utils/overpass';
+import { LatLngBox } from '../utils/tiles';
+
+// --- Overpass Worker ---
+// Fetches OSM building tiles and turns the JSON into packed footprints, so neither the
+// (often multi-megabyte) parse nor the geometry conversion runs on the main thread. Each
+// request can be cancelled, which aborts its fetch.
+
+export type OverpassWorkerRequest =
+    | { type: 'fetch', requestId: number, box: LatLngBox }
+    | { type: 'cancel', requestId: number };
+
+export type OverpassWorkerResult =
+    | { type: 'result', requestId: number, data: FootprintData, bytes: number }
+    | { type: 'error', requestId: number, message: string };
+
+const inFlight = new Map<number, AbortController>();
+
+const post = (msg: OverpassWorkerResult, transfer: Transferable[] = []) =>
+    (self as unknown as DedicatedWorkerGlobalScope).postMessage(msg, transfer);
+
+const load = async (requestId: number, box: LatLngBox) => {
+    const controller = new AbortController();
+    inFlight.set(requestId, controller);
+    try {
+        const { data, bytes } = await fetchOverpassBuildings(box, controller.signal);
+        if (controller.signal.aborted) return;
+        post({ type: 'result', requestId, data, bytes }, [data.xy.buffer, data.ringStart.buffer, data.buildingStart.buffer, data.bbox.buffer, data.centroids.buffer]);
+    } catch (e) {
+        if (!controller.signal.aborted) post({ type: 'error', requestId, message: e instanceof Error ? e.message : String(e) });
+    } finally {
+        inFlight.delete(requestId);
+    }
+};
+
+self.onmessage = (e: MessageEvent<OverpassWorkerRequest>) => {
+    const msg = e.data;
+    if (msg.type === 'fetch') load(msg.requestId, msg.box);
+    else inFlight.get(msg.requestId)?.abort();
+};